@@ -8,6 +8,7 @@ import time
 from typing import Any, Dict, Literal, Optional
 
 from app.agents.graph_state import AgentState
+from app.core.tracing import traced
 from app.agents.graph_nodes import (
     query_splitter_node, intent_router_node, constraint_parser_node, tool_executor_node,
     agent_filter_node, response_formatter_node, synthesize_formatter_node, rule_based_fallback_node,
@@ -43,15 +44,15 @@ def _build_graph() -> Optional["StateGraph"]:
     if not _LANGGRAPH_AVAILABLE: return None
     graph = StateGraph(AgentState)
 
-    graph.add_node("query_splitter", query_splitter_node)
-    graph.add_node("intent_router", intent_router_node)
-    graph.add_node("constraint_parser", constraint_parser_node)
-    graph.add_node("tool_executor", tool_executor_node)
-    graph.add_node("agent_filter", agent_filter_node)
-    graph.add_node("formatter", response_formatter_node)
-    graph.add_node("accumulate", _accumulate_and_route_node)
-    graph.add_node("synthesize", synthesize_formatter_node)
-    graph.add_node("rule_based_fallback", rule_based_fallback_node)
+    graph.add_node("query_splitter", traced("graph.query_splitter")(query_splitter_node))
+    graph.add_node("intent_router", traced("graph.intent_router")(intent_router_node))
+    graph.add_node("constraint_parser", traced("graph.constraint_parser")(constraint_parser_node))
+    graph.add_node("tool_executor", traced("graph.tool_executor")(tool_executor_node))
+    graph.add_node("agent_filter", traced("graph.agent_filter")(agent_filter_node))
+    graph.add_node("formatter", traced("graph.formatter")(response_formatter_node))
+    graph.add_node("accumulate", traced("graph.accumulate")(_accumulate_and_route_node))
+    graph.add_node("synthesize", traced("graph.synthesize")(synthesize_formatter_node))
+    graph.add_node("rule_based_fallback", traced("graph.rule_based_fallback")(rule_based_fallback_node))
 
     graph.set_entry_point("query_splitter")
     graph.add_edge("query_splitter", "intent_router")
@@ -6,8 +6,9 @@ import re
 import time
 import traceback
 import unicodedata
-from typing import Any, Dict, FrozenSet, List, Optional
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
 
+from app.core.tracing import traced
 from app.llm.llm_client import LLMClient
 from app.llm.llm_client import LLMCircuitOpenError, LLMAPIError, LLMTimeoutError
 from app.llm.response_cache import ResponseCache
@@ -17,7 +18,10 @@ from .graph_nodes import (
     format_rule_based_response,
     join_rule_based_segments,
 )
+from .inprocess_tools import tool_session_scope
 from .orchestration_metrics import get_orchestration_metrics
+from .response_stream import emit_delta, streaming_active
+from .semantic_cache import SemanticResponseCache, get_semantic_cache
 from .tools_registry import ToolsRegistry
 
 INTENT_CONF_THRESHOLD = float(os.environ.get("INTENT_CONF_THRESHOLD", "0.6"))
@@ -36,14 +40,16 @@ AGENT_REASONING_TIMEOUT = float(os.environ.get("AGENT_REASONING_TIMEOUT", "50.0"
 AGENT_EXTRACT_MAX_TOKENS = int(os.environ.get("AGENT_EXTRACT_MAX_TOKENS", "64"))
 AGENT_FILTER_MAX_TOKENS = int(os.environ.get("AGENT_FILTER_MAX_TOKENS", "128"))
 OPENAI_GENERATE_TIMEOUT = float(os.environ.get("OPENAI_GENERATE_TIMEOUT", "50.0"))
+# Node 4 writes the answer with LLM token streaming (only on /chat-stream requests)
+NODE4_STREAM_LLM = os.environ.get("NODE4_STREAM_LLM", "false").strip().lower() == "true"
 
 # LangGraph integration mode
 HANDLE_MODE = os.environ.get("AGENT_HANDLE_MODE", "graph").lower()
 
 try:
-    from app.chatbot.tfidf_classifier import TfidfIntentClassifier
+    from app.chatbot.tfidf_classifier import get_intent_classifier
 except ImportError:
-    TfidfIntentClassifier = None
+    get_intent_classifier = None
 
 # Fields to REMOVE from data before sending to Node 4
 _TRIM_FIELDS = frozenset({
@@ -122,6 +128,25 @@ def _strip_constraints(text: str) -> tuple[str, List[str]]:
     return clean, constraint_phrases
 
 
+_CONSTRAINT_PHRASE_REGEX = re.compile(
+    r"(?:tôi\s+)?(?:không\s+muốn|tránh|ngoại\s+trừ|không\s+học|thay\s+vì)[^,;\.]*",
+    re.IGNORECASE,
+)
+
+
+def _split_constraint_phrases(text: str) -> tuple[str, List[str]]:
+    """
+    Tách các cụm 'không muốn / tránh / ngoại trừ ...' khỏi query cho Node-2.
+    Trả về (clean_query, constraint_phrases).
+    """
+    constraint_phrases = [match.group(0).strip() for match in _CONSTRAINT_PHRASE_REGEX.finditer(text)]
+    clean_query = text
+    for phrase in constraint_phrases:
+        clean_query = clean_query.replace(phrase, "")
+    clean_query = re.sub(r"[,;\s]{2,}", " ", clean_query).strip(" ,;") or text
+    return clean_query, constraint_phrases
+
+
 def _safe_json_parse(text: str) -> Dict[str, Any]:
     if not text:
         return {}
@@ -148,11 +173,18 @@ def _normalize_text(text: str) -> str:
 
 
 class AgentOrchestrator:
-    def __init__(self, llm_client: Optional[LLMClient] = None, tools: Optional[ToolsRegistry] = None, cache: Optional[ResponseCache] = None):
+    def __init__(
+        self,
+        llm_client: Optional[LLMClient] = None,
+        tools: Optional[ToolsRegistry] = None,
+        cache: Optional[ResponseCache] = None,
+        semantic_cache: Optional[SemanticResponseCache] = None,
+    ):
         self.llm = llm_client or LLMClient()
         self.tools = tools or ToolsRegistry()
         self.cache = cache or ResponseCache()
-        self.tfidf = TfidfIntentClassifier() if TfidfIntentClassifier else None
+        self.semantic_cache = semantic_cache or get_semantic_cache()
+        self.tfidf = get_intent_classifier() if get_intent_classifier else None
         self.metrics = get_orchestration_metrics()
 
     def _stable_payload(self, value: Any) -> str:
@@ -795,6 +827,7 @@ Ví dụ 3:
             return raw_data
 
     # ── handle() entry point ─────────────────────────────────────────────────
+    @traced("agent.handle")
     async def handle(
         self,
         user_text: str,
@@ -803,11 +836,37 @@ Ví dụ 3:
     ) -> Dict[str, Any]:
         """
         Entry point — LangGraph mode.
+
+        A repeated question whose student data is unchanged is answered from
+        the semantic cache without running the pipeline. In-process tool calls
+        of all segments share one DB session / ChatbotService.
         """
-        if HANDLE_MODE == "graph":
-            return await self._handle_graph(user_text, student_id, conversation_id)
-        else:
-            return await self._handle_linear(user_text, student_id, conversation_id)
+        started_at = time.perf_counter()
+        lookup = await asyncio.to_thread(self.semantic_cache.lookup, user_text, student_id)
+        if lookup is not None and lookup.hit is not None:
+            result = lookup.hit
+            result["debug"] = {**(result.get("debug") or {}), "semantic_cache": "hit"}
+            emit_delta(result.get("text") or "")
+            self._observe_handle_latency(result, started_at, cache_hit=True)
+            return result
+
+        async with tool_session_scope():
+            if HANDLE_MODE == "graph":
+                result = await self._handle_graph(user_text, student_id, conversation_id)
+            else:
+                result = await self._handle_linear(user_text, student_id, conversation_id)
+        if lookup is not None:
+            await asyncio.to_thread(self.semantic_cache.store_result, lookup, result)
+        self._observe_handle_latency(result, started_at, cache_hit=False)
+        return result
+
+    def _observe_handle_latency(self, result: Any, started_at: float, cache_hit: bool) -> None:
+        intent = result.get("intent") if isinstance(result, dict) else None
+        self.metrics.observe_latency(
+            "agent.handle.latency",
+            time.perf_counter() - started_at,
+            labels={"intent": intent or "unknown", "cache_hit": str(cache_hit).lower()},
+        )
 
     async def _handle_graph(
         self,
@@ -1125,6 +1184,7 @@ Ví dụ 3:
             }
         }
 
+    @traced("node1.split")
     async def node1_query_splitter(self, text: str) -> List[str]:
         started_at = time.perf_counter()
         split_regex = re.compile(
@@ -1181,6 +1241,7 @@ Ví dụ 3:
             print(f"[NODE-1:SPLIT] fallback: {exc} -> {len(fallback_segments)} segments")
             return fallback_segments or [text]
 
+    @traced("node4.format")
     async def node4_response_formatter(
         self,
         raw_result: Any,
@@ -1203,7 +1264,22 @@ Ví dụ 3:
             if intent is None and isinstance(raw_result.get("data"), dict):
                 intent = raw_result["data"].get("intent")
 
+        streamed_pieces = 0
+        if NODE4_STREAM_LLM and streaming_active():
+            streamed, streamed_pieces = await self._stream_llm_response(
+                raw_result, instruction, original_query, intent_hints
+            )
+            if streamed is not None:
+                total_ms = (time.perf_counter() - started_at) * 1000
+                self.metrics.observe_latency("node4.latency", total_ms / 1000)
+                return streamed
+
         text = format_rule_based_response(raw_result, intent, original_query or instruction)
+        # After a stream that broke off mid-answer the client already shows part of
+        # the LLM text; appending the rule-based answer to it would read as one
+        # garbled reply. The "done" chunk carries this text and replaces the deltas.
+        if not streamed_pieces:
+            emit_delta(text)
         total_ms = (time.perf_counter() - started_at) * 1000
         self.metrics.observe_latency("node4.latency", total_ms / 1000)
         self.metrics.increment("node4.rule_based_success")
@@ -1214,6 +1290,55 @@ Ví dụ 3:
             "model_used": "rule_based",
         }
 
+    async def _stream_llm_response(
+        self,
+        raw_result: Any,
+        instruction: str,
+        original_query: Optional[str],
+        intent_hints: Optional[List[str]],
+    ) -> Tuple[Optional[Dict[str, Any]], int]:
+        """
+        Node 4 (streaming): write the answer with LLMClient.generate_stream and
+        forward every piece as a delta. Returns (result, pieces emitted); result
+        None → caller uses the rule-based text (error status, empty data, no
+        tokens from the LLM, or the stream failed part-way).
+        """
+        if isinstance(raw_result, dict) and raw_result.get("status") == "error":
+            return None, 0
+        if self._is_data_empty(self._extract_result_data(raw_result)):
+            return None, 0
+
+        prompt = self._build_formatter_prompt(raw_result, instruction, original_query, intent_hints=intent_hints)
+        started_at = time.perf_counter()
+        pieces: List[str] = []
+        try:
+            async for piece in self.llm.generate_stream(
+                prompt,
+                max_tokens=NODE4_GENERATE_MAX_TOKENS,
+                temperature=NODE4_GENERATE_TEMPERATURE,
+                timeout=NODE4_TIMEOUT,
+                top_p=NODE4_GENERATE_TOP_P,
+                repeat_penalty=NODE4_REPEAT_PENALTY,
+            ):
+                pieces.append(piece)
+                emit_delta(piece)
+        except Exception as exc:
+            self.metrics.increment("node4.stream_failure")
+            print(f"[NODE-4:STREAM] failed after {len(pieces)} pieces: {type(exc).__name__}: {exc}")
+            return None, len(pieces)
+
+        text = "".join(pieces).strip()
+        if not text:
+            return None, len(pieces)
+        self.metrics.increment("node4.stream_success")
+        return {
+            "text": text,
+            "from_cache": False,
+            "processing_time_ms": (time.perf_counter() - started_at) * 1000,
+            "model_used": "llm_stream",
+        }, len(pieces)
+
+    @traced("node4.synthesize")
     async def _synthesize_multi_segment(
         self,
         segment_results: List[Dict[str, Any]],
@@ -1232,6 +1357,7 @@ Ví dụ 3:
             formatted_parts.append(format_segment_answer(item.get("segment"), answer, idx))
 
         text = join_rule_based_segments(formatted_parts)
+        emit_delta(text)
         total_ms = (time.perf_counter() - started_at) * 1000
         self.metrics.observe_latency("node4_synthesize.latency", total_ms / 1000)
         self.metrics.increment("node4_synthesize.rule_based_success")
@@ -1243,6 +1369,7 @@ Ví dụ 3:
             "synthesized": True,
         }
 
+    @traced("agent.filter")
     async def _agent_filter(
         self,
         raw_data: Any,
@@ -1279,6 +1406,7 @@ Ví dụ 3:
             return raw_data
         return payload
 
+    @traced("agent.segment")
     async def _execute_segment_parallel(
         self,
         seg: str,
@@ -1357,8 +1485,12 @@ Ví dụ 3:
         print(f"[ORCH] node1_done segments={len(segments)}")
 
         try:
+            tfidf_results = await self.classify_segments_tfidf(segments)
             intent_infos = await asyncio.wait_for(
-                asyncio.gather(*(self.node2_intent_router(seg) for seg in segments)),
+                asyncio.gather(*(
+                    self.node2_intent_router(seg, tfidf_result=tfidf_result)
+                    for seg, tfidf_result in zip(segments, tfidf_results)
+                )),
                 timeout=LLM_REASONING_TIMEOUT,
             )
         except Exception as exc:
@@ -1465,10 +1597,12 @@ Ví dụ 3:
 
         from app.agents.agent_graph import run_graph_for_orchestrator
         try:
-            return await asyncio.wait_for(
+            result = await asyncio.wait_for(
                 run_graph_for_orchestrator(user_text, student_id, conversation_id),
                 timeout=AGENT_REASONING_TIMEOUT,
             )
+            emit_delta(result.get("text") or "")
+            return result
         except Exception as exc:
             print(f"[ORCH:GRAPH] fallback_to_parallel error={exc}")
             self.metrics.increment("agent.graph_error_fallback")
@@ -1500,18 +1634,31 @@ Ví dụ 3:
     ) -> Dict[str, Any]:
         return await self._run_parallel_pipeline(user_text, student_id, conversation_id)
 
-    async def node2_intent_router(self, text: str) -> Dict[str, Any]:
-        started_at = time.perf_counter()
-        constraint_regex = re.compile(
-            r"(?:tôi\s+)?(?:không\s+muốn|tránh|ngoại\s+trừ|không\s+học|thay\s+vì)[^,;\.]*",
-            re.IGNORECASE,
-        )
+    @traced("node2.tfidf_batch")
+    async def classify_segments_tfidf(self, segments: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Chạy TF-IDF cho clean_query của tất cả segment trong một lần classify_batch.
+        Kết quả truyền vào node2_intent_router(seg, tfidf_result=...); None nếu
+        không có classifier / batch lỗi (node2 sẽ tự classify từng segment).
+        """
+        classify_batch = getattr(self.tfidf, "classify_batch", None)
+        if not classify_batch or len(segments) < 2:
+            return [None] * len(segments)
+        try:
+            clean_queries = [_split_constraint_phrases(seg)[0] for seg in segments]
+            return await classify_batch(clean_queries)
+        except Exception as exc:
+            print(f"[NODE-2] TF-IDF batch failed: {exc}")
+            return [None] * len(segments)
 
-        constraint_phrases = [match.group(0).strip() for match in constraint_regex.finditer(text)]
-        clean_query = text
-        for phrase in constraint_phrases:
-            clean_query = clean_query.replace(phrase, "")
-        clean_query = re.sub(r"[,;\s]{2,}", " ", clean_query).strip(" ,;") or text
+    @traced("node2.classify")
+    async def node2_intent_router(
+        self,
+        text: str,
+        tfidf_result: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        started_at = time.perf_counter()
+        clean_query, constraint_phrases = _split_constraint_phrases(text)
 
         exclude_subjects: List[str] = []
         for phrase in constraint_phrases:
@@ -1560,7 +1707,7 @@ Ví dụ 3:
 
         if self.tfidf and clean_query:
             try:
-                tfidf_res = await self.tfidf.classify_intent(clean_query)
+                tfidf_res = tfidf_result or await self.tfidf.classify_intent(clean_query)
                 label = tfidf_res.get("intent", "unknown")
                 score = tfidf_res.get("confidence_score", 0.0)
                 if score >= INTENT_CONF_THRESHOLD:
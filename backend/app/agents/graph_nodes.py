@@ -19,13 +19,13 @@ from app.agents.graph_state import AgentState
 from app.agents.orchestration_metrics import get_orchestration_metrics
 from app.agents.tools_registry import ToolsRegistry
 from app.db.database import SessionLocal
-from app.llm.llm_client import LLMClient
+from app.llm.llm_client import LLMClient, get_llm_client
 from app.services.chatbot_service import format_rule_based_response as _service_format_rule_based_response
 
 try:
-    from app.chatbot.tfidf_classifier import TfidfIntentClassifier
+    from app.chatbot.tfidf_classifier import get_intent_classifier
 except ImportError:
-    TfidfIntentClassifier = None
+    get_intent_classifier = None
 
 try:
     from app.services.query_splitter import get_query_splitter
@@ -272,7 +272,7 @@ _FAST_SPLIT_CONNECTOR_REGEX = re.compile(
 
 _llm_client: Optional[LLMClient] = None
 _tools_registry: Optional[ToolsRegistry] = None
-_tfidf_classifier = TfidfIntentClassifier() if TfidfIntentClassifier else None
+_tfidf_classifier = get_intent_classifier() if get_intent_classifier else None
 _text_preprocessor = get_text_preprocessor() if get_text_preprocessor else None
 _metrics = get_orchestration_metrics()
 
@@ -559,7 +559,7 @@ User query:
 def _get_llm() -> LLMClient:
     global _llm_client
     if _llm_client is None:
-        _llm_client = LLMClient()
+        _llm_client = get_llm_client()
     return _llm_client
 
 
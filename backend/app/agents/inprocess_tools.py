@@ -0,0 +1,175 @@
+"""
+In-process transport for NODE-3 tool calls
+
+By default AGENT_TOOL_MAP points at this same backend
+(http://127.0.0.1:8000/api/agent-tools/intent/<intent>). Going through HTTP
+loopback costs two JSON round-trips, a second DB session and a second
+ChatbotService per segment. When the tool URL targets the local app,
+ToolsRegistry hands the call to call_local_tool(), which awaits the same
+handler coroutines as the routes (run_intent_tool / run_graduation_progress).
+
+Session reuse: inside ``async with tool_session_scope():`` in-process tool
+calls share one Session and one ChatbotService. A Session is not safe for
+concurrent use (some handlers hand it to asyncio.to_thread), so a call that
+starts while another one holds the scope (parallel segments) gets its own
+short-lived session. Outside a scope each call opens and closes its own.
+
+Timeouts: a to_thread worker cannot be cancelled, so a timed-out handler keeps
+running in the background and its session stays busy (not closed, not handed
+to the next call) until the handler has actually finished.
+
+Remote deployments keep the HTTP transport (AGENT_TOOLS_TRANSPORT=http forces
+it for every tool).
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Optional
+from urllib.parse import urlsplit
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+AGENT_TOOLS_TRANSPORT = os.environ.get("AGENT_TOOLS_TRANSPORT", "auto").strip().lower()
+LOCAL_APP_PORT = int(os.environ.get("LOCAL_APP_PORT", os.environ.get("PORT", "8000")))
+
+_LOCAL_HOSTS = {"127.0.0.1", "localhost", "::1", "0.0.0.0"}
+_INTENT_PATH_MARKER = "/agent-tools/intent/"
+
+
+class _ToolScope:
+    def __init__(self, db: Session):
+        self.db = db
+        self.busy = False
+        self.close_when_released = False
+        self._chatbot_service = None
+
+    def release(self) -> None:
+        self.busy = False
+        if self.close_when_released:
+            self.db.close()
+
+    @property
+    def chatbot_service(self):
+        if self._chatbot_service is None:
+            from app.services.chatbot_service import ChatbotService
+            self._chatbot_service = ChatbotService(self.db)
+        return self._chatbot_service
+
+
+_current_scope: ContextVar[Optional[_ToolScope]] = ContextVar("agent_tool_scope", default=None)
+
+
+def local_intent_name(url: str) -> Optional[str]:
+    """Intent name when ``url`` is a NODE-3 endpoint of this app, else None."""
+    parts = urlsplit(url)
+    if parts.hostname not in _LOCAL_HOSTS:
+        return None
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    if port != LOCAL_APP_PORT or _INTENT_PATH_MARKER not in parts.path:
+        return None
+    intent = parts.path.split(_INTENT_PATH_MARKER, 1)[1].strip("/")
+    return intent or None
+
+
+def use_inprocess_transport(url: str, transport: Optional[str] = None) -> bool:
+    mode = (transport or AGENT_TOOLS_TRANSPORT).lower()
+    if mode == "http":
+        return False
+    return local_intent_name(url) is not None
+
+
+@asynccontextmanager
+async def tool_session_scope(db: Optional[Session] = None) -> AsyncIterator[Session]:
+    """
+    Share one Session + ChatbotService across the in-process tool calls made
+    inside the block. A passed-in ``db`` is left open for its owner.
+    """
+    if _current_scope.get() is not None:
+        yield _current_scope.get().db
+        return
+
+    owns_session = db is None
+    if owns_session:
+        from app.db.database import SessionLocal
+        db = SessionLocal()
+    scope = _ToolScope(db)
+    token = _current_scope.set(scope)
+    try:
+        yield db
+    finally:
+        _current_scope.reset(token)
+        if owns_session:
+            if scope.busy:
+                scope.close_when_released = True
+            else:
+                db.close()
+
+
+def _error(category: str, detail: str, http_status: int) -> Dict[str, Any]:
+    return {"status": "error", "error": category, "http_status": http_status, "error_detail": detail}
+
+
+async def _dispatch(intent_name: str, request, scope: _ToolScope):
+    from app.routes.agent_tool_routes import run_graduation_progress, run_intent_tool
+
+    if intent_name == "graduation_progress":
+        return await run_graduation_progress(request, scope.db)
+    return await run_intent_tool(intent_name, request, scope.db, chatbot_service=scope.chatbot_service)
+
+
+def _release_when_finished(task: "asyncio.Future", scope: _ToolScope) -> None:
+    if not task.cancelled():
+        task.exception()  # retrieved so an abandoned failure is not logged as unhandled
+    scope.release()
+
+
+async def _run_with_timeout(intent_name: str, request, scope: _ToolScope, timeout: float):
+    """
+    Await the handler for at most ``timeout`` seconds. The handler itself is
+    shielded: on timeout it runs to completion and ``scope`` is released only then.
+    """
+    scope.busy = True
+    task = asyncio.ensure_future(_dispatch(intent_name, request, scope))
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), timeout=timeout)
+    finally:
+        if task.done():
+            scope.release()
+        else:
+            task.add_done_callback(lambda finished: _release_when_finished(finished, scope))
+
+
+async def call_local_tool(url: str, payload: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    """
+    Run a NODE-3 tool in-process. Returns the same JSON-shaped dict the HTTP
+    route would, or the ToolsRegistry error dict for 404 / 422 / timeout.
+    """
+    from app.agents.tools_registry import _classify_error
+    from app.schemas.node_schemas import Node3ToolExecutorRequest
+
+    intent_name = local_intent_name(url)
+    try:
+        request = Node3ToolExecutorRequest(**payload)
+    except ValidationError as exc:
+        return _error(f"HTTP_422_VALIDATION: Request body invalid for {url}", str(exc)[:200], 422)
+
+    try:
+        scope = _current_scope.get()
+        if scope is None or scope.busy:
+            from app.db.database import SessionLocal
+            scope = _ToolScope(SessionLocal())
+            scope.close_when_released = True
+        response = await _run_with_timeout(intent_name, request, scope, timeout)
+    except HTTPException as exc:
+        category = f"HTTP_404_NOT_FOUND: Endpoint not found {url}" if exc.status_code == 404 else f"HTTP_{exc.status_code}: {exc.detail}"
+        return _error(category, str(exc.detail)[:200], exc.status_code)
+    except asyncio.TimeoutError:
+        return {"status": "error", "error": "TIMEOUT: Request timed out"}
+    except Exception as exc:
+        return {"status": "error", "error": _classify_error(exc)}
+
+    return jsonable_encoder(response)
@@ -1,5 +1,5 @@
 import os
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 
 def _to_float(value: Any, default: float = 0.0) -> float:
@@ -9,16 +9,37 @@ def _to_float(value: Any, default: float = 0.0) -> float:
         return default
 
 
-ALERT_WINDOW_NOTE = "Thresholds are evaluated against current in-memory counters since process start."
+ALERT_WINDOW_NOTE = "Thresholds are evaluated against current in-memory counters and histograms since process start."
 
 ALERT_LLM_TIMEOUT_MIN = float(os.getenv("ALERT_LLM_TIMEOUT_MIN", "5"))
 ALERT_NODE4_FALLBACK_MIN = float(os.getenv("ALERT_NODE4_FALLBACK_MIN", "5"))
 ALERT_TOOLS_FAILURE_MIN = float(os.getenv("ALERT_TOOLS_FAILURE_MIN", "5"))
 ALERT_CIRCUIT_OPEN_MIN = float(os.getenv("ALERT_CIRCUIT_OPEN_MIN", "3"))
-
-
-def evaluate_orchestration_alerts(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+# "<latency key>=<p95 seconds>,..." — any key of snapshot["latency"] can be targeted
+ALERT_P95_SECONDS = os.getenv(
+    "ALERT_P95_SECONDS",
+    "node1.latency=5,node2.latency=5,node4.latency=3,agent.handle.latency=10",
+)
+ALERT_P95_MIN_SAMPLES = int(os.getenv("ALERT_P95_MIN_SAMPLES", "20"))
+
+
+def parse_p95_thresholds(raw: str) -> Dict[str, float]:
+    thresholds: Dict[str, float] = {}
+    for item in (raw or "").split(","):
+        key, _, value = item.partition("=")
+        if key.strip() and value.strip():
+            thresholds[key.strip()] = _to_float(value, default=0.0)
+    return {key: value for key, value in thresholds.items() if value > 0}
+
+
+def evaluate_orchestration_alerts(
+    snapshot: Dict[str, Any],
+    p95_thresholds: Optional[Dict[str, float]] = None,
+) -> Dict[str, Any]:
     counters = snapshot.get("counters", {}) if isinstance(snapshot, dict) else {}
+    latency = snapshot.get("latency", {}) if isinstance(snapshot, dict) else {}
+    if p95_thresholds is None:
+        p95_thresholds = parse_p95_thresholds(ALERT_P95_SECONDS)
 
     llm_timeout_failures = 0.0
     llm_circuit_open = 0.0
@@ -81,6 +102,25 @@ def evaluate_orchestration_alerts(snapshot: Dict[str, Any]) -> Dict[str, Any]:
             }
         )
 
+    p95_summary: Dict[str, float] = {}
+    for key, threshold in p95_thresholds.items():
+        stats = latency.get(key) or {}
+        if _to_float(stats.get("count")) < ALERT_P95_MIN_SAMPLES:
+            continue
+        p95 = _to_float(stats.get("p95_seconds"))
+        p95_summary[key] = p95
+        if p95 >= threshold:
+            active_alerts.append(
+                {
+                    "code": "p95_latency_high",
+                    "severity": "warning",
+                    "key": key,
+                    "value": p95,
+                    "threshold": threshold,
+                    "message": f"p95 latency of {key} is above threshold.",
+                }
+            )
+
     return {
         "status": "alert" if active_alerts else "ok",
         "alerts": active_alerts,
@@ -89,6 +129,7 @@ def evaluate_orchestration_alerts(snapshot: Dict[str, Any]) -> Dict[str, Any]:
             "node4_fallback": node4_fallback,
             "tools_failures": tools_failures,
             "llm_circuit_open": llm_circuit_open,
+            "p95_seconds": p95_summary,
         },
         "note": ALERT_WINDOW_NOTE,
     }
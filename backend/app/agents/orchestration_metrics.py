@@ -1,60 +1,225 @@
 from __future__ import annotations
 
+import re
 import threading
 import time
+from bisect import bisect_left
 from collections import defaultdict
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Histogram upper bounds: 0.5 ms … ~131 s in √2 steps (≤ ~20% bucket width,
+# narrowed further by interpolation and the observed min/max)
+LATENCY_BUCKETS: Tuple[float, ...] = tuple(0.0005 * 2 ** (step / 2) for step in range(37))
+PERCENTILES = (0.5, 0.95, 0.99)
+
+Labels = Tuple[Tuple[str, str], ...]
+SeriesKey = Tuple[str, Labels]
+
+
+def _labels_key(labels: Optional[Dict[str, Any]]) -> Labels:
+    if not labels:
+        return ()
+    return tuple(sorted((str(name), str(value)) for name, value in labels.items()))
+
+
+class LatencyHistogram:
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)  # last slot = +Inf
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, value in enumerate(other.counts):
+            self.counts[index] += value
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, quantile: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = quantile * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if not bucket_count or cumulative + bucket_count < rank:
+                cumulative += bucket_count
+                continue
+            lower = LATENCY_BUCKETS[index - 1] if index > 0 else 0.0
+            upper = LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else self.max
+            lower, upper = max(lower, self.min), min(upper, self.max)
+            fraction = (rank - cumulative) / bucket_count
+            return lower + (upper - lower) * fraction
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        summary = {
+            "count": self.count,
+            "total_seconds": round(self.total, 6),
+            "avg_seconds": round(self.total / self.count, 6) if self.count else 0.0,
+            "max_seconds": round(self.max, 6),
+        }
+        for quantile in PERCENTILES:
+            summary[f"p{int(quantile * 100)}_seconds"] = round(self.percentile(quantile), 6)
+        return summary
 
 
 class OrchestrationMetrics:
+    """
+    Counters and latency histograms keyed by a dotted name plus optional
+    labels (intent, node, tool, cache_hit, ...). One lock guards every write;
+    snapshot() and prometheus_text() copy the series under it and format
+    outside.
+    """
+
     def __init__(self) -> None:
         self._lock = threading.Lock()
-        self._counters = defaultdict(float)
-        self._latency_totals = defaultdict(float)
-        self._latency_counts = defaultdict(int)
-        self._last_observed = {}
+        self._counters: Dict[SeriesKey, float] = defaultdict(float)
+        self._histograms: Dict[SeriesKey, LatencyHistogram] = {}
+        self._last_observed: Dict[str, Any] = {}
 
-    def increment(self, key: str, value: float = 1.0) -> None:
+    def increment(self, key: str, value: float = 1.0, labels: Optional[Dict[str, Any]] = None) -> None:
+        series = (key, _labels_key(labels))
         with self._lock:
-            self._counters[key] += value
+            self._counters[series] += value
 
-    def observe_latency(self, key: str, seconds: float) -> None:
+    def observe_latency(self, key: str, seconds: float, labels: Optional[Dict[str, Any]] = None) -> None:
+        series = (key, _labels_key(labels))
         with self._lock:
-            self._latency_totals[key] += seconds
-            self._latency_counts[key] += 1
+            histogram = self._histograms.get(series)
+            if histogram is None:
+                histogram = self._histograms[series] = LatencyHistogram()
+            histogram.observe(seconds)
             self._last_observed[key] = seconds
 
     def record_event(self, key: str, metadata: Any = None) -> None:
         with self._lock:
-            self._counters[key] += 1.0
+            self._counters[(key, ())] += 1.0
             if metadata is not None:
                 self._last_observed[key] = metadata
 
-    def snapshot(self) -> Dict[str, Any]:
+    def _copy(self) -> Tuple[Dict[SeriesKey, float], Dict[SeriesKey, LatencyHistogram], Dict[str, Any]]:
+        histograms: Dict[SeriesKey, LatencyHistogram] = {}
         with self._lock:
-            latency = {}
-            for key, total in self._latency_totals.items():
-                count = self._latency_counts.get(key, 0)
-                latency[key] = {
-                    "count": count,
-                    "total_seconds": round(total, 6),
-                    "avg_seconds": round(total / count, 6) if count else 0.0,
-                    "last_seconds": round(self._last_observed.get(key, 0.0), 6) if isinstance(self._last_observed.get(key), (int, float)) else None,
-                }
-            return {
-                "counters": dict(self._counters),
-                "latency": latency,
-                "last_observed": dict(self._last_observed),
+            for series, histogram in self._histograms.items():
+                histograms[series] = copied = LatencyHistogram()
+                copied.merge(histogram)
+            return dict(self._counters), histograms, dict(self._last_observed)
+
+    def snapshot(self) -> Dict[str, Any]:
+        counters, histograms, last_observed = self._copy()
+
+        flat_counters: Dict[str, float] = defaultdict(float)
+        counters_by_label: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for (key, labels), value in counters.items():
+            flat_counters[key] += value
+            if labels:
+                counters_by_label[key].append({"labels": dict(labels), "value": value})
+
+        per_key: Dict[str, LatencyHistogram] = {}
+        latency_by_label: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for (key, labels), histogram in histograms.items():
+            per_key.setdefault(key, LatencyHistogram()).merge(histogram)
+            if labels:
+                latency_by_label[key].append({"labels": dict(labels), **histogram.summary()})
+
+        latency = {}
+        for key, histogram in per_key.items():
+            last = last_observed.get(key)
+            latency[key] = {
+                **histogram.summary(),
+                "last_seconds": round(last, 6) if isinstance(last, (int, float)) else None,
             }
+        return {
+            "counters": dict(flat_counters),
+            "latency": latency,
+            "last_observed": last_observed,
+            "counters_by_label": dict(counters_by_label),
+            "latency_by_label": dict(latency_by_label),
+        }
+
+    def prometheus_text(self, namespace: str = "orchestration") -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        counters, histograms, _ = self._copy()
+        lines: List[str] = []
+
+        counter_families: Dict[str, List[Tuple[Labels, float]]] = defaultdict(list)
+        for (key, labels), value in counters.items():
+            family, derived = _prometheus_family(key)
+            counter_families[f"{namespace}_{family}_total"].append((derived + labels, value))
+        for name in sorted(counter_families):
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in sorted(counter_families[name]):
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        histogram_families: Dict[str, List[Tuple[Labels, LatencyHistogram]]] = defaultdict(list)
+        for (key, labels), histogram in histograms.items():
+            family, derived = _prometheus_family(key)
+            histogram_families[f"{namespace}_{family}_seconds"].append((derived + labels, histogram))
+        for name in sorted(histogram_families):
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in sorted(histogram_families[name], key=lambda item: item[0]):
+                cumulative = 0
+                for bound, bucket_count in zip(LATENCY_BUCKETS, histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram.total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
 
     def reset(self) -> None:
         with self._lock:
             self._counters.clear()
-            self._latency_totals.clear()
-            self._latency_counts.clear()
+            self._histograms.clear()
             self._last_observed.clear()
 
 
+# Dotted keys already carry a dimension: node4.latency, tools.grade_view.failure,
+# llm.classify.latency → one Prometheus family with node / tool / operation labels
+_PROMETHEUS_RULES = (
+    (re.compile(r"^(node\d+\w*)\.(\w+)$"), "node_{}", "node"),
+    (re.compile(r"^tools\.([^.]+)\.(\w+)$"), "tool_{}", "tool"),
+    (re.compile(r"^llm\.([^.]+)\.(\w+)$"), "llm_{}", "operation"),
+)
+_INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def _prometheus_family(key: str) -> Tuple[str, Labels]:
+    for pattern, template, label in _PROMETHEUS_RULES:
+        match = pattern.match(key)
+        if match:
+            return _INVALID_NAME_CHARS.sub("_", template.format(match.group(2))), ((label, match.group(1)),)
+    return _INVALID_NAME_CHARS.sub("_", key), ()
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
 _DEFAULT_METRICS = OrchestrationMetrics()
 
 
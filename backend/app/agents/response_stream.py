@@ -0,0 +1,64 @@
+"""
+Partial-response streaming from the agent pipeline to /chat-stream
+
+The route runs AgentOrchestrator.handle() under ``stream_with_deltas()``,
+which installs a delta sink in a contextvar (inherited by every task the
+pipeline spawns) and yields each piece of text the moment node-4 produces
+it, then the handle() result. Code outside a streaming request sees no
+sink and ``emit_delta`` is a no-op, so /chat and the tests are unchanged.
+
+Deltas are a preview for time-to-first-token: the final ``done`` chunk still
+carries the complete text and supersedes them.
+"""
+import asyncio
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, Tuple
+
+DELTA = "delta"
+RESULT = "result"
+
+_delta_sink: ContextVar[Optional[Callable[[str], None]]] = ContextVar("agent_delta_sink", default=None)
+
+
+def streaming_active() -> bool:
+    return _delta_sink.get() is not None
+
+
+def emit_delta(text: str) -> None:
+    sink = _delta_sink.get()
+    if sink is not None and text:
+        sink(text)
+
+
+async def stream_with_deltas(
+    run: Callable[[], Awaitable[Any]],
+    timeout: float,
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Run ``run()`` with a delta sink installed; yields ``(DELTA, text)`` as
+    pieces arrive and finally ``(RESULT, value)``. Exceptions of ``run()``
+    (including the timeout) propagate after the already-emitted deltas.
+    """
+    deltas: "asyncio.Queue[str]" = asyncio.Queue()
+    token = _delta_sink.set(deltas.put_nowait)
+    try:
+        # The task copies the current context, sink included
+        task = asyncio.ensure_future(asyncio.wait_for(run(), timeout=timeout))
+    finally:
+        _delta_sink.reset(token)
+
+    try:
+        while True:
+            getter = asyncio.ensure_future(deltas.get())
+            done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                yield DELTA, getter.result()
+                continue
+            getter.cancel()
+            break
+        while not deltas.empty():
+            yield DELTA, deltas.get_nowait()
+        yield RESULT, task.result()
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,312 @@
+"""
+Front-of-pipeline answer cache for AgentOrchestrator.handle()
+
+A repeated question ("xem điểm của tôi") from the same student skips split,
+classify, tools and formatting. Entries are keyed on:
+    • the normalized query (accents, case, whitespace, trailing punctuation)
+    • the intent the pipeline resolved for that query — a student-independent
+      ``query -> intent`` index lets a lookup find it without classifying
+    • the data versions the answer was read under: the student's own version
+      and a shared catalog version
+
+Invalidation: SQLAlchemy session events bump a student's version after
+commit when rows of learned_subjects, class_registers, subject_registers,
+semester_gpa or students change for that student (old and new owner when
+``student_id`` moves). Changes to classes / subjects / course_subjects bump
+the catalog version. ORM bulk INSERT with per-row ``student_id`` params bumps
+just those students; bulk UPDATE / DELETE on a student table bumps an epoch
+that retires every student's entries. Raw ``text()`` SQL is not observed.
+
+Versions are read before the pipeline runs, so an answer computed while a
+write commits is stored under the old version and never served. Intents
+whose answer depends on the current date ("lịch học hôm nay") also key on
+the day the lookup ran.
+
+lookup() reads the versions and the intent index in one MGET and the answer
+in one GET; callers on the event loop run it (and store_result()) through
+asyncio.to_thread, since the Redis client is synchronous.
+
+The cache is only used when its store is shared (Redis). With the in-memory
+fallback every worker has its own version counters, so a commit handled by
+one worker would never retire the answers cached by the others: lookup()
+and store_result() then bypass the cache.
+"""
+import hashlib
+import json
+import os
+import re
+import unicodedata
+from datetime import date
+from itertools import chain
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.llm.response_cache import ResponseCache
+from .orchestration_metrics import get_orchestration_metrics
+
+SEMANTIC_CACHE_ENABLED = os.environ.get("SEMANTIC_CACHE_ENABLED", "true").strip().lower() == "true"
+SEMANTIC_CACHE_TTL = int(os.environ.get("SEMANTIC_CACHE_TTL", "1800"))
+
+# Intents whose answer depends only on the tracked tables below
+CACHEABLE_INTENTS = frozenset({
+    "grade_view",
+    "learned_subjects_view",
+    "student_info",
+    "schedule_view",
+    "graduation_progress",
+})
+# Cacheable intents whose answer is relative to today's date
+DATE_RELATIVE_INTENTS = frozenset({"schedule_view"})
+
+# table -> column holding the owning student's id
+STUDENT_TABLES = {
+    "learned_subjects": "student_id",
+    "class_registers": "student_id",
+    "subject_registers": "student_id",
+    "semester_gpa": "student_id",
+    "students": "id",
+}
+SHARED_TABLES = frozenset({"classes", "subjects", "course_subjects"})
+_TRACKED_TABLES = SHARED_TABLES | set(STUDENT_TABLES)
+
+_KEY_PREFIX = "semcache"
+_EPOCH_KEY = f"{_KEY_PREFIX}:v:epoch"
+_CATALOG_KEY = f"{_KEY_PREFIX}:v:catalog"
+_PENDING_INFO_KEY = "semantic_cache_pending"
+_TRAILING_PUNCT = re.compile(r"[\s?.!,;:…]+$")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    normalized = (text or "").replace("đ", "d").replace("Đ", "D")
+    normalized = unicodedata.normalize("NFD", normalized)
+    normalized = "".join(ch for ch in normalized if unicodedata.category(ch) != "Mn")
+    normalized = _SPACES.sub(" ", normalized.lower()).strip()
+    return _TRAILING_PUNCT.sub("", normalized)
+
+
+def _student_version_key(student_id: Any) -> str:
+    return f"{_KEY_PREFIX}:v:student:{student_id}"
+
+
+class CacheLookup:
+    """Versions captured before the pipeline ran; passed back to store_result()."""
+
+    __slots__ = ("student_id", "query_hash", "versions", "day", "hit")
+
+    def __init__(
+        self,
+        student_id: Any,
+        query_hash: str,
+        versions: str,
+        hit: Optional[Dict[str, Any]] = None,
+        day: Optional[date] = None,
+    ):
+        self.student_id = student_id
+        self.query_hash = query_hash
+        self.versions = versions
+        self.day = day or date.today()
+        self.hit = hit
+
+
+class SemanticResponseCache:
+    def __init__(self, store: Optional[ResponseCache] = None, ttl: int = SEMANTIC_CACHE_TTL):
+        self.store = store or ResponseCache()
+        self.ttl = ttl
+        self.metrics = get_orchestration_metrics()
+
+    @staticmethod
+    def _version_keys(student_id: Any) -> List[str]:
+        return [_EPOCH_KEY, _CATALOG_KEY, _student_version_key(student_id)]
+
+    @staticmethod
+    def _join_versions(values: Iterable[Optional[str]]) -> str:
+        return ".".join(str(value or 0) for value in values)
+
+    def versions(self, student_id: Any) -> str:
+        """epoch.catalog.student — also keys the academic snapshot cache."""
+        return self._join_versions(self.store.get_many(self._version_keys(student_id)))
+
+    def _intent_key(self, query_hash: str) -> str:
+        return f"{_KEY_PREFIX}:intent:{query_hash}"
+
+    def _response_key(self, lookup: CacheLookup, intent: str) -> str:
+        key = f"{_KEY_PREFIX}:resp:{lookup.student_id}:{lookup.versions}:{intent}:{lookup.query_hash}"
+        if intent in DATE_RELATIVE_INTENTS:
+            key = f"{key}:{lookup.day.isoformat()}"
+        return key
+
+    def lookup(self, user_text: str, student_id: Any) -> Optional[CacheLookup]:
+        """None when the request can't be cached (no student, disabled, store not shared)."""
+        if not SEMANTIC_CACHE_ENABLED or student_id is None:
+            return None
+        if not self.store.shared:
+            self.metrics.increment("semantic_cache.bypass")
+            return None
+        query = normalize_query(user_text)
+        if not query:
+            return None
+        query_hash = hashlib.sha1(query.encode("utf-8")).hexdigest()
+        *versions, intent = self.store.get_many(self._version_keys(student_id) + [self._intent_key(query_hash)])
+        lookup = CacheLookup(student_id, query_hash, self._join_versions(versions))
+
+        cached = self.store.get(self._response_key(lookup, intent)) if intent else None
+        if cached:
+            try:
+                lookup.hit = json.loads(cached)
+            except (TypeError, ValueError):
+                lookup.hit = None
+        self.metrics.increment("semantic_cache.hit" if lookup.hit is not None else "semantic_cache.miss")
+        return lookup
+
+    @staticmethod
+    def _is_cacheable(result: Dict[str, Any]) -> bool:
+        if not isinstance(result, dict) or result.get("is_compound"):
+            return False
+        if result.get("intent") not in CACHEABLE_INTENTS or not result.get("text"):
+            return False
+        debug = result.get("debug")
+        if isinstance(debug, dict) and debug.get("fallback_mode"):
+            return False
+        raw = result.get("raw")
+        raw_items = raw if isinstance(raw, list) else [raw]
+        return not any(
+            isinstance(item, dict) and (
+                item.get("status") == "error"
+                or (isinstance(item.get("raw_result"), dict) and item["raw_result"].get("status") == "error")
+            )
+            for item in raw_items
+        )
+
+    def store_result(self, lookup: Optional[CacheLookup], result: Dict[str, Any]) -> None:
+        if lookup is None or not self.store.shared:
+            return
+        if not self._is_cacheable(result):
+            self.metrics.increment("semantic_cache.skip")
+            return
+        try:
+            payload = json.dumps(result, ensure_ascii=False, default=str)
+        except (TypeError, ValueError):
+            self.metrics.increment("semantic_cache.skip")
+            return
+        intent = result["intent"]
+        self.store.set(self._intent_key(lookup.query_hash), intent, ttl=self.ttl)
+        self.store.set(self._response_key(lookup, intent), payload, ttl=self.ttl)
+        self.metrics.increment("semantic_cache.store")
+
+    # ── invalidation ────────────────────────────────────────────────────────
+    def bump_students(self, student_ids: Iterable[Any]) -> None:
+        for student_id in student_ids:
+            self.store.incr(_student_version_key(student_id))
+            self.metrics.increment("semantic_cache.invalidate_student")
+
+    def bump_catalog(self) -> None:
+        self.store.incr(_CATALOG_KEY)
+        self.metrics.increment("semantic_cache.invalidate_catalog")
+
+    def bump_epoch(self) -> None:
+        self.store.incr(_EPOCH_KEY)
+        self.metrics.increment("semantic_cache.invalidate_all")
+
+
+_shared_cache: Optional[SemanticResponseCache] = None
+
+
+def get_semantic_cache() -> SemanticResponseCache:
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = SemanticResponseCache()
+    return _shared_cache
+
+
+# ── SQLAlchemy hooks ─────────────────────────────────────────────────────────
+class _PendingChanges:
+    __slots__ = ("students", "catalog", "epoch")
+
+    def __init__(self):
+        self.students: Set[Any] = set()
+        self.catalog = False
+        self.epoch = False
+
+
+def _pending(session: Session) -> _PendingChanges:
+    pending = session.info.get(_PENDING_INFO_KEY)
+    if pending is None:
+        pending = session.info[_PENDING_INFO_KEY] = _PendingChanges()
+    return pending
+
+
+def has_uncommitted_writes(session: Session) -> bool:
+    """True while the session holds tracked writes the version counters don't reflect yet."""
+    if _PENDING_INFO_KEY in session.info:
+        return True
+    return any(
+        getattr(type(obj), "__tablename__", None) in _TRACKED_TABLES
+        for obj in chain(session.new, session.dirty, session.deleted)
+    )
+
+
+def _owner_ids(obj: Any, column: str) -> Set[Any]:
+    history = inspect(obj).attrs[column].history
+    values = chain(history.added, history.unchanged, history.deleted)
+    return {value for value in values if value is not None}
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed_changes(session: Session, flush_context: Any) -> None:
+    modified = [obj for obj in session.dirty if session.is_modified(obj)]
+    for obj in chain(session.new, modified, session.deleted):
+        table = getattr(type(obj), "__tablename__", None)
+        if table in STUDENT_TABLES:
+            owners = _owner_ids(obj, STUDENT_TABLES[table])
+            if owners:
+                _pending(session).students.update(owners)
+            else:
+                _pending(session).epoch = True  # owner column not loaded
+        elif table in SHARED_TABLES:
+            _pending(session).catalog = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_changes(orm_execute_state: Any) -> None:
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    name = getattr(table, "name", None)
+    if name in SHARED_TABLES:
+        _pending(orm_execute_state.session).catalog = True
+        return
+    if name not in STUDENT_TABLES:
+        return
+
+    pending = _pending(orm_execute_state.session)
+    column = STUDENT_TABLES[name]
+    params = orm_execute_state.parameters
+    rows = params if isinstance(params, list) else [params] if isinstance(params, dict) else []
+    if orm_execute_state.is_insert and rows and all(row.get(column) is not None for row in rows):
+        pending.students.update(row[column] for row in rows)
+    else:
+        pending.epoch = True
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_committed_versions(session: Session) -> None:
+    pending = session.info.pop(_PENDING_INFO_KEY, None)
+    if pending is None:
+        return
+    cache = get_semantic_cache()
+    if pending.epoch:
+        cache.bump_epoch()
+    if pending.catalog:
+        cache.bump_catalog()
+    if pending.students and not pending.epoch:
+        cache.bump_students(pending.students)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back_changes(session: Session, previous_transaction: Any) -> None:
+    # A savepoint rollback keeps the outer transaction's earlier flushes pending
+    if previous_transaction.parent is None:
+        session.info.pop(_PENDING_INFO_KEY, None)
@@ -1,10 +1,18 @@
 import json
+import logging
 import os
 import time
 from typing import Any, Dict, List, Optional
 
 import httpx
 
+from app.agents.inprocess_tools import call_local_tool, use_inprocess_transport
+from app.agents.orchestration_metrics import get_orchestration_metrics
+from app.core.http_client import connection_trace, get_http_client, httpx_timeout
+from app.core.tracing import span
+
+logger = logging.getLogger(__name__)
+
 
 DEFAULT_AGENT_TOOLS_BASE_URL = os.environ.get("AGENT_TOOLS_BASE_URL", "http://127.0.0.1:8000/api/agent-tools")
 AGENT_INTERNAL_TOOL_KEY = os.environ.get("AGENT_INTERNAL_TOOL_KEY", "dev-agent-key")
@@ -64,6 +72,8 @@ def _load_tool_map_from_env() -> Dict[str, Dict[str, Any]]:
                 "timeout": int(timeout),
                 "headers": headers or {},
             }
+            if isinstance(cfg.get("transport"), str):
+                normalized[str(name)]["transport"] = cfg["transport"]
     return normalized
 
 
@@ -100,6 +110,11 @@ def _build_internal_auth_headers() -> Dict[str, str]:
     return {INTERNAL_AUTH_HEADER: AGENT_INTERNAL_TOOL_KEY}
 
 
+def _preview(value: Any, limit: int = 160) -> str:
+    text = json.dumps(value, ensure_ascii=False, default=str)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
 def _merge_tool_headers(custom_headers: Dict[str, Any]) -> Dict[str, str]:
     headers = _build_internal_auth_headers()
     if not isinstance(custom_headers, dict):
@@ -111,7 +126,7 @@ def _merge_tool_headers(custom_headers: Dict[str, Any]) -> Dict[str, str]:
             continue
         if str(key).lower() == INTERNAL_AUTH_HEADER.lower():
             if str(value) != AGENT_INTERNAL_TOOL_KEY:
-                print(
+                logger.warning(
                     "[TOOLS] ignored custom X-Agent-Internal-Key override because it "
                     "does not match AGENT_INTERNAL_TOOL_KEY"
                 )
@@ -145,6 +160,13 @@ class ToolsRegistry:
           - On HTTP error: {"status": "error", "error": "<classified reason>", "http_status": <int>}
           - On network error: {"status": "error", "error": "<classified reason>"}
         """
+        with span("tool", tool=name) as tool_span:
+            body = await self._call(name, payload)
+            if tool_span is not None and isinstance(body, dict):
+                tool_span.attrs["status"] = body.get("status")
+            return body
+
+    async def _call(self, name: str, payload: Dict[str, Any]) -> Dict[str, Any]:
         tool = self.get(name)
         if not tool:
             raise RuntimeError(f"Tool {name} not found")
@@ -156,62 +178,73 @@ class ToolsRegistry:
             else {}
         )
         headers = _merge_tool_headers(custom_headers)
-        payload_preview = json.dumps(payload, ensure_ascii=False, default=str)
-        if len(payload_preview) > 160:
-            payload_preview = payload_preview[:160] + "..."
-        print(f"[TOOLS] start name={name} url={url} timeout={timeout}s payload={payload_preview}")
+        metrics = get_orchestration_metrics()
+        if use_inprocess_transport(url, tool.get("transport")):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("[TOOLS] start name=%s transport=inprocess timeout=%ss payload=%s", name, timeout, _preview(payload))
+            started_at = time.perf_counter()
+            body = await call_local_tool(url, payload, timeout)
+            duration_ms = (time.perf_counter() - started_at) * 1000
+            metrics.observe_latency(f"tools.{name}.latency", duration_ms / 1000)
+            metrics.increment("tools.inprocess")
+            logger.info("[TOOLS] done name=%s transport=inprocess status=%s duration_ms=%.1f", name, body.get('status'), duration_ms)
+            return body
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[TOOLS] start name=%s url=%s timeout=%ss payload=%s", name, url, timeout, _preview(payload))
         started_at = time.perf_counter()
 
         try:
-            async with httpx.AsyncClient(timeout=timeout, headers=headers) as client:
-                resp = await client.post(url, json=payload)
-                duration_ms = (time.perf_counter() - started_at) * 1000
-                print(
-                    f"[TOOLS] response name={name} status={resp.status_code} "
-                    f"duration_ms={duration_ms:.1f}"
-                )
-
-                # ── Success ──────────────────────────────────────────────────────
-                if resp.status_code == 200:
-                    body = resp.json()
-                    body_preview = json.dumps(body, ensure_ascii=False, default=str)
-                    if len(body_preview) > 160:
-                        body_preview = body_preview[:160] + "..."
-                    print(f"[TOOLS] done name={name} body={body_preview}")
-                    return body  # passthrough so orchestrator sees real data
-
-                # ── HTTP error — return structured error, do NOT raise ─────────────
-                err_category = _classify_error(
-                    httpx.HTTPStatusError(
-                        f"HTTP {resp.status_code}",
-                        request=resp.request,
-                        response=resp,
-                    )
-                )
-                err_detail = (
-                    resp.text[:200].strip() if resp.text else f"HTTP {resp.status_code}"
-                )
-                print(
-                    f"[TOOLS] HTTP error name={name} status={resp.status_code} "
-                    f"category={err_category} detail={err_detail[:80]}"
+            resp = await get_http_client().post(
+                url,
+                json=payload,
+                headers=headers,
+                timeout=httpx_timeout(timeout),
+                extensions={"trace": connection_trace("tools")},
+            )
+            duration_ms = (time.perf_counter() - started_at) * 1000
+            metrics.observe_latency(f"tools.{name}.latency", duration_ms / 1000)
+            logger.info("[TOOLS] response name=%s status=%s duration_ms=%.1f", name, resp.status_code, duration_ms)
+
+            # ── Success ──────────────────────────────────────────────────────
+            if resp.status_code == 200:
+                body = resp.json()
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("[TOOLS] done name=%s body=%s", name, _preview(body))
+                return body  # passthrough so orchestrator sees real data
+
+            # ── HTTP error — return structured error, do NOT raise ─────────────
+            err_category = _classify_error(
+                httpx.HTTPStatusError(
+                    f"HTTP {resp.status_code}",
+                    request=resp.request,
+                    response=resp,
                 )
-                return {
-                    "status": "error",
-                    "error": err_category,
-                    "http_status": resp.status_code,
-                    "error_detail": err_detail,
-                }
+            )
+            err_detail = (
+                resp.text[:200].strip() if resp.text else f"HTTP {resp.status_code}"
+            )
+            logger.warning(
+                "[TOOLS] HTTP error name=%s status=%s category=%s detail=%s",
+                name, resp.status_code, err_category, err_detail[:80],
+            )
+            return {
+                "status": "error",
+                "error": err_category,
+                "http_status": resp.status_code,
+                "error_detail": err_detail,
+            }
 
         except httpx.TimeoutException as exc:
             duration_ms = (time.perf_counter() - started_at) * 1000
             err = _classify_error(exc)
-            print(f"[TOOLS] timeout name={name} duration_ms={duration_ms:.1f} error={err}")
+            logger.warning("[TOOLS] timeout name=%s duration_ms=%.1f error=%s", name, duration_ms, err)
             return {"status": "error", "error": err}
 
         except httpx.ConnectError as exc:
             duration_ms = (time.perf_counter() - started_at) * 1000
             err = _classify_error(exc)
-            print(f"[TOOLS] connect_error name={name} duration_ms={duration_ms:.1f} error={err}")
+            logger.warning("[TOOLS] connect_error name=%s duration_ms=%.1f error=%s", name, duration_ms, err)
             return {"status": "error", "error": err}
 
         except httpx.HTTPStatusError as exc:
@@ -222,8 +255,5 @@ class ToolsRegistry:
         except Exception as exc:
             duration_ms = (time.perf_counter() - started_at) * 1000
             err_category = _classify_error(exc)
-            print(
-                f"[TOOLS] unexpected name={name} duration_ms={duration_ms:.1f} "
-                f"error={err_category}"
-            )
+            logger.warning("[TOOLS] unexpected name=%s duration_ms=%.1f error=%s", name, duration_ms, err_category)
             return {"status": "error", "error": err_category}
@@ -0,0 +1,170 @@
+"""
+On-disk artifact cho TF-IDF + Word2Vec intent classifier
+
+Training (augment patterns, fit TfidfVectorizer, train Word2Vec 20 epochs)
+chạy một lần bởi ``scripts/retrain_classifier.py``; các worker chỉ load lại.
+
+Mỗi artifact nằm trong thư mục riêng, đặt tên theo fingerprint (sha256 của
+ARTIFACT_VERSION + intents.json + config + synonyms), nên sửa intents hay
+config sẽ tự động dẫn tới artifact mới thay vì dùng nhầm model cũ:
+
+    <root>/<fingerprint[:16]>/
+        metadata.json          labels, patterns, keywords, TF-IDF params
+        tfidf_vocabulary.json  term -> column
+        tfidf_idf.npy          idf weights
+        tfidf_matrix.npz       sparse pattern matrix (scipy.sparse.save_npz)
+        intent_embeddings.npz  averaged Word2Vec embedding per intent
+        word_vectors.kv        gensim KeyedVectors (+ .npy, loaded via mmap)
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+from scipy import sparse
+from gensim.models import KeyedVectors
+
+# Tăng khi thay đổi cách train (augmentation, normalization, layout) để
+# artifact cũ không còn khớp fingerprint.
+ARTIFACT_VERSION = 1
+
+DEFAULT_ARTIFACT_ROOT = os.getenv(
+    "INTENT_MODEL_DIR",
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+        "ml_models",
+        "intent_classifier",
+    ),
+)
+
+_METADATA_FILE = "metadata.json"
+_VOCABULARY_FILE = "tfidf_vocabulary.json"
+_IDF_FILE = "tfidf_idf.npy"
+_MATRIX_FILE = "tfidf_matrix.npz"
+_EMBEDDINGS_FILE = "intent_embeddings.npz"
+_WORD_VECTORS_FILE = "word_vectors.kv"
+
+
+@dataclass
+class IntentModelArtifact:
+    """Everything the classifier needs at inference time"""
+    fingerprint: str
+    intent_labels: List[str]
+    intent_patterns_map: Dict[str, List[str]]
+    intent_keywords_map: Dict[str, Set[str]]
+    vocabulary: Dict[str, int]
+    idf: np.ndarray
+    tfidf_matrix: sparse.csr_matrix
+    intent_embeddings_map: Dict[str, np.ndarray]
+    word_vectors: Optional[KeyedVectors]
+
+
+def compute_fingerprint(intents: Dict, config: Dict, synonyms: Dict) -> str:
+    """sha256 over every input that changes the trained model"""
+    payload = json.dumps(
+        {
+            "version": ARTIFACT_VERSION,
+            "intents": intents,
+            "config": config,
+            "synonyms": synonyms,
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def artifact_path(root: str, fingerprint: str) -> str:
+    return os.path.join(root, fingerprint[:16])
+
+
+def save_artifact(root: str, artifact: IntentModelArtifact) -> str:
+    """
+    Write the artifact and return its directory.
+
+    Files are written to a temporary sibling directory and renamed into place,
+    so a worker never sees a half-written artifact.
+    """
+    os.makedirs(root, exist_ok=True)
+    target = artifact_path(root, artifact.fingerprint)
+    staging = tempfile.mkdtemp(prefix=".tmp-", dir=root)
+
+    try:
+        tags = list(artifact.intent_embeddings_map.keys())
+        metadata = {
+            "version": ARTIFACT_VERSION,
+            "fingerprint": artifact.fingerprint,
+            "created_at": datetime.now().isoformat(),
+            "intent_labels": artifact.intent_labels,
+            "intent_patterns_map": artifact.intent_patterns_map,
+            "intent_keywords_map": {
+                tag: sorted(keywords) for tag, keywords in artifact.intent_keywords_map.items()
+            },
+            "embedding_tags": tags,
+            "has_word_vectors": artifact.word_vectors is not None,
+        }
+        with open(os.path.join(staging, _METADATA_FILE), "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False)
+        with open(os.path.join(staging, _VOCABULARY_FILE), "w", encoding="utf-8") as f:
+            json.dump({term: int(col) for term, col in artifact.vocabulary.items()}, f, ensure_ascii=False)
+
+        np.save(os.path.join(staging, _IDF_FILE), artifact.idf)
+        sparse.save_npz(os.path.join(staging, _MATRIX_FILE), sparse.csr_matrix(artifact.tfidf_matrix))
+        np.savez(
+            os.path.join(staging, _EMBEDDINGS_FILE),
+            **{f"e{index}": artifact.intent_embeddings_map[tag] for index, tag in enumerate(tags)},
+        )
+        if artifact.word_vectors is not None:
+            # vectors in a separate .npy so load() can mmap them
+            artifact.word_vectors.save(os.path.join(staging, _WORD_VECTORS_FILE), separately=["vectors"])
+
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        os.replace(staging, target)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    return target
+
+
+def load_artifact(root: str, fingerprint: str) -> Optional[IntentModelArtifact]:
+    """Load the artifact for ``fingerprint``; None if missing or stale"""
+    directory = artifact_path(root, fingerprint)
+    metadata_path = os.path.join(directory, _METADATA_FILE)
+    if not os.path.isfile(metadata_path):
+        return None
+
+    with open(metadata_path, "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    if metadata.get("version") != ARTIFACT_VERSION or metadata.get("fingerprint") != fingerprint:
+        return None
+
+    with open(os.path.join(directory, _VOCABULARY_FILE), "r", encoding="utf-8") as f:
+        vocabulary = json.load(f)
+
+    with np.load(os.path.join(directory, _EMBEDDINGS_FILE)) as embeddings:
+        intent_embeddings_map = {
+            tag: embeddings[f"e{index}"] for index, tag in enumerate(metadata["embedding_tags"])
+        }
+
+    word_vectors = None
+    if metadata.get("has_word_vectors"):
+        word_vectors = KeyedVectors.load(os.path.join(directory, _WORD_VECTORS_FILE), mmap="r")
+
+    return IntentModelArtifact(
+        fingerprint=fingerprint,
+        intent_labels=metadata["intent_labels"],
+        intent_patterns_map=metadata["intent_patterns_map"],
+        intent_keywords_map={tag: set(words) for tag, words in metadata["intent_keywords_map"].items()},
+        vocabulary=vocabulary,
+        idf=np.load(os.path.join(directory, _IDF_FILE)),
+        tfidf_matrix=sparse.load_npz(os.path.join(directory, _MATRIX_FILE)).tocsr(),
+        intent_embeddings_map=intent_embeddings_map,
+        word_vectors=word_vectors,
+    )
@@ -6,6 +6,7 @@ Phase 2: TF-IDF + Word2Vec Semantic Embeddings
 import json
 import os
 import re
+import threading
 from typing import Dict, List, Tuple, Optional
 import numpy as np
 from pathlib import Path
@@ -13,12 +14,24 @@ from pathlib import Path
 # Scikit-learn imports for Phase 1
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
 
 # Gensim imports for Phase 2
 from gensim.models import Word2Vec
 import warnings
+
+from app.chatbot.intent_model_store import (
+    DEFAULT_ARTIFACT_ROOT,
+    IntentModelArtifact,
+    compute_fingerprint,
+    load_artifact,
+    save_artifact,
+)
 warnings.filterwarnings('ignore', category=DeprecationWarning)
 
+_classifier_instance: Optional["TfidfIntentClassifier"] = None
+_classifier_lock = threading.Lock()
+
 
 class TfidfIntentClassifier:
     """
@@ -80,12 +93,21 @@ class TfidfIntentClassifier:
     7. Scoring: Kết hợp TF-IDF (50%) + Semantic (30%) + Keyword (20%)
     """
     
-    def __init__(self, config_path: Optional[str] = None):
+    def __init__(
+        self,
+        config_path: Optional[str] = None,
+        artifact_dir: Optional[str] = None,
+        use_artifact: bool = True,
+    ):
         """
         Initialize TF-IDF Intent Classifier
         
         Args:
             config_path: Đường dẫn đến file config (optional)
+            artifact_dir: Thư mục chứa model artifact (mặc định INTENT_MODEL_DIR
+                hoặc backend/ml_models/intent_classifier)
+            use_artifact: Load artifact đã train nếu khớp fingerprint, nếu không
+                thì train rồi lưu lại. False = luôn train lại, không đọc/ghi đĩa
         """
         print("🔧 Initializing TF-IDF Intent Classifier (Phase 3 - Fine-tuned)...")
         
@@ -126,9 +148,17 @@ class TfidfIntentClassifier:
         self.intent_keywords_map = {}
         
         # Word2Vec Model (Phase 2 configuration)
+        # word2vec_model chỉ có khi vừa train; inference dùng word_vectors
+        # (KeyedVectors) để bản load từ artifact (mmap) chạy cùng code path.
         self.word2vec_model = None
+        self.word_vectors = None
         self.intent_embeddings_map = {}
         
+        # Model artifact
+        self.artifact_dir = artifact_dir or DEFAULT_ARTIFACT_ROOT
+        self.fingerprint = compute_fingerprint(self.intents, self.config, self.synonyms)
+        self.loaded_from_artifact = False
+        
         # Thresholds cho confidence levels
         self.thresholds = self.config.get("thresholds", {
             "high_confidence": 0.60,
@@ -136,11 +166,23 @@ class TfidfIntentClassifier:
             "low_confidence": 0.25
         })
         
-        # Initialize TF-IDF components
-        self._initialize_tfidf()
+        if use_artifact:
+            self.loaded_from_artifact = self._load_from_artifact()
         
-        # Initialize Word2Vec embeddings (Phase 2)
-        self._initialize_word_embeddings()
+        if not self.loaded_from_artifact:
+            # Initialize TF-IDF components
+            self._initialize_tfidf()
+            
+            # Initialize Word2Vec embeddings (Phase 2)
+            self._initialize_word_embeddings()
+            
+            if use_artifact and self.intent_tfidf_matrix is not None:
+                try:
+                    self.save_artifact()
+                except OSError as e:
+                    print(f"⚠️  Could not save intent model artifact: {e}")
+        
+        self._prepare_batch_index()
         
         print(f"✅ TF-IDF + Word2Vec classifier initialized with {len(self.intents.get('intents', []))} intents")
         print(f" TF-IDF Matrix shape: {self.intent_tfidf_matrix.shape if self.intent_tfidf_matrix is not None else 'N/A'}")
@@ -207,6 +249,106 @@ class TfidfIntentClassifier:
             print(f" Intents file not found at {intents_path}")
             return {"intents": []}
     
+    def _build_tfidf_vectorizer(self) -> TfidfVectorizer:
+        """Unfitted TfidfVectorizer với params từ config"""
+        tfidf_params = self.config.get("tfidf_params", {})
+        ngram_range = tuple(tfidf_params.get("ngram_range", [1, 3]))
+        max_features = tfidf_params.get("max_features", 5000)
+        analyzer = tfidf_params.get("analyzer", "word")
+        lowercase = tfidf_params.get("lowercase", True)
+        min_df = tfidf_params.get("min_df", 1)
+        max_df = tfidf_params.get("max_df", 1.0)
+        sublinear_tf = tfidf_params.get("sublinear_tf", True)
+        
+        return TfidfVectorizer(
+            ngram_range=ngram_range,
+            max_features=max_features,
+            analyzer=analyzer,
+            lowercase=lowercase,
+            min_df=min_df,
+            max_df=max_df,
+            sublinear_tf=sublinear_tf,
+            token_pattern=r'\b\w+\b'  # Match word boundaries
+        )
+    
+    def _load_from_artifact(self) -> bool:
+        """
+        Load TF-IDF + Word2Vec từ artifact khớp fingerprint hiện tại
+        
+        Returns:
+            True nếu load thành công, False nếu chưa có artifact (cần train)
+        """
+        try:
+            artifact = load_artifact(self.artifact_dir, self.fingerprint)
+        except Exception as e:
+            print(f"⚠️  Failed to load intent model artifact, retraining: {e}")
+            return False
+        
+        if artifact is None:
+            return False
+        
+        vectorizer = self._build_tfidf_vectorizer()
+        vectorizer.vocabulary_ = artifact.vocabulary
+        vectorizer.idf_ = artifact.idf
+        
+        self.tfidf_vectorizer = vectorizer
+        self.intent_tfidf_matrix = artifact.tfidf_matrix
+        self.intent_labels = artifact.intent_labels
+        self.intent_patterns_map = artifact.intent_patterns_map
+        self.intent_keywords_map = artifact.intent_keywords_map
+        self.word_vectors = artifact.word_vectors
+        self.intent_embeddings_map = artifact.intent_embeddings_map
+        
+        print(f"📦 Loaded intent model artifact {self.fingerprint[:16]} from {self.artifact_dir}")
+        return True
+    
+    def save_artifact(self) -> str:
+        """
+        Lưu model đã train thành artifact (dùng bởi scripts/retrain_classifier.py)
+        
+        Returns:
+            Thư mục artifact
+        """
+        if self.intent_tfidf_matrix is None:
+            raise ValueError("TF-IDF model is not trained, nothing to save")
+        
+        path = save_artifact(self.artifact_dir, IntentModelArtifact(
+            fingerprint=self.fingerprint,
+            intent_labels=self.intent_labels,
+            intent_patterns_map=self.intent_patterns_map,
+            intent_keywords_map=self.intent_keywords_map,
+            vocabulary=self.tfidf_vectorizer.vocabulary_,
+            idf=self.tfidf_vectorizer.idf_,
+            tfidf_matrix=self.intent_tfidf_matrix,
+            intent_embeddings_map=self.intent_embeddings_map,
+            word_vectors=self.word_vectors,
+        ))
+        print(f"💾 Saved intent model artifact to {path}")
+        return path
+    
+    def _prepare_batch_index(self):
+        """
+        Precompute index arrays cho batch scoring
+        
+        - _intent_order: intent tags theo thứ tự xuất hiện đầu tiên trong
+          intent_labels (cột của ma trận điểm)
+        - _pattern_order / _intent_starts: hoán vị cột pattern để các pattern
+          cùng intent liền nhau, dùng cho np.maximum.reduceat
+        - _intent_embedding_matrix: intent embeddings xếp chồng (đã L2-normalize)
+        """
+        self._intent_order = list(dict.fromkeys(self.intent_labels))
+        intent_index = {tag: i for i, tag in enumerate(self._intent_order)}
+        label_ids = np.array([intent_index[label] for label in self.intent_labels], dtype=np.intp)
+        self._pattern_order = np.argsort(label_ids, kind="stable")
+        self._intent_starts = np.searchsorted(label_ids[self._pattern_order], np.arange(len(self._intent_order)))
+        
+        self._embedding_tags = list(self.intent_embeddings_map.keys())
+        self._intent_embedding_matrix = None
+        if self._embedding_tags:
+            self._intent_embedding_matrix = normalize(
+                np.vstack([self.intent_embeddings_map[tag] for tag in self._embedding_tags]).astype(np.float64)
+            )
+    
     def _normalize_vietnamese(self, text: str) -> str:
         """
         Chuẩn hóa Vietnamese text
@@ -518,25 +660,9 @@ class TfidfIntentClassifier:
             intent_keywords_map[tag] = keywords
         
         # Initialize TfidfVectorizer with configured parameters
-        tfidf_params = self.config.get("tfidf_params", {})
-        ngram_range = tuple(tfidf_params.get("ngram_range", [1, 3]))
-        max_features = tfidf_params.get("max_features", 5000)
-        analyzer = tfidf_params.get("analyzer", "word")
-        lowercase = tfidf_params.get("lowercase", True)
-        min_df = tfidf_params.get("min_df", 1)
-        max_df = tfidf_params.get("max_df", 1.0)
-        sublinear_tf = tfidf_params.get("sublinear_tf", True)
-        
-        self.tfidf_vectorizer = TfidfVectorizer(
-            ngram_range=ngram_range,
-            max_features=max_features,
-            analyzer=analyzer,
-            lowercase=lowercase,
-            min_df=min_df,
-            max_df=max_df,
-            sublinear_tf=sublinear_tf,
-            token_pattern=r'\b\w+\b'  # Match word boundaries
-        )
+        self.tfidf_vectorizer = self._build_tfidf_vectorizer()
+        ngram_range = self.tfidf_vectorizer.ngram_range
+        max_features = self.tfidf_vectorizer.max_features
         
         # Fit and transform patterns
         if all_patterns:
@@ -634,6 +760,7 @@ class TfidfIntentClassifier:
                 min_alpha=min_alpha,
                 seed=42
             )
+            self.word_vectors = self.word2vec_model.wv
             
             # Compute intent embeddings (average of all pattern embeddings)
             for tag, intent_sents in intent_sentences_map.items():
@@ -650,7 +777,7 @@ class TfidfIntentClassifier:
             
             print(f" Word2Vec initialized:")
             print(f"   - Total sentences: {len(sentences)}")
-            print(f"   - Vocabulary size: {len(self.word2vec_model.wv)}")
+            print(f"   - Vocabulary size: {len(self.word_vectors)}")
             print(f"   - Vector size: {vector_size}")
             print(f"   - Window: {window}")
             print(f"   - Algorithm: {'Skip-gram' if sg == 1 else 'CBOW'}")
@@ -684,13 +811,13 @@ class TfidfIntentClassifier:
         - Average: [(0.2+0.1+0.4+0.3)/4, (0.5+0.3-0.1+0.2)/4, (-0.3+0.2+0.1-0.2)/4]
         - Result: [0.25, 0.225, -0.05]
         """
-        if not self.word2vec_model or not words:
+        if self.word_vectors is None or not words:
             return None
         
         word_vectors = []
         for word in words:
-            if word in self.word2vec_model.wv:
-                word_vectors.append(self.word2vec_model.wv[word])
+            if word in self.word_vectors:
+                word_vectors.append(self.word_vectors[word])
         
         if not word_vectors:
             return None
@@ -733,30 +860,42 @@ class TfidfIntentClassifier:
         
         Cosine similarity: 0.15 (thấp - nghĩa khác nhau)
         """
-        if not self.word2vec_model or not self.intent_embeddings_map:
-            return []
-        
-        # Get message embedding
         normalized_message = self._normalize_vietnamese(message)
-        words = normalized_message.split()
-        message_embedding = self._get_sentence_embedding(words)
-        
-        if message_embedding is None:
-            return []
+        return self._semantic_scores_to_list(self._semantic_scores_batch([normalized_message])[0])
+    
+    def _semantic_scores_batch(self, normalized_messages: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Semantic similarity của nhiều message với tất cả intent embeddings
         
-        # Calculate cosine similarity with each intent embedding
-        similarities = []
-        for intent_tag, intent_embedding in self.intent_embeddings_map.items():
-            # Reshape for sklearn cosine_similarity
-            msg_vec = message_embedding.reshape(1, -1)
-            intent_vec = intent_embedding.reshape(1, -1)
-            
-            similarity = cosine_similarity(msg_vec, intent_vec)[0][0]
-            similarities.append((intent_tag, float(similarity)))
+        Một phép nhân ma trận (n_messages × dim) · (dim × n_intents) thay cho
+        vòng lặp cosine_similarity từng intent.
         
-        # Sort by similarity score
+        Returns:
+            Mỗi message một vector điểm (cột theo _embedding_tags), hoặc None
+            nếu message không có từ nào trong vocabulary
+        """
+        if self.word_vectors is None or self._intent_embedding_matrix is None:
+            return [None] * len(normalized_messages)
+        
+        embeddings = [self._get_sentence_embedding(message.split()) for message in normalized_messages]
+        valid_rows = [i for i, embedding in enumerate(embeddings) if embedding is not None]
+        results: List[Optional[np.ndarray]] = [None] * len(normalized_messages)
+        if not valid_rows:
+            return results
+        
+        message_matrix = normalize(np.vstack([embeddings[i] for i in valid_rows]).astype(np.float64))
+        # einsum (không qua BLAS) để mỗi hàng cho kết quả giống hệt khi tính riêng lẻ
+        similarities = np.einsum("md,id->mi", message_matrix, self._intent_embedding_matrix)
+        for row, i in enumerate(valid_rows):
+            results[i] = similarities[row]
+        return results
+    
+    def _semantic_scores_to_list(self, scores: Optional[np.ndarray]) -> List[Tuple[str, float]]:
+        """Vector điểm semantic → list (intent_tag, score) sorted"""
+        if scores is None:
+            return []
+        similarities = list(zip(self._embedding_tags, scores.tolist()))
         similarities.sort(key=lambda x: x[1], reverse=True)
-        
         return similarities
     
     def _calculate_tfidf_similarity(self, message: str) -> List[Tuple[str, float]]:
@@ -784,18 +923,31 @@ class TfidfIntentClassifier:
         Cosine similarity: 0.85 (cao vì nhiều từ giống nhau)
         """
         normalized_message = self._normalize_vietnamese(message)
+        return self._tfidf_scores_to_list(self._tfidf_scores_batch([normalized_message])[0])
+    
+    def _tfidf_scores_batch(self, normalized_messages: List[str]) -> np.ndarray:
+        """
+        TF-IDF similarity của nhiều message, gộp theo intent
         
-        # Transform message to TF-IDF vector
-        message_tfidf = self.tfidf_vectorizer.transform([normalized_message])
+        Transform tất cả message cùng lúc, một phép nhân sparse × sparse với
+        ma trận pattern, rồi lấy max theo intent bằng np.maximum.reduceat
+        trên các cột pattern đã xếp theo intent.
+        
+        Returns:
+            Ma trận (n_messages, n_intents), cột theo _intent_order
+        """
+        # Transform messages to TF-IDF vectors
+        message_tfidf = self.tfidf_vectorizer.transform(normalized_messages)
         
         # Calculate cosine similarity with all patterns
-        similarities = cosine_similarity(message_tfidf, self.intent_tfidf_matrix)[0]
+        similarities = cosine_similarity(message_tfidf, self.intent_tfidf_matrix)
         
         # Aggregate by intent (take maximum similarity for each intent)
-        intent_scores = {}
-        for idx, (label, score) in enumerate(zip(self.intent_labels, similarities)):
-            if label not in intent_scores or score > intent_scores[label]:
-                intent_scores[label] = float(score)
+        return np.maximum.reduceat(similarities[:, self._pattern_order], self._intent_starts, axis=1)
+    
+    def _tfidf_scores_to_list(self, scores: np.ndarray) -> List[Tuple[str, float]]:
+        """Vector điểm TF-IDF theo intent → list (intent_tag, score) sorted"""
+        intent_scores = dict(zip(self._intent_order, scores.tolist()))
         
         # Sort by score
         sorted_scores = sorted(intent_scores.items(), key=lambda x: x[1], reverse=True)
@@ -964,122 +1116,195 @@ class TfidfIntentClassifier:
         }
         """
         if not message or not message.strip():
-            return {
-                "intent": "out_of_scope",
-                "confidence": "low",
-                "confidence_score": 0.0,
-                "method": "tfidf_word2vec_hybrid",
-                "message": "Empty message"
-            }
+            return self._empty_message_result()
 
         try:
-            # Phase 3: Use adaptive weights based on message length
-            weights = self._calculate_adaptive_weights(message)
-            
             # Calculate TF-IDF similarities
             tfidf_scores = self._calculate_tfidf_similarity(message)
             
             # Calculate semantic similarities (Word2Vec)
             semantic_scores_list = self._semantic_similarity(message)
-            semantic_scores = {tag: score for tag, score in semantic_scores_list}
             
-            # Calculate combined scores for each intent
-            combined_scores = []
+            return self._classify_from_scores(message, tfidf_scores, semantic_scores_list)
+        except Exception as e:
+            return self._classification_error_result(e)
+    
+    async def classify_batch(self, messages: List[str]) -> List[Dict]:
+        """
+        Phân loại intent cho nhiều message trong một lần
+        
+        TF-IDF transform tất cả message cùng lúc (một phép nhân sparse × sparse),
+        semantic similarity là một phép nhân ma trận với intent embeddings;
+        phần keyword / bonus / boost vẫn tính theo từng message như
+        classify_intent. Kết quả từng phần tử giống classify_intent(message).
+        
+        Args:
+            messages: Danh sách message (vd. các segment sau Node-1)
             
-            for intent_tag, tfidf_score in tfidf_scores:
-                # Calculate keyword score
-                keyword_score = self._calculate_keyword_score(message, intent_tag)
-                
-                # Get semantic score for this intent
-                semantic_score = semantic_scores.get(intent_tag, 0.0)
-                
-                # Phase 3: Calculate exact match bonus
-                exact_bonus = self._calculate_exact_match_bonus(message, intent_tag)
-                
-                # Combined weighted score (Phase 3: TF-IDF + Semantic + Keyword + Exact Match Bonus)
-                combined_score = (
-                    tfidf_score * weights["tfidf"] +
-                    semantic_score * weights["semantic"] +
-                    keyword_score * weights["keyword"] +
-                    exact_bonus
+        Returns:
+            List kết quả, cùng thứ tự và format với classify_intent
+        
+        Ví dụ:
+            results = await classifier.classify_batch(["xem điểm", "lịch học tuần này"])
+            # [{"intent": "grade_view", ...}, {"intent": "schedule_view", ...}]
+        """
+        results: List[Optional[Dict]] = [None] * len(messages)
+        pending = []
+        for i, message in enumerate(messages):
+            if not message or not message.strip():
+                results[i] = self._empty_message_result()
+            else:
+                pending.append(i)
+        
+        if not pending:
+            return results
+        
+        try:
+            normalized = [self._normalize_vietnamese(messages[i]) for i in pending]
+            tfidf_matrix = self._tfidf_scores_batch(normalized)
+            semantic_rows = self._semantic_scores_batch(normalized)
+        except Exception as e:
+            error_result = self._classification_error_result(e)
+            for i in pending:
+                results[i] = dict(error_result)
+            return results
+        
+        for row, i in enumerate(pending):
+            try:
+                results[i] = self._classify_from_scores(
+                    messages[i],
+                    self._tfidf_scores_to_list(tfidf_matrix[row]),
+                    self._semantic_scores_to_list(semantic_rows[row]),
                 )
-                
-                combined_scores.append({
-                    "intent": intent_tag,
-                    "score": combined_score,
-                    "tfidf": tfidf_score,
-                    "semantic": semantic_score,
-                    "keyword": keyword_score,
-                    "exact_bonus": exact_bonus
-                })
+            except Exception as e:
+                results[i] = self._classification_error_result(e)
+        return results
+    
+    def _empty_message_result(self) -> Dict:
+        return {
+            "intent": "out_of_scope",
+            "confidence": "low",
+            "confidence_score": 0.0,
+            "method": "tfidf_word2vec_hybrid",
+            "message": "Empty message"
+        }
+    
+    def _classification_error_result(self, e: Exception) -> Dict:
+        print(f" Error during classification: {e}")
+        import traceback
+        traceback.print_exc()
+        return {
+            "intent": "out_of_scope",
+            "confidence": "low",
+            "confidence_score": 0.0,
+            "method": "tfidf_word2vec_hybrid",
+            "error": str(e)
+        }
+    
+    def _classify_from_scores(
+        self,
+        message: str,
+        tfidf_scores: List[Tuple[str, float]],
+        semantic_scores_list: List[Tuple[str, float]],
+    ) -> Dict:
+        """
+        Kết hợp điểm TF-IDF + semantic đã tính với keyword / exact bonus / boost
+        
+        Args:
+            message: User message gốc
+            tfidf_scores: (intent_tag, score) sorted, từ _calculate_tfidf_similarity
+            semantic_scores_list: (intent_tag, score), từ _semantic_similarity
+        """
+        # Phase 3: Use adaptive weights based on message length
+        weights = self._calculate_adaptive_weights(message)
+        
+        semantic_scores = {tag: score for tag, score in semantic_scores_list}
+        
+        # Calculate combined scores for each intent
+        combined_scores = []
+        
+        for intent_tag, tfidf_score in tfidf_scores:
+            # Calculate keyword score
+            keyword_score = self._calculate_keyword_score(message, intent_tag)
             
-            # Sort by combined score
-            combined_scores.sort(key=lambda x: x["score"], reverse=True)
+            # Get semantic score for this intent
+            semantic_score = semantic_scores.get(intent_tag, 0.0)
             
-            if combined_scores:
-                best_result = combined_scores[0]
-                
-                # Phase 3: Apply confidence boost
-                best_result = self._apply_confidence_boost(message, best_result)
-                
-                best_intent = best_result["intent"]
-                best_score = best_result["score"]
-                override_intent = self._rule_override_intent(message, best_intent)
-                if override_intent:
-                    best_intent = override_intent
-                    best_score = max(best_score, self.thresholds["high_confidence"])
-                    best_result["score"] = best_score
-                
-                second_best_score = combined_scores[1]["score"] if len(combined_scores) > 1 else 0.0
-                margin = best_score - second_best_score
-                
-                # Determine confidence level
-                if best_score >= self.thresholds["high_confidence"] and margin > 0.1:
-                    confidence = "high"
-                elif best_score >= self.thresholds["medium_confidence"] and margin > 0.05:
-                    confidence = "medium"
-                elif best_score >= self.thresholds["low_confidence"]:
-                    confidence = "low"
-                else:
-                    best_intent = "out_of_scope"
-                    confidence = "low"
-                
-                return {
-                    "intent": best_intent,
-                    "confidence": confidence,
-                    "confidence_score": float(best_score),
-                    "method": "tfidf_word2vec_hybrid_phase3",
-                    "tfidf_score": float(best_result["tfidf"]),
-                    "semantic_score": float(best_result["semantic"]),
-                    "keyword_score": float(best_result["keyword"]),
-                    "exact_bonus": float(best_result.get("exact_bonus", 0.0)),
-                    "boost_applied": float(best_result.get("boost_applied", 0.0)),
-                    "boost_reasons": best_result.get("boost_reasons", []),
-                    "original_score": float(best_result.get("original_score", best_score)),
-                    "adaptive_weights": self._calculate_adaptive_weights(message),
-                    "margin": float(margin),
-                    "all_scores": combined_scores[:5]
-                }
+            # Phase 3: Calculate exact match bonus
+            exact_bonus = self._calculate_exact_match_bonus(message, intent_tag)
+            
+            # Combined weighted score (Phase 3: TF-IDF + Semantic + Keyword + Exact Match Bonus)
+            combined_score = (
+                tfidf_score * weights["tfidf"] +
+                semantic_score * weights["semantic"] +
+                keyword_score * weights["keyword"] +
+                exact_bonus
+            )
+            
+            combined_scores.append({
+                "intent": intent_tag,
+                "score": combined_score,
+                "tfidf": tfidf_score,
+                "semantic": semantic_score,
+                "keyword": keyword_score,
+                "exact_bonus": exact_bonus
+            })
+        
+        # Sort by combined score
+        combined_scores.sort(key=lambda x: x["score"], reverse=True)
+        
+        if combined_scores:
+            best_result = combined_scores[0]
+            
+            # Phase 3: Apply confidence boost
+            best_result = self._apply_confidence_boost(message, best_result)
+            
+            best_intent = best_result["intent"]
+            best_score = best_result["score"]
+            override_intent = self._rule_override_intent(message, best_intent)
+            if override_intent:
+                best_intent = override_intent
+                best_score = max(best_score, self.thresholds["high_confidence"])
+                best_result["score"] = best_score
+            
+            second_best_score = combined_scores[1]["score"] if len(combined_scores) > 1 else 0.0
+            margin = best_score - second_best_score
+            
+            # Determine confidence level
+            if best_score >= self.thresholds["high_confidence"] and margin > 0.1:
+                confidence = "high"
+            elif best_score >= self.thresholds["medium_confidence"] and margin > 0.05:
+                confidence = "medium"
+            elif best_score >= self.thresholds["low_confidence"]:
+                confidence = "low"
+            else:
+                best_intent = "out_of_scope"
+                confidence = "low"
             
             return {
-                "intent": "out_of_scope",
-                "confidence": "low",
-                "confidence_score": 0.0,
-                "method": "tfidf_word2vec_hybrid",
-                "all_scores": []
-            }
-                
-        except Exception as e:
-            print(f" Error during classification: {e}")
-            import traceback
-            traceback.print_exc()
-            return {
-                "intent": "out_of_scope",
-                "confidence": "low",
-                "confidence_score": 0.0,
-                "method": "tfidf_word2vec_hybrid",
-                "error": str(e)
+                "intent": best_intent,
+                "confidence": confidence,
+                "confidence_score": float(best_score),
+                "method": "tfidf_word2vec_hybrid_phase3",
+                "tfidf_score": float(best_result["tfidf"]),
+                "semantic_score": float(best_result["semantic"]),
+                "keyword_score": float(best_result["keyword"]),
+                "exact_bonus": float(best_result.get("exact_bonus", 0.0)),
+                "boost_applied": float(best_result.get("boost_applied", 0.0)),
+                "boost_reasons": best_result.get("boost_reasons", []),
+                "original_score": float(best_result.get("original_score", best_score)),
+                "adaptive_weights": self._calculate_adaptive_weights(message),
+                "margin": float(margin),
+                "all_scores": combined_scores[:5]
             }
+        
+        return {
+            "intent": "out_of_scope",
+            "confidence": "low",
+            "confidence_score": 0.0,
+            "method": "tfidf_word2vec_hybrid",
+            "all_scores": []
+        }
     
     def get_all_similarities(self, message: str) -> List[Tuple[str, float]]:
         """
@@ -1114,9 +1339,9 @@ class TfidfIntentClassifier:
             "method": "tfidf_word2vec_hybrid_phase3",
             "phase": "3 - Fine-tuned with Adaptive Weights + Confidence Boost",
             "tfidf_vocabulary_size": len(self.tfidf_vectorizer.vocabulary_) if self.tfidf_vectorizer else 0,
-            "word2vec_vocabulary_size": len(self.word2vec_model.wv) if self.word2vec_model else 0,
+            "word2vec_vocabulary_size": len(self.word_vectors) if self.word_vectors is not None else 0,
             "tfidf_matrix_shape": str(self.intent_tfidf_matrix.shape) if self.intent_tfidf_matrix is not None else "N/A",
-            "word2vec_vector_size": self.word2vec_model.wv.vector_size if self.word2vec_model else 0,
+            "word2vec_vector_size": self.word_vectors.vector_size if self.word_vectors is not None else 0,
             "intent_embeddings_count": len(self.intent_embeddings_map),
             "thresholds": self.thresholds,
             "tfidf_params": self.config.get("tfidf_params", {}),
@@ -1166,6 +1391,24 @@ class TfidfIntentClassifier:
         return intent_names.get(intent_tag, "trao đổi")
 
 
+def get_intent_classifier() -> TfidfIntentClassifier:
+    """
+    Get process-wide shared instance of TfidfIntentClassifier
+    
+    Routes, graph nodes và AgentOrchestrator dùng chung một instance nên
+    model chỉ được load (hoặc train) một lần cho mỗi worker.
+    
+    Returns:
+        TfidfIntentClassifier instance
+    """
+    global _classifier_instance
+    if _classifier_instance is None:
+        with _classifier_lock:
+            if _classifier_instance is None:
+                _classifier_instance = TfidfIntentClassifier()
+    return _classifier_instance
+
+
 # For testing
 if __name__ == "__main__":
     import asyncio
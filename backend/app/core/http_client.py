@@ -0,0 +1,105 @@
+"""
+Process-wide pooled httpx.AsyncClient
+
+ToolsRegistry and the LLM clients used to open a new AsyncClient per call,
+paying a TCP (+TLS) handshake on every agent node hop. get_http_client()
+returns one long-lived client with keep-alive and bounded pool limits;
+timeouts are passed per request (httpx_timeout()), so tools with different
+budgets share the same connections.
+
+The client is bound to the event loop that created it. A call from a
+different loop (tests using asyncio.run, worker threads) gets a fresh
+client instead of reusing sockets owned by a dead loop.
+
+close_http_client() is awaited from the FastAPI lifespan on shutdown.
+"""
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from app.agents.orchestration_metrics import get_orchestration_metrics
+
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_POOL_TIMEOUT = float(os.environ.get("HTTP_POOL_TIMEOUT", "5"))
+HTTP2_ENABLED = os.environ.get("HTTP2_ENABLED", "false").strip().lower() == "true"
+
+EXTERNAL_CONNECT_TIMEOUT = float(os.environ.get("EXTERNAL_CONNECT_TIMEOUT", "5"))
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _http2_available() -> bool:
+    if not HTTP2_ENABLED:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        print("[HTTP] HTTP2_ENABLED=true but package 'h2' is not installed — using HTTP/1.1")
+        return False
+    return True
+
+
+def _build_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        limits=limits,
+        timeout=httpx_timeout(10.0),
+        http2=_http2_available(),
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared AsyncClient for the running event loop (created on first use)."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = _build_client()
+        _client_loop = loop
+        get_orchestration_metrics().increment("http_client.created")
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared client (FastAPI shutdown)."""
+    global _client, _client_loop
+    client, _client, _client_loop = _client, None, None
+    if client is not None and not client.is_closed:
+        await client.aclose()
+        print("[HTTP] shared client closed")
+
+
+def httpx_timeout(seconds: float) -> httpx.Timeout:
+    """Per-request timeout: total budget, connect capped by EXTERNAL_CONNECT_TIMEOUT."""
+    return httpx.Timeout(
+        timeout=seconds,
+        connect=min(seconds, EXTERNAL_CONNECT_TIMEOUT),
+        pool=min(seconds, HTTP_POOL_TIMEOUT),
+    )
+
+
+def connection_trace(metric_prefix: str) -> Callable[[str, Dict[str, Any]], Awaitable[None]]:
+    """
+    httpx "trace" extension counting new TCP connections vs. reused ones.
+
+    Increments <metric_prefix>.connection_opened for each handshake and
+    <metric_prefix>.request for each request, so opened / request is the
+    miss rate of the keep-alive pool.
+    """
+    metrics = get_orchestration_metrics()
+
+    async def trace(event: str, info: Dict[str, Any]) -> None:
+        if event == "connection.connect_tcp.complete":
+            metrics.increment(f"{metric_prefix}.connection_opened")
+        elif event in ("http11.send_request_headers.started", "http2.send_request_headers.started"):
+            metrics.increment(f"{metric_prefix}.request")
+
+    return trace
@@ -0,0 +1,119 @@
+"""
+Structured, non-blocking logging for the ``app.*`` loggers
+
+``configure_logging()`` puts a QueueHandler on the ``app`` logger and a
+QueueListener thread in front of the real stdout handler, so a log call on
+the event loop only builds the message and enqueues the record — timestamp
+formatting, JSON serialisation and the write itself happen off-loop.
+
+Usage in a module:
+    logger = logging.getLogger(__name__)
+    logger.debug("conflict %s vs %s", a, b)          # %-args: not formatted below LOG_LEVEL
+    logger.info("chat_history_metric", extra={"fields": {"event": "cache_hit"}})
+
+Env:
+    LOG_LEVEL   DEBUG | INFO (default) | WARNING ...
+    LOG_FORMAT  text (default) | json — one JSON object per line, ``fields`` merged in
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").strip().upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text").strip().lower()
+
+APP_LOGGER = "app"
+_TEXT_FORMAT = "%(asctime)s %(levelname)s [%(name)s] %(message)s%(fields_text)s"
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if isinstance(fields, dict):
+            payload.update(fields)
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self) -> None:
+        super().__init__(_TEXT_FORMAT)
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = getattr(record, "fields", None)
+        record.fields_text = (
+            " " + json.dumps(fields, ensure_ascii=False, default=str) if isinstance(fields, dict) else ""
+        )
+        return super().format(record)
+
+
+class _DeferredFormatQueueHandler(QueueHandler):
+    """
+    QueueHandler.prepare() runs the full Formatter on the calling thread;
+    here only the message is rendered (so later mutation of args can't change
+    it) and the Formatter runs on the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+_listener: Optional[QueueListener] = None
+_configure_lock = threading.Lock()
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    fmt: Optional[str] = None,
+    stream: Any = None,
+) -> QueueListener:
+    """Idempotent; reconfiguring replaces the previous listener."""
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+
+        sink = logging.StreamHandler(stream or sys.stdout)
+        sink.setFormatter(JsonFormatter() if (fmt or LOG_FORMAT) == "json" else TextFormatter())
+        records: queue.SimpleQueue = queue.SimpleQueue()
+
+        app_logger = logging.getLogger(APP_LOGGER)
+        for handler in list(app_logger.handlers):
+            if isinstance(handler, _DeferredFormatQueueHandler):
+                app_logger.removeHandler(handler)
+        app_logger.addHandler(_DeferredFormatQueueHandler(records))
+        app_logger.setLevel((level or LOG_LEVEL).upper())
+        app_logger.propagate = False
+
+        _listener = QueueListener(records, sink, respect_handler_level=True)
+        _listener.start()
+        return _listener
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+atexit.register(shutdown_logging)
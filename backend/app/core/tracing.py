@@ -0,0 +1,299 @@
+"""
+Per-request span tracing
+
+A trace is opened once per chat request (``trace_request``) and its ID plus
+the current span travel in context variables, so every ``span()`` /
+``@traced`` below it — preprocess, split, classify, tool calls, formatter,
+and each SQL statement via SQLAlchemy engine events — nests under the right
+parent, including across ``asyncio.gather`` tasks and ``asyncio.to_thread``.
+Code running with no active trace pays one ContextVar lookup and records
+nothing.
+
+Finished traces go to a bounded in-memory ring buffer; ``slowest(n)``
+returns a flame-style breakdown (depth, offset, duration, self time, folded
+stacks) for ``/internal/traces/slowest``.
+"""
+from __future__ import annotations
+
+import asyncio
+import inspect
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+TRACE_ENABLED = os.environ.get("TRACE_ENABLED", "true").strip().lower() == "true"
+TRACE_BUFFER_SIZE = int(os.environ.get("TRACE_BUFFER_SIZE", "200"))
+TRACE_MAX_SPANS = int(os.environ.get("TRACE_MAX_SPANS", "500"))
+TRACE_DB_STATEMENT_CHARS = int(os.environ.get("TRACE_DB_STATEMENT_CHARS", "160"))
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("trace_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "attrs", "started_at", "duration", "children")
+
+    def __init__(self, name: str, attrs: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.attrs = attrs or {}
+        self.started_at = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.children: List[Span] = []
+
+    def finish(self) -> None:
+        if self.duration is None:
+            self.duration = time.perf_counter() - self.started_at
+
+
+class Trace:
+    __slots__ = ("trace_id", "root", "started_wall", "span_count", "dropped_spans")
+
+    def __init__(self, name: str, trace_id: Optional[str] = None, attrs: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id or str(uuid.uuid4())[:8]
+        self.root = Span(name, attrs)
+        self.started_wall = datetime.now(timezone.utc).isoformat()
+        self.span_count = 1
+        self.dropped_spans = 0
+
+    @property
+    def duration(self) -> float:
+        return self.root.duration if self.root.duration is not None else time.perf_counter() - self.root.started_at
+
+    def _add(self, parent: Span, child: Span) -> bool:
+        if self.span_count >= TRACE_MAX_SPANS:
+            self.dropped_spans += 1
+            return False
+        self.span_count += 1
+        parent.children.append(child)
+        return True
+
+    def breakdown(self) -> Dict[str, Any]:
+        """Spans depth-first (flame-graph order) with offsets relative to the request start."""
+        origin = self.root.started_at
+        spans: List[Dict[str, Any]] = []
+        self_ms_by_name: Dict[str, float] = defaultdict(float)
+        folded: Dict[str, float] = defaultdict(float)
+
+        def visit(span: Span, depth: int, stack: str) -> None:
+            duration = span.duration if span.duration is not None else time.perf_counter() - span.started_at
+            children_total = sum(child.duration or 0.0 for child in span.children)
+            # Parallel children can overlap; self time never goes negative
+            self_ms = max(0.0, duration - children_total) * 1000
+            spans.append({
+                "name": span.name,
+                "depth": depth,
+                "start_ms": round((span.started_at - origin) * 1000, 3),
+                "duration_ms": round(duration * 1000, 3),
+                "self_ms": round(self_ms, 3),
+                "attrs": span.attrs,
+            })
+            self_ms_by_name[span.name] += self_ms
+            folded[stack] += self_ms
+            for child in span.children:
+                visit(child, depth + 1, f"{stack};{child.name}")
+
+        visit(self.root, 0, self.root.name)
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "started_at": self.started_wall,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attrs": self.root.attrs,
+            "span_count": self.span_count,
+            "dropped_spans": self.dropped_spans,
+            "spans": spans,
+            "self_ms_by_name": {
+                name: round(value, 3)
+                for name, value in sorted(self_ms_by_name.items(), key=lambda item: -item[1])
+            },
+            # "a;b;c <self µs>" — input format of flamegraph.pl / speedscope
+            "folded": [f"{stack} {int(value * 1000)}" for stack, value in folded.items()],
+        }
+
+
+class TraceRecorder:
+    """Ring buffer of the last ``capacity`` finished traces."""
+
+    def __init__(self, capacity: int = TRACE_BUFFER_SIZE):
+        self._traces: deque = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def record(self, trace: Trace) -> None:
+        with self._lock:
+            self._traces.append(trace)
+
+    def slowest(self, limit: int = 10, name: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            traces = [trace for trace in self._traces if name is None or trace.root.name == name]
+        traces.sort(key=lambda trace: trace.duration, reverse=True)
+        return [trace.breakdown() for trace in traces[:max(0, limit)]]
+
+    def __len__(self) -> int:
+        return len(self._traces)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._traces.clear()
+
+
+_recorder = TraceRecorder()
+
+
+def get_trace_recorder() -> TraceRecorder:
+    return _recorder
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.trace_id if trace is not None else None
+
+
+def annotate_trace(**attrs: Any) -> None:
+    """Attach attributes (mode, route, intent, ...) to the request's root span."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.root.attrs.update(attrs)
+
+
+def _reset(var: ContextVar, token: Any) -> None:
+    try:
+        var.reset(token)
+    except ValueError:
+        # Async generator closed from another context; that context never saw the set()
+        pass
+
+
+@contextmanager
+def start_trace(name: str, trace_id: Optional[str] = None, **attrs: Any) -> Iterator[Optional[Trace]]:
+    if not TRACE_ENABLED:
+        yield None
+        return
+    trace = Trace(name, trace_id=trace_id, attrs=attrs)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(trace.root)
+    try:
+        yield trace
+    except BaseException as exc:
+        trace.root.attrs["error"] = type(exc).__name__
+        raise
+    finally:
+        trace.root.finish()
+        _reset(_current_span, span_token)
+        _reset(_current_trace, trace_token)
+        _recorder.record(trace)
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Optional[Span]]:
+    trace = _current_trace.get()
+    parent = _current_span.get()
+    if trace is None or parent is None:
+        yield None
+        return
+    child = Span(name, attrs)
+    if not trace._add(parent, child):
+        yield None
+        return
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as exc:
+        child.attrs["error"] = type(exc).__name__
+        raise
+    finally:
+        child.finish()
+        _reset(_current_span, token)
+
+
+def traced(name: str) -> Callable:
+    """Decorator: run the (sync or async) function inside ``span(name)``."""
+
+    def decorator(fn: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(fn)
+        def sync_wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return sync_wrapper
+
+    return decorator
+
+
+def trace_request(name: str) -> Callable:
+    """
+    Decorator for an endpoint (coroutine) or a streaming body (async
+    generator): everything it runs — until the last chunk is sent — is one
+    trace. Inside, ``current_trace_id()`` gives the ID used in the logs.
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        if inspect.isasyncgenfunction(fn):
+            @wraps(fn)
+            async def gen_wrapper(*args, **kwargs):
+                with start_trace(name):
+                    async for item in fn(*args, **kwargs):
+                        yield item
+
+            return gen_wrapper
+
+        @wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            with start_trace(name):
+                return await fn(*args, **kwargs)
+
+        return async_wrapper
+
+    return decorator
+
+
+# ── SQLAlchemy: one span per executed statement ──────────────────────────────
+_DB_SPANS_KEY = "trace_spans"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _open_db_span(conn, cursor, statement, parameters, context, executemany) -> None:
+    trace = _current_trace.get()
+    parent = _current_span.get()
+    if trace is None or parent is None:
+        return
+    statement_preview = " ".join(str(statement).split())[:TRACE_DB_STATEMENT_CHARS]
+    child = Span("db.query", {"statement": statement_preview, "executemany": bool(executemany)})
+    if trace._add(parent, child):
+        conn.info.setdefault(_DB_SPANS_KEY, []).append(child)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _close_db_span(conn, cursor, statement, parameters, context, executemany) -> None:
+    spans = conn.info.get(_DB_SPANS_KEY)
+    if spans:
+        child = spans.pop()
+        child.attrs["rowcount"] = getattr(cursor, "rowcount", None)
+        child.finish()
+
+
+@event.listens_for(Engine, "handle_error")
+def _fail_db_span(exception_context) -> None:
+    conn = exception_context.connection
+    spans = conn.info.get(_DB_SPANS_KEY) if conn is not None else None
+    if spans:
+        child = spans.pop()
+        child.attrs["error"] = type(exception_context.original_exception).__name__
+        child.finish()
@@ -19,6 +19,9 @@
 
 
 # backend/app/core/database.py
+import os
+import threading
+
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -57,3 +60,68 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# ============================================================
+# Async engine / session (chat hot path)
+# ============================================================
+# Engine async tạo lazy ở lần dùng đầu: module này được import ở mọi nơi, còn
+# driver async (aiomysql / aiosqlite) chỉ cần khi endpoint dùng get_async_db.
+_ASYNC_DRIVERS = {
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+_async_engine = None
+_async_session_factory = None
+_async_engine_lock = threading.Lock()
+
+
+def to_async_database_url(url: str) -> str:
+    """mysql+pymysql://... → mysql+aiomysql://..., sqlite://... → sqlite+aiosqlite://..."""
+    scheme, sep, rest = url.partition("://")
+    return f"{_ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_database_url(DATABASE_URL)
+
+
+def get_async_engine():
+    global _async_engine, _async_session_factory
+    if _async_engine is None:
+        with _async_engine_lock:
+            if _async_engine is None:
+                from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+                is_mysql = "mysql" in ASYNC_DATABASE_URL
+                pool_args = dict(
+                    pool_pre_ping=True,
+                    pool_recycle=3600,
+                    pool_size=10,
+                    max_overflow=20,
+                    pool_timeout=30,
+                ) if is_mysql else {}
+                _async_engine = create_async_engine(
+                    ASYNC_DATABASE_URL,
+                    echo=False,
+                    connect_args={"charset": "utf8mb4", "connect_timeout": 10} if is_mysql else {},
+                    **pool_args,
+                )
+                # expire_on_commit=False: object vẫn đọc được sau commit mà không
+                # phải lazy-load (lazy-load ngoài greenlet sẽ lỗi với AsyncSession)
+                _async_session_factory = async_sessionmaker(
+                    _async_engine, autoflush=False, expire_on_commit=False
+                )
+    return _async_engine
+
+
+def AsyncSessionLocal():
+    get_async_engine()
+    return _async_session_factory()
+
+
+## Dependency async cho FastAPI — song song với get_db
+async def get_async_db():
+    async with AsyncSessionLocal() as session:
+        yield session
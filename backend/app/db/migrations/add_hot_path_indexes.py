@@ -0,0 +1,68 @@
+"""Add indexes for the hot-path queries
+
+Revision ID: add_hot_path_indexes
+Revises: add_feedback_faq_tables
+Create Date: 2026-10-17
+
+Chọn theo các query thực tế (kiểm tra bằng tests/test_query_plans.py):
+- classes(subject_id): ClassSuggestionRuleEngine.get_available_classes,
+  ClassQueryService (JOIN subjects ... WHERE subjects.subject_id IN)
+- classes(class_id, study_date, study_time_start): key upsert của import TKB,
+  đồng thời phục vụ lookup theo class_id
+- class_registers(class_id): đếm sĩ số (covering cho COUNT theo class_id)
+- class_registers(student_id, class_id): danh sách lớp đã đăng ký của sinh viên
+- learned_subjects(student_id, semester): bảng điểm, GPA theo học kỳ, import điểm
+- semester_gpa(student_id, semester): cập nhật GPA/CPA theo delta
+- course_subjects(course_id, subject_id): chương trình đào tạo theo ngành (covering)
+subjects.subject_id đã có unique index (lookup theo mã HP của FuzzyMatcher/upload).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+def _existing_indexes(table):
+    # DB tạo bằng Base.metadata.create_all đã có các index này (khai báo trong
+    # __table_args__ của model); unique constraint trên MySQL cũng là một index.
+    inspector = sa.inspect(op.get_bind())
+    names = {index['name'] for index in inspector.get_indexes(table)}
+    return names | {constraint['name'] for constraint in inspector.get_unique_constraints(table)}
+
+
+def _create_index(name, table, columns, unique=False):
+    if name not in _existing_indexes(table):
+        op.create_index(name, table, columns, unique=unique)
+
+
+def _drop_index(name, table):
+    if name in _existing_indexes(table):
+        op.drop_index(name, table_name=table)
+
+
+def upgrade():
+    _create_index('idx_classes_subject', 'classes', ['subject_id'])
+
+    # uq_classes_session: class_import_service chỉ kiểm tra; DB không chạy Alembic dùng
+    # scripts/db/add_class_session_key.py (cùng các bước, có báo buổi trùng).
+    # NULL không bao giờ trùng trong unique index: chuẩn hoá như import.
+    # Nếu đã có buổi học trùng (class_id, study_date, study_time_start) thì phải xoá trước.
+    if 'uq_classes_session' not in _existing_indexes('classes'):
+        op.execute(sa.text("UPDATE classes SET study_date = '' WHERE study_date IS NULL"))
+        op.execute(sa.text("UPDATE classes SET study_time_start = '00:00:00' WHERE study_time_start IS NULL"))
+        op.create_index('uq_classes_session', 'classes', ['class_id', 'study_date', 'study_time_start'], unique=True)
+
+    _create_index('idx_class_registers_class', 'class_registers', ['class_id'])
+    _create_index('idx_class_registers_student_class', 'class_registers', ['student_id', 'class_id'])
+    _create_index('idx_learned_subjects_student_semester', 'learned_subjects', ['student_id', 'semester'])
+    _create_index('idx_semester_gpa_student_semester', 'semester_gpa', ['student_id', 'semester'])
+    _create_index('idx_course_subjects_course_subject', 'course_subjects', ['course_id', 'subject_id'])
+
+def downgrade():
+    # MySQL: index mới có thể đang là index duy nhất phục vụ một foreign key;
+    # khi đó DROP INDEX báo lỗi 1553 — tạo lại index riêng cho cột FK trước khi downgrade.
+    _drop_index('idx_course_subjects_course_subject', 'course_subjects')
+    _drop_index('idx_semester_gpa_student_semester', 'semester_gpa')
+    _drop_index('idx_learned_subjects_student_semester', 'learned_subjects')
+    _drop_index('idx_class_registers_student_class', 'class_registers')
+    _drop_index('idx_class_registers_class', 'class_registers')
+    _drop_index('uq_classes_session', 'classes')
+    _drop_index('idx_classes_subject', 'classes')
@@ -3,15 +3,19 @@ import json
 import os
 import re
 import time
-from typing import Any, Dict, List, Optional
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 import httpx
 
 from app.agents.orchestration_metrics import get_orchestration_metrics
+from app.core.http_client import connection_trace, get_http_client, httpx_timeout
 
 
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
 OPENAI_MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+MODEL_SPACE_URL = os.environ.get("MODEL_SPACE_URL", "").strip()
+MODEL_SPACE_TOKEN = os.environ.get("MODEL_SPACE_TOKEN", "").strip()
 
 EXTERNAL_CONNECT_TIMEOUT = float(os.environ.get("EXTERNAL_CONNECT_TIMEOUT", "5"))
 EXTERNAL_DEFAULT_TIMEOUT = float(os.environ.get("EXTERNAL_DEFAULT_TIMEOUT", "10"))
@@ -36,6 +40,8 @@ LLM_RETRY_BASE_DELAY = float(os.environ.get("LLM_RETRY_BASE_DELAY", "0.5"))
 LLM_BREAKER_FAIL_THRESHOLD = int(os.environ.get("LLM_BREAKER_FAIL_THRESHOLD", "5"))
 LLM_BREAKER_COOLDOWN_SECONDS = float(os.environ.get("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
 
+GENERATE_FALLBACK_TEXT = "Minh dang xu ly hoi cham, ban vui long thu lai trong giay lat nhe!"
+
 INTENT_LABELS = (
     "grade_view",
     "learned_subjects_view",
@@ -103,6 +109,20 @@ def safe_parse_llm_response(raw_text: str) -> Dict[str, Any]:
     }
 
 
+async def iter_sse_events(response: httpx.Response) -> AsyncIterator[Dict[str, Any]]:
+    """JSON payloads of the ``data:`` lines of a Server-Sent Events response."""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if not data or data == "[DONE]":
+            continue
+        try:
+            yield json.loads(data)
+        except json.JSONDecodeError:
+            continue
+
+
 class LLMCircuitOpenError(RuntimeError):
     pass
 
@@ -141,11 +161,12 @@ class GeminiClient:
             },
         }
         try:
-            async with httpx.AsyncClient() as client:
-                response = await asyncio.wait_for(
-                    client.post(self.url, json=payload, headers=headers, params=params, timeout=timeout),
-                    timeout=timeout,
-                )
+            response = await asyncio.wait_for(
+                get_http_client().post(
+                    self.url, json=payload, headers=headers, params=params, timeout=httpx_timeout(timeout)
+                ),
+                timeout=timeout,
+            )
             if response.status_code != 200:
                 raise LLMAPIError(f"Gemini API error: {response.status_code}")
             data = response.json()
@@ -187,13 +208,16 @@ class OpenAIClient:
         }
 
         try:
-            async with httpx.AsyncClient(
-                timeout=httpx.Timeout(timeout=timeout, connect=min(timeout, EXTERNAL_CONNECT_TIMEOUT))
-            ) as client:
-                response = await asyncio.wait_for(
-                    client.post(self.url, json=payload, headers=headers),
-                    timeout=timeout,
-                )
+            response = await asyncio.wait_for(
+                get_http_client().post(
+                    self.url,
+                    json=payload,
+                    headers=headers,
+                    timeout=httpx_timeout(timeout),
+                    extensions={"trace": connection_trace("llm")},
+                ),
+                timeout=timeout,
+            )
             if response.status_code != 200:
                 raise LLMAPIError(f"OpenAI API error: {response.status_code} {response.text[:300]}")
             data = response.json()
@@ -207,13 +231,107 @@ class OpenAIClient:
         except asyncio.TimeoutError as exc:
             raise LLMTimeoutError("OpenAI timeout") from exc
 
+    async def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        max_tokens: int = 160,
+        temperature: float = 0.2,
+        timeout: float = 25.0,
+    ) -> AsyncIterator[str]:
+        """Chat completion with ``stream: true``; yields content deltas."""
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}",
+        }
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "top_p": 0.9,
+            "stream": True,
+        }
+
+        try:
+            async with get_http_client().stream(
+                "POST",
+                self.url,
+                json=payload,
+                headers=headers,
+                timeout=httpx_timeout(timeout),
+                extensions={"trace": connection_trace("llm")},
+            ) as response:
+                if response.status_code != 200:
+                    body = (await response.aread()).decode("utf-8", "replace")
+                    raise LLMAPIError(f"OpenAI API error: {response.status_code} {body[:300]}")
+                async for event in iter_sse_events(response):
+                    choices = event.get("choices") or [{}]
+                    piece = (choices[0].get("delta") or {}).get("content")
+                    if piece:
+                        yield piece
+        except httpx.TimeoutException as exc:
+            raise LLMTimeoutError("OpenAI stream timeout") from exc
+
+
+class ModelSpaceClient:
+    """Self-hosted llama-cpp model-space (/generate); only used for streaming."""
+
+    def __init__(self, base_url: str, token: Optional[str] = None):
+        self.base_url = base_url.rstrip("/")
+        self._headers = {"Authorization": f"Bearer {token}"} if token else {}
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        max_tokens: int = 160,
+        temperature: float = 0.2,
+        timeout: float = 25.0,
+        top_p: float = 0.9,
+        repeat_penalty: float = 1.08,
+        stop: Optional[List[str]] = None,
+    ) -> AsyncIterator[str]:
+        payload = {
+            "prompt": prompt,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "top_p": top_p,
+            "repeat_penalty": repeat_penalty,
+            "stop": stop,
+            "stream": True,
+        }
+        try:
+            async with get_http_client().stream(
+                "POST",
+                f"{self.base_url}/generate",
+                json=payload,
+                headers=self._headers,
+                timeout=httpx_timeout(timeout),
+                extensions={"trace": connection_trace("llm")},
+            ) as response:
+                if response.status_code != 200:
+                    body = (await response.aread()).decode("utf-8", "replace")
+                    raise LLMAPIError(f"model-space error: {response.status_code} {body[:300]}")
+                async for event in iter_sse_events(response):
+                    if event.get("error"):
+                        raise LLMAPIError(str(event["error"]))
+                    if event.get("delta"):
+                        yield event["delta"]
+        except httpx.TimeoutException as exc:
+            raise LLMTimeoutError("model-space stream timeout") from exc
+
 
 class LLMClient:
     def __init__(self, base_url: Optional[str] = None, token: Optional[str] = None):
-        self.base_url = None
-        self.token = None
+        self.base_url = (base_url or MODEL_SPACE_URL).rstrip("/") or None
+        self.token = token or MODEL_SPACE_TOKEN or None
         self._headers = {}
         self._openai = OpenAIClient(OPENAI_API_KEY, model=OPENAI_MODEL) if OPENAI_API_KEY else None
+        self._model_space = ModelSpaceClient(self.base_url, self.token) if self.base_url else None
         self._consecutive_failures = 0
         self._breaker_open_until = 0.0
         self._metrics = get_orchestration_metrics()
@@ -383,9 +501,74 @@ class LLMClient:
         self._metrics.increment("llm.generate.rulebase_fallback")
         self._metrics.observe_latency("llm.generate.latency", duration)
         return {
-            "text": "Minh dang xu ly hoi cham, ban vui long thu lai trong giay lat nhe!",
+            "text": GENERATE_FALLBACK_TEXT,
             "model_used": "rulebase_fallback",
         }
 
+    async def generate_stream(
+        self,
+        prompt: str,
+        max_tokens: int = LLM_GENERATE_MAX_TOKENS,
+        temperature: float = LLM_GENERATE_TEMPERATURE,
+        timeout: float = LLM_GENERATE_TIMEOUT,
+        top_p: float = LLM_TOP_P,
+        repeat_penalty: float = LLM_REPEAT_PENALTY,
+        stop: Optional[List[str]] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Streaming counterpart of generate(): yields text pieces as the backend
+        decodes them (OpenAI first, then model-space). A backend that fails
+        before its first piece falls through to the next one, and with no
+        backend left the generate() fallback text is yielded once. A failure
+        after pieces were yielded is re-raised — the caller has already shown
+        partial text. ``llm.generate_stream.ttft`` records time-to-first-token.
+        """
+        started = time.perf_counter()
+        backends = []
+        if self._openai:
+            backends.append(("openai", lambda: self._openai.generate_stream(
+                prompt=prompt, max_tokens=max_tokens, temperature=temperature, timeout=timeout,
+            )))
+        if self._model_space:
+            backends.append(("model_space", lambda: self._model_space.generate_stream(
+                prompt=prompt, max_tokens=max_tokens, temperature=temperature, timeout=timeout,
+                top_p=top_p, repeat_penalty=repeat_penalty, stop=stop,
+            )))
+
+        for name, open_stream in backends:
+            emitted = False
+            try:
+                async with aclosing(open_stream()) as pieces:
+                    async for piece in pieces:
+                        if not emitted:
+                            emitted = True
+                            self._metrics.observe_latency("llm.generate_stream.ttft", time.perf_counter() - started)
+                        yield piece
+                self._record_success()
+                self._metrics.increment(f"llm.generate_stream.{name}_success")
+                self._metrics.observe_latency("llm.generate_stream.latency", time.perf_counter() - started)
+                return
+            except Exception as exc:
+                self._record_failure()
+                self._metrics.increment(f"llm.generate_stream.{name}_failure")
+                print(f"[LLM:STREAM] {name} failed: {type(exc).__name__}: {exc}")
+                if emitted:
+                    raise
+
+        self._metrics.increment("llm.generate_stream.rulebase_fallback")
+        self._metrics.observe_latency("llm.generate_stream.ttft", time.perf_counter() - started)
+        yield GENERATE_FALLBACK_TEXT
+
     async def close(self):
         return None
+
+
+_shared_llm_client: Optional[LLMClient] = None
+
+
+def get_llm_client() -> LLMClient:
+    """Process-wide LLMClient (circuit breaker state is shared by all callers)."""
+    global _shared_llm_client
+    if _shared_llm_client is None:
+        _shared_llm_client = LLMClient()
+    return _shared_llm_client
@@ -1,6 +1,9 @@
+import heapq
 import os
+import threading
 import time
-from typing import Optional
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 
 try:
     import redis
@@ -9,24 +12,137 @@ except Exception:
     _REDIS_AVAILABLE = False
 
 CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", "300"))
+MEMORY_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+MEMORY_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
 
 
 class InMemoryCache:
-    def __init__(self):
-        self.store = {}
+    """
+    Bounded LRU + TTL store (the ResponseCache fallback when Redis is down).
+
+    - Capped by entry count and by total size (UTF-8 bytes of key + value);
+      inserting past either cap evicts least-recently-used entries.
+    - Expired entries are swept incrementally: each entry is filed in a
+      coarse expiry bucket, and every get/set retires at most
+      ``sweep_batch`` keys from buckets that are already past, so expiry
+      costs amortised O(1) per operation instead of a full scan.
+    - incr() counters live outside the LRU and never expire or get evicted
+      (eviction would silently reset a version counter).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = MEMORY_CACHE_MAX_ENTRIES,
+        max_bytes: int = MEMORY_CACHE_MAX_BYTES,
+        sweep_batch: int = 8,
+        bucket_seconds: int = 5,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max(1, max_bytes)
+        self.sweep_batch = max(1, sweep_batch)
+        self.bucket_seconds = max(1, bucket_seconds)
+        self._entries: "OrderedDict[str, Tuple[str, float, int]]" = OrderedDict()
+        self._buckets: Dict[int, List[str]] = {}
+        self._bucket_heap: List[int] = []
+        self._counters: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _size(key: str, value: str) -> int:
+        return len(key.encode("utf-8")) + len(value.encode("utf-8"))
+
+    def _remove(self, key: str) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _sweep(self, now: float) -> None:
+        budget = self.sweep_batch
+        current = int(now // self.bucket_seconds)
+        while budget and self._bucket_heap and self._bucket_heap[0] < current:
+            bucket = self._bucket_heap[0]
+            keys = self._buckets[bucket]
+            while budget and keys:
+                key = keys.pop()
+                budget -= 1
+                item = self._entries.get(key)
+                # Skip keys re-set since they were filed in this bucket
+                if item is not None and item[1] <= now:
+                    self._remove(key)
+                    self.expirations += 1
+            if not keys:
+                heapq.heappop(self._bucket_heap)
+                del self._buckets[bucket]
 
     def get(self, key: str) -> Optional[str]:
-        item = self.store.get(key)
-        if not item:
-            return None
-        value, expires = item
-        if expires < time.time():
-            del self.store[key]
-            return None
-        return value
+        now = time.time()
+        with self._lock:
+            self._sweep(now)
+            if key in self._counters:
+                self.hits += 1
+                return str(self._counters[key])
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            value, expires, _ = item
+            if expires < now:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
 
     def set(self, key: str, value: str, ttl: int = CACHE_TTL):
-        self.store[key] = (value, time.time() + ttl)
+        now = time.time()
+        size = self._size(key, value)
+        with self._lock:
+            self._sweep(now)
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return  # would evict everything and still not fit
+            expires = now + ttl
+            self._entries[key] = (value, expires, size)
+            self._bytes += size
+            bucket = int(expires // self.bucket_seconds)
+            if bucket not in self._buckets:
+                self._buckets[bucket] = []
+                heapq.heappush(self._bucket_heap, bucket)
+            self._buckets[bucket].append(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def incr(self, key: str) -> int:
+        """Counter that never expires (like Redis INCR on a key without TTL)."""
+        with self._lock:
+            value = self._counters.get(key, 0) + 1
+            self._counters[key] = value
+            return value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "counters": len(self._counters),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
 
 
 class ResponseCache:
@@ -83,6 +199,11 @@ class ResponseCache:
 
     # ── public API ────────────────────────────────────────────────────────────────
 
+    @property
+    def shared(self) -> bool:
+        """True when entries are visible to other processes (Redis is up)."""
+        return self._redis_available and self._client is not None
+
     def get(self, key: str) -> Optional[str]:
         # Try Redis first if alive
         if self._redis_available and self._client is not None:
@@ -95,6 +216,16 @@ class ResponseCache:
         # Fall through to in-memory
         return self._memory.get(key)
 
+    def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        """Values of ``keys`` in order — one MGET round trip on Redis."""
+        if self._redis_available and self._client is not None:
+            try:
+                return list(self._client.mget(keys))
+            except Exception:
+                self._redis_available = False
+                self._client = None
+        return [self._memory.get(key) for key in keys]
+
     def set(self, key: str, value: str, ttl: int = CACHE_TTL) -> None:
         if self._redis_available and self._client is not None:
             try:
@@ -105,3 +236,18 @@ class ResponseCache:
                 self._redis_available = False
                 self._client = None
         self._memory.set(key, value, ttl)
+
+    def incr(self, key: str) -> int:
+        if self._redis_available and self._client is not None:
+            try:
+                return int(self._client.incr(key))
+            except Exception:
+                self._redis_available = False
+                self._client = None
+        return self._memory.incr(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis" if self._redis_available else "memory",
+            "memory": self._memory.stats(),
+        }
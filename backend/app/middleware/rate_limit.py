@@ -1,78 +1,143 @@
 """
 Rate Limiting Middleware and Decorator
 Hỗ trợ giới hạn truy vấn theo nhiều cấp: phút, giờ, ngày.
-Sử dụng Redis với fallback in-memory (thread-safe).
+Sliding-window log trên Redis (một Lua script cho mọi cấp) với fallback
+in-memory (thread-safe) dùng cùng thuật toán.
 """
 from __future__ import annotations
 
 import asyncio
 import logging
+import math
+import os
 import threading
 import time
-from collections import defaultdict
+import uuid
+from collections import deque
 from functools import wraps
-from typing import Callable, Dict, List, Optional, Tuple
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
 
 from fastapi import HTTPException
 
 logger = logging.getLogger(__name__)
 
 # ──────────────────────────────────────────────────────────────────────────────
-# In-memory fallback store (thread-safe, process-scoped)
-# Used when Redis is unavailable (e.g., error 10061 connection refused).
+# Sliding-window log: a request is allowed only if, for EVERY tier, fewer than
+# `limit` requests were accepted in the trailing `window` seconds. Denied
+# requests are not recorded. Redis and the in-memory fallback run the same
+# algorithm; Redis evaluates all tiers in one EVALSHA round-trip.
 # ──────────────────────────────────────────────────────────────────────────────
 
-class _InMemoryCounter:
-    """Thread-safe counter with automatic expiry."""
+RATE_LIMIT_REDIS_FAIL_THRESHOLD = int(os.getenv("RATE_LIMIT_REDIS_FAIL_THRESHOLD", "3"))
+RATE_LIMIT_REDIS_COOLDOWN_SECONDS = float(os.getenv("RATE_LIMIT_REDIS_COOLDOWN_SECONDS", "30"))
 
-    __slots__ = ("value", "reset_at")
+Tier = Tuple[str, int, int]  # (tier_name, limit, window_seconds)
 
-    def __init__(self) -> None:
-        self.value: int = 0
-        self.reset_at: float = 0.0
+
+class RateLimitDecision:
+    __slots__ = ("allowed", "tier", "limit", "retry_after", "backend")
+
+    def __init__(self, allowed: bool, tier: Optional[str] = None, limit: int = 0,
+                 retry_after: int = 0, backend: str = "memory") -> None:
+        self.allowed = allowed
+        self.tier = tier
+        self.limit = limit
+        self.retry_after = retry_after
+        self.backend = backend
+
+
+def _denied(tiers: List[Tier], index: int, retry_ms: float, backend: str) -> RateLimitDecision:
+    tier_name, tier_limit, tier_window = tiers[index]
+    retry_after = max(1, min(tier_window, math.ceil(retry_ms / 1000)))
+    return RateLimitDecision(False, tier_name, tier_limit, retry_after, backend)
+
+
+# KEYS[i] = sorted set (score = accept time in ms) of tier i
+# ARGV    = member, then limit_i, window_ms_i for each tier
+# Returns {1} when allowed, {0, tier_index (1-based), retry_ms} when denied
+_SLIDING_WINDOW_LUA = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local denied_index, denied_retry = 0, -1
+for i = 1, #KEYS do
+    local limit = tonumber(ARGV[i * 2])
+    local window = tonumber(ARGV[i * 2 + 1])
+    redis.call('ZREMRANGEBYSCORE', KEYS[i], '-inf', now - window)
+    local count = redis.call('ZCARD', KEYS[i])
+    if count >= limit then
+        local oldest = redis.call('ZRANGE', KEYS[i], count - limit, count - limit, 'WITHSCORES')
+        local retry = tonumber(oldest[2]) + window - now
+        if retry > denied_retry then
+            denied_index, denied_retry = i, retry
+        end
+    end
+end
+if denied_index > 0 then
+    return {0, denied_index, denied_retry}
+end
+for i = 1, #KEYS do
+    redis.call('ZADD', KEYS[i], now, ARGV[1])
+    redis.call('PEXPIRE', KEYS[i], tonumber(ARGV[i * 2 + 1]))
+end
+return {1}
+"""
 
 
-class _InMemoryStore:
+class _SlidingWindowStore:
     """
-    Global in-memory store backed by defaultdict + threading.Lock.
-    Stores {_key: _InMemoryCounter(value, reset_at)}.
+    In-process sliding-window log (thread-safe, process-scoped).
 
     NOTE: This is a per-process fallback. It will NOT share state across
     multiple uvicorn/gunicorn workers. Use Redis in production multi-worker
     deployments to get distributed rate limiting.
     """
 
+    SWEEP_EVERY = 1024
+
     def __init__(self) -> None:
         self._lock = threading.Lock()
-        self._data: Dict[str, _InMemoryCounter] = defaultdict(_InMemoryCounter)
-
-    def incr(self, key: str, window_seconds: int) -> int:
-        """
-        Increment counter for `key` and return the new value.
-        Resets the counter when the window has elapsed.
-        """
-        now = time.monotonic()
+        self._logs: Dict[str, Tuple[int, Deque[float]]] = {}
+        self._calls = 0
+
+    def hit(self, keys: List[str], tiers: List[Tier], now: Optional[float] = None) -> RateLimitDecision:
+        now = time.monotonic() if now is None else now
         with self._lock:
-            counter = self._data[key]
-            if now >= counter.reset_at:
-                counter.value = 0
-                counter.reset_at = now + window_seconds
-            counter.value += 1
-            return counter.value
-
-    def ttl_remaining(self, key: str) -> int:
-        """Return seconds until the current window expires (0 if key missing)."""
-        now = time.monotonic()
+            self._calls += 1
+            if self._calls % self.SWEEP_EVERY == 0:
+                self._sweep(now)
+
+            denied_index, denied_retry = -1, -1.0
+            logs = []
+            for index, (key, (_, tier_limit, tier_window)) in enumerate(zip(keys, tiers)):
+                entry = self._logs.get(key)
+                log = entry[1] if entry is not None else deque()
+                while log and log[0] <= now - tier_window:
+                    log.popleft()
+                logs.append(log)
+                if len(log) >= tier_limit:
+                    retry = log[len(log) - tier_limit] + tier_window - now
+                    if retry > denied_retry:
+                        denied_index, denied_retry = index, retry
+            if denied_index >= 0:
+                return _denied(tiers, denied_index, denied_retry * 1000, "memory")
+
+            for key, log, (_, _, tier_window) in zip(keys, logs, tiers):
+                log.append(now)
+                self._logs[key] = (tier_window, log)
+            return RateLimitDecision(True, backend="memory")
+
+    def _sweep(self, now: float) -> None:
+        expired = [key for key, (window, log) in self._logs.items() if not log or log[-1] <= now - window]
+        for key in expired:
+            del self._logs[key]
+
+    def clear(self) -> None:
         with self._lock:
-            counter = self._data.get(key)
-            if counter is None:
-                return 0
-            remaining = counter.reset_at - now
-            return max(0, int(remaining))
+            self._logs.clear()
 
 
 # Process-global fallback store (singleton)
-_inmemory_store = _InMemoryStore()
+_inmemory_store = _SlidingWindowStore()
 
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -81,62 +146,80 @@ _inmemory_store = _InMemoryStore()
 
 class _RedisRateLimiter:
     """
-    Redis-based sliding-window rate limiter.
-    Uses INCR + EXPIRE (simplified fixed window) to track request counts.
+    Redis sliding-window limiter: one Lua script checks and records all tiers
+    atomically (1 round-trip). A circuit breaker replaces the per-call PING:
+    after RATE_LIMIT_REDIS_FAIL_THRESHOLD consecutive errors Redis is skipped
+    for RATE_LIMIT_REDIS_COOLDOWN_SECONDS and the in-memory store is used.
     """
 
-    def __init__(self) -> None:
-        try:
-            from app.cache.redis_cache import get_redis_cache
-            self._cache = get_redis_cache()
-        except Exception as exc:
-            logger.warning(f"Redis unavailable for rate limiting, falling back to in-memory: {exc}")
-            self._cache = None
-
-    def _is_available(self) -> bool:
-        if self._cache is None:
-            return False
-        try:
-            self._cache.client.ping()
-            return True
-        except Exception:
-            return False
-
-    def incr(self, key: str, window_seconds: int) -> Tuple[int, bool]:
-        """
-        Increment the counter for `key` and return (new_value, is_redis).
-
-        - If Redis is available: INCR + EXPIRE (set TTL only on first set).
-        - If Redis is unavailable: falls back to in-memory store.
-        """
-        if self._is_available():
+    def __init__(self, cache: Any = None, store: Optional[_SlidingWindowStore] = None) -> None:
+        if cache is None:
             try:
-                new_val = self._cache.increment(key, 1)
-                if new_val is None:
-                    raise RuntimeError("Redis INCR returned None")
-
-                # Set TTL only the first time the key is created (when value == 1)
-                if new_val == 1:
-                    self._cache.expire(key, window_seconds)
+                from app.cache.redis_cache import get_redis_cache
+                cache = get_redis_cache()
+            except Exception as exc:
+                logger.warning(f"Redis unavailable for rate limiting, falling back to in-memory: {exc}")
+        self._client = getattr(cache, "client", None)
+        self._script = None
+        self._store = store or _inmemory_store
+        self._breaker_lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._open_until = 0.0
+
+    def _redis_usable(self) -> bool:
+        return self._client is not None and time.monotonic() >= self._open_until
+
+    def _record_failure(self, exc: Exception) -> None:
+        with self._breaker_lock:
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= RATE_LIMIT_REDIS_FAIL_THRESHOLD:
+                self._open_until = time.monotonic() + RATE_LIMIT_REDIS_COOLDOWN_SECONDS
+                self._consecutive_failures = 0
+                logger.warning(
+                    "Redis rate limiting failed, using in-memory fallback for %ss: %s",
+                    RATE_LIMIT_REDIS_COOLDOWN_SECONDS, exc,
+                )
 
-                return int(new_val), True
+    def _record_success(self) -> None:
+        if self._consecutive_failures:
+            with self._breaker_lock:
+                self._consecutive_failures = 0
+
+    @staticmethod
+    def _keys(key: str, tiers: List[Tier]) -> List[str]:
+        # Hash tag keeps every tier of one user in the same Redis Cluster slot
+        return [f"rate_limit:{{{key}}}:{tier_name}" for tier_name, _, _ in tiers]
+
+    def hit(self, key: str, tiers: List[Tier]) -> RateLimitDecision:
+        """Check all tiers for `key`; record the request only if every tier allows it."""
+        if not tiers:
+            return RateLimitDecision(True)
+        keys = self._keys(key, tiers)
+        if self._redis_usable():
+            try:
+                if self._script is None:
+                    self._script = self._client.register_script(_SLIDING_WINDOW_LUA)
+                args: List[Any] = [uuid.uuid4().hex]
+                for _, tier_limit, tier_window in tiers:
+                    args.extend((tier_limit, tier_window * 1000))
+                result = self._script(keys=keys, args=args)
+                self._record_success()
+                if int(result[0]) == 1:
+                    return RateLimitDecision(True, backend="redis")
+                return _denied(tiers, int(result[1]) - 1, float(result[2]), "redis")
             except Exception as exc:
-                logger.warning(f"Redis INCR/EXPIRE failed, using fallback: {exc}")
+                self._record_failure(exc)
+        return self._store.hit(keys, tiers)
 
-        # Fallback to in-memory
-        return _inmemory_store.incr(key, window_seconds), False
 
-    def ttl_remaining(self, key: str) -> int:
-        """
-        Return seconds until the current window expires.
-        Tries Redis first, falls back to in-memory store.
-        """
-        if self._is_available():
-            try:
-                return max(0, self._cache.get_ttl(key))
-            except Exception:
-                pass
-        return _inmemory_store.ttl_remaining(key)
+def _enforce(limiter: _RedisRateLimiter, key: str, tiers: List[Tier]) -> None:
+    decision = limiter.hit(key, tiers)
+    if not decision.allowed:
+        raise RateLimitExceeded(
+            retry_after=decision.retry_after,
+            tier=decision.tier,
+            limit=decision.limit,
+        )
 
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -232,11 +315,13 @@ def rate_limit(
                   If None, defaults to keying by `student_id` on the first arg
                   that has a `.id` attribute (works with SQLAlchemy Student model).
 
-    The decorator checks ALL active tiers (minute / hour / day) and returns 429
-    on the first one that is breached, with the exact retry-after seconds.
+    The decorator checks ALL active tiers (minute / hour / day) in one atomic
+    step and returns 429 naming the breached tier that frees up last, with the
+    exact retry-after seconds. Rejected requests do not consume quota.
 
-    Redis is used for tracking when available; falls back to a thread-safe
-    in-memory dict if Redis is unreachable (e.g. connection error 10061).
+    Redis is used for tracking when available; falls back to the thread-safe
+    in-memory sliding-window log while Redis is unreachable (e.g. connection
+    error 10061) or its circuit breaker is open.
     """
 
     # Resolve effective limit / window (None → env defaults)
@@ -273,36 +358,12 @@ def rate_limit(
 
         @wraps(fn)
         async def async_wrapper(*args, **kwargs):
-            key = _key_func(**kwargs)
-            for tier_name, tier_limit, tier_window in _tiers:
-                rl_key = f"rate_limit:{tier_name}:{key}"
-                current_count, _ = _limiter.incr(rl_key, tier_window)
-                if current_count > tier_limit:
-                    retry_after = _limiter.ttl_remaining(rl_key)
-                    if retry_after <= 0:
-                        retry_after = tier_window
-                    raise RateLimitExceeded(
-                        retry_after=retry_after,
-                        tier=tier_name,
-                        limit=tier_limit,
-                    )
+            _enforce(_limiter, _key_func(**kwargs), _tiers)
             return await fn(*args, **kwargs)
 
         @wraps(fn)
         def sync_wrapper(*args, **kwargs):
-            key = _key_func(**kwargs)
-            for tier_name, tier_limit, tier_window in _tiers:
-                rl_key = f"rate_limit:{tier_name}:{key}"
-                current_count, _ = _limiter.incr(rl_key, tier_window)
-                if current_count > tier_limit:
-                    retry_after = _limiter.ttl_remaining(rl_key)
-                    if retry_after <= 0:
-                        retry_after = tier_window
-                    raise RateLimitExceeded(
-                        retry_after=retry_after,
-                        tier=tier_name,
-                        limit=tier_limit,
-                    )
+            _enforce(_limiter, _key_func(**kwargs), _tiers)
             return fn(*args, **kwargs)
 
         return async_wrapper if is_async else sync_wrapper
@@ -327,51 +388,25 @@ def simple_rate_limit(limit: int, window: int) -> Callable:
             ...
     """
     _limiter = _RedisRateLimiter()
+    _tiers = [("per_minute", limit, window)]
+
+    def _student_key(kwargs: Dict[str, Any]) -> str:
+        student = kwargs.get("current_student")
+        if student is not None and hasattr(student, "id"):
+            return f"student:{student.id}"
+        return "user:unknown"
 
     def decorator(fn: Callable) -> Callable:
         is_async = asyncio.iscoroutinefunction(fn)
 
         @wraps(fn)
         async def async_wrapper(*args, **kwargs):
-            # Try to find current_student in kwargs
-            student = kwargs.get("current_student")
-            if student is not None and hasattr(student, "id"):
-                key = f"student:{student.id}"
-            else:
-                key = "user:unknown"
-
-            rl_key = f"rate_limit:{key}"
-            current_count, _ = _limiter.incr(rl_key, window)
-            if current_count > limit:
-                retry_after = _limiter.ttl_remaining(rl_key)
-                if retry_after <= 0:
-                    retry_after = window
-                raise RateLimitExceeded(
-                    retry_after=retry_after,
-                    tier="per_minute",
-                    limit=limit,
-                )
+            _enforce(_limiter, f"simple:{_student_key(kwargs)}", _tiers)
             return await fn(*args, **kwargs)
 
         @wraps(fn)
         def sync_wrapper(*args, **kwargs):
-            student = kwargs.get("current_student")
-            if student is not None and hasattr(student, "id"):
-                key = f"student:{student.id}"
-            else:
-                key = "user:unknown"
-
-            rl_key = f"rate_limit:{key}"
-            current_count, _ = _limiter.incr(rl_key, window)
-            if current_count > limit:
-                retry_after = _limiter.ttl_remaining(rl_key)
-                if retry_after <= 0:
-                    retry_after = window
-                raise RateLimitExceeded(
-                    retry_after=retry_after,
-                    tier="per_minute",
-                    limit=limit,
-                )
+            _enforce(_limiter, f"simple:{_student_key(kwargs)}", _tiers)
             return fn(*args, **kwargs)
 
         return async_wrapper if is_async else sync_wrapper
@@ -4,11 +4,14 @@ from sqlalchemy.orm import relationship
 
 from app.db.database import Base
 
+# SQLite chỉ auto-increment cột INTEGER PRIMARY KEY (test dùng sqlite/aiosqlite)
+_BigIntPK = BigInteger().with_variant(Integer, "sqlite")
+
 
 class ChatConversation(Base):
     __tablename__ = "chat_conversations"
 
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    id = Column(_BigIntPK, primary_key=True, autoincrement=True)
     student_pk = Column(Integer, ForeignKey("students.id"), nullable=False)
     title = Column(String(255), nullable=True)
     created_at = Column(DateTime, nullable=False, server_default=func.now())
@@ -30,7 +33,7 @@ class ChatConversation(Base):
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
 
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    id = Column(_BigIntPK, primary_key=True, autoincrement=True)
     conversation_id = Column(
         BigInteger,
         ForeignKey("chat_conversations.id", ondelete="CASCADE"),
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Time, ForeignKey
+from sqlalchemy import Column, String, Integer, Time, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship, validates
 from app.db.database import Base
 from datetime import datetime, time
@@ -8,6 +8,12 @@ from sqlalchemy.types import JSON
 
 class Class(Base):
     __tablename__ = "classes"
+    # Một mã lớp có thể có nhiều buổi; key của upsert khi import TKB (class_import_service).
+    # Cũng là index cho các lookup theo class_id (cột đầu tiên).
+    __table_args__ = (
+        UniqueConstraint("class_id", "study_date", "study_time_start", name="uq_classes_session"),
+        Index("idx_classes_subject", "subject_id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     subject_id = Column(Integer, ForeignKey("subjects.id"))
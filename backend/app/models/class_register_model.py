@@ -1,5 +1,5 @@
 from typing import Optional
-from sqlalchemy import Column, String, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, String, Integer, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.database import Base
@@ -18,3 +18,8 @@ class ClassRegister(Base):
 
     student = relationship("Student", back_populates="class_registers")
     class_info_rel = relationship("Class", back_populates="class_registers")
+
+    __table_args__ = (
+        Index("idx_class_registers_class", "class_id"),
+        Index("idx_class_registers_student_class", "student_id", "class_id"),
+    )
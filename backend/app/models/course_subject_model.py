@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, ForeignKey
+from sqlalchemy import Column, String, Integer, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 
@@ -12,3 +12,7 @@ class CourseSubject(Base):
 
     subject = relationship("Subject", back_populates="course_subjects")
     course = relationship("Course", back_populates="course_subjects")
+
+    __table_args__ = (
+        Index("idx_course_subjects_course_subject", "course_id", "subject_id"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, ForeignKey
+from sqlalchemy import Column, String, Integer, Float, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 
@@ -15,3 +15,7 @@ class LearnedSubject(Base):
 
     student = relationship("Student", back_populates="learned_subjects")
     subject = relationship("Subject", back_populates="learned_subjects")
+
+    __table_args__ = (
+        Index("idx_learned_subjects_student_semester", "student_id", "semester"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, ForeignKey
+from sqlalchemy import Column, String, Integer, Float, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 
@@ -12,3 +12,7 @@ class SemesterGPA(Base):
     student_id = Column(Integer, ForeignKey("students.id"))  # Foreign key to Student
 
     student = relationship("Student", back_populates="semester_gpa")
+
+    __table_args__ = (
+        Index("idx_semester_gpa_student_semester", "student_id", "semester"),
+    )
@@ -38,6 +38,7 @@ from app.schemas.node_schemas import (
     Node4FormatResponseResponse,
     NodeHealthResponse,
 )
+from app.services.academic_snapshot_service import get_student_snapshot
 from app.services.chatbot_service import ChatbotService
 from app.services.text_preprocessor import get_text_preprocessor
 from app.services.query_splitter import get_query_splitter
@@ -368,9 +369,9 @@ async def node2_intent_classifier(
     _verify_internal_key(x_agent_internal_key)
 
     try:
-        from app.chatbot.tfidf_classifier import TfidfIntentClassifier
+        from app.chatbot.tfidf_classifier import get_intent_classifier
 
-        classifier = TfidfIntentClassifier()
+        classifier = get_intent_classifier()
         result = await classifier.classify_intent(payload.query)
         duration_ms = (time.perf_counter() - started_at) * 1000
 
@@ -424,7 +425,7 @@ async def node2_intent_classifier(
 # graduation_progress tool
 # Dedicated route for calculating remaining credits toward graduation.
 # Flow:
-#   1. Look up student → get course_id
+#   1. Load the student's academic snapshot (course, curriculum, transcript)
 #   2. Get all subjects in that course (course_subjects JOIN subjects)
 #   3. Compare against learned_subjects to separate passed / failed / not_taken
 #   4. Return structured summary with total / accumulated / remaining credits
@@ -441,9 +442,15 @@ async def graduation_progress_tool(
     db: Session = Depends(get_db),
     x_agent_internal_key: Optional[str] = Header(None, alias="X-Agent-Internal-Key"),
 ):
-    from app.models import Student, CourseSubject, LearnedSubject, Subject, Course
-
     _verify_internal_key(x_agent_internal_key)
+    return await run_graduation_progress(payload, db)
+
+
+async def run_graduation_progress(
+    payload: Node3ToolExecutorRequest,
+    db: Session,
+) -> Node3ToolExecutorResponse:
+    """graduation_progress handler, shared by the HTTP route and the in-process tool transport"""
     started_at = time.perf_counter()
 
     student_id = payload.student_id
@@ -464,9 +471,9 @@ async def graduation_progress_tool(
     )
 
     try:
-        # ── Step 1: Student → course_id ─────────────────────────────────────────
-        student = db.query(Student).filter(Student.id == student_id).first()
-        if not student:
+        # ── Step 1: Student, course, curriculum and transcript (one snapshot) ─
+        snapshot = get_student_snapshot(db, student_id)
+        if snapshot is None:
             return Node3ToolExecutorResponse(
                 status="error",
                 data=None,
@@ -478,22 +485,11 @@ async def graduation_progress_tool(
                 error=f"Không tìm thấy sinh viên với student_id={student_id}.",
             )
 
-        course_id = student.course_id
-
-        # Course name (for response context)
-        course_name = None
-        course_row = db.query(Course).filter(Course.id == course_id).first()
-        if course_row:
-            course_name = getattr(course_row, "course_name", None) or getattr(course_row, "name", None)
+        course_id = snapshot.course_id
+        course_name = snapshot.course_name
 
         # ── Step 2: All subjects in the student's program ──────────────────────
-        course_subjects = (
-            db.query(CourseSubject, Subject)
-            .join(Subject, CourseSubject.subject_id == Subject.id)
-            .filter(CourseSubject.course_id == course_id)
-            .all()
-        )
-        if not course_subjects:
+        if not snapshot.curriculum:
             return Node3ToolExecutorResponse(
                 status="error",
                 data=None,
@@ -505,95 +501,13 @@ async def graduation_progress_tool(
                 error=f"Không tìm thấy chương trình đào tạo nào cho course_id={course_id}.",
             )
 
-        total_required_credits = 0
-        course_subject_ids = set()
-        subject_info_map: Dict[int, Dict[str, Any]] = {}
-
-        for cs, subj in course_subjects:
-            credits = subj.credits or 0
-            total_required_credits += credits
-            course_subject_ids.add(subj.id)
-            subject_info_map[subj.id] = {
-                "subject_id": subj.subject_id or str(subj.id),
-                "subject_name": subj.subject_name or "",
-                "credits": credits,
-                "learning_semester": cs.learning_semester,
-                "conditional_subjects": subj.conditional_subjects,
-            }
-
-        # ── Step 3: Learned subjects for this student ──────────────────────────
-        learned_rows = (
-            db.query(LearnedSubject)
-            .filter(
-                LearnedSubject.student_id == student_id,
-                LearnedSubject.subject_id.in_(course_subject_ids),
-            )
-            .all()
-        )
-
-        learned_map: Dict[int, LearnedSubject] = {lr.subject_id: lr for lr in learned_rows}
-
-        # ── Step 4: Classify each course subject ──────────────────────────────
-        # Pass: letter_grade in {"A","B+","B","C+","C","D+","D"}
-        # Failed (must retake): grade = "F" or null/empty
-        PASS_GRADES = {"A", "B+", "B", "C+", "C", "D+", "D"}
-
-        passed_items: List[Dict[str, Any]] = []
-        missing_items: List[Dict[str, Any]] = []
-        accumulated_credits = 0
-
-        for subj_id, info in subject_info_map.items():
-            lr = learned_map.get(subj_id)
-            grade = getattr(lr, "letter_grade", None) or None
-
-            if lr is None:
-                status = "not_taken"
-                missing_items.append({
-                    "subject_id": info["subject_id"],
-                    "subject_name": info["subject_name"],
-                    "credits": info["credits"],
-                    "learning_semester": info["learning_semester"],
-                    "conditional_subjects": info["conditional_subjects"],
-                    "grade": None,
-                    "status": status,
-                })
-            elif (grade or "").upper() == "F":
-                status = "failed"
-                missing_items.append({
-                    "subject_id": info["subject_id"],
-                    "subject_name": info["subject_name"],
-                    "credits": info["credits"],
-                    "learning_semester": info["learning_semester"],
-                    "conditional_subjects": info["conditional_subjects"],
-                    "grade": grade,
-                    "status": status,
-                })
-            elif grade in PASS_GRADES:
-                status = "passed"
-                accumulated_credits += info["credits"]
-                passed_items.append({
-                    "subject_id": info["subject_id"],
-                    "subject_name": info["subject_name"],
-                    "credits": info["credits"],
-                    "learning_semester": info["learning_semester"],
-                    "conditional_subjects": info["conditional_subjects"],
-                    "grade": grade,
-                    "status": status,
-                })
-            else:
-                # Grade ambiguous (null, "", unknown) → treat as not passed
-                status = "not_taken"
-                missing_items.append({
-                    "subject_id": info["subject_id"],
-                    "subject_name": info["subject_name"],
-                    "credits": info["credits"],
-                    "learning_semester": info["learning_semester"],
-                    "conditional_subjects": info["conditional_subjects"],
-                    "grade": grade,
-                    "status": status,
-                })
-
-        remaining_credits = total_required_credits - accumulated_credits
+        # ── Step 3: Classify each course subject against the transcript ───────
+        progress = snapshot.graduation_progress()
+        total_required_credits = progress["total_required_credits"]
+        accumulated_credits = progress["accumulated_credits"]
+        passed_items: List[Dict[str, Any]] = progress["passed_subjects"]
+        missing_items: List[Dict[str, Any]] = progress["missing_subjects"]
+        remaining_credits = progress["remaining_credits"]
 
         duration_ms = (time.perf_counter() - started_at) * 1000
         print(
@@ -695,8 +609,26 @@ async def execute_intent_tool(
     db: Session = Depends(get_db),
     x_agent_internal_key: Optional[str] = Header(None, alias="X-Agent-Internal-Key"),
 ):
-    started_at = time.perf_counter()
     _verify_internal_key(x_agent_internal_key)
+    return await run_intent_tool(intent_name, payload, db)
+
+
+async def run_intent_tool(
+    intent_name: str,
+    payload: Node3ToolExecutorRequest,
+    db: Session,
+    chatbot_service: Optional[ChatbotService] = None,
+) -> Node3ToolExecutorResponse:
+    """
+    NODE-3 handler, shared by the HTTP route and the in-process tool transport.
+
+    Args:
+        chatbot_service: Reused service bound to ``db``; built on demand when omitted
+
+    Raises:
+        HTTPException(404) for intents outside ALLOWED_TOOL_INTENTS
+    """
+    started_at = time.perf_counter()
 
     if intent_name not in ALLOWED_TOOL_INTENTS:
         raise HTTPException(
@@ -707,7 +639,8 @@ async def execute_intent_tool(
     try:
         from app.routes.chatbot_routes import _process_single_query
 
-        chatbot_service = ChatbotService(db)
+        if chatbot_service is None:
+            chatbot_service = ChatbotService(db)
         query_text = payload.get_query()
         normalized_text = _preprocessor_instance.preprocess(query_text)
 
@@ -2,18 +2,19 @@
 Chatbot Routes - API endpoints cho chatbot with NL2SQL and Rule Engine
 """
 from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 import asyncio
 import re
 import unicodedata
 from html import escape
 from typing import Any, Dict, List, Optional, Tuple
-from app.chatbot.tfidf_classifier import TfidfIntentClassifier
+from app.chatbot.tfidf_classifier import get_intent_classifier
 from app.services.nl2sql_service import NL2SQLService
 from app.services.chatbot_service import ChatbotService, format_rule_based_response
 from app.services.text_preprocessor import get_text_preprocessor
 from app.services.query_splitter import get_query_splitter, SubQuery
-from app.services.chat_history_service import ChatHistoryService
+from app.services.chat_history_service import AsyncChatHistoryService
 from app.services.conversation_state import ConversationState, get_conversation_state_manager
 from app.schemas.chatbot_schema import (
     ChatMessage, 
@@ -28,7 +29,7 @@ from app.schemas.chatbot_schema import (
     LLMProcessingMetadata,
 )
 from app.schemas.preference_schema import CompletePreference, PreferenceQuestion, PREFERENCE_QUESTIONS
-from app.db.database import get_db
+from app.db.database import AsyncSessionLocal, SessionLocal, get_async_db
 from app.models.student_model import Student
 from app.utils.jwt_utils import get_current_student
 from sqlalchemy import text
@@ -37,13 +38,16 @@ import os
 import time
 
 from app.agents.agent_orchestrator import AgentOrchestrator
+from app.agents.orchestration_metrics import get_orchestration_metrics
+from app.agents.response_stream import DELTA, stream_with_deltas
+from app.core.tracing import annotate_trace, current_trace_id, span, trace_request, traced
 from app.middleware.rate_limit import rate_limit
 
 
 router = APIRouter(prefix="/chatbot", tags=["Chatbot"])
 
 # Initialize TF-IDF intent classifier, NL2SQL service, and text preprocessor
-intent_classifier = TfidfIntentClassifier()
+intent_classifier = get_intent_classifier()
 nl2sql_service = NL2SQLService()
 text_preprocessor = get_text_preprocessor()
 query_splitter = get_query_splitter()
@@ -288,7 +292,7 @@ async def _run_fast_rule_fallback(
     normalized_text: str,
     student_id: Optional[int],
     conversation_id: Optional[int],
-    db: Session,
+    db: Optional[Session],
     chatbot_service: ChatbotService,
     extracted_constraints: Optional[Dict[str, Any]] = None,
 ) -> ChatResponseWithData:
@@ -658,8 +662,8 @@ def _build_assistant_payload_for_history(
     return assistant_payload
 
 
-def _hydrate_state_from_history_if_needed(
-    history_service: ChatHistoryService,
+async def _hydrate_state_from_history_if_needed(
+    history_service: AsyncChatHistoryService,
     student_id: int,
     conversation_id: int,
 ) -> Optional[ConversationState]:
@@ -668,7 +672,7 @@ def _hydrate_state_from_history_if_needed(
     if state:
         return state
 
-    latest_assistant = history_service.get_latest_assistant_message(
+    latest_assistant = await history_service.get_latest_assistant_message(
         student_pk=student_id,
         conversation_id=conversation_id,
     )
@@ -794,16 +798,21 @@ def _merge_responses(
 # Single-query processor  (extracted from the main handler)
 # ─────────────────────────────────────────────────────────────────────────────
 
+@traced("legacy.process_query")
 async def _process_single_query(
     normalized_text: str,
     student_id: Optional[int],
     conversation_id: Optional[int],
-    db: Session,
+    db: Optional[Session],
     chatbot_service: ChatbotService,
     forced_intent: Optional[str] = None,
     extracted_constraints: Optional[Dict[str, Any]] = None,
 ) -> ChatResponseWithData:
-    """Process one normalized sub-query and return ChatResponseWithData."""
+    """
+    Process one normalized sub-query and return ChatResponseWithData.
+
+    db=None: dùng chatbot_service.db, chỉ mở sau intent guard (lời chào không cần).
+    """
 
     # ── Intent classification ─────────────────────────────────────────────────
     if forced_intent:
@@ -848,6 +857,9 @@ async def _process_single_query(
             sql_error=None,
         )
 
+    if db is None:
+        db = chatbot_service.db
+
     # ── Rule-engine intents ───────────────────────────────────────────────────
     if intent in ("subject_registration_suggestion", "class_registration_suggestion", "modify_schedule"):
         if intent == "subject_registration_suggestion":
@@ -1113,8 +1125,8 @@ async def _process_single_query(
                             f"Hãy nhập lại với mã môn **{matched_id}** hoặc tên môn đầy đủ."
                         )
                     else:
-                        from app.services.fuzzy_matcher import FuzzyMatcher
-                        matcher = FuzzyMatcher(db)
+                        from app.services.fuzzy_matcher import get_fuzzy_matcher
+                        matcher = get_fuzzy_matcher(db)
                         candidates = matcher.get_subject_candidates(original_query, db=db)
                         clarification_text = matcher.format_candidates_prompt(candidates)
                     return ChatResponseWithData(
@@ -1399,6 +1411,7 @@ def _make_execution_debug(
         debug["fallback_reason"] = fallback_reason
     if extra:
         debug.update(extra)
+    annotate_trace(mode=mode, route=route)
     return debug
 
 
@@ -1408,9 +1421,10 @@ def _make_execution_debug(
 
 @router.post("/chat", response_model=ChatResponseWithData)
 @rate_limit()
+@trace_request("chat")
 async def chat(
     message: ChatMessage,
-    db: Session = Depends(get_db),
+    async_db: AsyncSession = Depends(get_async_db),
     current_student: Student = Depends(get_current_student),
 ):
     """
@@ -1427,15 +1441,17 @@ async def chat(
         - **is_compound**: True nếu câu hỏi chứa nhiều intent
         - **parts**: List kết quả từng phần (khi is_compound=True)
     """
+    # Sync Session chỉ mở khi path cần tới nó (legacy / fallback, ORM sync trong
+    # ChatbotService); history và suggestion loader chạy trên async_db
+    chatbot_service = ChatbotService(None, async_db=async_db, db_factory=SessionLocal)
     try:
-        request_trace_id = str(uuid.uuid4())[:8]
+        request_trace_id = current_trace_id() or str(uuid.uuid4())[:8]
         request_started_at = time.perf_counter()
         effective_student_id = current_student.id
         execution_debug: Dict[str, Any] = {}
 
-        chatbot_service = ChatbotService(db)
-        history_service = ChatHistoryService(db)
-        conversation = history_service.get_or_create_conversation(
+        history_service = AsyncChatHistoryService(async_db)
+        conversation = await history_service.get_or_create_conversation(
             student_pk=effective_student_id,
             conversation_id=message.conversation_id,
             first_message=message.message,
@@ -1444,7 +1460,8 @@ async def chat(
         response_payload: ChatResponseWithData
 
         print(f"📝 [ORIGINAL] {message.message}")
-        normalized_message = text_preprocessor.preprocess(message.message)
+        with span("preprocess"):
+            normalized_message = text_preprocessor.preprocess(message.message)
         if normalized_message != message.message:
             print(f"✨ [NORMALIZED] {normalized_message}")
         preview_message = normalized_message if len(normalized_message) <= 120 else normalized_message[:120] + "..."
@@ -1462,7 +1479,7 @@ async def chat(
         )
 
         # ── Active conversation shortcut (preference collection in progress) ──
-        state = _hydrate_state_from_history_if_needed(
+        state = await _hydrate_state_from_history_if_needed(
             history_service=history_service,
             student_id=effective_student_id,
             conversation_id=effective_conversation_id,
@@ -1487,7 +1504,7 @@ async def chat(
             )
             if effective_student_id:
                 try:
-                    conversation, _, assistant_message = history_service.save_chat_turn(
+                    conversation, _, assistant_message = await history_service.save_chat_turn(
                         student_pk=effective_student_id,
                         user_content=message.message,
                         assistant_payload=_build_assistant_payload_for_history(
@@ -1605,7 +1622,7 @@ async def chat(
                 # persist history as before
                 if effective_student_id:
                     try:
-                        conversation, _, assistant_message = history_service.save_chat_turn(
+                        conversation, _, assistant_message = await history_service.save_chat_turn(
                             student_pk=effective_student_id,
                             user_content=message.message,
                             assistant_payload=_build_assistant_payload_for_history(
@@ -1643,7 +1660,7 @@ async def chat(
                     normalized_text=normalized_message,
                     student_id=effective_student_id,
                     conversation_id=effective_conversation_id,
-                    db=db,
+                    db=None,
                     chatbot_service=chatbot_service,
                 )
                 # Mark metadata so callers know this was a fallback
@@ -1670,7 +1687,7 @@ async def chat(
                 response_payload.debug = execution_debug
                 if effective_student_id:
                     try:
-                        conversation, _, assistant_message = history_service.save_chat_turn(
+                        conversation, _, assistant_message = await history_service.save_chat_turn(
                             student_pk=effective_student_id,
                             user_content=message.message,
                             assistant_payload=_build_assistant_payload_for_history(
@@ -1692,7 +1709,8 @@ async def chat(
             print(f"[EXEC][{request_trace_id}] path=LEGACY_DIRECT reason=agent_disabled")
 
         # ── Compound query check ──────────────────────────────────────────────
-        sub_queries = query_splitter.split(normalized_message)
+        with span("split"):
+            sub_queries = query_splitter.split(normalized_message)
         print(f"🔀 [SPLITTER] {len(sub_queries)} part(s): {[sq.detected_intent for sq in sub_queries]}")
 
         if len(sub_queries) > 1:
@@ -1704,7 +1722,7 @@ async def chat(
                         normalized_text=sq.text,
                         student_id=effective_student_id,
                         conversation_id=effective_conversation_id,
-                        db=db,
+                        db=None,
                         chatbot_service=chatbot_service,
                     )
                 except Exception as part_err:
@@ -1741,7 +1759,7 @@ async def chat(
                 normalized_text=normalized_message,
                 student_id=effective_student_id,
                 conversation_id=effective_conversation_id,
-                db=db,
+                db=None,
                 chatbot_service=chatbot_service,
             )
             # Add LLM processing metadata for legacy single query
@@ -1762,7 +1780,7 @@ async def chat(
 
         if effective_student_id:
             try:
-                conversation, _, assistant_message = history_service.save_chat_turn(
+                conversation, _, assistant_message = await history_service.save_chat_turn(
                     student_pk=effective_student_id,
                     user_content=message.message,
                     assistant_payload=_build_assistant_payload_for_history(
@@ -1788,6 +1806,8 @@ async def chat(
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Lỗi xử lý tin nhắn: {str(e)}")
+    finally:
+        chatbot_service.close()
 
 
 def _generate_response_text(
@@ -1906,7 +1926,6 @@ async def get_available_intents():
 @rate_limit()
 async def chat_stream(
     message: ChatMessage,
-    db: Session = Depends(get_db),
     current_student: Student = Depends(get_current_student),
 ):
     """
@@ -1915,6 +1934,7 @@ async def chat_stream(
     Trả về Server-Sent Events stream với nhiều StreamChunk:
     - "status" chunks: cập nhật giai đoạn xử lý
     - "data" chunks: dữ liệu một phần đã lấy được
+    - "delta" chunks: đoạn câu trả lời vừa sinh (agent path), nối lại để hiển thị sớm
     - "metadata" chunk: thông tin xử lý trung gian từ LLM
     - "done" chunk: phản hồi hoàn chỉnh
     - "error" chunk: lỗi xảy ra
@@ -1923,17 +1943,30 @@ async def chat_stream(
     from app.schemas.chatbot_schema import StreamChunk
     import json
     
+    @trace_request("chat_stream")
     async def event_generator():
+        # Session mở ngay trong generator: dependency yield của FastAPI (>=0.106) đóng
+        # trước khi body được stream, session lấy qua Depends sẽ bị dùng lại sau close
+        async with AsyncSessionLocal() as async_db:
+            chatbot_service = ChatbotService(None, async_db=async_db, db_factory=SessionLocal)
+            try:
+                async for event in _stream_events(chatbot_service, async_db):
+                    yield event
+            finally:
+                chatbot_service.close()
+
+    async def _stream_events(chatbot_service: ChatbotService, async_db: AsyncSession):
         def _emit(chunk: StreamChunk):
             payload = chunk.model_dump(exclude_none=True, mode="json")
             return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
 
+        stream_started_at = time.perf_counter()
+        first_token_at = None
         try:
-            request_trace_id = str(uuid.uuid4())[:8]
+            request_trace_id = current_trace_id() or str(uuid.uuid4())[:8]
             effective_student_id = current_student.id
-            chatbot_service = ChatbotService(db)
-            history_service = ChatHistoryService(db)
-            conversation = history_service.get_or_create_conversation(
+            history_service = AsyncChatHistoryService(async_db)
+            conversation = await history_service.get_or_create_conversation(
                 student_pk=effective_student_id,
                 conversation_id=message.conversation_id,
                 first_message=message.message,
@@ -1942,7 +1975,8 @@ async def chat_stream(
 
             print(f"📝 [STREAM] {message.message}")
             yield _emit(StreamChunk(type="status", stage="preprocessing", message="Đang chuẩn hóa câu hỏi..."))
-            normalized_message = text_preprocessor.preprocess(message.message)
+            with span("preprocess"):
+                normalized_message = text_preprocessor.preprocess(message.message)
             if normalized_message != message.message:
                 print(f"✨ [STREAM] {normalized_message}")
 
@@ -1954,7 +1988,7 @@ async def chat_stream(
                 use_agent,
             ) = _resolve_agent_routing(normalized_message)
 
-            state = _hydrate_state_from_history_if_needed(
+            state = await _hydrate_state_from_history_if_needed(
                 history_service=history_service,
                 student_id=effective_student_id,
                 conversation_id=effective_conversation_id,
@@ -1996,7 +2030,8 @@ async def chat_stream(
             else:
                 yield _emit(StreamChunk(type="status", stage="classification", message="Đang phân loại ý định câu hỏi..."))
 
-                sub_queries = query_splitter.split(normalized_message)
+                with span("split"):
+                    sub_queries = query_splitter.split(normalized_message)
                 print(f"🔀 [STREAM][SPLITTER] {len(sub_queries)} part(s): {[sq.detected_intent for sq in sub_queries]}")
 
                 if len(sub_queries) > 1 and not use_agent:
@@ -2016,7 +2051,7 @@ async def chat_stream(
                                 normalized_text=sq.text,
                                 student_id=effective_student_id,
                                 conversation_id=effective_conversation_id,
-                                db=db,
+                                db=None,
                                 chatbot_service=chatbot_service,
                             )
                         except Exception as part_err:
@@ -2058,14 +2093,24 @@ async def chat_stream(
                         try:
                             orchestrator = _get_agent_orchestrator()
                             print("[CHAT-STREAM][AGENT] orchestrator.handle start")
-                            orchestration_result = await asyncio.wait_for(
-                                orchestrator.handle(
+                            orchestration_result = None
+                            async for kind, value in stream_with_deltas(
+                                lambda: orchestrator.handle(
                                     normalized_message,
                                     student_id=effective_student_id,
                                     conversation_id=effective_conversation_id,
                                 ),
                                 timeout=10.0,
-                            )
+                            ):
+                                if kind == DELTA:
+                                    if first_token_at is None:
+                                        first_token_at = time.perf_counter()
+                                        get_orchestration_metrics().observe_latency(
+                                            "chat_stream.ttft", first_token_at - stream_started_at
+                                        )
+                                    yield _emit(StreamChunk(type="delta", stage="formatting", text=value))
+                                else:
+                                    orchestration_result = value
                             print("[CHAT-STREAM][AGENT] orchestrator.handle success")
                             resp_text = orchestration_result.get('response') or ''
                             raw = orchestration_result.get('raw')
@@ -2135,7 +2180,7 @@ async def chat_stream(
                                 normalized_text=normalized_message,
                                 student_id=effective_student_id,
                                 conversation_id=effective_conversation_id,
-                                db=db,
+                                db=None,
                                 chatbot_service=chatbot_service,
                             )
                     else:
@@ -2145,7 +2190,7 @@ async def chat_stream(
                             normalized_text=normalized_message,
                             student_id=effective_student_id,
                             conversation_id=effective_conversation_id,
-                            db=db,
+                            db=None,
                             chatbot_service=chatbot_service,
                         )
                         # Add LLM processing metadata for legacy single query
@@ -2172,7 +2217,7 @@ async def chat_stream(
 
             if effective_student_id:
                 try:
-                    conversation, _, assistant_message = history_service.save_chat_turn(
+                    conversation, _, assistant_message = await history_service.save_chat_turn(
                         student_pk=effective_student_id,
                         user_content=message.message,
                         assistant_payload=_build_assistant_payload_for_history(
@@ -2198,6 +2243,12 @@ async def chat_stream(
                     )
                 )
 
+            if first_token_at is None:
+                # No delta on this path: the answer text first reaches the user in "done"
+                get_orchestration_metrics().observe_latency(
+                    "chat_stream.ttft", time.perf_counter() - stream_started_at
+                )
+            annotate_trace(mode=stream_debug["mode"], intent=response_payload.intent)
             yield _emit(
                 StreamChunk(
                     type="done",
@@ -2248,12 +2299,12 @@ async def intents_endpoint():
 @router.post("/conversations", response_model=ChatConversationItem)
 async def create_conversation(
     payload: ConversationCreateRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_student: Student = Depends(get_current_student),
 ):
     try:
-        service = ChatHistoryService(db)
-        conversation = service.create_conversation(
+        service = AsyncChatHistoryService(db)
+        conversation = await service.create_conversation(
             student_pk=current_student.id,
             title=payload.title,
         )
@@ -2273,12 +2324,12 @@ async def list_conversations(
     student_id: int = Query(..., ge=1),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_student: Student = Depends(get_current_student),
 ):
     try:
-        service = ChatHistoryService(db)
-        result = service.list_conversations(
+        service = AsyncChatHistoryService(db)
+        result = await service.list_conversations(
             student_pk=current_student.id,
             page=page,
             page_size=page_size,
@@ -2294,12 +2345,12 @@ async def list_conversation_messages(
     student_id: int = Query(..., ge=1),
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=200),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_student: Student = Depends(get_current_student),
 ):
     try:
-        service = ChatHistoryService(db)
-        result = service.list_messages(
+        service = AsyncChatHistoryService(db)
+        result = await service.list_messages(
             student_pk=current_student.id,
             conversation_id=conversation_id,
             page=page,
@@ -2316,12 +2367,12 @@ async def list_conversation_messages(
 async def rename_conversation(
     conversation_id: int,
     payload: ConversationUpdateRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_student: Student = Depends(get_current_student),
 ):
     try:
-        service = ChatHistoryService(db)
-        conversation = service.rename_conversation(
+        service = AsyncChatHistoryService(db)
+        conversation = await service.rename_conversation(
             student_pk=current_student.id,
             conversation_id=conversation_id,
             title=payload.title,
@@ -2343,12 +2394,12 @@ async def rename_conversation(
 async def delete_conversation(
     conversation_id: int,
     student_id: int = Query(..., ge=1),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_student: Student = Depends(get_current_student),
 ):
     try:
-        service = ChatHistoryService(db)
-        service.delete_conversation(student_pk=current_student.id, conversation_id=conversation_id)
+        service = AsyncChatHistoryService(db)
+        await service.delete_conversation(student_pk=current_student.id, conversation_id=conversation_id)
         return {"success": True}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
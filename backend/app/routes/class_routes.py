@@ -1,10 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
 from sqlalchemy.orm import Session, joinedload
 from app.db.database import get_db
 from app.models.__init__ import Class, ClassRegister, Subject
 from app.schemas.class_schema import ClassCreate, ClassUpdate, ClassResponse
+from app.services.class_import_service import (
+    CLASS_SESSION_INDEX,
+    ClassImportError,
+    ClassImportResult,
+    import_classes,
+    preview_prune,
+    read_class_file,
+    update_teacher_names,
+)
+from app.services.fuzzy_matcher import publish_catalogue_change
+from app.utils.jwt_utils import get_current_admin
 from pydantic import BaseModel
-from typing import List
+from typing import Any, Dict, List
 from sqlalchemy import text
 
 router = APIRouter(prefix="/classes", tags=["Classes"])
@@ -18,6 +31,14 @@ class TeacherUpdate(BaseModel):
 class TeacherUpdateRequest(BaseModel):
     updates: List[TeacherUpdate]
 
+# Schema for bulk timetable import
+class ClassBulkImportRequest(BaseModel):
+    rows: List[Dict[str, Any]]
+    prune: bool = False
+
+# Quá số mã lớp này thì báo "reset" cho fuzzy matcher thay vì từng mã
+CATALOGUE_RESET_THRESHOLD = 500
+
 
 def _delete_class_with_registers(db: Session, class_id: int):
     class_obj = db.query(Class).filter(Class.id == class_id).first()
@@ -25,9 +46,11 @@ def _delete_class_with_registers(db: Session, class_id: int):
         raise HTTPException(status_code=404, detail="Class not found")
 
     # Delete dependent class registrations first to avoid FK constraint errors.
+    class_code = class_obj.class_id
     db.query(ClassRegister).filter(ClassRegister.class_id == class_id).delete(synchronize_session=False)
     db.delete(class_obj)
     db.commit()
+    publish_catalogue_change(db, "class", [class_code])
     return {"message": "Class deleted successfully"}
 
 #    Create class
@@ -47,6 +70,7 @@ def create_class(class_data: ClassCreate, db: Session = Depends(get_db)):
         db.add(db_class)
         db.commit()
         db.refresh(db_class)
+        publish_catalogue_change(db, "class", [db_class.class_id])
         return db_class
     except Exception as e:
         db.rollback()
@@ -87,6 +111,7 @@ def delete_all_classes(db: Session = Depends(get_db)):
     try:
         deleted_classes = db.query(Class).delete(synchronize_session=False)
         db.commit()
+        publish_catalogue_change(db, "reset")
         return {
             "message": "Deleted all classes successfully",
             "deleted_classes": deleted_classes,
@@ -105,8 +130,8 @@ def _purge_all_classes(db: Session):
           AND TABLE_NAME = 'classes'
           AND COLUMN_NAME = 'class_id'
           AND NON_UNIQUE = 0
-          AND INDEX_NAME <> 'PRIMARY'
-    """)).fetchall()
+          AND INDEX_NAME NOT IN ('PRIMARY', :session_index)
+    """), {"session_index": CLASS_SESSION_INDEX}).fetchall()
 
     for row in unique_indexes:
         index_name = row[0]
@@ -115,6 +140,7 @@ def _purge_all_classes(db: Session):
     deleted_registers = db.query(ClassRegister).delete(synchronize_session=False)
     deleted_classes = db.query(Class).delete(synchronize_session=False)
     db.commit()
+    publish_catalogue_change(db, "reset")
     return {
         "message": "Purged all class registrations and classes successfully",
         "deleted_class_registers": deleted_registers,
@@ -132,6 +158,86 @@ def purge_all_classes(db: Session = Depends(get_db)):
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to purge classes: {str(e)}")
 
+def _import_and_publish(db: Session, rows, prune: bool) -> Dict[str, Any]:
+    try:
+        result: ClassImportResult = import_classes(db, rows, prune=prune)
+        db.commit()
+    except ClassImportError as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if result.class_codes:
+        if len(result.class_codes) > CATALOGUE_RESET_THRESHOLD:
+            publish_catalogue_change(db, "reset")
+        else:
+            publish_catalogue_change(db, "class", sorted(result.class_codes))
+    return result.summary()
+
+
+#    Bulk import timetable rows (JSON)
+@router.post("/bulk")
+def bulk_import_classes(
+    request: ClassBulkImportRequest,
+    db: Session = Depends(get_db),
+    _: object = Depends(get_current_admin),
+):
+    """
+    Upsert hàng loạt buổi học theo key (class_id, study_date, study_time_start).
+    Mỗi dòng dùng tên cột của ClassCreate hoặc của file TKB (class_code, room,
+    day_of_week_converted, study_weeks...) và subject_code hoặc subject_id.
+    prune=true xoá các buổi học không có trong lần import (kèm đăng ký lớp);
+    bị từ chối (409) nếu có dòng lỗi — xem trước bằng /classes/bulk/prune-preview.
+    Không prune: lỗi được trả về theo từng dòng, các dòng hợp lệ vẫn được ghi.
+    """
+    try:
+        return _import_and_publish(db, list(enumerate(request.rows, start=1)), request.prune)
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Failed to import classes: {str(e)}")
+
+
+#    Preview the sessions a prune import would delete
+@router.post("/bulk/prune-preview")
+def preview_bulk_prune(
+    request: ClassBulkImportRequest,
+    db: Session = Depends(get_db),
+    _: object = Depends(get_current_admin),
+):
+    """
+    Các buổi học (và số đăng ký lớp) mà POST /classes/bulk với prune=true sẽ
+    xoá cho cùng rows, để admin xác nhận trước. Không ghi gì.
+    """
+    return preview_prune(db, list(enumerate(request.rows, start=1)))
+
+
+#    Bulk import timetable from an uploaded xlsx/csv
+@router.post("/bulk/upload")
+async def bulk_upload_classes(
+    file: UploadFile = File(...),
+    prune: bool = False,
+    db: Session = Depends(get_db),
+    _: object = Depends(get_current_admin),
+):
+    """Như /classes/bulk, dữ liệu lấy từ file xlsx/csv (dòng đầu là header)."""
+    if not file.filename.lower().endswith((".xlsx", ".csv")):
+        raise HTTPException(status_code=400, detail="Chỉ chấp nhận file .xlsx hoặc .csv")
+    contents = await file.read()
+    try:
+        # openpyxl/csv is pure CPU: parse off the event loop
+        rows = await asyncio.to_thread(read_class_file, contents, file.filename)
+    except ClassImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        return _import_and_publish(db, rows, prune)
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Failed to import classes: {str(e)}")
+
 #    Get all classes
 @router.get("/", response_model=list[ClassResponse])
 def get_classes(db: Session = Depends(get_db)):
@@ -156,6 +262,7 @@ def update_class(class_id: int, class_update: ClassUpdate, db: Session = Depends
     if not class_obj:
         raise HTTPException(status_code=404, detail="Class not found")
 
+    old_code = class_obj.class_id
     update_dict = class_update.dict(exclude_unset=True)
     
     # Handle special fields
@@ -171,6 +278,7 @@ def update_class(class_id: int, class_update: ClassUpdate, db: Session = Depends
 
     db.commit()
     db.refresh(class_obj)
+    publish_catalogue_change(db, "class", [old_code, class_obj.class_id])
     return class_obj
 
 #    Delete class
@@ -187,43 +295,27 @@ def delete_class(class_id: int, db: Session = Depends(get_db)):
 #    Update teachers from Excel
 @router.post("/update-teachers")
 def update_teachers(request: TeacherUpdateRequest, db: Session = Depends(get_db)):
-    """Update teacher names for existing classes based on class_id"""
-    updated_count = 0
-    errors = []
-    
-    for update in request.updates:
-        try:
-            # Tìm lớp dựa trên class_id hoặc class_id_kem
-            class_obj = db.query(Class).filter(
-                (Class.class_id == update.class_id)  
-               
-            ).first()
-            
-            if class_obj:
-                # Cập nhật tên giáo viên
-                class_obj.teacher_name = update.teacher
-                print(f"Updating class {class_obj.class_id} with teacher {update.teacher}")
-                updated_count += 1
-            else:
-                errors.append(f"Không tìm thấy lớp với mã: {update.class_id} hoặc {update.class_id_kem}")
-                
-        except Exception as e:
-            errors.append(f"Lỗi khi cập nhật lớp {update.class_id}: {str(e)}")
-    
+    """Update teacher names for every session of each class_id (one UPDATE per chunk)"""
+    teachers_by_code = {update.class_id: update.teacher for update in request.updates}
+
     try:
+        found = update_teacher_names(db, teachers_by_code)
         db.commit()
-        
-        result = {
-            "updated_count": updated_count,
-            "total_records": len(request.updates),
-            "message": f"Đã cập nhật thành công {updated_count}/{len(request.updates)} lớp"
-        }
-        
-        if errors:
-            result["errors"] = errors
-            
-        return result
-        
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Lỗi khi lưu dữ liệu: {str(e)}")
+
+    updated_count = sum(1 for update in request.updates if update.class_id in found)
+    errors = [
+        f"Không tìm thấy lớp với mã: {update.class_id} hoặc {update.class_id_kem}"
+        for update in request.updates
+        if update.class_id not in found
+    ]
+    result = {
+        "updated_count": updated_count,
+        "total_records": len(request.updates),
+        "message": f"Đã cập nhật thành công {updated_count}/{len(request.updates)} lớp"
+    }
+    if errors:
+        result["errors"] = errors
+    return result
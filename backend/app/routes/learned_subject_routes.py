@@ -1,12 +1,11 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
-from typing import List
-import openpyxl
-from io import BytesIO
+from typing import Dict, List
 from app.db.database import get_db
-from app.models.__init__ import LearnedSubject, Subject, Student, SemesterGPA
-from app.utils.jwt_utils import get_current_student
+from app.models.__init__ import LearnedSubject, Subject, Student
+from app.utils.jwt_utils import get_current_admin, get_current_student
 from app.schemas.learned_subject_schema import (
     LearnedSubjectCreate,
     LearnedSubjectUpdate,
@@ -14,6 +13,22 @@ from app.schemas.learned_subject_schema import (
     LearnedSubjectSimpleCreate,
 )
 from app.services.elective_service import ElectiveModuleService
+from app.services.grade_aggregate_service import (
+    GradeEntry,
+    apply_grade_change,
+    apply_grade_changes,
+    grade_entry,
+    rebuild_semester_gpa,
+    rebuild_student_stats,
+)
+from app.services.grade_import_service import (
+    GradeImportResult,
+    GradeSheetError,
+    ParsedGradeSheet,
+    import_grade_rows,
+    parse_grade_workbook,
+    resolve_students,
+)
 
 router = APIRouter(prefix="/learned-subjects", tags=["Learned Subjects"])
 
@@ -21,163 +36,13 @@ router = APIRouter(prefix="/learned-subjects", tags=["Learned Subjects"])
 def _ensure_student_ownership(target_student_id: int, current_student: Student):
     return
 
-# 🔹 Hàm tính letter grade to score (thang 4.0)
-def letter_grade_to_score(letter_grade: str) -> float:
-    grade_map = {
-        "F": 0.0,
-        "D": 1.0,
-        "D+": 1.5,
-        "C": 2.0,
-        "C+": 2.5,
-        "B": 3.0,
-        "B+": 3.5,
-        "A": 4.0,
-        "A+": 4.0
-    }
-    return grade_map.get(letter_grade, 0.0)
-
-# 🔹 Hàm update semester GPA
+# 🔹 Hàm tính lại toàn bộ semester GPA (đối soát; thay đổi thường ngày đi qua apply_grade_change)
 def update_semester_gpa(student_id: int, semester: str, db: Session):
-    # Lấy tất cả learned subjects của student trong semester này
-    learned_subjects = db.query(LearnedSubject).filter(
-        and_(
-            LearnedSubject.student_id == student_id,
-            LearnedSubject.semester == semester
-        )
-    ).all()
-    
-    if not learned_subjects:
-        # Xóa SemesterGPA nếu không còn môn nào trong học kỳ này
-        semester_gpa_to_delete = db.query(SemesterGPA).filter(
-            and_(
-                SemesterGPA.student_id == student_id,
-                SemesterGPA.semester == semester
-            )
-        ).first()
-        if semester_gpa_to_delete:
-            db.delete(semester_gpa_to_delete)
-        return
-    
-    total_credits = 0
-    total_grade_points = 0.0
-    
-    for ls in learned_subjects:
-        credits = ls.credits
-        score = letter_grade_to_score(ls.letter_grade)
-        total_credits += credits
-        total_grade_points += credits * score
-    
-    gpa = total_grade_points / total_credits if total_credits > 0 else 0.0
-    
-    # Tìm hoặc tạo semester GPA
-    semester_gpa = db.query(SemesterGPA).filter(
-        and_(
-            SemesterGPA.student_id == student_id,
-            SemesterGPA.semester == semester
-        )
-    ).first()
-    
-    if semester_gpa:
-        semester_gpa.gpa = gpa
-        semester_gpa.total_credits = total_credits
-    else:
-        semester_gpa = SemesterGPA(
-            student_id=student_id,
-            semester=semester,
-            gpa=gpa,
-            total_credits=total_credits
-        )
-        db.add(semester_gpa)
+    rebuild_semester_gpa(db, student_id, semester)
 
-# 🔹 Hàm update student stats
+# 🔹 Hàm tính lại toàn bộ student stats
 def update_student_stats(student_id: int, db: Session):
-    student = db.query(Student).filter(Student.id == student_id).first()
-    if not student:
-        return
-    
-    # Lấy tất cả learned subjects của student
-    learned_subjects = db.query(LearnedSubject).filter(LearnedSubject.student_id == student_id).all()
-    
-    elective_service = ElectiveModuleService()
-    recognized_subject_ids = elective_service.recognized_subject_ids_for_cpa(
-        course_id=elective_service.get_student_course_code(db, student_id),
-        learned_subjects=learned_subjects,
-    )
-
-    # Reset counters
-    failed_subjects_number = 0
-    study_subjects_number = 0
-    total_failed_credits = 0
-    total_learned_credits = 0
-    recognized_total_grade_points = 0.0
-    
-    for ls in learned_subjects:
-        if ls.letter_grade == "F":
-            failed_subjects_number += 1
-            total_failed_credits += ls.credits
-        else:
-            subject_code = (
-                str(ls.subject.subject_id).strip().upper()
-                if getattr(ls, "subject", None) and ls.subject.subject_id
-                else None
-            )
-            if recognized_subject_ids is None or subject_code in recognized_subject_ids:
-                study_subjects_number += 1
-                total_learned_credits += ls.credits
-
-        subject_code = (
-            str(ls.subject.subject_id).strip().upper()
-            if getattr(ls, "subject", None) and ls.subject.subject_id
-            else None
-        )
-        if recognized_subject_ids is not None and subject_code in recognized_subject_ids:
-            recognized_total_grade_points += ls.credits * letter_grade_to_score(ls.letter_grade)
-    
-    # Update student fields
-    student.failed_subjects_number = failed_subjects_number
-    student.study_subjects_number = study_subjects_number
-    student.total_failed_credits = total_failed_credits
-    student.total_learned_credits = total_learned_credits
-    
-    # Calculate CPA from all semester GPAs
-    semester_gpas = db.query(SemesterGPA).filter(SemesterGPA.student_id == student_id).all()
-    total_credits = sum(sgpa.total_credits for sgpa in semester_gpas)
-    total_grade_points = sum(sgpa.gpa * sgpa.total_credits for sgpa in semester_gpas)
-    print("total_credits:", total_credits, "total_grade_points:", total_grade_points)
-    if total_learned_credits == 0:
-        student.cpa = 0.0
-    elif recognized_subject_ids is not None:
-        student.cpa = recognized_total_grade_points / total_learned_credits
-    else:
-        student.cpa = total_grade_points / total_learned_credits if total_credits > 0 else 0.0
-    
-    # Update warning level
-    old_warning = student.warning_level
-    if total_failed_credits >= 27:
-        student.warning_level = "Cảnh báo mức 3"
-    elif total_failed_credits >= 16:
-        student.warning_level = "Cảnh báo mức 2"
-    elif total_failed_credits >= 8:
-        student.warning_level = "Cảnh báo mức 1"
-    else:
-        student.warning_level = "Cảnh báo mức 0"
-    
-    # Update level 3 warning counter
-    if old_warning != "Cảnh báo mức 3" and student.warning_level == "Cảnh báo mức 3":
-        student.level_3_warning_number += 1
-    
-    # Update year level
-    total_learned = total_learned_credits
-    if total_learned < 32:
-        student.year_level = "Năm 1"
-    elif total_learned < 64:
-        student.year_level = "Năm 2"
-    elif total_learned < 96:
-        student.year_level = "Năm 3"
-    elif total_learned < 128:
-        student.year_level = "Năm 4"
-    else:
-        student.year_level = "Năm 5"
+    rebuild_student_stats(db, student_id)
 
 # 🔹 CRUD ROUTES
 
@@ -249,13 +114,11 @@ def create_learned_subject(
     )
     
     db.add(db_learned_subject)
-    db.commit()
-    db.refresh(db_learned_subject)
     
-    #    AUTO-CALCULATE GPA & STUDENT STATS
-    update_semester_gpa(db_learned_subject.student_id, db_learned_subject.semester, db)
-    update_student_stats(db_learned_subject.student_id, db)
+    #    AUTO-UPDATE GPA & STUDENT STATS (incremental)
+    apply_grade_change(db, current_student.id, None, grade_entry(db_learned_subject, subject.subject_id))
     db.commit()
+    db.refresh(db_learned_subject)
     
     return db_learned_subject
 
@@ -271,19 +134,19 @@ def update_learned_subject(
         raise HTTPException(status_code=404, detail="Learned subject not found")
     _ensure_student_ownership(db_learned_subject.student_id, current_student)
     
+    before = grade_entry(db_learned_subject)
+    
     # Update fields
     for field, value in learned_subject.model_dump(exclude_unset=True).items():
         setattr(db_learned_subject, field, value)
     
+    #    AUTO-UPDATE GPA & STUDENT STATS (old and new semester)
+    apply_grade_change(
+        db, db_learned_subject.student_id, before, grade_entry(db_learned_subject, before.subject_code)
+    )
     db.commit()
     db.refresh(db_learned_subject)
     
-    #    AUTO-CALCULATE GPA & STUDENT STATS
-    update_semester_gpa(db_learned_subject.student_id, db_learned_subject.semester, db)
-    db.flush()  #    Flush to ensure semester_gpa is in session before calculating CPA
-    update_student_stats(db_learned_subject.student_id, db)
-    db.commit()
-    
     return db_learned_subject
 
 @router.delete("/{learned_subject_id}")
@@ -298,26 +161,13 @@ def delete_learned_subject(
     _ensure_student_ownership(db_learned_subject.student_id, current_student)
     
     student_id = db_learned_subject.student_id
-    semester = db_learned_subject.semester
+    before = grade_entry(db_learned_subject)
     
     db.delete(db_learned_subject)
-    db.commit()
-    
-    #    AUTO-CALCULATE GPA & STUDENT STATS after deletion
-    # Cập nhật toàn bộ semester GPA của student (không chỉ semester bị xóa)
-    all_semesters = db.query(LearnedSubject.semester).filter(
-        LearnedSubject.student_id == student_id
-    ).distinct().all()
-    
-    # Update GPA cho từng semester còn lại
-    for (sem,) in all_semesters:
-        update_semester_gpa(student_id, sem, db)
     
-    # Xử lý riêng semester của môn vừa xóa (có thể đã không còn môn nào)
-    update_semester_gpa(student_id, semester, db)
-    
-    db.flush()
-    update_student_stats(student_id, db)
+    #    AUTO-UPDATE GPA & STUDENT STATS after deletion
+    # Chỉ semester của môn vừa xóa thay đổi (bị xóa nếu không còn môn nào)
+    apply_grade_change(db, student_id, before, None)
     db.commit()
     
     return {"message": "Learned subject deleted successfully"}
@@ -351,9 +201,11 @@ def create_new_learned_subject(
     ).first()
 
     old_semester = None
+    before = None
     if existing:
-        # Lưu lại học kỳ cũ để cập nhật GPA sau khi xóa
+        # Lưu lại bản cũ để trừ khỏi GPA sau khi xóa
         old_semester = existing.semester
+        before = grade_entry(existing, subject.subject_id)
         db.delete(existing)
         db.flush()  # Xóa khỏi session trước khi thêm mới
 
@@ -368,17 +220,12 @@ def create_new_learned_subject(
     )
     
     db.add(new_learned_subject)
-    db.commit()
-    db.refresh(new_learned_subject)
     
-    # 6.    AUTO-CALCULATE GPA & STUDENT STATS
-    # Nếu học kỳ cũ khác học kỳ mới thì cập nhật GPA cho cả 2 học kỳ
-    if old_semester and old_semester != data.semester:
-        update_semester_gpa(student.id, old_semester, db)
-    update_semester_gpa(student.id, data.semester, db)
-    db.flush()  #    Flush to ensure semester_gpa is in session before calculating CPA
-    update_student_stats(student.id, db)
+    # 5.    AUTO-UPDATE GPA & STUDENT STATS
+    # Học kỳ cũ (nếu khác) và học kỳ mới đều nhận delta
+    apply_grade_change(db, student.id, before, grade_entry(new_learned_subject, subject.subject_id))
     db.commit()
+    db.refresh(new_learned_subject)
     
     action = "Cập nhật" if old_semester else "Thêm"
     return {
@@ -396,152 +243,99 @@ def create_new_learned_subject(
     
 
 
+# 🔹 Hàm cộng các môn vừa import vào GPA/CPA (chỉ các học kỳ có môn mới)
+def apply_imported_grades(added: Dict[int, List[GradeEntry]], db: Session):
+    service = ElectiveModuleService()
+    for student_pk, entries in added.items():
+        apply_grade_changes(db, student_pk, [(None, entry) for entry in entries], service=service)
+
+
+def _import_and_recompute(parsed: ParsedGradeSheet, db: Session, **owners) -> GradeImportResult:
+    result = import_grade_rows(db, parsed, **owners)
+    if result.created > 0:
+        apply_imported_grades(result.added, db)
+        db.commit()
+    return result
+
+
+async def _parse_upload(file: UploadFile) -> ParsedGradeSheet:
+    if not file.filename.endswith(('.xlsx', '.xls')):
+        raise HTTPException(status_code=400, detail="Chỉ chấp nhận file Excel (.xlsx, .xls)")
+    contents = await file.read()
+    try:
+        # openpyxl is pure CPU: parse off the event loop
+        return await asyncio.to_thread(parse_grade_workbook, contents)
+    except GradeSheetError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 # 🔹 API: Upload điểm từ file Excel CTT HUST
 @router.post("/upload-grades-excel")
 async def upload_grades_excel(
-    student_id: str,
+    student_id: int,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_student: Student = Depends(get_current_student),
 ):
     """
     API upload file điểm Excel từ CTT HUST
-    - Nhận student_id (MSSV string như "20225818") → tìm students.id
+    - Nhận student_id (students.id)
     - Parse Excel: Học kỳ, Mã HP (subject_id string), Tên HP, Tín chỉ, Điểm HP (chữ)
-    - Mỗi dòng: tìm subjects.id từ mã HP, tạo LearnedSubject với FK integer
-    - Xử lý giống POST "/" nhưng nhận student_id dạng string và parse từ Excel
+    - Import theo tập: 1 IN query cho mã HP, 1 query kiểm tra trùng, 1 bulk insert
+    - Chỉ tính lại GPA của các học kỳ có môn mới
     """
     try:
-        # 1. Validate file type
-        if not file.filename.endswith(('.xlsx', '.xls')):
-            raise HTTPException(status_code=400, detail="Chỉ chấp nhận file Excel (.xlsx, .xls)")
-        
-        # 2. Tìm Student theo student_id (MSSV string) → lấy students.id (integer)
-        student = db.query(Student).filter(Student.student_id == student_id).first()
+        student = db.query(Student).filter(Student.id == student_id).first()
         if not student:
-            raise HTTPException(status_code=404, detail=f"Không tìm thấy sinh viên với MSSV {student_id}")
-        
-        # 3. Read Excel file
-        contents = await file.read()
-        workbook = openpyxl.load_workbook(BytesIO(contents))
-        sheet = workbook.active
-        
-        # 4. Find header row
-        header_row_idx = None
-        required_fields = ['học kỳ', 'mã hp', 'điểm hp']
-        
-        for idx, row in enumerate(sheet.iter_rows(min_row=1, max_row=20, values_only=True), start=1):
-            if row and all(any(field in str(cell).lower() for cell in row if cell) for field in required_fields):
-                header_row_idx = idx
-                break
-        
-        if not header_row_idx:
-            raise HTTPException(
-                status_code=400,
-                detail="Không tìm thấy header với các cột bắt buộc: Học kỳ, Mã HP, Điểm HP"
-            )
-        
-        # 5. Get headers
-        headers = [str(cell).strip().lower() if cell else '' for cell in sheet[header_row_idx]]
-        
-        # Find column indices
-        semester_idx = next((i for i, h in enumerate(headers) if 'học kỳ' in h or 'hoc ky' in h), None)
-        subject_code_idx = next((i for i, h in enumerate(headers) if 'mã hp' in h), None)
-        grade_idx = next((i for i, h in enumerate(headers) if 'điểm hp' in h or 'diem hp' in h), None)
-        
-        if semester_idx is None or subject_code_idx is None or grade_idx is None:
-            raise HTTPException(
-                status_code=400,
-                detail="Không tìm thấy các cột bắt buộc: Học kỳ, Mã HP, Điểm HP"
-            )
-        
-        # 6. Parse data rows
-        created_count = 0
-        skipped_count = 0
-        errors = []
-        valid_grades = ["A+", "A", "B+", "B", "C+", "C", "D+", "D", "F"]
-        
-        for row_idx, row in enumerate(sheet.iter_rows(min_row=header_row_idx + 1, values_only=True), start=header_row_idx + 1):
-            # Skip empty rows
-            if not row or all(cell is None or str(cell).strip() == '' for cell in row):
-                continue
-            
-            try:
-                semester = str(row[semester_idx]).strip() if row[semester_idx] else ''
-                subject_code = str(row[subject_code_idx]).strip() if row[subject_code_idx] else ''
-                letter_grade = str(row[grade_idx]).strip() if row[grade_idx] else ''
-                
-                # Validate data
-                if not semester or not subject_code or not letter_grade:
-                    skipped_count += 1
-                    continue
-                
-                if letter_grade not in valid_grades:
-                    errors.append(f"Dòng {row_idx}: Điểm '{letter_grade}' không hợp lệ")
-                    skipped_count += 1
-                    continue
-                
-                # Find subject
-                subject = db.query(Subject).filter(Subject.subject_id == subject_code).first()
-                if not subject:
-                    errors.append(f"Dòng {row_idx}: Không tìm thấy môn học với mã HP '{subject_code}'")
-                    skipped_count += 1
-                    continue
-                
-                # Check duplicate
-                existing = db.query(LearnedSubject).filter(
-                    and_(
-                        LearnedSubject.student_id == student.id,
-                        LearnedSubject.subject_id == subject.id,
-                        LearnedSubject.semester == semester
-                    )
-                ).first()
-                
-                if existing:
-                    skipped_count += 1
-                    continue
-                
-                # Create learned subject
-                new_learned_subject = LearnedSubject(
-                    subject_name=subject.subject_name,
-                    credits=subject.credits,
-                    letter_grade=letter_grade,
-                    semester=semester,
-                    student_id=student.id,
-                    subject_id=subject.id
-                )
-                
-                db.add(new_learned_subject)
-                created_count += 1
-                
-            except Exception as e:
-                errors.append(f"Dòng {row_idx}: {str(e)}")
-                skipped_count += 1
-                continue
-        
-        # 7. Commit and update stats
-        if created_count > 0:
-            db.commit()
-            
-            # Update GPA for all affected semesters
-            semesters = db.query(LearnedSubject.semester).filter(
-                LearnedSubject.student_id == student.id
-            ).distinct().all()
-            
-            for (semester,) in semesters:
-                update_semester_gpa(student.id, semester, db)
-            
-            db.flush()  #    Flush to ensure all semester_gpas are in session before calculating CPA
-            update_student_stats(student.id, db)
-            db.commit()
-        
+            raise HTTPException(status_code=404, detail=f"Không tìm thấy sinh viên với id {student_id}")
+
+        parsed = await _parse_upload(file)
+        result = _import_and_recompute(parsed, db, student_pk=student.id)
+
+        return {
+            "message": "Upload điểm thành công",
+            "created": result.created,
+            "skipped": result.skipped,
+            "errors": result.error_messages()  # Limit to first 10 errors
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Lỗi khi upload file: {str(e)}"
+        )
+
+
+# 🔹 API (admin): Upload bảng điểm của nhiều sinh viên trong một file
+@router.post("/upload-grades-excel/batch")
+async def upload_grades_excel_batch(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    _: object = Depends(get_current_admin),
+):
+    """
+    Như /upload-grades-excel nhưng sheet có thêm cột MSSV (students.id) —
+    mỗi dòng thuộc về sinh viên ở cột đó. Số query không phụ thuộc số dòng.
+    """
+    try:
+        parsed = await _parse_upload(file)
+        if not parsed.has_student_column:
+            raise HTTPException(status_code=400, detail="Không tìm thấy cột MSSV")
+
+        student_pks = resolve_students(db, (row.student_key for row in parsed.rows))
+        result = _import_and_recompute(parsed, db, student_pks_by_key=student_pks)
+
         return {
             "message": "Upload điểm thành công",
-            "created": created_count,
-            "skipped": skipped_count,
-            "errors": errors[:10] if errors else None  # Limit to first 10 errors
+            "students": len(result.added),
+            "created": result.created,
+            "skipped": result.skipped,
+            "errors": result.error_messages()
         }
-        
+
     except HTTPException:
         raise
     except Exception as e:
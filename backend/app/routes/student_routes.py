@@ -12,12 +12,17 @@ from app.models.__init__ import (
     SubjectRegister,
 )
 from app.schemas.student_schemas import StudentCreate, StudentUpdate, StudentAccountResponse
+from app.services.academic_snapshot_service import get_student_snapshot
 from app.utils.jwt_utils import get_current_admin, get_current_student
 from app.utils.grade_calculator import letter_grade_to_score
 import hashlib
 
 router = APIRouter(prefix="/students", tags=["Students"])
 
+_LEARNED_SUBJECT_FIELDS = (
+    "id", "subject_name", "credits", "letter_grade", "semester", "student_id", "subject_id", "subject_code",
+)
+
 
 #    Create student (chỉ dành cho admin, student sẽ dùng /auth/register)
 @router.post("/", response_model=StudentAccountResponse)
@@ -169,67 +174,41 @@ def get_student_academic_details(
     db: Session = Depends(get_db),
     current_student: Student = Depends(get_current_student),
 ):
-    student = db.query(Student).filter(Student.id == student_id).first()
-    if not student:
+    snapshot = get_student_snapshot(db, student_id)
+    if snapshot is None:
         raise HTTPException(status_code=404, detail="Không tìm thấy sinh viên")
-    
-    # Get all semester GPAs using student.id (not student_id)
-    semester_gpas = db.query(SemesterGPA).filter(SemesterGPA.student_id == student.id).all()
-    
-    # Get all learned subjects using student.id (not student_id)
-    learned_subjects = db.query(LearnedSubject).filter(LearnedSubject.student_id == student.id).all()
-    
+    student = snapshot.student
+
+    # learned_subjects row + subject_code (mã HP từ Subject)
+    learned_subjects_data = [
+        {key: row[key] for key in _LEARNED_SUBJECT_FIELDS}
+        for row in snapshot.learned
+    ]
+
     # Calculate overall GPA
-    total_credits = sum([ls.credits for ls in learned_subjects])
+    total_credits = sum([ls["credits"] for ls in learned_subjects_data])
     total_grade_points = sum([
-        ls.credits * letter_grade_to_score(ls.letter_grade) 
-        for ls in learned_subjects
+        ls["credits"] * letter_grade_to_score(ls["letter_grade"])
+        for ls in learned_subjects_data
     ])
     overall_gpa = total_grade_points / total_credits if total_credits > 0 else 0.0
 
     # Failed subjects (F)
-    failed_subjects = [
-        ls for ls in learned_subjects
-        if (ls.letter_grade or "").upper() == "F"
+    failed_subjects_data = [
+        ls for ls in learned_subjects_data
+        if (ls["letter_grade"] or "").upper() == "F"
     ]
-    failed_subjects_data = []
-    for ls in failed_subjects:
-        failed_subjects_data.append({
-            "id": ls.id,
-            "subject_name": ls.subject_name,
-            "credits": ls.credits,
-            "letter_grade": ls.letter_grade,
-            "semester": ls.semester,
-            "student_id": ls.student_id,
-            "subject_id": ls.subject_id,
-            "subject_code": ls.subject.subject_id if ls.subject else None
-        })
-    
-    # Map learned subjects với subject_code từ relationship
-    learned_subjects_data = []
-    for ls in learned_subjects:
-        ls_dict = {
-            "id": ls.id,
-            "subject_name": ls.subject_name,
-            "credits": ls.credits,
-            "letter_grade": ls.letter_grade,
-            "semester": ls.semester,
-            "student_id": ls.student_id,
-            "subject_id": ls.subject_id,
-            "subject_code": ls.subject.subject_id if ls.subject else None  # Mã HP từ Subject
-        }
-        learned_subjects_data.append(ls_dict)
-    
+
     return {
         "student": student,
-        "semester_gpas": semester_gpas,
+        "semester_gpas": snapshot.semester_gpas,
         "learned_subjects": learned_subjects_data,
         "failed_subjects": failed_subjects_data,
         "overall_gpa": round(overall_gpa, 2),
         "total_credits": total_credits,
-        "total_learned_credits": student.total_learned_credits,
-        "total_failed_credits": sum([ls.credits for ls in failed_subjects]),
-        "failed_subjects_number": len(failed_subjects),
-        "warning_level": student.warning_level,
-        "year_level": student.year_level
+        "total_learned_credits": student["total_learned_credits"],
+        "total_failed_credits": sum([ls["credits"] for ls in failed_subjects_data]),
+        "failed_subjects_number": len(failed_subjects_data),
+        "warning_level": student["warning_level"],
+        "year_level": student["year_level"]
     }
@@ -4,6 +4,7 @@ from app.db.database import get_db
 from app.models.__init__ import SubjectRegister
 from app.models.subject_model import Subject  # Sửa import
 from app.schemas.subject_schema import SubjectCreate, SubjectUpdate, SubjectResponse
+from app.services.fuzzy_matcher import publish_catalogue_change
 from typing import List, Optional
 
 router = APIRouter(prefix="/subjects", tags=["Subjects"])
@@ -22,6 +23,7 @@ def create_subject(subject_data: SubjectCreate, db: Session = Depends(get_db)):
     db.add(db_subject)
     db.commit()
     db.refresh(db_subject)
+    publish_catalogue_change(db, "subject", [db_subject.subject_id])
     return db_subject
 
 #    Get all subjects
@@ -49,6 +51,7 @@ def update_subject(subject_id: int, subject_update: SubjectUpdate, db: Session =
     if not subject:
         raise HTTPException(status_code=404, detail="Subject not found")
 
+    old_code = subject.subject_id
     update_data = subject_update.dict(exclude_unset=True)
     
     # Xử lý conditional_subjects nếu có
@@ -61,6 +64,7 @@ def update_subject(subject_id: int, subject_update: SubjectUpdate, db: Session =
 
     db.commit()
     db.refresh(subject)
+    publish_catalogue_change(db, "subject", [old_code, subject.subject_id])
     return subject
 
 #    Delete subject
@@ -69,6 +73,7 @@ def delete_subject(subject_id: int, db: Session = Depends(get_db)):
     subject = db.query(Subject).filter(Subject.id == subject_id).first()
     if not subject:
         raise HTTPException(status_code=404, detail="Subject not found")
+    subject_code = subject.subject_id
     try:
         db.query(SubjectRegister).filter(
             SubjectRegister.subject_id == subject.id
@@ -78,6 +83,7 @@ def delete_subject(subject_id: int, db: Session = Depends(get_db)):
     except Exception as exc:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to delete subject: {str(exc)}")
+    publish_catalogue_change(db, "subject", [subject_code])
     return {"message": "Subject deleted successfully"}
 
 #    Get subject by subject_id (mã môn học)
@@ -24,6 +24,9 @@ from sqlalchemy import text
 import json
 import os
 
+from app.utils.config_cache import load_json_config
+from app.utils.schedule_occupancy import attach_occupancy, get_occupancy, occupancy_conflict
+
 
 class ClassSuggestionRuleEngine:
     """Rule-Based System for Class Registration Suggestions"""
@@ -74,8 +77,7 @@ class ClassSuggestionRuleEngine:
     def _load_config(self, config_path: str):
         """Load configuration from JSON file"""
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
+            config = load_json_config(config_path)
             
             # Load time preferences
             time_pref = config.get('time_preferences', {})
@@ -210,6 +212,9 @@ class ClassSuggestionRuleEngine:
                 'available_slots': None
             })
         
+        # Encode each timetable once so conflict checks are bitset ANDs
+        attach_occupancy(classes)
+        
         return classes
     
     def parse_study_days(self, study_date: str) -> List[str]:
@@ -322,6 +327,19 @@ class ClassSuggestionRuleEngine:
         Returns:
             True if conflict exists, False otherwise
         """
+        # Fast path: precomputed week / day-slot bitsets (see app.utils.schedule_occupancy).
+        # Classes without week data never conflict here.
+        conflict = occupancy_conflict(
+            get_occupancy(class1),
+            get_occupancy(class2),
+            missing_weeks_overlap=False,
+        )
+        if conflict is not None:
+            return conflict
+        return self._has_schedule_conflict_by_fields(class1, class2)
+    
+    def _has_schedule_conflict_by_fields(self, class1: Dict, class2: Dict) -> bool:
+        """Field-by-field conflict check, used when a time is off the 5-minute grid"""
         # Get study days
         days1 = set(self.parse_study_days(class1.get('study_date', '')))
         days2 = set(self.parse_study_days(class2.get('study_date', '')))
@@ -498,13 +516,19 @@ class ClassSuggestionRuleEngine:
         if not registered_classes:
             return classes
         
+        registered_occupancies = [get_occupancy(registered) for registered in registered_classes]
+        
         filtered = []
         for cls in classes:
             has_conflict = False
             conflict_with = []
+            occupancy = get_occupancy(cls)
             
-            for registered in registered_classes:
-                if self.has_schedule_conflict(cls, registered):
+            for registered, registered_occupancy in zip(registered_classes, registered_occupancies):
+                conflict = occupancy_conflict(occupancy, registered_occupancy, missing_weeks_overlap=False)
+                if conflict is None:
+                    conflict = self._has_schedule_conflict_by_fields(cls, registered)
+                if conflict:
                     has_conflict = True
                     conflict_with.append(registered['class_id'])
             
@@ -22,12 +22,13 @@ from typing import Dict, List, Optional, Set, Tuple
 from datetime import datetime
 from sqlalchemy.orm import Session
 from sqlalchemy import text, bindparam
-import json
 import os
 import re
 import unicodedata
 
+from app.services.academic_snapshot_service import get_student_snapshot
 from app.services.elective_service import ElectiveModuleService
+from app.utils.config_cache import load_json_config
 
 
 class SubjectSuggestionRuleEngine:
@@ -55,8 +56,7 @@ class SubjectSuggestionRuleEngine:
     def _load_config(self, config_path: str):
         """Load configuration from JSON file"""
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
+            config = load_json_config(config_path)
             
             # Load subject categories
             self.POLITICAL_SUBJECTS = config['subject_categories']['political_subjects']
@@ -350,93 +350,23 @@ class SubjectSuggestionRuleEngine:
         Returns:
             Semester number (1, 2, 3, 4, 5, 6, 7, 8)
         """
-        # Get all semesters from learned_subjects (completed semesters)
-        query = """
-            SELECT DISTINCT ls.semester
-            FROM learned_subjects ls
-            WHERE ls.student_id = :student_id
-            AND ls.semester IS NOT NULL
-            ORDER BY ls.semester
-        """
-        
-        result = self.db.execute(
-            text(query),
-            {"student_id": student_id}
-        )
-        
-        completed_semesters = [row[0] for row in result.fetchall()]
-        
-        # Count non-supplementary semesters (exclude semester 3)
-        semester_count = 0
-        for sem in completed_semesters:
-            if sem and not sem.endswith('3'):  # Exclude supplementary
-                semester_count += 1
-        
-        # Add 1 for current semester if not yet in completed list
-        if current_semester not in completed_semesters:
-            semester_count += 1
-        
-        return semester_count
+        snapshot = get_student_snapshot(self.db, student_id)
+        if snapshot is None:
+            # Unknown student: no completed semesters yet
+            return 1
+        return snapshot.semester_number(current_semester)
     
     def get_student_data(self, student_id: int) -> Dict:
         """
         Get comprehensive student data
         
         Returns:
-            Dict with keys: cpa, gpa, warning_level, completed_subjects, grades
-        """
-        # Get student info
-        student_query = """
-            SELECT cpa, warning_level
-            FROM students
-            WHERE id = :student_id
+            Dict with keys: cpa, warning_level, completed_subjects
         """
-        student_result = self.db.execute(
-            text(student_query),
-            {"student_id": student_id}
-        ).fetchone()
-        
-        if not student_result:
+        snapshot = get_student_snapshot(self.db, student_id)
+        if snapshot is None:
             raise ValueError(f"Student {student_id} not found")
-        
-        # Get learned subjects with grades
-        learned_query = """
-            SELECT 
-                s.subject_id,
-                s.subject_name,
-                ls.letter_grade,
-                s.credits
-            FROM learned_subjects ls
-            JOIN subjects s ON ls.subject_id = s.id
-            WHERE ls.student_id = :student_id
-        """
-        learned_result = self.db.execute(
-            text(learned_query),
-            {"student_id": student_id}
-        ).fetchall()
-        
-        completed_subjects = {}
-        for row in learned_result:
-            subject_id = row[0]
-            completed_subjects[subject_id] = {
-                'subject_id': subject_id,
-                'subject_name': row[1],
-                'grade': row[2],
-                'credits': row[3]
-            }
-        
-        # Parse warning_level from string like "Cảnh cáo mức 2" to int 2
-        warning_str = student_result[1] if student_result[1] else "Cảnh cáo mức 0"
-        try:
-            warning_level = int(warning_str.split()[-1]) if warning_str else 0
-        except:
-            warning_level = 0
-        
-        return {
-            'cpa': float(student_result[0]) if student_result[0] else 0.0,
-            'warning_level': warning_level,
-            'completed_subjects': completed_subjects
-        }
+        return snapshot.student_data()
     
     def is_summer_semester(self, semester: str) -> bool:
         """
@@ -539,47 +469,18 @@ class SubjectSuggestionRuleEngine:
         Returns:
             List of dicts with subject info
         """
-        # Get student's course
-        course_query = """
-            SELECT course_id
-            FROM students
-            WHERE id = :student_id
-        """
-        course_result = self.db.execute(
-            text(course_query),
-            {"student_id": student_id}
-        ).fetchone()
-        
-        if not course_result:
+        snapshot = get_student_snapshot(self.db, student_id)
+        if snapshot is None:
             raise ValueError(f"Student {student_id} has no course assigned")
         
-        course_id = course_result[0]
-        
-        # Get all subjects in the course with learning_semester
-        subjects_query = """
-            SELECT 
-                s.id,
-                s.subject_id,
-                s.subject_name,
-                s.credits,
-                cs.learning_semester
-            FROM course_subjects cs
-            JOIN subjects s ON cs.subject_id = s.id
-            WHERE cs.course_id = :course_id
-        """
-        subjects_result = self.db.execute(
-            text(subjects_query),
-            {"course_id": course_id}
-        ).fetchall()
-        
         available_subjects = []
-        for row in subjects_result:
+        for item in snapshot.curriculum:
             subject = {
-                'id': row[0],
-                'subject_id': row[1],
-                'subject_name': row[2],
-                'credits': row[3],
-                'learning_semester': row[4] if row[4] else None
+                'id': item['id'],
+                'subject_id': item['subject_id'],
+                'subject_name': item['subject_name'],
+                'credits': item['credits'],
+                'learning_semester': item['learning_semester'] if item['learning_semester'] else None
             }
             if self._is_excluded_subject_code(subject['subject_id']):
                 continue
@@ -252,7 +252,7 @@ class ConversationMessagesResponse(BaseModel):
 
 class StreamChunk(BaseModel):
     """Schema cho streaming response chunks"""
-    type: str = Field(..., description="Loại chunk: status|data|error|done|metadata", pattern="^(status|data|error|done|metadata)$")
+    type: str = Field(..., description="Loại chunk: status|data|delta|error|done|metadata", pattern="^(status|data|delta|error|done|metadata)$")
     stage: Optional[str] = Field(None, description="Giai đoạn xử lý: preprocessing|classification|query|formatting|complete|llm_processing")
     message: Optional[str] = Field(None, description="Thông báo cho user")
     timestamp: datetime = Field(default_factory=datetime.utcnow, description="Thời điểm gửi chunk")
@@ -260,8 +260,8 @@ class StreamChunk(BaseModel):
     data_count: Optional[int] = Field(None, description="Số lượng bản ghi hiện tại")
     total_count: Optional[int] = Field(None, description="Tổng số bản ghi dự kiến")
     
-    # Full response (khi type=done)
-    text: Optional[str] = Field(None, description="Câu trả lời hoàn chỉnh")
+    # Full response (khi type=done); khi type=delta là đoạn text vừa sinh thêm
+    text: Optional[str] = Field(None, description="Câu trả lời hoàn chỉnh (done) hoặc đoạn text tiếp theo (delta)")
     intent: Optional[str] = Field(None, description="Intent được phân loại")
     confidence: Optional[str] = Field(None, description="Độ tin cậy")
     data: Optional[List[Dict[str, Any]]] = Field(None, description="Dữ liệu hoàn chỉnh")
@@ -0,0 +1,437 @@
+"""
+Per-student academic snapshot shared by the read paths that used to rebuild it
+
+StudentAcademicSnapshot holds what those paths read about one student, loaded
+in one round of queries (student + course, transcript, semester GPA,
+curriculum, registered classes):
+    • SubjectSuggestionRuleEngine: get_student_data, calculate_student_semester_number,
+      get_available_subjects
+    • graduation_progress (agent tool and ChatbotService.process_graduation_progress)
+    • GET /students/{id}/academic-details
+    • ChatbotService: student info, learned-subject map, schedule audit
+
+Lookup order:
+    • session memo (db.info) — one build per request, dropped on commit/rollback
+    • L1: in-process LRU holding the JSON payload, so callers never share dicts
+    • L2: Redis, shared by workers; skipped while ResponseCache runs in memory
+      and for in-memory sqlite
+While ResponseCache runs in memory the version counters are per worker, so a
+commit handled by another worker never retires this worker's L1 entries: L1
+then keeps entries for ACADEMIC_SNAPSHOT_UNSHARED_TTL seconds only (in-memory
+sqlite is process-private and keeps the full TTL).
+Keys carry the semantic-cache data versions (epoch.catalog.student). The session
+hooks in app/agents/semantic_cache.py bump them after commits that touch
+learned_subjects / class_registers / semester_gpa / students (that student) or
+classes / subjects / course_subjects (catalog), so a write retires the snapshot
+without explicit deletes. A session holding uncommitted writes to those tables
+reads straight from the database.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+import weakref
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, time
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.llm.response_cache import InMemoryCache
+from app.models.__init__ import (
+    Class,
+    ClassRegister,
+    Course,
+    CourseSubject,
+    LearnedSubject,
+    SemesterGPA,
+    Student,
+    Subject,
+)
+
+ACADEMIC_SNAPSHOT_CACHE_ENABLED = (
+    os.environ.get("ACADEMIC_SNAPSHOT_CACHE_ENABLED", "true").strip().lower() == "true"
+)
+ACADEMIC_SNAPSHOT_TTL = int(os.environ.get("ACADEMIC_SNAPSHOT_TTL", "1800"))
+ACADEMIC_SNAPSHOT_L1_ENTRIES = int(os.environ.get("ACADEMIC_SNAPSHOT_L1_ENTRIES", "512"))
+ACADEMIC_SNAPSHOT_UNSHARED_TTL = int(os.environ.get("ACADEMIC_SNAPSHOT_UNSHARED_TTL", "5"))
+
+# Pass: letter_grade in {"A","B+","B","C+","C","D+","D"}; F / null / unknown → not passed
+PASS_GRADES = frozenset({"A", "B+", "B", "C+", "C", "D+", "D"})
+
+_KEY_PREFIX = "academic_snapshot"
+_SESSION_INFO_KEY = "academic_snapshots"
+_STUDENT_HIDDEN_COLUMNS = frozenset({"password"})
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return value
+
+
+@dataclass
+class StudentAcademicSnapshot:
+    """
+    Read-only view of one student's academic data.
+
+    ``learned`` rows follow LearnedSubject (``subject_id`` = subjects.id,
+    ``subject_code`` = mã HP) and are ordered by id, so later rows are newer;
+    ``curriculum`` and ``registered_classes`` follow the rule engine / schedule
+    audit naming (``id`` / ``subject_db_id`` = subjects.id, ``subject_id`` /
+    ``subject_code`` = mã HP).
+    """
+
+    student: Dict[str, Any]
+    course: Optional[Dict[str, Any]] = None
+    learned: List[Dict[str, Any]] = field(default_factory=list)
+    semester_gpas: List[Dict[str, Any]] = field(default_factory=list)
+    curriculum: List[Dict[str, Any]] = field(default_factory=list)
+    registered_classes: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def student_id(self) -> int:
+        return self.student["id"]
+
+    @property
+    def course_id(self) -> Optional[int]:
+        return self.student.get("course_id")
+
+    @property
+    def course_name(self) -> Optional[str]:
+        return (self.course or {}).get("course_name")
+
+    # ── derived views ───────────────────────────────────────────────────────
+    def semesters(self) -> List[str]:
+        """Distinct semesters of the transcript, ascending."""
+        return sorted({row["semester"] for row in self.learned if row["semester"] is not None})
+
+    def semester_number(self, current_semester: str) -> int:
+        """Which main semester the student is in (supplementary "…3" semesters excluded)."""
+        completed = self.semesters()
+        count = sum(1 for semester in completed if semester and not semester.endswith("3"))
+        if current_semester not in completed:
+            count += 1
+        return count
+
+    def warning_level_number(self) -> int:
+        # "Cảnh cáo mức 2" → 2
+        warning = self.student.get("warning_level") or "Cảnh cáo mức 0"
+        try:
+            return int(warning.split()[-1])
+        except (ValueError, IndexError):
+            return 0
+
+    def completed_subjects(self) -> Dict[str, Dict[str, Any]]:
+        """{mã HP: {subject_id, subject_name, grade, credits}}; the newest row wins."""
+        completed: Dict[str, Dict[str, Any]] = {}
+        for row in self.learned:
+            code = row["subject_code"]
+            if code is None:
+                continue
+            completed[code] = {
+                "subject_id": code,
+                "subject_name": row["catalog_subject_name"],
+                "grade": row["letter_grade"],
+                "credits": row["catalog_credits"],
+            }
+        return completed
+
+    def student_data(self) -> Dict[str, Any]:
+        """SubjectSuggestionRuleEngine.get_student_data() format."""
+        cpa = self.student.get("cpa")
+        return {
+            "cpa": float(cpa) if cpa else 0.0,
+            "warning_level": self.warning_level_number(),
+            "completed_subjects": self.completed_subjects(),
+        }
+
+    def latest_learned(self, subject_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, Any]]:
+        """{subjects.id: newest learned row}, optionally limited to ``subject_ids``."""
+        wanted = set(subject_ids) if subject_ids is not None else None
+        latest: Dict[int, Dict[str, Any]] = {}
+        for row in self.learned:
+            subject_id = row["subject_id"]
+            if subject_id is None or (wanted is not None and subject_id not in wanted):
+                continue
+            latest[subject_id] = row
+        return latest
+
+    def graduation_progress(self) -> Dict[str, Any]:
+        """Required / accumulated credits and per-subject status over the curriculum."""
+        total_required_credits = 0
+        subject_info_map: Dict[int, Dict[str, Any]] = {}
+        for item in self.curriculum:
+            credits = item["credits"] or 0
+            total_required_credits += credits
+            subject_info_map[item["id"]] = {
+                "subject_id": item["subject_id"] or str(item["id"]),
+                "subject_name": item["subject_name"] or "",
+                "credits": credits,
+                "learning_semester": item["learning_semester"],
+                "conditional_subjects": item["conditional_subjects"],
+            }
+
+        learned_map = self.latest_learned(subject_info_map)
+        passed_items: List[Dict[str, Any]] = []
+        missing_items: List[Dict[str, Any]] = []
+        accumulated_credits = 0
+        for subject_db_id, info in subject_info_map.items():
+            learned = learned_map.get(subject_db_id)
+            grade = (learned or {}).get("letter_grade") or None
+            if learned is None:
+                missing_items.append({**info, "grade": None, "status": "not_taken"})
+            elif (grade or "").upper() == "F":
+                missing_items.append({**info, "grade": grade, "status": "failed"})
+            elif grade in PASS_GRADES:
+                accumulated_credits += info["credits"]
+                passed_items.append({**info, "grade": grade, "status": "passed"})
+            else:
+                # Grade ambiguous (null, "", unknown) → treat as not passed
+                missing_items.append({**info, "grade": grade, "status": "not_taken"})
+
+        return {
+            "total_required_credits": total_required_credits,
+            "accumulated_credits": accumulated_credits,
+            "remaining_credits": total_required_credits - accumulated_credits,
+            "passed_subjects": passed_items,
+            "missing_subjects": missing_items,
+        }
+
+    # ── serialization ───────────────────────────────────────────────────────
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, payload: str) -> "StudentAcademicSnapshot":
+        return cls(**json.loads(payload))
+
+
+def load_student_snapshot(db: Session, student_id: int) -> Optional[StudentAcademicSnapshot]:
+    """Build the snapshot from the database (no caching). None when the student doesn't exist."""
+    row = (
+        db.query(Student, Course)
+        .outerjoin(Course, Course.id == Student.course_id)
+        .filter(Student.id == student_id)
+        .first()
+    )
+    if row is None:
+        return None
+    student, course = row
+
+    learned_rows = (
+        db.query(
+            LearnedSubject.id,
+            LearnedSubject.subject_name,
+            LearnedSubject.credits,
+            LearnedSubject.letter_grade,
+            LearnedSubject.semester,
+            LearnedSubject.subject_id,
+            Subject.subject_id,
+            Subject.subject_name,
+            Subject.credits,
+        )
+        .outerjoin(Subject, Subject.id == LearnedSubject.subject_id)
+        .filter(LearnedSubject.student_id == student_id)
+        .order_by(LearnedSubject.id)
+        .all()
+    )
+    semester_gpa_rows = (
+        db.query(SemesterGPA.id, SemesterGPA.semester, SemesterGPA.gpa, SemesterGPA.total_credits)
+        .filter(SemesterGPA.student_id == student_id)
+        .order_by(SemesterGPA.id)
+        .all()
+    )
+    curriculum_rows = (
+        db.query(
+            Subject.id,
+            Subject.subject_id,
+            Subject.subject_name,
+            Subject.credits,
+            Subject.conditional_subjects,
+            CourseSubject.learning_semester,
+        )
+        .join(Subject, CourseSubject.subject_id == Subject.id)
+        .filter(CourseSubject.course_id == student.course_id)
+        .order_by(CourseSubject.id)
+        .all()
+        if student.course_id is not None
+        else []
+    )
+    register_rows = (
+        db.query(
+            ClassRegister.id,
+            Class.id,
+            Class.class_id,
+            Class.class_name,
+            Class.study_date,
+            Class.study_week,
+            Class.study_time_start,
+            Class.study_time_end,
+            Subject.id,
+            Subject.subject_id,
+            Subject.subject_name,
+            Subject.credits,
+        )
+        .join(Class, ClassRegister.class_id == Class.id)
+        .join(Subject, Class.subject_id == Subject.id)
+        .filter(ClassRegister.student_id == student_id)
+        .order_by(ClassRegister.id)
+        .all()
+    )
+
+    return StudentAcademicSnapshot(
+        student={
+            column.key: _jsonable(getattr(student, column.key))
+            for column in Student.__table__.columns
+            if column.key not in _STUDENT_HIDDEN_COLUMNS
+        },
+        course=(
+            {"id": course.id, "course_id": course.course_id, "course_name": course.course_name}
+            if course is not None
+            else None
+        ),
+        learned=[
+            {
+                "id": r[0], "subject_name": r[1], "credits": r[2], "letter_grade": r[3], "semester": r[4],
+                "student_id": student_id, "subject_id": r[5], "subject_code": r[6],
+                "catalog_subject_name": r[7], "catalog_credits": r[8],
+            }
+            for r in learned_rows
+        ],
+        semester_gpas=[
+            {"id": r[0], "semester": r[1], "gpa": r[2], "total_credits": r[3], "student_id": student_id}
+            for r in semester_gpa_rows
+        ],
+        curriculum=[
+            {
+                "id": r[0], "subject_id": r[1], "subject_name": r[2], "credits": r[3],
+                "conditional_subjects": r[4], "learning_semester": r[5],
+            }
+            for r in curriculum_rows
+        ],
+        registered_classes=[
+            {
+                "register_id": r[0], "class_db_id": r[1], "class_id": r[2], "class_name": r[3],
+                "study_date": r[4], "study_week": list(r[5] or []),
+                "study_time_start": _jsonable(r[6]), "study_time_end": _jsonable(r[7]),
+                "subject_db_id": r[8], "subject_code": r[9], "subject_name": r[10], "credits": r[11] or 0,
+            }
+            for r in register_rows
+        ],
+    )
+
+
+class AcademicSnapshotCache:
+    def __init__(
+        self,
+        ttl: int = ACADEMIC_SNAPSHOT_TTL,
+        l1_entries: int = ACADEMIC_SNAPSHOT_L1_ENTRIES,
+        unshared_ttl: int = ACADEMIC_SNAPSHOT_UNSHARED_TTL,
+    ):
+        self.ttl = ttl
+        self.unshared_ttl = min(ttl, unshared_ttl)
+        self.l1 = InMemoryCache(max_entries=l1_entries)
+        # Engine → namespace: tests and scripts run several databases in one process
+        self._namespaces: "weakref.WeakKeyDictionary[Any, str]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _namespaces_for(self, db: Session):
+        bind = db.get_bind()
+        engine = getattr(bind, "engine", bind)
+        with self._lock:
+            local = self._namespaces.get(engine)
+            if local is None:
+                local = self._namespaces[engine] = uuid.uuid4().hex[:12]
+        if engine.url.get_backend_name() == "sqlite" and engine.url.database in (None, "", ":memory:"):
+            return local, None  # private to this process: nothing to share through Redis
+        url = engine.url.render_as_string(hide_password=True)
+        return local, hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+
+    def get(self, db: Session, student_id: int) -> Optional[StudentAcademicSnapshot]:
+        from app.agents.orchestration_metrics import get_orchestration_metrics
+        from app.agents.semantic_cache import get_semantic_cache
+
+        semantic_cache = get_semantic_cache()
+        metrics = get_orchestration_metrics()
+        # Versions are read before loading: a snapshot built while a write
+        # commits is stored under the old versions and never served.
+        versions = semantic_cache.versions(student_id)
+        local, database = self._namespaces_for(db)
+        store = semantic_cache.store
+        shared = store.shared
+        use_l2 = database is not None and shared
+        # Per-worker versions only retire what this worker committed: keep L1 short.
+        # The scope in the key keeps entries from the two modes apart when Redis comes or goes.
+        l1_ttl = self.ttl if shared or database is None else self.unshared_ttl
+        l1_key = f"{local}:{'shared' if shared else 'local'}:{student_id}:{versions}"
+        l2_key = f"{_KEY_PREFIX}:{database}:{student_id}:{versions}"
+
+        payload = self.l1.get(l1_key)
+        if payload is not None:
+            metrics.increment("academic_snapshot.hit_l1")
+            return StudentAcademicSnapshot.from_json(payload)
+        if use_l2:
+            payload = store.get(l2_key)
+            if payload is not None:
+                metrics.increment("academic_snapshot.hit_l2")
+                self.l1.set(l1_key, payload, ttl=l1_ttl)
+                return StudentAcademicSnapshot.from_json(payload)
+
+        metrics.increment("academic_snapshot.miss")
+        snapshot = load_student_snapshot(db, student_id)
+        if snapshot is None:
+            return None
+        payload = snapshot.to_json()
+        if l1_ttl > 0:
+            self.l1.set(l1_key, payload, ttl=l1_ttl)
+        if use_l2:
+            store.set(l2_key, payload, ttl=self.ttl)
+        return snapshot
+
+
+_shared_cache: Optional[AcademicSnapshotCache] = None
+
+
+def get_academic_snapshot_cache() -> AcademicSnapshotCache:
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = AcademicSnapshotCache()
+    return _shared_cache
+
+
+def get_student_snapshot(db: Session, student_id: Optional[int]) -> Optional[StudentAcademicSnapshot]:
+    """Snapshot for ``student_id`` through session memo → L1 → Redis → database."""
+    if not student_id:
+        return None
+    from app.agents.semantic_cache import has_uncommitted_writes
+
+    if has_uncommitted_writes(db):
+        # Read-your-writes: nothing cached reflects this transaction yet
+        return load_student_snapshot(db, student_id)
+
+    memo = db.info.setdefault(_SESSION_INFO_KEY, {})
+    if student_id in memo:
+        return memo[student_id]
+    if ACADEMIC_SNAPSHOT_CACHE_ENABLED:
+        snapshot = get_academic_snapshot_cache().get(db, student_id)
+    else:
+        snapshot = load_student_snapshot(db, student_id)
+    if snapshot is not None:
+        memo[student_id] = snapshot
+    return snapshot
+
+
+@event.listens_for(Session, "after_commit")
+def _drop_memo_after_commit(session: Session) -> None:
+    session.info.pop(_SESSION_INFO_KEY, None)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_memo_after_rollback(session: Session, previous_transaction: Any) -> None:
+    if previous_transaction.parent is None:
+        session.info.pop(_SESSION_INFO_KEY, None)
@@ -1,18 +1,26 @@
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
-import json
+import asyncio
+import logging
 import time
 
-from sqlalchemy import func
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.models.chat_history_model import ChatConversation, ChatMessage
 
+logger = logging.getLogger(__name__)
 
-class ChatHistoryService:
-    """Persistence service for chatbot conversations and messages."""
 
-    def __init__(self, db: Session):
+class _ChatHistoryMixin:
+    """
+    Phần dùng chung của ChatHistoryService / AsyncChatHistoryService: Redis cache,
+    query builder và payload. Không có public method — mỗi service tự thực thi
+    query trên loại session của nó.
+    """
+
+    def __init__(self, db):
         self.db = db
         self._cache = None
         self._cache_ready = False
@@ -39,11 +47,8 @@ class ChatHistoryService:
         return f"chat:conv:msgs:{conversation_id}:p:{page}:s:{page_size}"
 
     def _log_metric(self, event: str, **fields: Any):
-        payload = {"event": event, **fields}
-        try:
-            print(f"[CHAT_HISTORY_METRIC] {json.dumps(payload, default=str, ensure_ascii=False)}")
-        except Exception:
-            print(f"[CHAT_HISTORY_METRIC] {payload}")
+        # JSON serialisation happens in the log formatter, off the event loop
+        logger.info("[CHAT_HISTORY_METRIC] %s", event, extra={"fields": {"event": event, **fields}})
 
     def _invalidate_list_cache(self, student_pk: int):
         cache = self._get_cache()
@@ -63,6 +68,118 @@ class ChatHistoryService:
         for key in keys:
             cache.delete(key)
 
+    def _invalidate_caches(self, student_pk: int, conversation_id: Optional[int] = None):
+        self._invalidate_list_cache(student_pk)
+        if conversation_id is not None:
+            self._invalidate_messages_cache(conversation_id)
+
+    # ── Cached pages: dùng chung cho bản sync và async ───────────────────────────
+
+    def _read_cached_page(self, event: str, key: str, started_at: float, **fields: Any) -> Optional[Dict[str, Any]]:
+        cache = self._get_cache()
+        if not cache:
+            return None
+
+        cached = cache.get(key)
+        if not cached:
+            return None
+
+        cached["cache_hit"] = True
+        self._log_metric(
+            event,
+            cache_hit=True,
+            **fields,
+            rows=len(cached.get("items", [])),
+            elapsed_ms=round((time.perf_counter() - started_at) * 1000, 2),
+        )
+        return cached
+
+    def _store_page(
+        self,
+        event: str,
+        key: str,
+        payload: Dict[str, Any],
+        ttl_seconds: int,
+        started_at: float,
+        **fields: Any,
+    ) -> Dict[str, Any]:
+        cache = self._get_cache()
+        if cache:
+            cache.set(key, payload, ttl_seconds)
+
+        self._log_metric(
+            event,
+            cache_hit=False,
+            **fields,
+            rows=len(payload["items"]),
+            elapsed_ms=round((time.perf_counter() - started_at) * 1000, 2),
+        )
+        return payload
+
+    @staticmethod
+    def _clear_conversation_state(conversation_id: int):
+        try:
+            from app.services.conversation_state import get_conversation_state_manager
+
+            get_conversation_state_manager().delete_state(conversation_id)
+        except Exception as exc:
+            print(f"[CHAT_HISTORY] Failed to clear conversation state for conversation {conversation_id}: {exc}")
+
+    # ── Query builders: dùng chung cho bản sync và async ─────────────────────────
+
+    @staticmethod
+    def _owned_conversation_query(student_pk: int, conversation_id: int):
+        return (
+            select(ChatConversation)
+            .where(
+                ChatConversation.id == conversation_id,
+                ChatConversation.student_pk == student_pk,
+            )
+            .limit(1)
+        )
+
+    @staticmethod
+    def _latest_assistant_message_query(conversation_id: int):
+        return (
+            select(ChatMessage)
+            .where(
+                ChatMessage.conversation_id == conversation_id,
+                ChatMessage.role == "assistant",
+            )
+            .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+            .limit(1)
+        )
+
+    @staticmethod
+    def _conversation_count_query(student_pk: int):
+        return select(func.count(ChatConversation.id)).where(ChatConversation.student_pk == student_pk)
+
+    @staticmethod
+    def _conversation_page_query(student_pk: int, offset: int, page_size: int):
+        return (
+            select(ChatConversation)
+            .where(ChatConversation.student_pk == student_pk)
+            .order_by(ChatConversation.updated_at.desc())
+            .offset(offset)
+            .limit(page_size)
+        )
+
+    @staticmethod
+    def _message_count_query(conversation_id: int):
+        return select(func.count(ChatMessage.id)).where(ChatMessage.conversation_id == conversation_id)
+
+    @staticmethod
+    def _message_page_query(conversation_id: int, offset: int, page_size: int):
+        return (
+            select(ChatMessage)
+            .where(ChatMessage.conversation_id == conversation_id)
+            .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+            .offset(offset)
+            .limit(page_size)
+        )
+
+    # ── Row / payload builders ───────────────────────────────────────────────────
+
     @staticmethod
     def _normalize_title(first_message: Optional[str]) -> str:
         if not first_message:
@@ -114,43 +231,91 @@ class ChatHistoryService:
             "conversation_state_snapshot": conversation_state_snapshot,
         }
 
-    def get_latest_assistant_message(self, student_pk: int, conversation_id: int) -> Optional[Dict[str, Any]]:
-        conversation = (
-            self.db.query(ChatConversation)
-            .filter(
-                ChatConversation.id == conversation_id,
-                ChatConversation.student_pk == student_pk,
-            )
-            .first()
+    @staticmethod
+    def _new_conversation(student_pk: int, title: Optional[str]) -> ChatConversation:
+        return ChatConversation(
+            student_pk=student_pk,
+            title=(title or "Cuoc tro chuyen moi")[:255],
+        )
+
+    def _new_turn(
+        self,
+        conversation: ChatConversation,
+        user_content: str,
+        assistant_payload: Dict[str, Any],
+    ) -> Tuple[ChatMessage, ChatMessage]:
+        user_msg = ChatMessage(
+            conversation_id=conversation.id,
+            role="user",
+            content=user_content,
         )
+        assistant_msg = ChatMessage(
+            conversation_id=conversation.id,
+            role="assistant",
+            content=assistant_payload.get("text") or "",
+            intent=assistant_payload.get("intent"),
+            confidence=assistant_payload.get("confidence"),
+            data_json=self._build_assistant_data_json(assistant_payload),
+            sql_text=assistant_payload.get("sql"),
+            sql_error=assistant_payload.get("sql_error"),
+        )
+        conversation.updated_at = datetime.utcnow()
+        return user_msg, assistant_msg
+
+    @staticmethod
+    def _rename(conversation: ChatConversation, title: str):
+        conversation.title = title[:255]
+        conversation.updated_at = datetime.utcnow()
+
+    @staticmethod
+    def _page_payload(
+        total: Optional[int],
+        page: int,
+        page_size: int,
+        offset: int,
+        items: List[Dict[str, Any]],
+        **extra: Any,
+    ) -> Dict[str, Any]:
+        total = int(total or 0)
+        return {
+            **extra,
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "has_more": offset + len(items) < total,
+            "items": items,
+            "cache_hit": False,
+        }
+
+
+class ChatHistoryService(_ChatHistoryMixin):
+    """Persistence service for chatbot conversations and messages."""
+
+    def __init__(self, db: Session):
+        super().__init__(db)
+
+    def _get_owned_conversation(self, student_pk: int, conversation_id: int) -> ChatConversation:
+        conversation = self.db.scalars(self._owned_conversation_query(student_pk, conversation_id)).first()
         if not conversation:
             raise ValueError("Conversation not found or access denied")
+        return conversation
 
-        message = (
-            self.db.query(ChatMessage)
-            .filter(
-                ChatMessage.conversation_id == conversation_id,
-                ChatMessage.role == "assistant",
-            )
-            .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
-            .first()
-        )
+    def get_latest_assistant_message(self, student_pk: int, conversation_id: int) -> Optional[Dict[str, Any]]:
+        self._get_owned_conversation(student_pk, conversation_id)
 
+        message = self.db.scalars(self._latest_assistant_message_query(conversation_id)).first()
         if not message:
             return None
 
         return self._message_to_dict(message)
 
     def create_conversation(self, student_pk: int, title: Optional[str] = None) -> ChatConversation:
-        conversation = ChatConversation(
-            student_pk=student_pk,
-            title=(title or "Cuoc tro chuyen moi")[:255],
-        )
+        conversation = self._new_conversation(student_pk, title)
         self.db.add(conversation)
         self.db.commit()
         self.db.refresh(conversation)
 
-        self._invalidate_list_cache(student_pk)
+        self._invalidate_caches(student_pk)
         return conversation
 
     def get_or_create_conversation(
@@ -160,17 +325,7 @@ class ChatHistoryService:
         first_message: Optional[str] = None,
     ) -> ChatConversation:
         if conversation_id:
-            conversation = (
-                self.db.query(ChatConversation)
-                .filter(
-                    ChatConversation.id == conversation_id,
-                    ChatConversation.student_pk == student_pk,
-                )
-                .first()
-            )
-            if not conversation:
-                raise ValueError("Conversation not found or access denied")
-            return conversation
+            return self._get_owned_conversation(student_pk, conversation_id)
 
         title = self._normalize_title(first_message)
         return self.create_conversation(student_pk=student_pk, title=title)
@@ -183,44 +338,16 @@ class ChatHistoryService:
         conversation_id: int,
     ) -> Tuple[ChatConversation, ChatMessage, ChatMessage]:
         # conversation already validated by the caller — query by PK directly.
-        conversation = (
-            self.db.query(ChatConversation)
-            .filter(
-                ChatConversation.id == conversation_id,
-                ChatConversation.student_pk == student_pk,
-            )
-            .first()
-        )
-        if not conversation:
-            raise ValueError("Conversation not found or access denied")
-
-        user_msg = ChatMessage(
-            conversation_id=conversation.id,
-            role="user",
-            content=user_content,
-        )
-        assistant_msg = ChatMessage(
-            conversation_id=conversation.id,
-            role="assistant",
-            content=assistant_payload.get("text") or "",
-            intent=assistant_payload.get("intent"),
-            confidence=assistant_payload.get("confidence"),
-            data_json=self._build_assistant_data_json(assistant_payload),
-            sql_text=assistant_payload.get("sql"),
-            sql_error=assistant_payload.get("sql_error"),
-        )
+        conversation = self._get_owned_conversation(student_pk, conversation_id)
+        user_msg, assistant_msg = self._new_turn(conversation, user_content, assistant_payload)
 
-        conversation.updated_at = datetime.utcnow()
-
-        self.db.add(user_msg)
-        self.db.add(assistant_msg)
+        self.db.add_all([user_msg, assistant_msg])
         self.db.commit()
         self.db.refresh(conversation)
         self.db.refresh(user_msg)
         self.db.refresh(assistant_msg)
 
-        self._invalidate_list_cache(student_pk)
-        self._invalidate_messages_cache(conversation.id)
+        self._invalidate_caches(student_pk, conversation.id)
 
         return conversation, user_msg, assistant_msg
 
@@ -232,63 +359,21 @@ class ChatHistoryService:
         ttl_seconds: int = 60,
     ) -> Dict[str, Any]:
         started_at = time.perf_counter()
-        cache = self._get_cache()
         key = self._list_cache_key(student_pk, page, page_size)
+        fields = dict(student_pk=student_pk, page=page, page_size=page_size)
 
-        if cache:
-            cached = cache.get(key)
-            if cached:
-                cached["cache_hit"] = True
-                self._log_metric(
-                    "conversation_list",
-                    cache_hit=True,
-                    student_pk=student_pk,
-                    page=page,
-                    page_size=page_size,
-                    rows=len(cached.get("items", [])),
-                    elapsed_ms=round((time.perf_counter() - started_at) * 1000, 2),
-                )
-                return cached
+        cached = self._read_cached_page("conversation_list", key, started_at, **fields)
+        if cached:
+            return cached
 
         offset = (page - 1) * page_size
-        total = (
-            self.db.query(func.count(ChatConversation.id))
-            .filter(ChatConversation.student_pk == student_pk)
-            .scalar()
-        )
+        total = self.db.scalar(self._conversation_count_query(student_pk))
+        rows = self.db.scalars(self._conversation_page_query(student_pk, offset, page_size)).all()
 
-        rows = (
-            self.db.query(ChatConversation)
-            .filter(ChatConversation.student_pk == student_pk)
-            .order_by(ChatConversation.updated_at.desc())
-            .offset(offset)
-            .limit(page_size)
-            .all()
+        payload = self._page_payload(
+            total, page, page_size, offset, [self._conversation_to_dict(row) for row in rows]
         )
-
-        payload = {
-            "total": int(total or 0),
-            "page": page,
-            "page_size": page_size,
-            "has_more": offset + len(rows) < int(total or 0),
-            "items": [self._conversation_to_dict(row) for row in rows],
-            "cache_hit": False,
-        }
-
-        if cache:
-            cache.set(key, payload, ttl_seconds)
-
-        self._log_metric(
-            "conversation_list",
-            cache_hit=False,
-            student_pk=student_pk,
-            page=page,
-            page_size=page_size,
-            rows=len(rows),
-            elapsed_ms=round((time.perf_counter() - started_at) * 1000, 2),
-        )
-
-        return payload
+        return self._store_page("conversation_list", key, payload, ttl_seconds, started_at, **fields)
 
     def list_messages(
         self,
@@ -299,122 +384,185 @@ class ChatHistoryService:
         ttl_seconds: int = 60,
     ) -> Dict[str, Any]:
         started_at = time.perf_counter()
-        conversation = (
-            self.db.query(ChatConversation)
-            .filter(
-                ChatConversation.id == conversation_id,
-                ChatConversation.student_pk == student_pk,
-            )
-            .first()
-        )
-        if not conversation:
-            raise ValueError("Conversation not found or access denied")
-
-        cache = self._get_cache()
+        conversation = self._get_owned_conversation(student_pk, conversation_id)
         key = self._messages_cache_key(conversation_id, page, page_size)
+        fields = dict(student_pk=student_pk, conversation_id=conversation_id, page=page, page_size=page_size)
 
-        if cache:
-            cached = cache.get(key)
-            if cached:
-                cached["cache_hit"] = True
-                self._log_metric(
-                    "conversation_messages",
-                    cache_hit=True,
-                    student_pk=student_pk,
-                    conversation_id=conversation_id,
-                    page=page,
-                    page_size=page_size,
-                    rows=len(cached.get("items", [])),
-                    elapsed_ms=round((time.perf_counter() - started_at) * 1000, 2),
-                )
-                return cached
+        cached = self._read_cached_page("conversation_messages", key, started_at, **fields)
+        if cached:
+            return cached
 
         offset = (page - 1) * page_size
-        total = (
-            self.db.query(func.count(ChatMessage.id))
-            .filter(ChatMessage.conversation_id == conversation_id)
-            .scalar()
-        )
+        total = self.db.scalar(self._message_count_query(conversation_id))
+        rows = list(reversed(self.db.scalars(self._message_page_query(conversation_id, offset, page_size)).all()))
 
-        rows = (
-            self.db.query(ChatMessage)
-            .filter(ChatMessage.conversation_id == conversation_id)
-            .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
-            .offset(offset)
-            .limit(page_size)
-            .all()
+        payload = self._page_payload(
+            total, page, page_size, offset, [self._message_to_dict(row) for row in rows],
+            conversation=self._conversation_to_dict(conversation),
         )
-        rows = list(reversed(rows))
+        return self._store_page("conversation_messages", key, payload, ttl_seconds, started_at, **fields)
 
-        payload = {
-            "conversation": self._conversation_to_dict(conversation),
-            "total": int(total or 0),
-            "page": page,
-            "page_size": page_size,
-            "has_more": offset + len(rows) < int(total or 0),
-            "items": [self._message_to_dict(row) for row in rows],
-            "cache_hit": False,
-        }
+    def rename_conversation(self, student_pk: int, conversation_id: int, title: str) -> ChatConversation:
+        conversation = self._get_owned_conversation(student_pk, conversation_id)
 
-        if cache:
-            cache.set(key, payload, ttl_seconds)
+        self._rename(conversation, title)
+        self.db.commit()
+        self.db.refresh(conversation)
 
-        self._log_metric(
-            "conversation_messages",
-            cache_hit=False,
-            student_pk=student_pk,
-            conversation_id=conversation_id,
-            page=page,
-            page_size=page_size,
-            rows=len(rows),
-            elapsed_ms=round((time.perf_counter() - started_at) * 1000, 2),
-        )
+        self._invalidate_caches(student_pk, conversation_id)
 
-        return payload
+        return conversation
 
-    def rename_conversation(self, student_pk: int, conversation_id: int, title: str) -> ChatConversation:
-        conversation = (
-            self.db.query(ChatConversation)
-            .filter(
-                ChatConversation.id == conversation_id,
-                ChatConversation.student_pk == student_pk,
-            )
-            .first()
-        )
+    def delete_conversation(self, student_pk: int, conversation_id: int):
+        conversation = self._get_owned_conversation(student_pk, conversation_id)
+
+        self.db.delete(conversation)
+        self.db.commit()
+
+        self._clear_conversation_state(conversation_id)
+        self._invalidate_caches(student_pk, conversation_id)
+
+
+class AsyncChatHistoryService(_ChatHistoryMixin):
+    """
+    Chat history trên AsyncSession (get_async_db): cùng query builder và payload
+    với ChatHistoryService (qua _ChatHistoryMixin), chỉ phần thực thi là coroutine.
+    Redis cache / conversation state (client sync) chạy qua asyncio.to_thread nên
+    không block event loop.
+    """
+
+    def __init__(self, db: AsyncSession):
+        super().__init__(db)
+
+    async def _get_owned_conversation(self, student_pk: int, conversation_id: int) -> ChatConversation:
+        conversation = (await self.db.scalars(self._owned_conversation_query(student_pk, conversation_id))).first()
         if not conversation:
             raise ValueError("Conversation not found or access denied")
+        return conversation
 
-        conversation.title = title[:255]
-        conversation.updated_at = datetime.utcnow()
-        self.db.commit()
-        self.db.refresh(conversation)
+    async def get_latest_assistant_message(self, student_pk: int, conversation_id: int) -> Optional[Dict[str, Any]]:
+        await self._get_owned_conversation(student_pk, conversation_id)
 
-        self._invalidate_list_cache(student_pk)
-        self._invalidate_messages_cache(conversation_id)
+        message = (await self.db.scalars(self._latest_assistant_message_query(conversation_id))).first()
+        if not message:
+            return None
+
+        return self._message_to_dict(message)
 
+    async def create_conversation(self, student_pk: int, title: Optional[str] = None) -> ChatConversation:
+        conversation = self._new_conversation(student_pk, title)
+        self.db.add(conversation)
+        await self.db.commit()
+        await self.db.refresh(conversation)
+
+        await asyncio.to_thread(self._invalidate_caches, student_pk)
         return conversation
 
-    def delete_conversation(self, student_pk: int, conversation_id: int):
-        conversation = (
-            self.db.query(ChatConversation)
-            .filter(
-                ChatConversation.id == conversation_id,
-                ChatConversation.student_pk == student_pk,
-            )
-            .first()
+    async def get_or_create_conversation(
+        self,
+        student_pk: int,
+        conversation_id: Optional[int],
+        first_message: Optional[str] = None,
+    ) -> ChatConversation:
+        if conversation_id:
+            return await self._get_owned_conversation(student_pk, conversation_id)
+
+        title = self._normalize_title(first_message)
+        return await self.create_conversation(student_pk=student_pk, title=title)
+
+    async def save_chat_turn(
+        self,
+        student_pk: int,
+        user_content: str,
+        assistant_payload: Dict[str, Any],
+        conversation_id: int,
+    ) -> Tuple[ChatConversation, ChatMessage, ChatMessage]:
+        conversation = await self._get_owned_conversation(student_pk, conversation_id)
+        user_msg, assistant_msg = self._new_turn(conversation, user_content, assistant_payload)
+
+        self.db.add_all([user_msg, assistant_msg])
+        await self.db.commit()
+        await self.db.refresh(conversation)
+        await self.db.refresh(user_msg)
+        await self.db.refresh(assistant_msg)
+
+        await asyncio.to_thread(self._invalidate_caches, student_pk, conversation.id)
+
+        return conversation, user_msg, assistant_msg
+
+    async def list_conversations(
+        self,
+        student_pk: int,
+        page: int = 1,
+        page_size: int = 20,
+        ttl_seconds: int = 60,
+    ) -> Dict[str, Any]:
+        started_at = time.perf_counter()
+        key = self._list_cache_key(student_pk, page, page_size)
+        fields = dict(student_pk=student_pk, page=page, page_size=page_size)
+
+        cached = await asyncio.to_thread(self._read_cached_page, "conversation_list", key, started_at, **fields)
+        if cached:
+            return cached
+
+        offset = (page - 1) * page_size
+        total = await self.db.scalar(self._conversation_count_query(student_pk))
+        rows = (await self.db.scalars(self._conversation_page_query(student_pk, offset, page_size))).all()
+
+        payload = self._page_payload(
+            total, page, page_size, offset, [self._conversation_to_dict(row) for row in rows]
+        )
+        return await asyncio.to_thread(
+            self._store_page, "conversation_list", key, payload, ttl_seconds, started_at, **fields
         )
-        if not conversation:
-            raise ValueError("Conversation not found or access denied")
 
-        self.db.delete(conversation)
-        self.db.commit()
+    async def list_messages(
+        self,
+        student_pk: int,
+        conversation_id: int,
+        page: int = 1,
+        page_size: int = 50,
+        ttl_seconds: int = 60,
+    ) -> Dict[str, Any]:
+        started_at = time.perf_counter()
+        conversation = await self._get_owned_conversation(student_pk, conversation_id)
+        key = self._messages_cache_key(conversation_id, page, page_size)
+        fields = dict(student_pk=student_pk, conversation_id=conversation_id, page=page, page_size=page_size)
 
-        try:
-            from app.services.conversation_state import get_conversation_state_manager
+        cached = await asyncio.to_thread(self._read_cached_page, "conversation_messages", key, started_at, **fields)
+        if cached:
+            return cached
 
-            get_conversation_state_manager().delete_state(conversation_id)
-        except Exception as exc:
-            print(f"[CHAT_HISTORY] Failed to clear conversation state for conversation {conversation_id}: {exc}")
+        offset = (page - 1) * page_size
+        total = await self.db.scalar(self._message_count_query(conversation_id))
+        rows = list(reversed(
+            (await self.db.scalars(self._message_page_query(conversation_id, offset, page_size))).all()
+        ))
+
+        payload = self._page_payload(
+            total, page, page_size, offset, [self._message_to_dict(row) for row in rows],
+            conversation=self._conversation_to_dict(conversation),
+        )
+        return await asyncio.to_thread(
+            self._store_page, "conversation_messages", key, payload, ttl_seconds, started_at, **fields
+        )
 
-        self._invalidate_list_cache(student_pk)
-        self._invalidate_messages_cache(conversation_id)
+    async def rename_conversation(self, student_pk: int, conversation_id: int, title: str) -> ChatConversation:
+        conversation = await self._get_owned_conversation(student_pk, conversation_id)
+
+        self._rename(conversation, title)
+        await self.db.commit()
+        await self.db.refresh(conversation)
+
+        await asyncio.to_thread(self._invalidate_caches, student_pk, conversation_id)
+
+        return conversation
+
+    async def delete_conversation(self, student_pk: int, conversation_id: int):
+        conversation = await self._get_owned_conversation(student_pk, conversation_id)
+
+        await self.db.delete(conversation)
+        await self.db.commit()
+
+        await asyncio.to_thread(self._clear_conversation_state, conversation_id)
+        await asyncio.to_thread(self._invalidate_caches, student_pk, conversation_id)
@@ -4,14 +4,17 @@ Integrates Rule Engine for intelligent subject/class suggestions
 """
 from collections import defaultdict
 from html import escape
-from typing import Any, Dict, List, Optional, Set, Tuple
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 import re
+import time
 import unicodedata
 from datetime import time as dtime, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, func, or_
 from app.rules.subject_suggestion_rules import SubjectSuggestionRuleEngine
 from app.rules.class_suggestion_rules import ClassSuggestionRuleEngine
+from app.services.academic_snapshot_service import get_student_snapshot
 
 
 _FORMAT_TRIM_FIELDS = frozenset(
@@ -350,31 +353,194 @@ def format_rule_based_response(raw_result: Any, intent: Optional[str], segment:
     return "Mình đã xử lý xong yêu cầu của bạn."
 
 
+def _service_metrics():
+    """Orchestration metrics; import lazy vì app.agents cũng import service này"""
+    try:
+        from app.agents.orchestration_metrics import get_orchestration_metrics
+        return get_orchestration_metrics()
+    except Exception:
+        return None
+
+
+class _LoaderScope:
+    """
+    Những gì một suggestion data loader cần, bind vào session của AsyncSession.run_sync.
+
+    Rule engine được inject vào ChatbotService thì dùng lại nguyên; còn lại tạo một
+    lần cho session đó. FuzzyMatcher lấy từ ChatbotService, tức là matcher dùng chung
+    theo engine sync mà publish_catalogue_change cập nhật, không phải theo
+    AsyncEngine.sync_engine của session này.
+    """
+
+    def __init__(self, service: "ChatbotService", session: Session):
+        self._service = service
+        self.db = session
+        self._subject_rule_engine: Optional[SubjectSuggestionRuleEngine] = None
+        self._class_rule_engine: Optional[ClassSuggestionRuleEngine] = None
+
+    @property
+    def subject_rule_engine(self) -> SubjectSuggestionRuleEngine:
+        if "subject_rule_engine" in self._service._injected:
+            return self._service.subject_rule_engine
+        if self._subject_rule_engine is None:
+            self._subject_rule_engine = self._service._init_component(
+                "subject_rule_engine", lambda: SubjectSuggestionRuleEngine(self.db)
+            )
+        return self._subject_rule_engine
+
+    @property
+    def class_rule_engine(self) -> ClassSuggestionRuleEngine:
+        if "class_rule_engine" in self._service._injected:
+            return self._service.class_rule_engine
+        if self._class_rule_engine is None:
+            self._class_rule_engine = self._service._init_component(
+                "class_rule_engine", lambda: ClassSuggestionRuleEngine(self.db)
+            )
+        return self._class_rule_engine
+
+    def class_query_service(self):
+        from app.services.class_query_service import ClassQueryService
+        matcher = self._service._fuzzy_matcher if self._service.has_sync_db else None
+        return ClassQueryService(self.db, fuzzy_matcher=matcher)
+
+
 class ChatbotService:
     """
     Service layer for chatbot functionality
     Handles integration between intent classification, rule engine, and NL2SQL
     """
-    
-    def __init__(self, db: Session):
+
+    _db: Optional[Session] = None
+    _db_factory: Optional[Callable[[], Session]] = None
+    _owns_db = False
+
+    def __init__(
+        self,
+        db: Optional[Session],
+        async_db: Optional[AsyncSession] = None,
+        db_factory: Optional[Callable[[], Session]] = None,
+    ):
         """
         Initialize chatbot service
         
         Args:
             db: Database session
+            async_db: AsyncSession (get_async_db, optional) — nếu có, các suggestion
+                data loader chạy qua nó thay vì block event loop (xem _run_loader)
+            db_factory: (khi db=None) tạo sync Session ở lần đầu self.db được dùng,
+                để request chỉ chạy trên async_db không giữ thêm connection sync;
+                close() đóng session đã tạo
         """
-        self.db = db
-        self.subject_rule_engine = SubjectSuggestionRuleEngine(db)
-        self.class_rule_engine = ClassSuggestionRuleEngine(db)
+        self._db = db
+        self._db_factory = db_factory
+        self.async_db = async_db
+
+        # Rule engines và FuzzyMatcher được tạo lần đầu dùng (xem các property bên
+        # dưới): lời chào hay xem điểm không cần tới chúng
+        self._subject_rule_engine: Optional[SubjectSuggestionRuleEngine] = None
+        self._class_rule_engine: Optional[ClassSuggestionRuleEngine] = None
+        self._fuzzy_matcher_instance = None
+        self._fuzzy_matcher_loaded = False
+        self._injected: Set[str] = set()
+        self._loader_scope: Optional[_LoaderScope] = None
+        self._metrics = _service_metrics()
+        if self._metrics is not None:
+            self._metrics.increment("chatbot_service.instances")
+
+    @property
+    def db(self) -> Optional[Session]:
+        if self._db is None and self._db_factory is not None:
+            self._db = self._db_factory()
+            self._owns_db = True
+        return self._db
+
+    @db.setter
+    def db(self, session: Optional[Session]) -> None:
+        self._db = session
+
+    @property
+    def has_sync_db(self) -> bool:
+        """Có sync Session (đã mở hoặc mở được) mà không mở nó"""
+        return self._db is not None or self._db_factory is not None
+
+    def close(self) -> None:
+        """Đóng sync Session do db_factory tạo (session truyền vào thì caller tự đóng)"""
+        if self._owns_db and self._db is not None:
+            self._db.close()
+            self._db = None
+        self._owns_db = False
+
+    def _init_component(self, name: str, factory):
+        """Tạo component và ghi thời gian init vào orchestration metrics"""
+        started = time.perf_counter()
+        component = factory()
+        if self._metrics is not None:
+            self._metrics.observe_latency(f"chatbot_service.init.{name}", time.perf_counter() - started)
+        return component
+
+    async def _run_loader(self, loader):
+        """
+        Chạy suggestion data loader (rule engine / ClassQueryService, ORM sync).
 
-        # FuzzyMatcher — dùng để resolve tên môn khi user gõ sai / thiếu dấu
-        try:
-            from app.services.fuzzy_matcher import FuzzyMatcher
-            self._fuzzy_matcher = FuzzyMatcher(db)
-            print(f"✅ [ChatbotService] FuzzyMatcher loaded: {self._fuzzy_matcher.subject_count} subjects")
-        except Exception as e:
-            print(f"⚠️ [ChatbotService] FuzzyMatcher not available: {e}")
-            self._fuzzy_matcher = None
+        loader nhận service (db, subject_rule_engine, class_rule_engine,
+        class_query_service()). Có async_db: loader chạy trong AsyncSession.run_sync
+        với một _LoaderScope bind vào session của greenlet đó, nên query đi qua driver
+        async và không block event loop; scope được giữ lại cho các lần gọi sau trên
+        cùng session. Không có async_db: gọi thẳng loader(self) trên sync Session.
+        """
+        if self.async_db is None:
+            return loader(self)
+        return await self.async_db.run_sync(lambda session: loader(self._scope_for(session)))
+
+    def _scope_for(self, session: Session) -> _LoaderScope:
+        if self._loader_scope is None or self._loader_scope.db is not session:
+            self._loader_scope = _LoaderScope(self, session)
+        return self._loader_scope
+
+    def class_query_service(self):
+        from app.services.class_query_service import ClassQueryService
+        return ClassQueryService(self.db, fuzzy_matcher=self._fuzzy_matcher)
+
+    @property
+    def subject_rule_engine(self) -> SubjectSuggestionRuleEngine:
+        if self._subject_rule_engine is None:
+            self._subject_rule_engine = self._init_component(
+                "subject_rule_engine", lambda: SubjectSuggestionRuleEngine(self.db)
+            )
+        return self._subject_rule_engine
+
+    @subject_rule_engine.setter
+    def subject_rule_engine(self, engine: SubjectSuggestionRuleEngine) -> None:
+        self._subject_rule_engine = engine
+        self._injected.add("subject_rule_engine")
+
+    @property
+    def class_rule_engine(self) -> ClassSuggestionRuleEngine:
+        if self._class_rule_engine is None:
+            self._class_rule_engine = self._init_component(
+                "class_rule_engine", lambda: ClassSuggestionRuleEngine(self.db)
+            )
+        return self._class_rule_engine
+
+    @class_rule_engine.setter
+    def class_rule_engine(self, engine: ClassSuggestionRuleEngine) -> None:
+        self._class_rule_engine = engine
+        self._injected.add("class_rule_engine")
+
+    @property
+    def _fuzzy_matcher(self):
+        """FuzzyMatcher — dùng để resolve tên môn khi user gõ sai / thiếu dấu (None nếu lỗi)"""
+        if not self._fuzzy_matcher_loaded:
+            self._fuzzy_matcher_loaded = True
+            try:
+                from app.services.fuzzy_matcher import get_fuzzy_matcher
+                self._fuzzy_matcher_instance = self._init_component(
+                    "fuzzy_matcher", lambda: get_fuzzy_matcher(self.db)
+                )
+            except Exception as e:
+                print(f"⚠️ [ChatbotService] FuzzyMatcher not available: {e}")
+                self._fuzzy_matcher_instance = None
+        return self._fuzzy_matcher_instance
 
     def _normalize_lookup_text(self, text: str) -> str:
         if not text:
@@ -432,10 +598,8 @@ class ChatbotService:
     def _get_student_course_id(self, student_id: Optional[int]) -> Optional[int]:
         if not student_id:
             return None
-        from app.models.student_model import Student
-
-        student = self.db.query(Student).filter(Student.id == student_id).first()
-        return student.course_id if student else None
+        snapshot = get_student_snapshot(self.db, student_id)
+        return snapshot.course_id if snapshot else None
 
     def _subject_in_course(self, subject_db_id: int, course_id: Optional[int]) -> bool:
         if not course_id:
@@ -467,26 +631,17 @@ class ChatbotService:
     def _get_learned_subject_map(self, student_id: Optional[int], subject_ids: List[int]) -> Dict[int, Dict[str, Any]]:
         if not student_id or not subject_ids:
             return {}
-        from app.models.learned_subject_model import LearnedSubject
-
-        rows = (
-            self.db.query(LearnedSubject)
-            .filter(
-                LearnedSubject.student_id == student_id,
-                LearnedSubject.subject_id.in_(subject_ids),
-            )
-            .order_by(LearnedSubject.id.desc())
-            .all()
-        )
-        learned_map: Dict[int, Dict[str, Any]] = {}
-        for row in rows:
-            if row.subject_id not in learned_map:
-                learned_map[row.subject_id] = {
-                    "letter_grade": row.letter_grade,
-                    "semester": row.semester,
-                    "credits": row.credits,
-                }
-        return learned_map
+        snapshot = get_student_snapshot(self.db, student_id)
+        if snapshot is None:
+            return {}
+        return {
+            subject_id: {
+                "letter_grade": row["letter_grade"],
+                "semester": row["semester"],
+                "credits": row["credits"],
+            }
+            for subject_id, row in snapshot.latest_learned(subject_ids).items()
+        }
 
     def _build_learning_status(self, learned_info: Optional[Dict[str, Any]]) -> Tuple[str, Optional[str]]:
         if not learned_info:
@@ -1320,76 +1475,54 @@ class ChatbotService:
         if not student_id:
             return None
 
-        from app.models.student_model import Student
-        from app.models.course_model import Course
-        from app.models.course_subject_model import CourseSubject
-        from app.models.semester_gpa_model import SemesterGPA
-
-        student_row = (
-            self.db.query(Student, Course)
-            .outerjoin(Course, Course.id == Student.course_id)
-            .filter(Student.id == student_id)
-            .first()
-        )
-        if not student_row:
-            return None
-
-        student, course = self._safe_unpack_entity_row(student_row, expected=2)
-        if student is None:
+        snapshot = get_student_snapshot(self.db, student_id)
+        if snapshot is None:
             return None
+        student = snapshot.student
 
-        semester_rows = (
-            self.db.query(SemesterGPA)
-            .filter(SemesterGPA.student_id == student_id)
-            .order_by(SemesterGPA.semester.asc())
-            .all()
-        )
         semester_gpa = [
             {
-                "semester": row.semester,
-                "gpa": row.gpa,
-                "total_credits": row.total_credits,
+                "semester": row["semester"],
+                "gpa": row["gpa"],
+                "total_credits": row["total_credits"],
             }
-            for row in semester_rows
+            for row in sorted(
+                snapshot.semester_gpas,
+                key=lambda row: (row["semester"] is not None, row["semester"] or ""),
+            )
         ]
 
-        pathway_rows = (
-            self.db.query(CourseSubject.learning_semester, func.count(CourseSubject.subject_id))
-            .filter(CourseSubject.course_id == student.course_id)
-            .group_by(CourseSubject.learning_semester)
-            .order_by(CourseSubject.learning_semester.asc())
-            .all()
-            if student.course_id
-            else []
-        )
+        subject_counts: Dict[Optional[int], int] = defaultdict(int)
+        for item in snapshot.curriculum:
+            subject_counts[item["learning_semester"]] += 1
         learning_pathway = [
             {
                 "learning_semester": semester,
-                "subject_count": subject_count,
+                "subject_count": subject_counts[semester],
             }
-            for semester, subject_count in pathway_rows
+            for semester in sorted(subject_counts, key=lambda value: (value is not None, value or 0))
         ]
 
         result_row = {
-            "student_id": student.id,
-            "student_name": student.student_name,
-            "email": student.email,
-            "cpa": student.cpa,
-            "course_id": student.course_id,
-            "course_name": course.course_name if course else None,
-            "total_learned_credits": student.total_learned_credits,
-            "year_level": student.year_level,
-            "warning_level": student.warning_level,
+            "student_id": student["id"],
+            "student_name": student["student_name"],
+            "email": student["email"],
+            "cpa": student["cpa"],
+            "course_id": student["course_id"],
+            "course_name": snapshot.course_name,
+            "total_learned_credits": student["total_learned_credits"],
+            "year_level": student["year_level"],
+            "warning_level": student["warning_level"],
             "learning_pathway": learning_pathway,
             "semester_gpa": semester_gpa,
         }
 
         summary_parts = [
-            f"Họ tên: {student.student_name}",
-            f"CPA: {student.cpa}",
+            f"Họ tên: {student['student_name']}",
+            f"CPA: {student['cpa']}",
         ]
-        if course and course.course_name:
-            summary_parts.append(f"Chương trình: {course.course_name}")
+        if snapshot.course_name:
+            summary_parts.append(f"Chương trình: {snapshot.course_name}")
 
         return {
             "text": " | ".join(summary_parts),
@@ -1397,9 +1530,9 @@ class ChatbotService:
             "confidence": "high",
             "data": [result_row],
             "metadata": {
-                "student_id": student.id,
-                "course_id": student.course_id,
-                "course_name": course.course_name if course else None,
+                "student_id": student["id"],
+                "course_id": student["course_id"],
+                "course_name": snapshot.course_name,
                 "semester_gpa_count": len(semester_gpa),
                 "learning_pathway_count": len(learning_pathway),
             },
@@ -2407,15 +2540,11 @@ class ChatbotService:
 
     def _audit_and_recommend_schedule(self, student_id: int) -> Dict:
         from collections import defaultdict
-        from app.models.student_model import Student
-        from app.models.class_register_model import ClassRegister
         from app.models.class_model import Class
         from app.models.subject_model import Subject
-        from app.models.course_subject_model import CourseSubject
-        from app.models.learned_subject_model import LearnedSubject
 
-        student = self.db.query(Student).filter(Student.id == student_id).first()
-        if not student:
+        snapshot = get_student_snapshot(self.db, student_id)
+        if snapshot is None:
             return {
                 "text": "❌ Không tìm thấy thông tin sinh viên.",
                 "intent": "modify_schedule",
@@ -2423,39 +2552,29 @@ class ChatbotService:
                 "data": None,
             }
 
-        registered_rows = (
-            self.db.query(ClassRegister, Class, Subject)
-            .join(Class, ClassRegister.class_id == Class.id)
-            .join(Subject, Class.subject_id == Subject.id)
-            .filter(ClassRegister.student_id == student_id)
-            .all()
-        )
-
         registered_classes: List[Dict] = []
-        for reg, cls, subj in registered_rows:
+        for registered in snapshot.registered_classes:
             registered_classes.append({
-                "register_id": reg.id,
-                "class_db_id": cls.id,
-                "class_id": cls.class_id,
-                "class_name": cls.class_name,
-                "subject_db_id": subj.id,
-                "subject_code": subj.subject_id,
-                "subject_name": subj.subject_name,
-                "credits": subj.credits or 0,
-                "days": self._parse_days(cls.study_date),
-                "weeks": list(cls.study_week or []),
-                "start_time": self._to_time_obj(cls.study_time_start),
-                "end_time": self._to_time_obj(cls.study_time_end),
+                "register_id": registered["register_id"],
+                "class_db_id": registered["class_db_id"],
+                "class_id": registered["class_id"],
+                "class_name": registered["class_name"],
+                "subject_db_id": registered["subject_db_id"],
+                "subject_code": registered["subject_code"],
+                "subject_name": registered["subject_name"],
+                "credits": registered["credits"],
+                "days": self._parse_days(registered["study_date"]),
+                "weeks": list(registered["study_week"]),
+                "start_time": self._to_time_obj(registered["study_time_start"]),
+                "end_time": self._to_time_obj(registered["study_time_end"]),
             })
 
-        course_subject_ids = {
-            row[0] for row in self.db.query(CourseSubject.subject_id).filter(CourseSubject.course_id == student.course_id).all()
-        }
+        course_subject_ids = {item["id"] for item in snapshot.curriculum}
 
-        learned_rows = self.db.query(LearnedSubject.subject_id, LearnedSubject.letter_grade).filter(
-            LearnedSubject.student_id == student_id
-        ).all()
-        learned_ge_b_subjects = {sid for sid, grade in learned_rows if sid is not None and self._grade_ge_b(grade)}
+        learned_ge_b_subjects = {
+            row["subject_id"] for row in snapshot.learned
+            if row["subject_id"] is not None and self._grade_ge_b(row["letter_grade"])
+        }
 
         subject_result = self.subject_rule_engine.suggest_subjects(student_id)
         subject_summary = subject_result.get("summary", {}) or {}
@@ -3584,7 +3703,9 @@ class ChatbotService:
                 }
 
             # Rule engine: get raw results (already ordered by priority in summary)
-            raw_result = self.subject_rule_engine.suggest_subjects(student_id, max_credits)
+            raw_result = await self._run_loader(
+                lambda svc: svc.subject_rule_engine.suggest_subjects(student_id, max_credits)
+            )
 
             # ── Sort suggested_subjects by priority ─────────────────────────────────
             # Each subject gets its rule category from the summary groups.
@@ -3692,11 +3813,8 @@ class ChatbotService:
                     "error": "missing_student_id",
                 }
 
-            db = self.db
-            from app.models import Student, CourseSubject, LearnedSubject, Subject, Course
-
-            student = db.query(Student).filter(Student.id == student_id).first()
-            if not student:
+            snapshot = get_student_snapshot(self.db, student_id)
+            if snapshot is None:
                 return {
                     "text": f"Không tìm thấy sinh viên với student_id={student_id}.",
                     "intent": "graduation_progress",
@@ -3705,18 +3823,10 @@ class ChatbotService:
                     "error": "student_not_found",
                 }
 
-            course_id = student.course_id
-            course_row = db.query(Course).filter(Course.id == course_id).first()
-            course_name = course_row.course_name if course_row is not None else None
+            course_id = snapshot.course_id
+            course_name = snapshot.course_name
 
-            course_subjects = (
-                db.query(CourseSubject, Subject)
-                .join(Subject, CourseSubject.subject_id == Subject.id)
-                .filter(CourseSubject.course_id == course_id)
-                .all()
-            )
-
-            if not course_subjects:
+            if not snapshot.curriculum:
                 return {
                     "text": "Không tìm thấy chương trình đào tạo cho sinh viên.",
                     "intent": "graduation_progress",
@@ -3725,56 +3835,12 @@ class ChatbotService:
                     "error": "no_course_subjects",
                 }
 
-            total_required_credits = 0
-            course_subject_ids = set()
-            subject_info_map: Dict[int, Dict] = {}
-            for cs, subj in course_subjects:
-                credits = subj.credits or 0
-                total_required_credits += credits
-                course_subject_ids.add(subj.id)
-                subject_info_map[subj.id] = {
-                    "subject_id": subj.subject_id or str(subj.id),
-                    "subject_name": subj.subject_name or "",
-                    "credits": credits,
-                    "learning_semester": cs.learning_semester,
-                    "conditional_subjects": subj.conditional_subjects,
-                }
-
-            learned_rows = (
-                db.query(LearnedSubject)
-                .filter(
-                    LearnedSubject.student_id == student_id,
-                    LearnedSubject.subject_id.in_(course_subject_ids),
-                )
-                .all()
-            )
-
-            learned_map = {lr.subject_id: lr for lr in learned_rows}
-            PASS_GRADES = {"A", "B+", "B", "C+", "C", "D+", "D"}
-
-            passed_items = []
-            missing_items = []
-            accumulated_credits = 0
-
-            for subj_id, info in subject_info_map.items():
-                lr = learned_map.get(subj_id)
-                grade = getattr(lr, "letter_grade", None) or None
-
-                if lr is None:
-                    status = "not_taken"
-                    missing_items.append({**info, "grade": None, "status": status})
-                elif (grade or "").upper() == "F":
-                    status = "failed"
-                    missing_items.append({**info, "grade": grade, "status": status})
-                elif grade in PASS_GRADES:
-                    status = "passed"
-                    accumulated_credits += info["credits"]
-                    passed_items.append({**info, "grade": grade, "status": status})
-                else:
-                    status = "not_taken"
-                    missing_items.append({**info, "grade": grade, "status": status})
-
-            remaining_credits = total_required_credits - accumulated_credits
+            progress = snapshot.graduation_progress()
+            total_required_credits = progress["total_required_credits"]
+            accumulated_credits = progress["accumulated_credits"]
+            remaining_credits = progress["remaining_credits"]
+            passed_items = progress["passed_subjects"]
+            missing_items = progress["missing_subjects"]
 
             table_rows = []
             for item in missing_items:
@@ -4231,7 +4297,9 @@ class ChatbotService:
             from app.models.subject_model import Subject
 
             # First, get subject candidates based on source
-            subject_result = self.subject_rule_engine.suggest_subjects(student_id)
+            subject_result = await self._run_loader(
+                lambda svc: svc.subject_rule_engine.suggest_subjects(student_id)
+            )
 
             if subject_source == 'registered' and subject_ids_seed:
                 registered_subject_rows = (
@@ -4391,15 +4459,19 @@ class ChatbotService:
             from app.services.preference_filter import PreferenceFilter
             pref_filter = PreferenceFilter()
             
-            for subj in suggested_subjects:
-                # Get classes for this specific subject
-                subject_classes = self.class_rule_engine.suggest_classes(
+            # Get classes for every subject in one loader round-trip
+            classes_per_subject = await self._run_loader(lambda svc: [
+                svc.class_rule_engine.suggest_classes(
                     student_id=student_id,
                     subject_ids=[subj['id']],
                     preferences=preferences_dict,
                     registered_classes=[],
                     min_suggestions=2  # Reduce candidate size to speed up response
                 )
+                for subj in suggested_subjects
+            ])
+
+            for subj, subject_classes in zip(suggested_subjects, classes_per_subject):
                 
                 # Apply preference filter BEFORE combination (Early Pruning Optimization)
                 all_classes = subject_classes['suggested_classes']
@@ -4471,14 +4543,17 @@ class ChatbotService:
             if len(combinations) < 3:
                 print("🔄 [COMBINATIONS] Relaxing soft preferences to find more valid schedules...")
                 relaxed_classes_by_subject = {}
-                for subj in suggested_subjects:
-                    relaxed_result = self.class_rule_engine.suggest_classes(
+                relaxed_results = await self._run_loader(lambda svc: [
+                    svc.class_rule_engine.suggest_classes(
                         student_id=student_id,
                         subject_ids=[subj['id']],
                         preferences={},
                         registered_classes=[],
                         min_suggestions=5,
                     )
+                    for subj in suggested_subjects
+                ])
+                for subj, relaxed_result in zip(suggested_subjects, relaxed_results):
                     relaxed_candidates = relaxed_result['suggested_classes'][:10]
                     relaxed_candidates = self._apply_class_nlq_constraints(
                         relaxed_candidates,
@@ -5350,8 +5425,7 @@ class ChatbotService:
                 ])
 
                 if has_structured_filters:
-                    svc = ClassQueryService(self.db)
-                    rows = svc.query(constraints)
+                    rows = await self._run_loader(lambda svc: svc.class_query_service().query(constraints))
 
                     import datetime as dt
                     for r in rows:
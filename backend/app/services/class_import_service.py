@@ -0,0 +1,545 @@
+"""
+Bulk timetable import: validate once per column, upsert in chunks
+
+read_class_file()     parses an uploaded xlsx/csv (pure CPU, safe to run in a
+                      worker thread) into row dicts.
+import_classes()      validates every row column by column — each distinct
+                      study_date / study_time_* / study_week value is parsed once,
+                      not once per row — resolves subject codes with one IN query
+                      per chunk and upserts CLASS_IMPORT_CHUNK rows per statement
+                      (MySQL: INSERT ... ON DUPLICATE KEY UPDATE, sqlite:
+                      INSERT ... ON CONFLICT DO UPDATE) on the session key
+                      (class_id, study_date, study_time_start).
+
+preview_prune()       lists the sessions a prune=True import would delete, without
+                      writing, so the admin can confirm first.
+
+A class code may have several sessions (lý thuyết + bài tập, hai buổi/tuần), so
+the upsert key is the session, not class_id alone. Missing study_date is stored
+as "" and missing times as 00:00 (same defaults the admin UI has always sent) so
+the key never contains NULL. The unique index on that key is created by
+scripts/db/add_class_session_key.py (or the add_hot_path_indexes migration) on
+existing databases; the import only checks that it exists.
+"""
+from __future__ import annotations
+
+import csv
+from dataclasses import dataclass, field
+from datetime import datetime, time
+from io import BytesIO, StringIO
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import openpyxl
+from sqlalchemy import case, delete, func, inspect, select, update
+from sqlalchemy.orm import Session
+
+from app.models.__init__ import Class, ClassRegister, Subject
+
+CLASS_IMPORT_CHUNK = 1000
+CLASS_IMPORT_IN_CHUNK = 500
+CLASS_SESSION_INDEX = "uq_classes_session"
+CLASS_SESSION_KEY = ("class_id", "study_date", "study_time_start")
+MIDNIGHT = time(0, 0)
+
+_NULL_STRINGS = {"", "null", "none", "n/a", "na", "-", "--"}
+
+# Tên cột của file Excel TKB / payload cũ của trang ScheduleManagement → cột của bảng classes
+_FIELD_ALIASES = {
+    "class_code": "class_id",
+    "class_code_attached": "linked_class_ids",
+    "subject_name": "class_name",
+    "room": "classroom",
+    "day_of_week_converted": "study_date",
+    "study_weeks": "study_week",
+    "teacher": "teacher_name",
+}
+
+# Cột được ghi đè khi trùng key (mọi cột trừ id và chính key)
+_UPDATE_COLUMNS = (
+    "subject_id", "class_name", "linked_class_ids", "class_type", "classroom",
+    "study_time_end", "teacher_name", "study_week",
+)
+
+
+class ClassImportError(ValueError):
+    """Import cannot start (unreadable file, session key missing, unsafe prune)."""
+
+
+@dataclass
+class ClassImportResult:
+    total: int = 0
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+    class_codes: Set[str] = field(default_factory=set)
+
+    def summary(self, error_limit: int = 200) -> Dict[str, Any]:
+        return {
+            "message": (
+                f"Đã import {self.inserted + self.updated}/{self.total} dòng "
+                f"({self.inserted} mới, {self.updated} cập nhật)"
+            ),
+            "total_rows": self.total,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "deleted": self.deleted,
+            "failed": len(self.errors),
+            "errors": self.errors[:error_limit],
+        }
+
+
+def _chunks(values: Sequence, size: int) -> Iterator[Sequence]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _blank(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and value.strip().lower() in _NULL_STRINGS)
+
+
+def _text(value: Any) -> Optional[str]:
+    if _blank(value):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # openpyxl/csv trả mã lớp dạng 123456.0
+    return str(value).strip()
+
+
+# ---------------- PARSERS (mỗi giá trị khác nhau chỉ parse một lần) ----------------
+
+def _parse_days(value: Any) -> str:
+    if _blank(value):
+        return ""
+    days = [day.strip() for day in str(value).split(",") if day.strip()]
+    for day in days:
+        if day not in Class.VALID_DAYS:
+            raise ValueError(f"ngày '{day}' không hợp lệ")
+    return ",".join(days)
+
+
+def _parse_time(value: Any) -> time:
+    if _blank(value):
+        return MIDNIGHT
+    if isinstance(value, datetime):
+        return value.time().replace(second=0, microsecond=0)
+    if isinstance(value, time):
+        return value.replace(second=0, microsecond=0)
+    normalized = str(value).strip()
+    for fmt in ("%H:%M", "%H:%M:%S"):
+        try:
+            return datetime.strptime(normalized, fmt).time().replace(second=0)
+        except ValueError:
+            continue
+    raise ValueError(f"giờ '{normalized}' phải có dạng HH:MM (ví dụ 09:05)")
+
+
+def _parse_weeks(value: Any) -> List[int]:
+    if _blank(value):
+        return []
+    if isinstance(value, (int, float)):
+        items: Iterable[Any] = [value]
+    elif isinstance(value, (list, tuple)):
+        items = value
+    else:
+        items = [item for item in str(value).split(",") if item.strip()]
+
+    weeks: List[int] = []
+    for item in items:
+        token = str(item).strip()
+        try:
+            if "-" in token:  # "2-9" như trong file TKB gốc
+                first, last = (int(part) for part in token.split("-", 1))
+                weeks.extend(range(first, last + 1))
+            else:
+                weeks.append(int(float(token)))
+        except ValueError:
+            raise ValueError(f"'{token}' không phải số tuần")
+    if any(week <= 0 for week in weeks):
+        raise ValueError("số tuần phải dương")
+    return weeks
+
+
+def _parse_linked(value: Any) -> str:
+    if _blank(value):
+        return ""
+    if isinstance(value, (list, tuple)):
+        return ",".join(code for code in (_text(item) for item in value) if code)
+    return ",".join(code.strip() for code in str(_text(value)).split(",") if code.strip())
+
+
+def _memoized(parser: Callable[[Any], Any], values: Iterable[Any]) -> Dict[Any, Any]:
+    """Parse từng giá trị khác nhau của một cột; lỗi được lưu lại như một giá trị."""
+    parsed: Dict[Any, Any] = {}
+    for value in values:
+        key = _hashable(value)
+        if key in parsed:
+            continue
+        try:
+            parsed[key] = parser(value)
+        except ValueError as e:
+            parsed[key] = e
+    return parsed
+
+
+def _hashable(value: Any) -> Any:
+    return tuple(value) if isinstance(value, list) else value
+
+
+# ---------------- INPUT ----------------
+
+def normalize_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Đổi tên cột (alias, hoa/thường, khoảng trắng) về tên cột của bảng classes."""
+    normalized: Dict[str, Any] = {}
+    for key, value in row.items():
+        if key is None:
+            continue
+        name = str(key).strip().lower().replace(" ", "_")
+        name = _FIELD_ALIASES.get(name, name)
+        if name not in normalized or _blank(normalized[name]):
+            normalized[name] = value
+    return normalized
+
+
+def read_class_file(contents: bytes, filename: str = "") -> List[Tuple[int, Dict[str, Any]]]:
+    """
+    Đọc file xlsx (read_only) hoặc csv; dòng đầu là header. Trả về
+    (số dòng trong file, dict) để lỗi được báo đúng dòng admin nhìn thấy.
+    """
+    if filename.lower().endswith(".csv"):
+        try:
+            reader = csv.reader(StringIO(contents.decode("utf-8-sig")))
+        except UnicodeDecodeError:
+            raise ClassImportError("File CSV phải được mã hoá UTF-8")
+        return _rows_with_header(reader)
+
+    try:
+        workbook = openpyxl.load_workbook(BytesIO(contents), read_only=True, data_only=True)
+    except Exception as e:
+        raise ClassImportError(f"Không đọc được file Excel: {e}")
+    try:
+        return _rows_with_header(workbook.active.iter_rows(values_only=True))
+    finally:
+        workbook.close()
+
+
+def _rows_with_header(rows: Iterable[Sequence[Any]]) -> List[Tuple[int, Dict[str, Any]]]:
+    iterator = iter(rows)
+    header = next(iterator, None)
+    if not header or not any(header):
+        raise ClassImportError("File không có dòng header")
+    columns = [str(cell).strip() if cell is not None else None for cell in header]
+
+    parsed: List[Tuple[int, Dict[str, Any]]] = []
+    for row_number, row in enumerate(iterator, start=2):
+        if not row or all(_blank(cell) for cell in row):
+            continue
+        parsed.append((row_number, {column: cell for column, cell in zip(columns, row) if column}))
+    return parsed
+
+
+# ---------------- VALIDATION ----------------
+
+def _subject_ids_by_code(db: Session, codes: Set[str]) -> Dict[str, int]:
+    lookup = sorted(codes | {code.upper() for code in codes})
+    resolved: Dict[str, int] = {}
+    for chunk in _chunks(lookup, CLASS_IMPORT_IN_CHUNK):
+        for subject_pk, code in db.execute(select(Subject.id, Subject.subject_id).where(Subject.subject_id.in_(chunk))):
+            resolved[str(code).strip().upper()] = subject_pk
+    return resolved
+
+
+def _known_subject_ids(db: Session, subject_pks: Set[int]) -> Set[int]:
+    known: Set[int] = set()
+    for chunk in _chunks(sorted(subject_pks), CLASS_IMPORT_IN_CHUNK):
+        known.update(db.execute(select(Subject.id).where(Subject.id.in_(chunk))).scalars())
+    return known
+
+
+def validate_class_rows(
+    db: Session, rows: Sequence[Tuple[int, Dict[str, Any]]]
+) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Dict[str, Any]]]:
+    """
+    Kiểm tra toàn bộ dòng theo từng cột. Trả về (dòng hợp lệ đã chuẩn hoá thành
+    mapping cho bảng classes, lỗi theo dòng). Dòng trùng key với một dòng trước
+    đó trong cùng file bị báo lỗi thay vì ghi đè âm thầm.
+    """
+    rows = [(row_number, normalize_row(row)) for row_number, row in rows]
+    days = _memoized(_parse_days, (row.get("study_date") for _, row in rows))
+    times = _memoized(_parse_time, (row.get(name) for _, row in rows
+                                    for name in ("study_time_start", "study_time_end")))
+    weeks = _memoized(_parse_weeks, (row.get("study_week") for _, row in rows))
+
+    codes = {_text(row.get("subject_code")) for _, row in rows} - {None}
+    subject_pks_by_code = _subject_ids_by_code(db, codes) if codes else {}
+    raw_subject_pks = set()
+    for _, row in rows:
+        if _text(row.get("subject_code")) is None and _text(row.get("subject_id")) is not None:
+            try:
+                raw_subject_pks.add(int(float(row["subject_id"])))
+            except ValueError:
+                pass
+    known_subject_pks = _known_subject_ids(db, raw_subject_pks) if raw_subject_pks else set()
+
+    valid: List[Tuple[int, Dict[str, Any]]] = []
+    errors: List[Dict[str, Any]] = []
+    first_row_by_key: Dict[Tuple[str, str, time], int] = {}
+
+    for row_number, row in rows:
+        class_code = _text(row.get("class_id"))
+        problems: List[str] = []
+
+        if class_code is None:
+            problems.append("thiếu class_id")
+        class_name = _text(row.get("class_name"))
+        if class_name is None:
+            problems.append("thiếu class_name")
+
+        subject_code = _text(row.get("subject_code"))
+        subject_pk = None
+        if subject_code is not None:
+            subject_pk = subject_pks_by_code.get(subject_code.upper())
+            if subject_pk is None:
+                problems.append(f"không tìm thấy môn học với mã '{subject_code}'")
+        elif _text(row.get("subject_id")) is not None:
+            try:
+                subject_pk = int(float(row["subject_id"]))
+            except ValueError:
+                subject_pk = None
+            if subject_pk not in known_subject_pks:
+                problems.append(f"không tìm thấy môn học id={row['subject_id']}")
+        else:
+            problems.append("thiếu subject_code hoặc subject_id")
+
+        parsed = {
+            "study_date": days[_hashable(row.get("study_date"))],
+            "study_time_start": times[_hashable(row.get("study_time_start"))],
+            "study_time_end": times[_hashable(row.get("study_time_end"))],
+            "study_week": weeks[_hashable(row.get("study_week"))],
+        }
+        for name, value in parsed.items():
+            if isinstance(value, ValueError):
+                problems.append(f"{name}: {value}")
+        start, end = parsed["study_time_start"], parsed["study_time_end"]
+        # 00:00 = không có giờ kết thúc (giá trị mặc định, không so sánh)
+        if isinstance(start, time) and isinstance(end, time) and end != MIDNIGHT and end < start:
+            problems.append("study_time_end phải sau study_time_start")
+
+        if not problems:
+            key = (class_code, parsed["study_date"], start)
+            if key in first_row_by_key:
+                problems.append(f"trùng buổi học với dòng {first_row_by_key[key]}")
+            else:
+                first_row_by_key[key] = row_number
+
+        if problems:
+            errors.append({"row": row_number, "class_id": class_code, "error": "; ".join(problems)})
+            continue
+
+        valid.append((row_number, {
+            "class_id": class_code,
+            "class_name": class_name,
+            "subject_id": subject_pk,
+            "linked_class_ids": _parse_linked(row.get("linked_class_ids")),
+            "class_type": _text(row.get("class_type")),
+            "classroom": _text(row.get("classroom")),
+            "teacher_name": _text(row.get("teacher_name")),
+            **parsed,
+        }))
+    return valid, errors
+
+
+# ---------------- UPSERT ----------------
+
+def class_session_key_exists(db: Session) -> bool:
+    inspector = inspect(db.connection())
+    names = {index["name"] for index in inspector.get_indexes("classes")}
+    names |= {constraint["name"] for constraint in inspector.get_unique_constraints("classes")}
+    return CLASS_SESSION_INDEX in names
+
+
+def ensure_class_session_key(db: Session) -> None:
+    """
+    Upsert cần unique index trên key buổi học. create_all không thêm index vào bảng
+    đã có, nên DB cũ phải chạy scripts/db/add_class_session_key.py (chuẩn hoá NULL
+    của key, báo buổi trùng, tạo index); ở đây chỉ kiểm tra — DDL giữa request sẽ
+    tự commit trên MySQL.
+    """
+    if not class_session_key_exists(db):
+        raise ClassImportError(
+            f"Bảng classes chưa có unique index {CLASS_SESSION_INDEX} trên "
+            f"({', '.join(CLASS_SESSION_KEY)}); hãy chạy "
+            "`cd backend && python -m scripts.db.add_class_session_key` trước khi import"
+        )
+
+
+def _upsert_statement(db: Session):
+    classes = Class.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+        stmt = mysql_insert(classes)
+        return stmt.on_duplicate_key_update({name: stmt.inserted[name] for name in _UPDATE_COLUMNS})
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+        stmt = sqlite_insert(classes)
+        return stmt.on_conflict_do_update(
+            index_elements=list(CLASS_SESSION_KEY),
+            set_={name: stmt.excluded[name] for name in _UPDATE_COLUMNS},
+        )
+    raise ClassImportError(f"Upsert chưa hỗ trợ dialect '{dialect}'")
+
+
+def _existing_keys(db: Session, class_codes: Sequence[str]) -> Set[Tuple[str, str, time]]:
+    classes = Class.__table__
+    stmt = select(classes.c.class_id, classes.c.study_date, classes.c.study_time_start).where(
+        classes.c.class_id.in_(class_codes)
+    )
+    return {tuple(row) for row in db.execute(stmt)}
+
+
+def _session_key(mapping: Dict[str, Any]) -> Tuple[str, str, time]:
+    return mapping["class_id"], mapping["study_date"], mapping["study_time_start"]
+
+
+def _missing_sessions(db: Session, imported: Set[Tuple[str, str, time]]) -> List[Tuple[int, str, str, time, str]]:
+    """(id, class_id, study_date, study_time_start, class_name) của các buổi học không có trong ``imported``."""
+    classes = Class.__table__
+    return [
+        (class_pk, class_code, study_date, start, class_name)
+        for class_pk, class_code, study_date, start, class_name in db.execute(
+            select(classes.c.id, classes.c.class_id, classes.c.study_date, classes.c.study_time_start,
+                   classes.c.class_name)
+            .order_by(classes.c.class_id, classes.c.study_date, classes.c.study_time_start)
+        )
+        if (class_code, study_date, start) not in imported
+    ]
+
+
+def _check_prune(valid: Sequence[Tuple[int, Dict[str, Any]]], errors: Sequence[Dict[str, Any]]) -> None:
+    """
+    Prune xoá mọi buổi học không có trong file: một dòng lỗi (hay cả file lỗi)
+    sẽ bị coi là "không còn" và bị xoá cùng đăng ký lớp. Chỉ prune khi cả file hợp lệ.
+    """
+    if errors:
+        raise ClassImportError(
+            f"Không thể xoá các buổi học cũ (prune) khi có {len(errors)} dòng lỗi; "
+            "hãy sửa file hoặc import không prune"
+        )
+    if not valid:
+        raise ClassImportError("Không thể xoá các buổi học cũ (prune) khi file không có dòng hợp lệ nào")
+
+
+def _prune_missing(db: Session, imported: Set[Tuple[str, str, time]]) -> Tuple[int, Set[str]]:
+    classes = Class.__table__
+    stale = _missing_sessions(db, imported)
+    stale_ids = [class_pk for class_pk, *_ in stale]
+    for chunk in _chunks(stale_ids, CLASS_IMPORT_IN_CHUNK):
+        db.execute(delete(ClassRegister.__table__).where(ClassRegister.__table__.c.class_id.in_(chunk)))
+        db.execute(delete(classes).where(classes.c.id.in_(chunk)))
+    return len(stale_ids), {class_code for _, class_code, *_ in stale}
+
+
+def preview_prune(
+    db: Session,
+    rows: Sequence[Tuple[int, Dict[str, Any]]],
+    session_limit: int = 200,
+) -> Dict[str, Any]:
+    """
+    Các buổi học mà import prune=True với ``rows`` sẽ xoá (kèm số đăng ký lớp bị
+    xoá theo), để admin xác nhận trước. Không ghi gì. ``can_prune`` False khi có
+    dòng lỗi hoặc không có dòng hợp lệ — import prune sẽ bị từ chối.
+    """
+    valid, errors = validate_class_rows(db, rows)
+    stale = _missing_sessions(db, {_session_key(mapping) for _, mapping in valid}) if valid and not errors else []
+
+    registers = ClassRegister.__table__
+    registrations = 0
+    for chunk in _chunks([class_pk for class_pk, *_ in stale], CLASS_IMPORT_IN_CHUNK):
+        registrations += db.execute(
+            select(func.count()).select_from(registers).where(registers.c.class_id.in_(chunk))
+        ).scalar_one()
+
+    return {
+        "total_rows": len(rows),
+        "failed": len(errors),
+        "errors": errors[:200],
+        "can_prune": bool(valid) and not errors,
+        "sessions_to_delete": len(stale),
+        "registrations_to_delete": registrations,
+        "sessions": [
+            {
+                "id": class_pk,
+                "class_id": class_code,
+                "class_name": class_name,
+                "study_date": study_date,
+                "study_time_start": start.strftime("%H:%M") if start else None,
+            }
+            for class_pk, class_code, study_date, start, class_name in stale[:session_limit]
+        ],
+    }
+
+
+def import_classes(
+    db: Session,
+    rows: Sequence[Tuple[int, Dict[str, Any]]],
+    prune: bool = False,
+    chunk_size: int = CLASS_IMPORT_CHUNK,
+) -> ClassImportResult:
+    """
+    Validate rồi upsert theo chunk. ``prune=True`` xoá các buổi học không có
+    trong lần import (kèm đăng ký lớp của chúng) — thay cho xoá sạch rồi tạo
+    lại, nên đăng ký của các lớp vẫn còn được giữ nguyên. Prune bị từ chối
+    (ClassImportError, không ghi gì) nếu có dòng lỗi hoặc không có dòng hợp lệ;
+    xem trước các buổi sẽ bị xoá bằng preview_prune(). Không commit.
+    """
+    result = ClassImportResult(total=len(rows))
+    valid, result.errors = validate_class_rows(db, rows)
+    if prune:
+        _check_prune(valid, result.errors)
+    if not valid:
+        return result
+
+    ensure_class_session_key(db)
+    stmt = _upsert_statement(db)
+    imported: Set[Tuple[str, str, time]] = set()
+
+    for chunk in _chunks([mapping for _, mapping in valid], chunk_size):
+        existing = _existing_keys(db, sorted({mapping["class_id"] for mapping in chunk}))
+        keys = [_session_key(mapping) for mapping in chunk]
+        updated = sum(1 for key in keys if key in existing)
+        db.execute(stmt, list(chunk))
+        result.updated += updated
+        result.inserted += len(chunk) - updated
+        imported.update(keys)
+        result.class_codes.update(key[0] for key in keys)
+
+    if prune:
+        result.deleted, stale_codes = _prune_missing(db, imported)
+        result.class_codes |= stale_codes
+    return result
+
+
+# ---------------- TEACHERS ----------------
+
+def update_teacher_names(db: Session, teachers_by_code: Dict[str, str]) -> Set[str]:
+    """
+    Gán giảng viên cho mọi buổi học của từng mã lớp: một SELECT tìm mã tồn tại
+    và một UPDATE ... CASE class_id cho mỗi chunk. Trả về các mã đã cập nhật.
+    Không commit.
+    """
+    classes = Class.__table__
+    found: Set[str] = set()
+    for chunk in _chunks(sorted(teachers_by_code), CLASS_IMPORT_IN_CHUNK):
+        codes = set(db.execute(select(classes.c.class_id).where(classes.c.class_id.in_(chunk)).distinct()).scalars())
+        if not codes:
+            continue
+        db.execute(
+            update(classes)
+            .where(classes.c.class_id.in_(sorted(codes)))
+            .values(teacher_name=case({code: teachers_by_code[code] for code in codes}, value=classes.c.class_id))
+        )
+        found |= codes
+    return found
@@ -22,6 +22,7 @@ from app.models.class_model import Class
 from app.models.subject_model import Subject
 from app.models.class_register_model import ClassRegister
 from app.services.constraint_extractor import ClassQueryConstraints, DaySessionConstraint
+from app.utils.schedule_occupancy import attach_occupancy
 
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -111,9 +112,9 @@ class ClassQueryService:
     AFTERNOON_START = dtime(12, 0)
     AFTERNOON_END   = dtime(20, 0)
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, fuzzy_matcher: Optional[object] = None):
         self.db = db
-        self._fuzzy: Optional[object] = None   # lazy init
+        self._fuzzy: Optional[object] = fuzzy_matcher   # None → lazy init theo engine của db
 
     # ── Public ────────────────────────────────────────────────────────────────
 
@@ -248,6 +249,9 @@ class ClassQueryService:
         # Apply hard time filters
         filtered = self._apply_hard_filters(raw_dicts, constraints)
 
+        # Encode each timetable once so the optimizer's conflict checks are bitset ANDs
+        attach_occupancy(filtered)
+
         # Group by subject_id
         grouped: Dict[str, List[Dict]] = {}
         for cls_dict in filtered:
@@ -261,8 +265,8 @@ class ClassQueryService:
     def _get_fuzzy(self):
         if self._fuzzy is None:
             try:
-                from app.services.fuzzy_matcher import FuzzyMatcher
-                self._fuzzy = FuzzyMatcher(self.db)
+                from app.services.fuzzy_matcher import get_fuzzy_matcher
+                self._fuzzy = get_fuzzy_matcher(self.db)
             except Exception as e:
                 print(f"⚠️ [ClassQueryService] FuzzyMatcher unavailable: {e}")
                 self._fuzzy = None
@@ -277,8 +281,8 @@ class ClassQueryService:
 
         fuzzy = self._get_fuzzy()
         if fuzzy:
-            for name in c.subject_names:
-                match = fuzzy.match_subject(name, db=self.db)
+            matches = fuzzy.match_subjects(c.subject_names, db=self.db) if c.subject_names else []
+            for name, match in zip(c.subject_names, matches):
                 if match:
                     print(f"🔍 [ClassQueryService] '{name}' → '{match.subject_id}' (score={match.score:.0f})")
                     if match.subject_id not in ids:
@@ -293,9 +297,8 @@ class ClassQueryService:
         """Resolve must-include subject names/codes to subject_ids."""
         ids = list(c.must_include_subject_codes)
         fuzzy = self._get_fuzzy()
-        if fuzzy:
-            for name in c.must_include_subject_names:
-                match = fuzzy.match_subject(name, db=self.db)
+        if fuzzy and c.must_include_subject_names:
+            for match in fuzzy.match_subjects(c.must_include_subject_names, db=self.db):
                 if match and match.subject_id not in ids:
                     ids.append(match.subject_id)
         return ids
@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import json
 import os
 from dataclasses import dataclass
 from typing import Any, Iterable, Mapping, Optional, TypedDict
@@ -11,6 +10,7 @@ from app.models.course_model import Course
 from app.models.learned_subject_model import LearnedSubject
 from app.models.student_model import Student
 from app.models.subject_model import Subject
+from app.utils.config_cache import load_json_config
 
 
 DEFAULT_COURSE_ID = "IT-E6"
@@ -75,6 +75,36 @@ def _passing_subject_ids_from_learned(learned_subjects: Iterable[LearnedSubject]
     return passed
 
 
+def _parse_elective_config(raw_config: Mapping[str, Any]) -> dict[str, list[ElectiveModule]]:
+    courses: dict[str, list[ElectiveModule]] = {}
+    for course in raw_config.get("courses", []):
+        course_id = _normalize_course_id(course.get("course_id"))
+        if not course_id:
+            continue
+
+        modules: list[ElectiveModule] = []
+        for module in course.get("modules", []):
+            module_id = str(module.get("module_id") or "").strip()
+            module_name = str(module.get("module_name") or module_id).strip()
+            subject_ids = tuple(
+                _normalize_subject_id(subject_id)
+                for subject_id in module.get("subject_ids", [])
+                if _normalize_subject_id(subject_id)
+            )
+            if module_id and subject_ids:
+                modules.append(
+                    ElectiveModule(
+                        module_id=module_id,
+                        module_name=module_name,
+                        subject_ids=subject_ids,
+                    )
+                )
+
+        if modules:
+            courses[course_id] = modules
+    return courses
+
+
 class ElectiveModuleService:
     """Config-backed elective module rules for graduation and suggestions."""
 
@@ -84,39 +114,10 @@ class ElectiveModuleService:
 
     def _load_config(self, config_path: str) -> dict[str, list[ElectiveModule]]:
         try:
-            with open(config_path, "r", encoding="utf-8") as f:
-                raw_config = json.load(f)
+            return load_json_config(config_path, transform=_parse_elective_config)
         except FileNotFoundError:
             return {}
 
-        courses: dict[str, list[ElectiveModule]] = {}
-        for course in raw_config.get("courses", []):
-            course_id = _normalize_course_id(course.get("course_id"))
-            if not course_id:
-                continue
-
-            modules: list[ElectiveModule] = []
-            for module in course.get("modules", []):
-                module_id = str(module.get("module_id") or "").strip()
-                module_name = str(module.get("module_name") or module_id).strip()
-                subject_ids = tuple(
-                    _normalize_subject_id(subject_id)
-                    for subject_id in module.get("subject_ids", [])
-                    if _normalize_subject_id(subject_id)
-                )
-                if module_id and subject_ids:
-                    modules.append(
-                        ElectiveModule(
-                            module_id=module_id,
-                            module_name=module_name,
-                            subject_ids=subject_ids,
-                        )
-                    )
-
-            if modules:
-                courses[course_id] = modules
-        return courses
-
     def get_modules_for_course(self, course_id: Optional[str]) -> list[ElectiveModule]:
         return list(self._courses.get(_normalize_course_id(course_id), []))
 
@@ -243,30 +244,39 @@ class ElectiveModuleService:
             passed_subject_ids = _passing_subject_ids_from_completed(completed_subjects)
         return self.analyze_progress(course_id, passed_subject_ids)
 
+    def elective_subject_ids(self, course_id: Optional[str]) -> set[str]:
+        return {subject_id for module in self.get_modules_for_course(course_id) for subject_id in module.subject_ids}
+
+    def excluded_subject_ids_for_cpa(
+        self,
+        course_id: Optional[str],
+        passed_subject_ids: Iterable[str],
+    ) -> Optional[set[str]]:
+        """Elective subjects outside the completed module; None while no module is completed."""
+        progress = self.analyze_progress(course_id, passed_subject_ids)
+        if not progress.get("completed_module"):
+            return None
+        return set(progress.get("elective_subject_ids", [])) - set(progress.get("target_subject_ids", []))
+
     def recognized_subject_ids_for_cpa(
         self,
         course_id: Optional[str],
         learned_subjects: Iterable[LearnedSubject],
     ) -> Optional[set[str]]:
         learned_list = list(learned_subjects)
-        progress = self.analyze_progress(
+        excluded = self.excluded_subject_ids_for_cpa(
             course_id,
             _passing_subject_ids_from_learned(learned_list),
         )
-        if not progress.get("completed_module"):
+        if excluded is None:
             return None
 
-        elective_subject_ids = set(progress.get("elective_subject_ids", []))
-        target_subject_ids = set(progress.get("target_subject_ids", []))
         recognized: set[str] = set()
         for learned in learned_list:
             subject = getattr(learned, "subject", None)
             subject_id = _normalize_subject_id(getattr(subject, "subject_id", None))
-            if not subject_id:
-                continue
-            if subject_id in elective_subject_ids and subject_id not in target_subject_ids:
-                continue
-            recognized.add(subject_id)
+            if subject_id and subject_id not in excluded:
+                recognized.add(subject_id)
         return recognized
 
     def filter_subjects_for_target_module(
@@ -6,14 +6,26 @@ Features:
 - Bỏ dấu tiếng Việt trước khi so sánh (giải tích == giai tich)
 - Ngưỡng tự động map: score >= AUTO_MAP_THRESHOLD
 - Dưới ngưỡng: trả về top-k candidates để hỏi lại
-- Cache danh sách từ DB, refresh theo TTL
+- Cache danh sách từ DB, refresh theo TTL; một snapshot dùng chung cho cả process
+  (get_fuzzy_matcher), cập nhật incremental khi CRUD môn/lớp và đồng bộ giữa các
+  worker qua change counter trong Redis + probe count/max(id) trên DB
+- Inverted index trigram/token (build trong refresh_cache) lọc trước candidates
+  khi catalogue lớn, rồi mới chấm điểm WRatio bằng rapidfuzz
 """
 import unicodedata
 import re
+import threading
+import time
+import logging
+import weakref
 from typing import List, Optional, Tuple, Dict, Set
 from datetime import datetime, timedelta
 from dataclasses import dataclass
 
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
 
 # ============================================================
 # Thresholds
@@ -24,6 +36,21 @@ TOP_K = 3                 # số candidates trả về khi dưới ngưỡng
 CACHE_TTL_MINUTES = 30    # thời gian cache danh sách môn/lớp
 COURSE_PREFERENCE_MAX_SCORE_GAP = 5.0
 
+# Prefilter: catalogue nhỏ hơn PREFILTER_MIN_ENTRIES thì quét toàn bộ như cũ
+# (ranking chính xác tuyệt đối); lớn hơn thì chỉ chấm WRatio cho tối đa
+# PREFILTER_MAX_CANDIDATES tên chia sẻ nhiều trigram/token nhất với query.
+NGRAM_SIZE = 3
+PREFILTER_MIN_ENTRIES = 500
+PREFILTER_MAX_CANDIDATES = 300
+EXTRACT_LIMIT = 10
+
+# Đồng bộ snapshot dùng chung giữa các worker
+CACHE_PROBE_INTERVAL_SECONDS = 5   # probe staleness tối đa 1 lần / 5s
+CHANGE_COUNTER_KEY = "fuzzy_matcher:catalogue_version"
+CHANGE_ENTRY_KEY = "fuzzy_matcher:catalogue_change:{}"
+CHANGE_ENTRY_TTL_SECONDS = 24 * 3600
+MAX_REPLAY_CHANGES = 200           # lệch nhiều hơn thì load lại toàn bộ
+
 
 @dataclass
 class FuzzyMatch:
@@ -45,6 +72,111 @@ class FuzzyClassMatch:
     auto_mapped: bool
 
 
+class _NgramIndex:
+    """
+    Inverted index: trigram (có padding) và token → mảng index các tên chứa nó.
+
+    Dùng để thu hẹp danh sách tên trước khi chấm WRatio. candidates() xếp hạng
+    theo số gram chung với query (hòa thì index nhỏ trước, như rapidfuzz) và
+    trả về index đã sort tăng dần, nên thứ tự tie-break của process.extract
+    trên tập con giống hệt khi chạy trên toàn bộ danh sách.
+    """
+
+    def __init__(self, names: List[str]):
+        self.size = len(names)
+        postings: Dict[str, List[int]] = {}
+        for idx, name in enumerate(names):
+            for gram in self.grams(name):
+                postings.setdefault(gram, []).append(idx)
+        self._postings = {gram: np.asarray(ids, dtype=np.intp) for gram, ids in postings.items()}
+
+    @staticmethod
+    def grams(text: str) -> Set[str]:
+        padded = f" {text} "
+        grams = {padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+        grams.update(f"#{token}" for token in text.split())
+        return grams
+
+    def candidates(
+        self,
+        query: str,
+        limit: int = PREFILTER_MAX_CANDIDATES,
+        within: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Index (tăng dần) của tối đa ``limit`` tên gần query nhất, trong ``within`` nếu có"""
+        query_grams = self.grams(query)
+        lists = [self._postings[gram] for gram in query_grams if gram in self._postings]
+        if not lists:
+            return np.empty(0, dtype=np.intp)
+
+        shared = np.bincount(np.concatenate(lists), minlength=self.size)
+        hits = np.flatnonzero(shared) if within is None else within[shared[within] > 0]
+        if len(hits) > limit:
+            # Ties keep the lowest indices, same as process.extract on the full list
+            order = np.lexsort((hits, -shared[hits]))[:limit]
+            hits = np.sort(hits[order])
+        return hits
+
+
+def _group_by_course(course_sets) -> Dict[int, np.ndarray]:
+    grouped: Dict[int, List[int]] = {}
+    for idx, course_ids in enumerate(course_sets):
+        for course_id in course_ids:
+            grouped.setdefault(course_id, []).append(idx)
+    return {course_id: np.asarray(ids, dtype=np.intp) for course_id, ids in grouped.items()}
+
+
+@dataclass(frozen=True)
+class _SubjectCatalogue:
+    """Danh sách môn + các list song song + index, build xong mới publish (không sửa tại chỗ)"""
+    entries: List[Tuple[str, str, Set[int]]]     # [(subject_id, subject_name, {course_ids})]
+    norm: List[Tuple[str, str]]                  # [(subject_id, normalized_name)]
+    names: List[str]
+    ids: List[str]
+    course_index: Dict[int, np.ndarray]          # course_id → subject indices
+    index: Optional[_NgramIndex]
+
+    @classmethod
+    def build(cls, entries: List[Tuple[str, str, Set[int]]], normalize) -> "_SubjectCatalogue":
+        norm = [(sid, normalize(name)) for sid, name, _ in entries]
+        names = [name for _, name in norm]
+        return cls(
+            entries=entries,
+            norm=norm,
+            names=names,
+            ids=[sid for sid, _, _ in entries],
+            course_index=_group_by_course(courses for _, _, courses in entries),
+            index=_NgramIndex(names) if len(names) >= PREFILTER_MIN_ENTRIES else None,
+        )
+
+
+@dataclass(frozen=True)
+class _ClassCatalogue:
+    entries: List[Dict]                          # list of class dicts
+    norm: List[Tuple[str, Dict]]                 # [(normalized_name, class_dict)]
+    names: List[str]
+    course_index: Dict[int, np.ndarray]          # course_id → class indices
+    index: Optional[_NgramIndex]
+
+    @classmethod
+    def build(cls, entries: List[Dict], normalize) -> "_ClassCatalogue":
+        norm = [(normalize(cd["class_name"]), cd) for cd in entries]
+        names = [name for name, _ in norm]
+        return cls(
+            entries=entries,
+            norm=norm,
+            names=names,
+            course_index=_group_by_course(cd.get("course_ids", set()) for cd in entries),
+            index=_NgramIndex(names) if len(names) >= PREFILTER_MIN_ENTRIES else None,
+        )
+
+
+@dataclass(frozen=True)
+class _CatalogueSnapshot:
+    subjects: _SubjectCatalogue
+    classes: _ClassCatalogue
+
+
 class FuzzyMatcher:
     """
     Fuzzy Matching cho subjects và classes.
@@ -68,13 +200,21 @@ class FuzzyMatcher:
             db: SQLAlchemy Session (optional)
                 Nếu None, cache sẽ trống cho đến khi gọi refresh_cache(db)
         """
-        # Cache
-        self._subjects: List[Tuple[str, str, Set[int]]] = []      # [(subject_id, subject_name, {course_ids})]
-        self._subjects_norm: List[Tuple[str, str]] = []  # [(subject_id, normalized_name)]
-        self._classes: List[Dict] = []                   # list of class dicts
-        self._classes_norm: List[Tuple[str, Dict]] = [] # [(normalized_name, class_dict)]
+        # Cache: một snapshot bất biến (list môn/lớp, list song song, index), thay
+        # bằng một phép gán duy nhất; hàm đọc lấy self._catalogue một lần mỗi lần gọi
+        self._catalogue = _CatalogueSnapshot(
+            subjects=_SubjectCatalogue.build([], self._normalize),
+            classes=_ClassCatalogue.build([], self._normalize),
+        )
         self._last_refresh: Optional[datetime] = None
 
+        # Version stamp + trạng thái đồng bộ (xem ensure_fresh / sync)
+        self.version = 0                            # tăng mỗi lần cache thay đổi
+        self._signature: Optional[Tuple] = None     # (count, max id) subjects/classes/course_subjects
+        self._seen_change: Optional[int] = None     # change counter Redis đã áp dụng
+        self._last_probe = 0.0
+        self._lock = threading.RLock()
+
         if db is not None:
             self.refresh_cache(db)
 
@@ -83,68 +223,228 @@ class FuzzyMatcher:
     # ----------------------------------------------------------
 
     def refresh_cache(self, db) -> None:
-        """Load lại danh sách subjects và classes từ DB"""
-        try:
-            from app.models.subject_model import Subject
-            from app.models.class_model import Class
-            from app.models.course_subject_model import CourseSubject
-            from sqlalchemy.orm import joinedload
-
-            # Load subjects with relation to course_subjects
-            sq = (
-                db.query(Subject.subject_id, Subject.subject_name, CourseSubject.course_id)
-                .outerjoin(CourseSubject, Subject.id == CourseSubject.subject_id)
-                .all()
-            )
-            
-            subj_dict = {}
-            for sid, sname, cid in sq:
-                if sid not in subj_dict:
-                    subj_dict[sid] = {"name": sname or '', "courses": set()}
-                if cid is not None:
-                    subj_dict[sid]["courses"].add(cid)
-                    
-            self._subjects = []
-            for sid, data in subj_dict.items():
-                self._subjects.append((sid, data["name"], data["courses"]))
-                
-            self._subjects_norm = [
-                (sid, self._normalize(data["name"]))
-                for sid, data in subj_dict.items()
-            ]
-
-            # Load classes with subject_name and course_ids join
-            classes_rows = (
-                db.query(Class, Subject.subject_id, Subject.subject_name, CourseSubject.course_id)
+        """Load lại toàn bộ danh sách subjects và classes từ DB"""
+        with self._lock:
+            try:
+                # Đọc mốc đồng bộ trước khi load: thay đổi xảy ra trong lúc load
+                # sẽ bị probe lần sau bắt được
+                seen_change = _read_change_counter()
+                signature = self._catalogue_signature(db)
+
+                subjects = self._collect_subjects(self._subject_query(db).all())
+                classes = self._collect_classes(self._class_query(db).all())
+                self._publish(list(subjects.values()), list(classes.values()))
+                self._last_refresh = datetime.now()
+                self._seen_change = seen_change
+                self._signature = signature
+                self._last_probe = time.monotonic()
+                self.version += 1
+                logger.info("[FuzzyMatcher] Cache refreshed: %d subjects, %d classes", self.subject_count, self.class_count)
+
+            except Exception as e:
+                logger.warning("[FuzzyMatcher] Failed to load cache: %s", e)
+
+    @staticmethod
+    def _subject_query(db):
+        """(subject_id, subject_name, course_id) — outer join course_subjects"""
+        from app.models.subject_model import Subject
+        from app.models.course_subject_model import CourseSubject
+
+        return (
+            db.query(Subject.subject_id, Subject.subject_name, CourseSubject.course_id)
+            .outerjoin(CourseSubject, Subject.id == CourseSubject.subject_id)
+        )
+
+    @staticmethod
+    def _class_query(db):
+        """(Class, subject code, subject name, course_id) — join subject, outer join course_subjects"""
+        from app.models.subject_model import Subject
+        from app.models.class_model import Class
+        from app.models.course_subject_model import CourseSubject
+
+        return (
+            db.query(Class, Subject.subject_id, Subject.subject_name, CourseSubject.course_id)
+            .join(Subject, Class.subject_id == Subject.id)
+            .outerjoin(CourseSubject, Subject.id == CourseSubject.subject_id)
+        )
+
+    @staticmethod
+    def _collect_subjects(rows) -> Dict[str, Tuple[str, str, Set[int]]]:
+        """Gộp các dòng join theo subject_id → (subject_id, subject_name, {course_ids})"""
+        subj_dict = {}
+        for sid, sname, cid in rows:
+            if sid not in subj_dict:
+                subj_dict[sid] = (sid, sname or '', set())
+            if cid is not None:
+                subj_dict[sid][2].add(cid)
+        return subj_dict
+
+    @staticmethod
+    def _collect_classes(rows) -> Dict[str, Dict]:
+        """Gộp các dòng join theo class_id (mã lớp), giữ dòng đầu tiên"""
+        cls_dict = {}
+        for cls, subj_code, subj_name, course_id in rows:
+            if cls.class_id not in cls_dict:
+                cls_dict[cls.class_id] = {
+                    "class_id": cls.class_id,
+                    "class_name": cls.class_name or '',
+                    "subject_id": subj_code,
+                    "subject_name": subj_name or '',
+                    "course_ids": set()
+                }
+            if course_id is not None:
+                cls_dict[cls.class_id]["course_ids"].add(course_id)
+        return cls_dict
+
+    def _publish(
+        self,
+        subjects: Optional[List[Tuple[str, str, Set[int]]]] = None,
+        classes: Optional[List[Dict]] = None,
+    ) -> None:
+        """Build list song song + index cho phần thay đổi rồi publish bằng một phép gán"""
+        current = self._catalogue
+        self._catalogue = _CatalogueSnapshot(
+            subjects=_SubjectCatalogue.build(subjects, self._normalize) if subjects is not None else current.subjects,
+            classes=_ClassCatalogue.build(classes, self._normalize) if classes is not None else current.classes,
+        )
+
+    # Read-only views of the current snapshot
+    @property
+    def _subjects(self) -> List[Tuple[str, str, Set[int]]]:
+        return self._catalogue.subjects.entries
+
+    @property
+    def _subject_ids(self) -> List[str]:
+        return self._catalogue.subjects.ids
+
+    @property
+    def _subject_names(self) -> List[str]:
+        return self._catalogue.subjects.names
+
+    @property
+    def _subject_course_index(self) -> Dict[int, np.ndarray]:
+        return self._catalogue.subjects.course_index
+
+    @property
+    def _subject_index(self) -> Optional[_NgramIndex]:
+        return self._catalogue.subjects.index
+
+    @property
+    def _classes(self) -> List[Dict]:
+        return self._catalogue.classes.entries
+
+    @property
+    def _class_names(self) -> List[str]:
+        return self._catalogue.classes.names
+
+    @property
+    def _class_index(self) -> Optional[_NgramIndex]:
+        return self._catalogue.classes.index
+
+    @staticmethod
+    def _catalogue_signature(db) -> Tuple:
+        """Probe rẻ: (count, max id) của subjects, classes, course_subjects"""
+        from sqlalchemy import func
+        from app.models.subject_model import Subject
+        from app.models.class_model import Class
+        from app.models.course_subject_model import CourseSubject
+
+        return tuple(
+            tuple(db.query(func.count(model.id), func.max(model.id)).one())
+            for model in (Subject, Class, CourseSubject)
+        )
+
+    # ----------------------------------------------------------
+    # Incremental updates
+    # ----------------------------------------------------------
+
+    def apply_change(self, db, kind: str, codes: List[str], change_number: Optional[int] = None) -> None:
+        """
+        Áp dụng một thay đổi catalogue đã commit vào cache, không load lại toàn bộ.
+
+        Args:
+            kind: "subject" (mã môn), "class" (mã lớp) hoặc "reset" (load lại toàn bộ)
+            codes: các mã bị thêm / sửa / xóa; trạng thái mới được đọc lại từ DB
+            change_number: số thứ tự change trong Redis (nếu đã publish)
+        """
+        with self._lock:
+            if self._last_refresh is None:
+                return  # chưa load, lần dùng đầu tiên sẽ load toàn bộ
+            try:
+                if kind == "reset":
+                    self.refresh_cache(db)
+                    return
+                self._apply(db, kind, codes)
+                if change_number is not None and self._seen_change == change_number - 1:
+                    self._seen_change = change_number
+                self._mark_changed(db)
+            except Exception as e:
+                logger.warning("[FuzzyMatcher] Incremental update failed (%s %s): %s, reloading", kind, codes, e)
+                self.refresh_cache(db)
+
+    def _apply(self, db, kind: str, codes: List[str]) -> None:
+        codes = {code for code in codes if code}
+        if not codes:
+            return
+        if kind == "subject":
+            subjects, class_codes = self._reload_subjects(db, codes)
+            self._publish(subjects, self._reload_classes(db, class_codes) if class_codes else None)
+        elif kind == "class":
+            self._publish(classes=self._reload_classes(db, codes))
+        else:
+            raise ValueError(f"Unknown catalogue change kind: {kind}")
+
+    def _reload_subjects(self, db, subject_codes: Set[str]) -> Tuple[List[Tuple[str, str, Set[int]]], Set[str]]:
+        """
+        Đọc lại các môn theo mã → (danh sách môn mới, mã các lớp thuộc môn cần đọc lại
+        vì subject_name của lớp đi theo môn)
+        """
+        from app.models.subject_model import Subject
+        from app.models.class_model import Class
+
+        fresh = self._collect_subjects(
+            self._subject_query(db).filter(Subject.subject_id.in_(subject_codes)).all()
+        )
+        subjects = self._merge_entries(self._subjects, fresh, subject_codes, lambda s: s[0])
+
+        class_codes = {cd["class_id"] for cd in self._classes if cd["subject_id"] in subject_codes}
+        class_codes.update(
+            code for (code,) in (
+                db.query(Class.class_id)
                 .join(Subject, Class.subject_id == Subject.id)
-                .outerjoin(CourseSubject, Subject.id == CourseSubject.subject_id)
+                .filter(Subject.subject_id.in_(subject_codes))
                 .all()
             )
-            
-            cls_dict = {}
-            for cls, subj_code, subj_name, course_id in classes_rows:
-                if cls.class_id not in cls_dict:
-                    cls_dict[cls.class_id] = {
-                        "class_id": cls.class_id,
-                        "class_name": cls.class_name or '',
-                        "subject_id": subj_code,
-                        "subject_name": subj_name or '',
-                        "course_ids": set()
-                    }
-                if course_id is not None:
-                    cls_dict[cls.class_id]["course_ids"].add(course_id)
-
-            self._classes = list(cls_dict.values())
-            self._classes_norm = []
-            for cd in self._classes:
-                norm_name = self._normalize(cd["class_name"])
-                self._classes_norm.append((norm_name, cd))
-
-            self._last_refresh = datetime.now()
-            print(f"✅ [FuzzyMatcher] Cache refreshed: {len(self._subjects)} subjects, {len(self._classes)} classes")
-
-        except Exception as e:
-            print(f"⚠️ [FuzzyMatcher] Failed to load cache: {e}")
+        )
+        class_codes.discard(None)
+        return subjects, class_codes
+
+    def _reload_classes(self, db, class_codes: Set[str]) -> List[Dict]:
+        from app.models.class_model import Class
+
+        fresh = self._collect_classes(
+            self._class_query(db).filter(Class.class_id.in_(class_codes)).all()
+        )
+        return self._merge_entries(self._classes, fresh, class_codes, lambda cd: cd["class_id"])
+
+    @staticmethod
+    def _merge_entries(current: List, fresh: Dict, codes: Set[str], key) -> List:
+        """Thay entry tại chỗ (giữ thứ tự cache), bỏ entry đã bị xóa, thêm entry mới vào cuối"""
+        fresh = dict(fresh)
+        merged = []
+        for entry in current:
+            code = key(entry)
+            if code not in codes:
+                merged.append(entry)
+            elif code in fresh:
+                merged.append(fresh.pop(code))
+        merged.extend(fresh.values())
+        return merged
+
+    def _mark_changed(self, db) -> None:
+        self._signature = self._catalogue_signature(db)
+        self._last_probe = time.monotonic()
+        self.version += 1
 
     def _is_cache_stale(self) -> bool:
         if self._last_refresh is None:
@@ -152,9 +452,58 @@ class FuzzyMatcher:
         return datetime.now() - self._last_refresh > timedelta(minutes=CACHE_TTL_MINUTES)
 
     def ensure_fresh(self, db) -> None:
-        """Tự động refresh cache nếu hết TTL"""
-        if self._is_cache_stale() and db is not None:
-            self.refresh_cache(db)
+        """
+        Tự động refresh cache nếu hết TTL; ngoài ra cứ CACHE_PROBE_INTERVAL_SECONDS
+        thì probe (change counter Redis + count/max id) để bắt thay đổi từ worker khác
+        """
+        if db is None:
+            return
+        if self._is_cache_stale():
+            with self._lock:
+                if self._is_cache_stale():
+                    self.refresh_cache(db)
+            return
+        if time.monotonic() - self._last_probe >= CACHE_PROBE_INTERVAL_SECONDS:
+            self.sync(db)
+
+    def sync(self, db) -> None:
+        """
+        Đồng bộ với catalogue hiện tại:
+        1. Change counter Redis đổi → replay các change (incremental);
+           thiếu change / lệch quá MAX_REPLAY_CHANGES → load lại toàn bộ
+        2. (count, max id) trên DB khác lúc sync trước → load lại toàn bộ
+           (bắt thay đổi không đi qua route CRUD hoặc khi Redis không có)
+        """
+        with self._lock:
+            self._last_probe = time.monotonic()
+            try:
+                change_counter = _read_change_counter()
+                if change_counter is not None and change_counter != self._seen_change:
+                    if not self._replay_changes(db, change_counter):
+                        self.refresh_cache(db)
+                        return
+                if self._catalogue_signature(db) != self._signature:
+                    self.refresh_cache(db)
+            except Exception as e:
+                logger.warning("[FuzzyMatcher] Staleness probe failed: %s", e)
+
+    def _replay_changes(self, db, change_counter: int) -> bool:
+        if self._seen_change is None or not 0 < change_counter - self._seen_change <= MAX_REPLAY_CHANGES:
+            return False
+        change_log = _change_log()
+        if change_log is None:
+            return False
+
+        for number in range(self._seen_change + 1, change_counter + 1):
+            change = change_log.get(CHANGE_ENTRY_KEY.format(number))
+            if not isinstance(change, dict) or change.get("kind") not in ("subject", "class"):
+                return False
+            self._apply(db, change["kind"], change.get("codes", []))
+
+        self._seen_change = change_counter
+        self._mark_changed(db)
+        logger.info("[FuzzyMatcher] Replayed catalogue changes up to #%s", change_counter)
+        return True
 
     # ----------------------------------------------------------
     # Normalization
@@ -214,6 +563,91 @@ class FuzzyMatcher:
 
         return text
 
+    # ----------------------------------------------------------
+    # Candidate scoping
+    # ----------------------------------------------------------
+
+    @staticmethod
+    def _prefilter(index: Optional[_NgramIndex], normalized_query: str) -> Optional[np.ndarray]:
+        """Index các tên cần chấm điểm; None = quét toàn bộ danh sách"""
+        if index is None:
+            return None
+        return index.candidates(normalized_query)
+
+    @staticmethod
+    def _course_scope(course_index: Dict[int, np.ndarray], preferred_course_id: Optional[int]) -> np.ndarray:
+        """Index (tăng dần) các mục thuộc khóa học ưu tiên"""
+        if preferred_course_id is None:
+            return np.empty(0, dtype=np.intp)
+        return course_index.get(preferred_course_id, np.empty(0, dtype=np.intp))
+
+    def _extract_in_course(
+        self,
+        normalized_query: str,
+        choices: List[str],
+        course_index: Dict[int, np.ndarray],
+        index: Optional[_NgramIndex],
+        preferred_course_id: Optional[int],
+    ) -> List[Tuple[str, float, int]]:
+        """process.extract trong khóa học ưu tiên; khóa học lớn cũng đi qua prefilter"""
+        indices = self._course_scope(course_index, preferred_course_id)
+        if not len(indices):
+            return []
+        if index is not None and len(indices) >= PREFILTER_MIN_ENTRIES:
+            results = self._extract(normalized_query, choices, index.candidates(normalized_query, within=indices))
+            if results:
+                return results
+        return self._extract(normalized_query, choices, indices)
+
+    @staticmethod
+    def _extract(
+        normalized_query: str,
+        choices: List[str],
+        indices: Optional[np.ndarray] = None,
+        limit: int = EXTRACT_LIMIT,
+    ) -> List[Tuple[str, float, int]]:
+        """
+        process.extract (WRatio) trên choices[indices], trả về index gốc.
+        indices phải tăng dần để tie-break giống khi chạy trên toàn bộ list.
+        """
+        from rapidfuzz import process, fuzz
+
+        if indices is None:
+            return process.extract(
+                normalized_query,
+                choices,
+                scorer=fuzz.WRatio,
+                limit=limit,
+                score_cutoff=SUGGEST_THRESHOLD,
+            )
+        scoped_results = process.extract(
+            normalized_query,
+            [choices[idx] for idx in indices],
+            scorer=fuzz.WRatio,
+            limit=limit,
+            score_cutoff=SUGGEST_THRESHOLD,
+        )
+        return [
+            (matched, score, int(indices[local_idx]))
+            for matched, score, local_idx in scoped_results
+        ]
+
+    @staticmethod
+    def _top_from_scores(
+        scores: np.ndarray,
+        columns: np.ndarray,
+        allowed: np.ndarray,
+        choices: List[str],
+        limit: int = EXTRACT_LIMIT,
+    ) -> List[Tuple[str, float, int]]:
+        """Top-k từ một hàng của cdist, cùng thứ tự với process.extract"""
+        selected = np.flatnonzero(allowed & (scores >= SUGGEST_THRESHOLD))
+        order = np.lexsort((columns[selected], -scores[selected]))[:limit]
+        return [
+            (choices[columns[selected[o]]], float(scores[selected[o]]), int(columns[selected[o]]))
+            for o in order
+        ]
+
     # ----------------------------------------------------------
     # Subject matching
     # ----------------------------------------------------------
@@ -247,86 +681,146 @@ class FuzzyMatcher:
 
         if db is not None:
             self.ensure_fresh(db)
+        subjects = self._catalogue.subjects
 
-        if not self._subjects_norm:
+        if not subjects.norm:
             return None
 
         try:
-            from rapidfuzz import process, fuzz
-
             normalized_query = self._normalize(query)
-            # Danh sách tên đã normalize để so sánh
-            name_list = [name for _, name in self._subjects_norm]
-            id_list = [sid for sid, _ in self._subjects_norm]
-
-            def extract_for_indices(indices: List[int]):
-                scoped_names = [name_list[idx] for idx in indices]
-                scoped_results = process.extract(
-                    normalized_query,
-                    scoped_names,
-                    scorer=fuzz.WRatio,
-                    limit=10,
-                    score_cutoff=SUGGEST_THRESHOLD,
-                )
-                return [
-                    (matched_name, score, indices[local_idx])
-                    for matched_name, score, local_idx in scoped_results
-                ]
-
-            all_indices = list(range(len(name_list)))
-            course_indices = [
-                idx for idx in all_indices
-                if preferred_course_id is not None and preferred_course_id in self._subjects[idx][2]
-            ]
-            course_candidates = extract_for_indices(course_indices) if course_indices else []
-            global_candidates = extract_for_indices(all_indices)
-            candidates = global_candidates
-            if course_candidates:
-                best_course_score = max(item[1] for item in course_candidates)
-                best_global_score = max(item[1] for item in global_candidates) if global_candidates else -1
-                if best_course_score >= best_global_score - COURSE_PREFERENCE_MAX_SCORE_GAP:
-                    candidates = course_candidates
-            if not candidates:
-                return None
+            scope = self._prefilter(subjects.index, normalized_query)
+            global_candidates = self._extract(normalized_query, subjects.names, scope)
+            if scope is not None and not global_candidates:
+                # Prefilter không giữ được tên nào đạt ngưỡng → quét toàn bộ
+                global_candidates = self._extract(normalized_query, subjects.names)
+            course_candidates = self._extract_in_course(
+                normalized_query, subjects.names, subjects.course_index,
+                subjects.index, preferred_course_id,
+            )
+            return self._pick_subject_match(subjects, course_candidates, global_candidates, threshold, preferred_course_id)
 
-            best_match = None
-            best_score = -1
+        except ImportError:
+            logger.warning("[FuzzyMatcher] rapidfuzz not installed, falling back to None")
+            return None
+        except Exception as e:
+            logger.warning("[FuzzyMatcher] match_subject error: %s", e)
+            return None
 
-            for matched_name, score, idx in candidates:
-                course_ids = self._subjects[idx][2]
-                
-                adjusted_score = score
-                if preferred_course_id is not None and preferred_course_id in course_ids:
-                    # Let score go above 100 temporarily to break ties definitively
-                    adjusted_score = score + 10
-                
-                if adjusted_score > best_score:
-                    best_score = adjusted_score
-                    best_match = (matched_name, score, idx) # Store original score for final result
+    def match_subjects(
+        self,
+        queries: List[str],
+        db=None,
+        threshold: int = AUTO_MAP_THRESHOLD,
+        preferred_course_id: Optional[int] = None
+    ) -> List[Optional[FuzzyMatch]]:
+        """
+        match_subject cho nhiều query cùng lúc.
 
-            if best_match is None:
-                return None
+        Khi quét toàn bộ (catalogue nhỏ hơn PREFILTER_MIN_ENTRIES), chấm WRatio
+        cho tất cả query bằng một lần rapidfuzz.process.cdist (đa luồng); khi
+        có n-gram index thì mỗi query chỉ chấm vài trăm candidate nên gọi
+        match_subject từng query. Kết quả giống hệt gọi match_subject từng query.
 
-            matched_name, original_score, idx = best_match
-            # Clamp final score
-            final_score = min(original_score + 10 if preferred_course_id is not None and preferred_course_id in self._subjects[idx][2] else original_score, 100)
-            subject_id = id_list[idx]
-            original_name = self._subjects[idx][1]
+        Ví dụ:
+            match_subjects(["giai tich 1", "cau truc du lieu"])
+            → [FuzzyMatch(subject_id="MI1114", ...), FuzzyMatch(subject_id="IT3011", ...)]
+        """
+        results: List[Optional[FuzzyMatch]] = [None] * len(queries)
+        if db is not None:
+            self.ensure_fresh(db)
+        subjects = self._catalogue.subjects
+        if not subjects.norm:
+            return results
 
-            return FuzzyMatch(
-                subject_id=subject_id,
-                subject_name=original_name,
-                score=final_score,
-                auto_mapped=final_score >= threshold
+        try:
+            from rapidfuzz import process, fuzz
+
+            active = [i for i, query in enumerate(queries) if query and query.strip()]
+            if subjects.index is not None:
+                for i in active:
+                    results[i] = self.match_subject(queries[i], threshold=threshold, preferred_course_id=preferred_course_id)
+                return results
+            if not active:
+                return results
+
+            scores = process.cdist(
+                [self._normalize(queries[i]) for i in active],
+                subjects.names,
+                scorer=fuzz.WRatio,
+                score_cutoff=SUGGEST_THRESHOLD,
+                dtype=np.float64,
+                workers=-1,
             )
 
+            columns = np.arange(len(subjects.names))
+            everything = np.ones(len(columns), dtype=bool)
+            in_course = np.zeros(len(columns), dtype=bool)
+            in_course[self._course_scope(subjects.course_index, preferred_course_id)] = True
+            for row, i in enumerate(active):
+                global_candidates = self._top_from_scores(scores[row], columns, everything, subjects.names)
+                course_candidates = (
+                    self._top_from_scores(scores[row], columns, in_course, subjects.names)
+                    if in_course.any() else []
+                )
+                results[i] = self._pick_subject_match(subjects, course_candidates, global_candidates, threshold, preferred_course_id)
+            return results
+
         except ImportError:
-            print("⚠️ [FuzzyMatcher] rapidfuzz not installed, falling back to None")
-            return None
+            logger.warning("[FuzzyMatcher] rapidfuzz not installed, falling back to None")
+            return results
         except Exception as e:
-            print(f"⚠️ [FuzzyMatcher] match_subject error: {e}")
+            logger.warning("[FuzzyMatcher] match_subjects error: %s", e)
+            return results
+
+    def _pick_subject_match(
+        self,
+        subjects: _SubjectCatalogue,
+        course_candidates: List[Tuple[str, float, int]],
+        global_candidates: List[Tuple[str, float, int]],
+        threshold: int,
+        preferred_course_id: Optional[int],
+    ) -> Optional[FuzzyMatch]:
+        """Chọn match tốt nhất, ưu tiên môn trong khóa học nếu điểm không kém quá xa"""
+        candidates = global_candidates
+        if course_candidates:
+            best_course_score = max(item[1] for item in course_candidates)
+            best_global_score = max(item[1] for item in global_candidates) if global_candidates else -1
+            if best_course_score >= best_global_score - COURSE_PREFERENCE_MAX_SCORE_GAP:
+                candidates = course_candidates
+        if not candidates:
+            return None
+
+        best_match = None
+        best_score = -1
+
+        for matched_name, score, idx in candidates:
+            course_ids = subjects.entries[idx][2]
+            
+            adjusted_score = score
+            if preferred_course_id is not None and preferred_course_id in course_ids:
+                # Let score go above 100 temporarily to break ties definitively
+                adjusted_score = score + 10
+            
+            if adjusted_score > best_score:
+                best_score = adjusted_score
+                best_match = (matched_name, score, idx) # Store original score for final result
+
+        if best_match is None:
             return None
 
+        matched_name, original_score, idx = best_match
+        # Clamp final score
+        final_score = min(original_score + 10 if preferred_course_id is not None and preferred_course_id in subjects.entries[idx][2] else original_score, 100)
+        subject_id = subjects.ids[idx]
+        original_name = subjects.entries[idx][1]
+
+        return FuzzyMatch(
+            subject_id=subject_id,
+            subject_name=original_name,
+            score=final_score,
+            auto_mapped=final_score >= threshold
+        )
+
     def get_subject_candidates(
         self,
         query: str,
@@ -350,28 +844,23 @@ class FuzzyMatcher:
 
         if db is not None:
             self.ensure_fresh(db)
+        subjects = self._catalogue.subjects
 
-        if not self._subjects_norm:
+        if not subjects.norm:
             return []
 
         try:
-            from rapidfuzz import process, fuzz
-
             normalized_query = self._normalize(query)
-            name_list = [name for _, name in self._subjects_norm]
-
-            results = process.extract(
-                normalized_query,
-                name_list,
-                scorer=fuzz.WRatio,
-                limit=max(top_k * 5, top_k),
-                score_cutoff=SUGGEST_THRESHOLD
-            )
+            limit = max(top_k * 5, top_k)
+            scope = self._prefilter(subjects.index, normalized_query)
+            results = self._extract(normalized_query, subjects.names, scope, limit=limit)
+            if scope is not None and not results:
+                results = self._extract(normalized_query, subjects.names, limit=limit)
 
             if preferred_course_id is not None:
                 in_course_results = []
                 for matched_name, score, idx in results:
-                    course_ids = self._subjects[idx][2]
+                    course_ids = subjects.entries[idx][2]
                     if preferred_course_id in course_ids:
                         in_course_results.append((matched_name, score, idx))
                 selected_results = in_course_results if in_course_results else results
@@ -380,8 +869,8 @@ class FuzzyMatcher:
 
             candidates = []
             for matched_name, score, idx in selected_results[:top_k]:
-                subject_id = self._subjects_norm[idx][0]
-                original_name = self._subjects[idx][1]
+                subject_id = subjects.ids[idx]
+                original_name = subjects.entries[idx][1]
                 candidates.append(FuzzyMatch(
                     subject_id=subject_id,
                     subject_name=original_name,
@@ -394,7 +883,7 @@ class FuzzyMatcher:
         except ImportError:
             return []
         except Exception as e:
-            print(f"⚠️ [FuzzyMatcher] get_subject_candidates error: {e}")
+            logger.warning("[FuzzyMatcher] get_subject_candidates error: %s", e)
             return []
 
     def match_subject_by_id(self, subject_id_query: str, db=None, preferred_course_id: Optional[int] = None) -> Optional[FuzzyMatch]:
@@ -408,40 +897,19 @@ class FuzzyMatcher:
 
         if db is not None:
             self.ensure_fresh(db)
+        subjects = self._catalogue.subjects
 
         try:
-            from rapidfuzz import process, fuzz
-
             query_norm = subject_id_query.upper().strip()
-            id_list = [sid for sid, _, _ in self._subjects]
-
-            def extract_for_indices(indices: List[int]):
-                scoped_ids = [id_list[idx] for idx in indices]
-                scoped_results = process.extract(
-                    query_norm,
-                    scoped_ids,
-                    scorer=fuzz.WRatio,
-                    limit=10,
-                    score_cutoff=SUGGEST_THRESHOLD,
-                )
-                return [
-                    (matched_id, score, indices[local_idx])
-                    for matched_id, score, local_idx in scoped_results
-                ]
-
-            all_indices = list(range(len(id_list)))
-            course_indices = [
-                idx for idx in all_indices
-                if preferred_course_id is not None and preferred_course_id in self._subjects[idx][2]
-            ]
-            candidates = extract_for_indices(course_indices) if course_indices else []
+            course_indices = self._course_scope(subjects.course_index, preferred_course_id)
+            candidates = self._extract(query_norm, subjects.ids, course_indices) if len(course_indices) else []
             if not candidates:
-                candidates = extract_for_indices(all_indices)
+                candidates = self._extract(query_norm, subjects.ids)
             if not candidates:
                 return None
 
             matched_id, score, idx = max(candidates, key=lambda x: x[1])
-            original_name = self._subjects[idx][1]
+            original_name = subjects.entries[idx][1]
 
             return FuzzyMatch(
                 subject_id=matched_id,
@@ -453,7 +921,7 @@ class FuzzyMatcher:
         except ImportError:
             return None
         except Exception as e:
-            print(f"⚠️ [FuzzyMatcher] match_subject_by_id error: {e}")
+            logger.warning("[FuzzyMatcher] match_subject_by_id error: %s", e)
             return None
 
     # ----------------------------------------------------------
@@ -472,39 +940,23 @@ class FuzzyMatcher:
 
         if db is not None:
             self.ensure_fresh(db)
+        classes = self._catalogue.classes
 
-        if not self._classes_norm:
+        if not classes.norm:
             return None
 
         try:
-            from rapidfuzz import process, fuzz
-
             normalized_query = self._normalize(query)
-            name_list = [name for name, _ in self._classes_norm]
-
-            def extract_for_indices(indices: List[int]):
-                scoped_names = [name_list[idx] for idx in indices]
-                scoped_results = process.extract(
-                    normalized_query,
-                    scoped_names,
-                    scorer=fuzz.WRatio,
-                    limit=10,
-                    score_cutoff=SUGGEST_THRESHOLD,
-                )
-                return [
-                    (matched_name, score, indices[local_idx])
-                    for matched_name, score, local_idx in scoped_results
-                ]
-
-            all_indices = list(range(len(name_list)))
-            course_indices = [
-                idx for idx in all_indices
-                if preferred_course_id is not None
-                and preferred_course_id in self._classes_norm[idx][1].get("course_ids", set())
-            ]
-            results = extract_for_indices(course_indices) if course_indices else []
+            results = self._extract_in_course(
+                normalized_query, classes.names, classes.course_index,
+                classes.index, preferred_course_id,
+            )
             if not results:
-                results = extract_for_indices(all_indices)
+                scope = self._prefilter(classes.index, normalized_query)
+                results = self._extract(normalized_query, classes.names, scope)
+                if scope is not None and not results:
+                    # Prefilter không giữ được lớp nào đạt ngưỡng → quét toàn bộ
+                    results = self._extract(normalized_query, classes.names)
             if not results:
                 return None
 
@@ -513,7 +965,7 @@ class FuzzyMatcher:
             best_idx = -1
 
             for matched_name, score, idx in results:
-                cls_dict = self._classes_norm[idx][1]
+                cls_dict = classes.norm[idx][1]
                 course_ids = cls_dict.get("course_ids", set())
                 
                 adjusted_score = score
@@ -528,9 +980,9 @@ class FuzzyMatcher:
                 return None
 
             matched_name, original_score, idx = best_match
-            course_ids = self._classes_norm[idx][1].get("course_ids", set())
+            course_ids = classes.norm[idx][1].get("course_ids", set())
             final_score = min(original_score + 10 if preferred_course_id is not None and preferred_course_id in course_ids else original_score, 100)
-            cls_dict = self._classes_norm[idx][1]
+            cls_dict = classes.norm[idx][1]
 
             return FuzzyClassMatch(
                 class_id=cls_dict["class_id"],
@@ -544,7 +996,7 @@ class FuzzyMatcher:
         except ImportError:
             return None
         except Exception as e:
-            print(f"⚠️ [FuzzyMatcher] match_class error: {e}")
+            logger.warning("[FuzzyMatcher] match_class error: %s", e)
             return None
 
     def get_class_candidates(
@@ -559,27 +1011,21 @@ class FuzzyMatcher:
 
         if db is not None:
             self.ensure_fresh(db)
+        classes = self._catalogue.classes
 
-        if not self._classes_norm:
+        if not classes.norm:
             return []
 
         try:
-            from rapidfuzz import process, fuzz
-
             normalized_query = self._normalize(query)
-            name_list = [name for name, _ in self._classes_norm]
-
-            results = process.extract(
-                normalized_query,
-                name_list,
-                scorer=fuzz.WRatio,
-                limit=top_k,
-                score_cutoff=SUGGEST_THRESHOLD
-            )
+            scope = self._prefilter(classes.index, normalized_query)
+            results = self._extract(normalized_query, classes.names, scope, limit=top_k)
+            if scope is not None and not results:
+                results = self._extract(normalized_query, classes.names, limit=top_k)
 
             candidates = []
             for matched_name, score, idx in results:
-                cls_dict = self._classes_norm[idx][1]
+                cls_dict = classes.norm[idx][1]
                 candidates.append(FuzzyClassMatch(
                     class_id=cls_dict["class_id"],
                     class_name=cls_dict["class_name"],
@@ -594,7 +1040,7 @@ class FuzzyMatcher:
         except ImportError:
             return []
         except Exception as e:
-            print(f"⚠️ [FuzzyMatcher] get_class_candidates error: {e}")
+            logger.warning("[FuzzyMatcher] get_class_candidates error: %s", e)
             return []
 
     # ----------------------------------------------------------
@@ -632,9 +1078,71 @@ class FuzzyMatcher:
 
 
 # ============================================================
-# Module-level singleton (per DB session lifecycle)
+# Shared snapshot (one per database engine)
 # ============================================================
-# NOTE: FuzzyMatcher được khởi tạo per-request với db session từ Depends(get_db)
-# Không dùng global singleton vì db session không thread-safe across requests.
-# Tuy nhiên cache nội bộ (_subjects, _classes) là read-only sau refresh
-# nên an toàn để dùng chung qua một wrapper factory nếu cần.
+# Matcher không giữ db session: mỗi lần gọi truyền session của request hiện tại.
+# Ghi (refresh / incremental) chạy dưới matcher._lock và publish cả snapshot bằng một
+# phép gán; đọc không lock, mỗi lần gọi chỉ lấy self._catalogue một lần.
+_shared_matchers: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_shared_lock = threading.Lock()
+
+
+def get_fuzzy_matcher(db) -> FuzzyMatcher:
+    """FuzzyMatcher dùng chung cho engine của ``db``; lần đầu load cache, sau đó chỉ probe"""
+    engine = db.get_bind()
+    with _shared_lock:
+        matcher = _shared_matchers.get(engine)
+        if matcher is None:
+            matcher = FuzzyMatcher()
+            _shared_matchers[engine] = matcher
+    matcher.ensure_fresh(db)
+    return matcher
+
+
+def publish_catalogue_change(db, kind: str, codes: Optional[List[str]] = None) -> None:
+    """
+    Gọi sau khi commit CRUD môn/lớp.
+
+    Cập nhật incremental matcher dùng chung của process này và ghi change vào
+    Redis (counter + entry) để worker khác replay thay vì load lại toàn bộ.
+
+    Args:
+        kind: "subject", "class" hoặc "reset" (xóa hàng loạt)
+        codes: mã môn / mã lớp bị thêm, sửa hoặc xóa (cả mã cũ nếu đổi mã)
+    """
+    try:
+        codes = sorted({code for code in (codes or []) if code})
+        change_number = None
+        change_log = _change_log()
+        if change_log is not None:
+            change_number = change_log.increment(CHANGE_COUNTER_KEY)
+            if change_number is not None:
+                change_log.set(
+                    CHANGE_ENTRY_KEY.format(change_number),
+                    {"kind": kind, "codes": codes},
+                    ttl=CHANGE_ENTRY_TTL_SECONDS,
+                )
+
+        matcher = _shared_matchers.get(db.get_bind())
+        if matcher is not None:
+            matcher.apply_change(db, kind, codes, change_number)
+    except Exception as e:
+        logger.warning("[FuzzyMatcher] publish_catalogue_change failed: %s", e)
+
+
+def _change_log():
+    """RedisCache cho change counter; None khi không có Redis (chỉ còn probe trên DB)"""
+    try:
+        from app.cache.redis_cache import get_redis_cache
+        cache = get_redis_cache()
+    except Exception:
+        return None
+    return cache if getattr(cache, "client", None) is not None else None
+
+
+def _read_change_counter() -> Optional[int]:
+    change_log = _change_log()
+    if change_log is None:
+        return None
+    value = change_log.get(CHANGE_COUNTER_KEY)
+    return int(value) if value is not None else 0
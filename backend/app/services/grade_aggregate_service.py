@@ -0,0 +1,331 @@
+"""
+Incremental GPA/CPA maintenance for SemesterGPA and Student
+
+Each LearnedSubject mutation is described as a (before, after) pair of
+GradeEntry values. apply_grade_changes() turns the pairs into deltas of
+credits, grade points and failed credits and adds them to the affected
+SemesterGPA rows and the Student row, without reloading the transcript.
+
+Grade points are credits × letter score and every score is a multiple of
+0.5, so the stored aggregates give them back exactly:
+round(average × credits × 2) / 2.
+
+Full recomputation (rebuild_*) is still used for:
+    • changes to elective-module subjects — passing one can complete a
+      module, which changes which subjects count toward CPA for the
+      whole transcript
+    • reconciliation: scripts/db/rebuild_grade_aggregates.py
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import and_
+from sqlalchemy.orm import Session
+
+from app.models.__init__ import LearnedSubject, SemesterGPA, Student, Subject
+from app.services.elective_service import PASSING_EXCLUDED_GRADES, ElectiveModuleService
+from app.utils.grade_calculator import letter_grade_to_score
+
+FAILED_GRADE = "F"
+LEVEL_3_WARNING = "Cảnh báo mức 3"
+REBUILD_BATCH_SIZE = 200
+
+
+def _normalize_code(subject_code: Optional[str]) -> str:
+    return str(subject_code or "").strip().upper()
+
+
+class GradeEntry(NamedTuple):
+    """What one LearnedSubject row contributes to the aggregates."""
+
+    semester: str
+    credits: int
+    letter_grade: str
+    subject_code: str = ""
+
+    @property
+    def failed(self) -> bool:
+        return self.letter_grade == FAILED_GRADE
+
+    @property
+    def grade_points(self) -> float:
+        return self.credits * letter_grade_to_score(self.letter_grade or "")
+
+
+GradeChange = Tuple[Optional[GradeEntry], Optional[GradeEntry]]
+
+
+def grade_entry(learned: LearnedSubject, subject_code: Optional[str] = None) -> GradeEntry:
+    if subject_code is None:
+        subject = learned.subject
+        subject_code = subject.subject_id if subject else ""
+    return GradeEntry(learned.semester, learned.credits or 0, learned.letter_grade, _normalize_code(subject_code))
+
+
+def recover_grade_points(average: Optional[float], credits: Optional[int]) -> float:
+    if not average or not credits:
+        return 0.0
+    return round(average * credits * 2) / 2
+
+
+def warning_level_for(total_failed_credits: int) -> str:
+    if total_failed_credits >= 27:
+        return LEVEL_3_WARNING
+    if total_failed_credits >= 16:
+        return "Cảnh báo mức 2"
+    if total_failed_credits >= 8:
+        return "Cảnh báo mức 1"
+    return "Cảnh báo mức 0"
+
+
+def year_level_for(total_learned_credits: int) -> str:
+    if total_learned_credits < 32:
+        return "Năm 1"
+    if total_learned_credits < 64:
+        return "Năm 2"
+    if total_learned_credits < 96:
+        return "Năm 3"
+    if total_learned_credits < 128:
+        return "Năm 4"
+    return "Năm 5"
+
+
+def _set_student_totals(
+    student: Student,
+    failed_subjects: int,
+    failed_credits: int,
+    study_subjects: int,
+    learned_credits: int,
+    grade_points: float,
+) -> None:
+    student.failed_subjects_number = failed_subjects
+    student.study_subjects_number = study_subjects
+    student.total_failed_credits = failed_credits
+    student.total_learned_credits = learned_credits
+    student.cpa = grade_points / learned_credits if learned_credits > 0 else 0.0
+
+    old_warning = student.warning_level
+    student.warning_level = warning_level_for(failed_credits)
+    if old_warning != LEVEL_3_WARNING and student.warning_level == LEVEL_3_WARNING:
+        student.level_3_warning_number = (student.level_3_warning_number or 0) + 1
+
+    student.year_level = year_level_for(learned_credits)
+
+
+def _semester_has_subjects(db: Session, student_id: int, semester: str) -> bool:
+    return db.query(LearnedSubject.id).filter(
+        and_(LearnedSubject.student_id == student_id, LearnedSubject.semester == semester)
+    ).first() is not None
+
+
+def _apply_semester_deltas(db: Session, student_id: int, deltas: Dict[str, List[float]]) -> None:
+    rows: Dict[str, SemesterGPA] = {}
+    for row in db.query(SemesterGPA).filter(
+        SemesterGPA.student_id == student_id, SemesterGPA.semester.in_(list(deltas))
+    ).order_by(SemesterGPA.id):
+        rows.setdefault(row.semester, row)
+
+    for semester, (credit_delta, point_delta) in deltas.items():
+        row = rows.get(semester)
+        credits = (row.total_credits or 0 if row else 0) + credit_delta
+        points = (recover_grade_points(row.gpa, row.total_credits) if row else 0.0) + point_delta
+        if credits == 0 and not _semester_has_subjects(db, student_id, semester):
+            if row:
+                db.delete(row)
+            continue
+        gpa = points / credits if credits > 0 else 0.0
+        if row:
+            row.gpa = gpa
+            row.total_credits = credits
+        else:
+            db.add(SemesterGPA(student_id=student_id, semester=semester, gpa=gpa, total_credits=credits))
+
+
+def apply_grade_changes(
+    db: Session,
+    student_id: int,
+    changes: Iterable[GradeChange],
+    service: Optional[ElectiveModuleService] = None,
+) -> None:
+    """
+    Apply LearnedSubject inserts (None, entry), updates (old, new) and
+    deletes (entry, None) of one student to SemesterGPA and Student.
+    Expects the LearnedSubject rows to be already added/changed in ``db``.
+    """
+    changes = [(before, after) for before, after in changes if before != after]
+    if not changes:
+        return
+    db.flush()
+
+    semester_deltas: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])
+    for before, after in changes:
+        for entry, sign in ((before, -1), (after, 1)):
+            if entry is not None:
+                semester_deltas[entry.semester][0] += sign * entry.credits
+                semester_deltas[entry.semester][1] += sign * entry.grade_points
+    _apply_semester_deltas(db, student_id, semester_deltas)
+
+    student = db.get(Student, student_id)
+    if student is None:
+        return
+    service = service or ElectiveModuleService()
+    electives = service.elective_subject_ids(service.get_student_course_code(db, student_id))
+    entries = [entry for pair in changes for entry in pair if entry is not None]
+    if electives and any(not entry.subject_code or entry.subject_code in electives for entry in entries):
+        db.flush()
+        rebuild_student_stats(db, student_id, service=service)
+        return
+
+    failed_subjects = student.failed_subjects_number or 0
+    failed_credits = student.total_failed_credits or 0
+    study_subjects = student.study_subjects_number or 0
+    learned_credits = student.total_learned_credits or 0
+    grade_points = recover_grade_points(student.cpa, learned_credits)
+    for before, after in changes:
+        for entry, sign in ((before, -1), (after, 1)):
+            if entry is None:
+                continue
+            if entry.failed:
+                failed_subjects += sign
+                failed_credits += sign * entry.credits
+            else:
+                study_subjects += sign
+                learned_credits += sign * entry.credits
+                grade_points += sign * entry.grade_points
+    _set_student_totals(student, failed_subjects, failed_credits, study_subjects, learned_credits, grade_points)
+
+
+def apply_grade_change(
+    db: Session,
+    student_id: int,
+    before: Optional[GradeEntry],
+    after: Optional[GradeEntry],
+) -> None:
+    apply_grade_changes(db, student_id, [(before, after)])
+
+
+# ---------------------------------------------------------------------------
+# Full recomputation
+# ---------------------------------------------------------------------------
+
+def _transcript(db: Session, student_id: int) -> List[Tuple[str, GradeEntry]]:
+    rows = db.query(
+        LearnedSubject.semester, LearnedSubject.credits, LearnedSubject.letter_grade, Subject.subject_id
+    ).outerjoin(Subject, Subject.id == LearnedSubject.subject_id).filter(
+        LearnedSubject.student_id == student_id
+    ).all()
+    return [GradeEntry(semester, credits or 0, grade, _normalize_code(code)) for semester, credits, grade, code in rows]
+
+
+def _rebuild_student_totals(
+    db: Session,
+    student: Student,
+    entries: Sequence[GradeEntry],
+    service: Optional[ElectiveModuleService] = None,
+) -> None:
+    service = service or ElectiveModuleService()
+    passed = {
+        entry.subject_code
+        for entry in entries
+        if entry.subject_code and str(entry.letter_grade or "").strip().upper() not in PASSING_EXCLUDED_GRADES | {""}
+    }
+    excluded = service.excluded_subject_ids_for_cpa(service.get_student_course_code(db, student.id), passed)
+
+    failed_subjects = failed_credits = study_subjects = learned_credits = 0
+    grade_points = 0.0
+    for entry in entries:
+        if entry.failed:
+            failed_subjects += 1
+            failed_credits += entry.credits
+        elif excluded is None or (entry.subject_code and entry.subject_code not in excluded):
+            study_subjects += 1
+            learned_credits += entry.credits
+            grade_points += entry.grade_points
+    _set_student_totals(student, failed_subjects, failed_credits, study_subjects, learned_credits, grade_points)
+
+
+def rebuild_student_stats(db: Session, student_id: int, service: Optional[ElectiveModuleService] = None) -> None:
+    """Recompute the Student counters and CPA from the whole transcript (one query)."""
+    student = db.get(Student, student_id)
+    if student is None:
+        return
+    _rebuild_student_totals(db, student, _transcript(db, student_id), service)
+
+
+def rebuild_semester_gpa(db: Session, student_id: int, semester: str) -> None:
+    """Recompute one SemesterGPA row; deletes it when the semester has no subjects left."""
+    rows = db.query(LearnedSubject.credits, LearnedSubject.letter_grade).filter(
+        and_(LearnedSubject.student_id == student_id, LearnedSubject.semester == semester)
+    ).all()
+    semester_gpa = db.query(SemesterGPA).filter(
+        and_(SemesterGPA.student_id == student_id, SemesterGPA.semester == semester)
+    ).first()
+
+    if not rows:
+        if semester_gpa:
+            db.delete(semester_gpa)
+        return
+
+    entries = [GradeEntry(semester, credits or 0, grade) for credits, grade in rows]
+    total_credits = sum(entry.credits for entry in entries)
+    total_points = sum(entry.grade_points for entry in entries)
+    gpa = total_points / total_credits if total_credits > 0 else 0.0
+    if semester_gpa:
+        semester_gpa.gpa = gpa
+        semester_gpa.total_credits = total_credits
+    else:
+        db.add(SemesterGPA(student_id=student_id, semester=semester, gpa=gpa, total_credits=total_credits))
+
+
+def rebuild_student_aggregates(db: Session, student_id: int, service: Optional[ElectiveModuleService] = None) -> None:
+    """
+    Reconcile every SemesterGPA row and the Student counters of one student
+    with the LearnedSubject table: drops orphan/duplicate SemesterGPA rows.
+    """
+    student = db.get(Student, student_id)
+    if student is None:
+        return
+    entries = _transcript(db, student_id)
+    per_semester: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])
+    for entry in entries:
+        per_semester[entry.semester][0] += entry.credits
+        per_semester[entry.semester][1] += entry.grade_points
+
+    kept: Dict[str, SemesterGPA] = {}
+    for row in db.query(SemesterGPA).filter(SemesterGPA.student_id == student_id).order_by(SemesterGPA.id):
+        if row.semester in per_semester and row.semester not in kept:
+            kept[row.semester] = row
+        else:
+            db.delete(row)
+
+    for semester, (credits, points) in per_semester.items():
+        gpa = points / credits if credits > 0 else 0.0
+        row = kept.get(semester)
+        if row:
+            row.gpa = gpa
+            row.total_credits = credits
+        else:
+            db.add(SemesterGPA(student_id=student_id, semester=semester, gpa=gpa, total_credits=credits))
+
+    _rebuild_student_totals(db, student, entries, service)
+
+
+def rebuild_all_grade_aggregates(
+    db: Session,
+    student_ids: Optional[Iterable[int]] = None,
+    batch_size: int = REBUILD_BATCH_SIZE,
+) -> int:
+    """Reconcile all (or the given) students, committing every ``batch_size`` students."""
+    if student_ids is None:
+        student_ids = [student_id for (student_id,) in db.query(Student.id).order_by(Student.id)]
+    service = ElectiveModuleService()
+    count = 0
+    for student_id in student_ids:
+        rebuild_student_aggregates(db, student_id, service=service)
+        count += 1
+        if count % batch_size == 0:
+            db.commit()
+    db.commit()
+    return count
@@ -0,0 +1,245 @@
+"""
+Set-based grade import from CTT HUST Excel transcripts
+
+parse_grade_workbook()  streams the sheet (openpyxl read_only) — pure CPU,
+                        safe to run in a worker thread.
+import_grade_rows()     resolves every subject code with one IN query,
+                        finds existing (student, subject, semester) rows with
+                        one query, inserts the new rows in a single executemany
+                        and returns them as GradeEntry values so the caller can
+                        apply them to the GPA/CPA aggregates incrementally.
+
+The number of queries depends on the number of distinct codes/students
+(chunked by GRADE_IMPORT_IN_CHUNK), not on the number of spreadsheet rows.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import openpyxl
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.models.__init__ import LearnedSubject, Student, Subject
+from app.services.grade_aggregate_service import GradeEntry
+
+VALID_LETTER_GRADES = ("A+", "A", "B+", "B", "C+", "C", "D+", "D", "F")
+HEADER_SCAN_ROWS = 20
+GRADE_IMPORT_IN_CHUNK = 500
+
+_REQUIRED_FIELDS = ("học kỳ", "mã hp", "điểm hp")
+_STUDENT_HEADERS = ("mssv", "mã sv", "student id", "student_id")
+
+
+class GradeSheetError(ValueError):
+    """Sheet layout is unusable (missing header / required columns)."""
+
+
+@dataclass
+class GradeRow:
+    row_idx: int
+    semester: str
+    subject_code: str
+    letter_grade: str
+    student_key: Optional[str] = None  # chỉ có khi sheet có cột MSSV (import theo lô)
+
+
+@dataclass
+class ParsedGradeSheet:
+    rows: List[GradeRow] = field(default_factory=list)
+    skipped: int = 0
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+    has_student_column: bool = False
+
+
+@dataclass
+class GradeImportResult:
+    created: int = 0
+    skipped: int = 0
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+    added: Dict[int, List[GradeEntry]] = field(default_factory=dict)
+
+    def error_messages(self, limit: int = 10) -> Optional[List[str]]:
+        messages = [f"Dòng {row_idx}: {message}" for row_idx, message in sorted(self.errors)]
+        return messages[:limit] or None
+
+
+def _chunks(values: Sequence, size: int = GRADE_IMPORT_IN_CHUNK) -> Iterator[Sequence]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _cell(row: Sequence, idx: Optional[int]) -> str:
+    if idx is None or idx >= len(row) or row[idx] is None:
+        return ""
+    return str(row[idx]).strip()
+
+
+def _find_column(headers: List[str], *needles: str) -> Optional[int]:
+    return next((i for i, h in enumerate(headers) if any(needle in h for needle in needles)), None)
+
+
+def _is_header(row: Sequence) -> bool:
+    return bool(row) and all(
+        any(needle in str(cell).lower() for cell in row if cell) for needle in _REQUIRED_FIELDS
+    )
+
+
+def parse_grade_workbook(contents: bytes) -> ParsedGradeSheet:
+    """
+    Đọc file điểm theo chế độ read_only (một lượt, không dựng cả workbook trong RAM).
+    Header được tìm trong HEADER_SCAN_ROWS dòng đầu; cột MSSV là tuỳ chọn.
+    """
+    workbook = openpyxl.load_workbook(BytesIO(contents), read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        return _parse_rows(rows)
+    finally:
+        workbook.close()
+
+
+def _parse_rows(rows: Iterable[Sequence]) -> ParsedGradeSheet:
+    parsed = ParsedGradeSheet()
+    columns = None
+
+    for row_idx, row in enumerate(rows, start=1):
+        if columns is None:
+            if row_idx > HEADER_SCAN_ROWS:
+                break
+            if _is_header(row):
+                headers = [str(cell).strip().lower() if cell else "" for cell in row]
+                columns = (
+                    _find_column(headers, "học kỳ", "hoc ky"),
+                    _find_column(headers, "mã hp"),
+                    _find_column(headers, "điểm hp", "diem hp"),
+                    _find_column(headers, *_STUDENT_HEADERS),
+                )
+                if None in columns[:3]:
+                    raise GradeSheetError("Không tìm thấy các cột bắt buộc: Học kỳ, Mã HP, Điểm HP")
+                parsed.has_student_column = columns[3] is not None
+            continue
+
+        # Skip empty rows
+        if not row or all(cell is None or str(cell).strip() == "" for cell in row):
+            continue
+
+        semester_idx, subject_code_idx, grade_idx, student_idx = columns
+        semester = _cell(row, semester_idx)
+        subject_code = _cell(row, subject_code_idx)
+        letter_grade = _cell(row, grade_idx)
+        student_key = _cell(row, student_idx) if student_idx is not None else None
+
+        if not semester or not subject_code or not letter_grade or student_key == "":
+            parsed.skipped += 1
+            continue
+        if letter_grade not in VALID_LETTER_GRADES:
+            parsed.errors.append((row_idx, f"Điểm '{letter_grade}' không hợp lệ"))
+            parsed.skipped += 1
+            continue
+        parsed.rows.append(GradeRow(row_idx, semester, subject_code, letter_grade, student_key))
+
+    if columns is None:
+        raise GradeSheetError("Không tìm thấy header với các cột bắt buộc: Học kỳ, Mã HP, Điểm HP")
+    return parsed
+
+
+def resolve_students(db: Session, student_keys: Iterable[str]) -> Dict[str, int]:
+    """Map giá trị cột MSSV (students.id) → students.id, một IN query mỗi chunk."""
+    by_id = {}
+    for key in set(student_keys):
+        try:
+            by_id[int(float(key))] = key
+        except (TypeError, ValueError):
+            continue
+    resolved: Dict[str, int] = {}
+    ids = sorted(by_id)
+    for chunk in _chunks(ids):
+        for (student_pk,) in db.execute(select(Student.id).where(Student.id.in_(chunk))):
+            resolved[by_id[student_pk]] = student_pk
+    return resolved
+
+
+def _resolve_subjects(db: Session, codes: Set[str]) -> Dict[str, tuple]:
+    lookup = sorted(codes | {code.upper() for code in codes})
+    subjects: Dict[str, tuple] = {}
+    for chunk in _chunks(lookup):
+        stmt = select(Subject.id, Subject.subject_id, Subject.subject_name, Subject.credits).where(
+            Subject.subject_id.in_(chunk)
+        )
+        for subject_pk, code, name, credits in db.execute(stmt):
+            subjects[str(code).strip().upper()] = (subject_pk, name, credits)
+    return subjects
+
+
+def _existing_keys(db: Session, student_pks: Set[int], semesters: Set[str]) -> Set[Tuple[int, int, str]]:
+    semester_list = sorted(semesters)
+    existing: Set[Tuple[int, int, str]] = set()
+    for chunk in _chunks(sorted(student_pks)):
+        stmt = select(LearnedSubject.student_id, LearnedSubject.subject_id, LearnedSubject.semester).where(
+            LearnedSubject.student_id.in_(chunk),
+            LearnedSubject.semester.in_(semester_list),
+        )
+        existing.update((student_pk, subject_pk, semester) for student_pk, subject_pk, semester in db.execute(stmt))
+    return existing
+
+
+def import_grade_rows(
+    db: Session,
+    parsed: ParsedGradeSheet,
+    student_pk: Optional[int] = None,
+    student_pks_by_key: Optional[Dict[str, int]] = None,
+) -> GradeImportResult:
+    """
+    Insert the parsed rows for one student (``student_pk``) or, when the sheet
+    has an MSSV column, for every student in ``student_pks_by_key``. Rows that
+    already exist — in the DB or earlier in the same file — are skipped.
+    Does not commit.
+    """
+    result = GradeImportResult(skipped=parsed.skipped, errors=list(parsed.errors))
+    subjects = _resolve_subjects(db, {row.subject_code for row in parsed.rows})
+
+    pending: List[Tuple[GradeRow, int, tuple]] = []
+    for row in parsed.rows:
+        owner = student_pk if student_pks_by_key is None else student_pks_by_key.get(row.student_key)
+        if owner is None:
+            result.errors.append((row.row_idx, f"Không tìm thấy sinh viên '{row.student_key}'"))
+            result.skipped += 1
+            continue
+        subject = subjects.get(row.subject_code.upper())
+        if subject is None:
+            result.errors.append((row.row_idx, f"Không tìm thấy môn học với mã HP '{row.subject_code}'"))
+            result.skipped += 1
+            continue
+        pending.append((row, owner, subject))
+
+    if not pending:
+        return result
+
+    seen = _existing_keys(db, {owner for _, owner, _ in pending}, {row.semester for row, _, _ in pending})
+    mappings = []
+    for row, owner, (subject_pk, subject_name, credits) in pending:
+        key = (owner, subject_pk, row.semester)
+        if key in seen:
+            result.skipped += 1
+            continue
+        seen.add(key)
+        mappings.append({
+            "subject_name": subject_name,
+            "credits": credits,
+            "letter_grade": row.letter_grade,
+            "semester": row.semester,
+            "student_id": owner,
+            "subject_id": subject_pk,
+        })
+        result.added.setdefault(owner, []).append(
+            GradeEntry(row.semester, credits or 0, row.letter_grade, row.subject_code.upper())
+        )
+
+    if mappings:
+        # ORM bulk INSERT (executemany); unlike the legacy bulk_insert_mappings it
+        # goes through do_orm_execute, so semantic-cache invalidation still sees it
+        db.execute(insert(LearnedSubject), mappings)
+        result.created = len(mappings)
+    return result
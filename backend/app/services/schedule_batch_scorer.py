@@ -0,0 +1,161 @@
+"""
+Vectorized Schedule Combination Scoring
+Score many candidate combinations at once with NumPy
+
+A combination is a row of indices into a per-class feature table
+(start minute, end minute, study-day matrix, time period, credits), so N
+candidates form an (N, K) index matrix for K subjects. Every term of
+``ScheduleCombinationGenerator.calculate_combination_score`` is computed
+for all N rows together and the float operations run in the same order,
+so the scores are identical to the per-combination scorer.
+"""
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from app.utils.schedule_occupancy import parse_study_days, time_to_minutes
+
+_PERIOD_MORNING = 0
+_PERIOD_AFTERNOON = 1
+_PERIOD_NONE = 2
+_PERIOD_CODES = {'morning': _PERIOD_MORNING, 'afternoon': _PERIOD_AFTERNOON, None: _PERIOD_NONE}
+
+
+class CombinationBatchScorer:
+    """Per-class feature table plus a batch scorer over index matrices"""
+
+    def __init__(self, classes: Sequence[Dict]):
+        """
+        Args:
+            classes: Flat list of class dicts; combination rows index into it
+        """
+        day_index: Dict[str, int] = {}
+        class_days: List[List[int]] = []
+        starts = []
+        ends = []
+        periods = []
+        credits = []
+        for cls in classes:
+            class_days.append([day_index.setdefault(day, len(day_index)) for day in parse_study_days(cls['study_date'])])
+            start = time_to_minutes(cls['study_time_start'])
+            starts.append(start)
+            ends.append(time_to_minutes(cls['study_time_end']))
+            periods.append(self._period_code(start))
+            credits.append(cls.get('credits', 0))
+
+        self.day_index = day_index
+        self.start = np.asarray(starts, dtype=np.int64)
+        self.end = np.asarray(ends, dtype=np.int64)
+        self.period = np.asarray(periods, dtype=np.int8)
+        self.credits = np.asarray(credits, dtype=np.float64)
+        self.days = np.zeros((len(classes), max(len(day_index), 1)), dtype=bool)
+        for row, day_columns in enumerate(class_days):
+            self.days[row, day_columns] = True
+
+    @staticmethod
+    def _period_code(minutes: int) -> int:
+        """Same boundaries as ScheduleCombinationGenerator._get_time_period"""
+        if 0 <= minutes < 720:
+            return _PERIOD_MORNING
+        if 720 <= minutes < 1080:
+            return _PERIOD_AFTERNOON
+        return _PERIOD_NONE
+
+    def _day_hits(self, day_names: Sequence[str]) -> np.ndarray:
+        """Per-class flag: the class meets on at least one of ``day_names``"""
+        columns = [self.day_index[day] for day in set(day_names) if day in self.day_index]
+        if not columns:
+            return np.zeros(len(self.start), dtype=bool)
+        return self.days[:, columns].any(axis=1)
+
+    def day_metrics(self, combos: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Study days, free days and continuous (>5h span) days for each row.
+
+        A day's span runs from its earliest start to the end of the class that
+        starts last (later position wins ties), as in calculate_schedule_metrics.
+        """
+        combo_count, class_count = combos.shape
+        on_day = self.days[combos]                      # (N, K, D)
+        starts = self.start[combos][:, :, None]         # (N, K, 1)
+        studied = on_day.any(axis=1)                    # (N, D)
+        study_days = studied.sum(axis=1)
+
+        big = np.iinfo(np.int64).max
+        first_start = np.where(on_day, starts, big).min(axis=1)
+        # Latest start, ties broken by position: encode as start * K + position.
+        order_key = starts * class_count + np.arange(class_count)[None, :, None]
+        last_position = np.where(on_day, order_key, -1).argmax(axis=1)   # (N, D)
+        last_end = self.end[np.take_along_axis(combos, last_position, axis=1)]
+        span_minutes = last_end - first_start
+        continuous_days = (studied & (span_minutes > 300)).sum(axis=1)
+
+        return {
+            'study_days': study_days,
+            'free_days': 7 - study_days,
+            'continuous_study_days': continuous_days,
+        }
+
+    def score(self, combos: np.ndarray, preferences: Dict) -> List[float]:
+        """
+        Score an (N, K) index matrix of combinations.
+
+        Returns:
+            N scores, equal to calculate_combination_score for each row
+        """
+        combos = np.asarray(combos, dtype=np.intp)
+        combo_count, class_count = combos.shape
+        if combo_count == 0:
+            return []
+
+        metrics = self.day_metrics(combos)
+        score = np.full(combo_count, 100.0)
+
+        if not preferences.get('free_days_is_not_important', False):
+            if preferences.get('prefer_free_days'):
+                score += metrics['free_days'] * 5
+
+        if not preferences.get('continuous_is_not_important', False):
+            if preferences.get('prefer_continuous'):
+                score += metrics['continuous_study_days'] * 5
+            elif preferences.get('prefer_continuous') == False:
+                score -= metrics['continuous_study_days'] * 3
+
+        periods = self.period[combos]
+        time_period = preferences.get('time_period')
+        if time_period:
+            matching = (periods == _PERIOD_CODES.get(time_period, -1)).sum(axis=1)
+            score += matching / class_count * 15
+
+        avoid_periods = preferences.get('avoid_time_periods', [])
+        if avoid_periods:
+            avoid_codes = [_PERIOD_CODES[p] for p in set(avoid_periods) if p in _PERIOD_CODES]
+            violating = np.isin(periods, avoid_codes).sum(axis=1)
+            score -= violating * 5
+
+        if not preferences.get('day_is_not_important', False):
+            prefer_days = preferences.get('prefer_days', [])
+            if prefer_days:
+                matching = self._day_hits(prefer_days)[combos].sum(axis=1)
+                score += matching / class_count * 15
+
+            avoid_days = preferences.get('avoid_days', [])
+            if avoid_days:
+                violating = self._day_hits(avoid_days)[combos].sum(axis=1)
+                score -= violating * 5
+
+        if not preferences.get('time_is_not_important', False):
+            if preferences.get('prefer_early_start') or preferences.get('prefer_late_start'):
+                avg_start = self.start[combos].sum(axis=1) / class_count
+            if preferences.get('prefer_early_start'):
+                score += np.maximum(0, (720 - avg_start) / 300 * 10)
+            if preferences.get('prefer_late_start'):
+                score += np.maximum(0, (avg_start - 420) / 360 * 10)
+
+        total_credits = self.credits[combos].sum(axis=1)
+        balanced = (total_credits >= 12) & (total_credits <= 18)
+        score = np.where(balanced, score + 5, score)
+        score = np.where(total_credits < 12, score - (12 - total_credits), score)
+
+        # Python's round() (not np.round) so ties round exactly like the scalar scorer.
+        return [round(value, 2) for value in score.tolist()]
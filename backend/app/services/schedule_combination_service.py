@@ -4,8 +4,20 @@ Generate optimal schedule combinations from multiple subjects
 """
 from typing import Any, List, Dict, Tuple, Optional, Set
 from datetime import time, datetime
-import itertools
+import heapq
+import logging
+
+import numpy as np
+
 from app.rules.class_suggestion_rules import ClassSuggestionRuleEngine
+from app.services.schedule_batch_scorer import CombinationBatchScorer
+from app.utils.schedule_occupancy import ScheduleOccupancy, get_occupancy, occupancy_conflict
+
+logger = logging.getLogger(__name__)
+
+
+# Safety cap for the branch-and-bound search; callers may pass None to search exhaustively.
+DEFAULT_MAX_SEARCH_NODES = 2_000_000
 
 
 class ScheduleCombinationGenerator:
@@ -18,25 +30,27 @@ class ScheduleCombinationGenerator:
         self,
         classes_by_subject: Dict[str, List[Dict]],
         preferences: Dict,
-        max_combinations: int = 100
+        max_combinations: int = 100,
+        max_search_nodes: Optional[int] = DEFAULT_MAX_SEARCH_NODES,
     ) -> List[Dict]:
         """
-        Generate valid schedule combinations from classes of different subjects
+        Generate the top-scoring valid schedule combinations from classes of different subjects
         
         Args:
             classes_by_subject: {subject_id: [class1, class2, ...]}
             preferences: User preferences
-            max_combinations: Maximum combinations to generate
+            max_combinations: Number of best combinations to return (top-K)
+            max_search_nodes: Safety cap on explored search nodes (None = exhaustive)
         
         Returns:
-            List of combinations with scores and metrics
+            List of combinations with scores and metrics, best score first
         """
-        print(f"🔄 [COMBINATIONS] Generating combinations from {len(classes_by_subject)} subjects")
+        logger.info("[COMBINATIONS] Generating combinations from %d subjects", len(classes_by_subject))
         
         # Step 0: Extract specific required class IDs (HARD FILTER - HIGHEST PRIORITY)
         specific_class_ids = preferences.get('specific_class_ids', [])
         if specific_class_ids:
-            print(f"  🎯 [SPECIFIC] Required class IDs: {specific_class_ids}")
+            logger.debug("[SPECIFIC] Required class IDs: %s", specific_class_ids)
         
         # Step 1: Get candidate classes per subject
         subject_classes = []
@@ -52,71 +66,52 @@ class ScheduleCombinationGenerator:
                         # ONLY use required classes for this subject
                         subject_classes.append(required_classes)
                         subject_ids.append(subject_id)
-                        print(f"  🎯 {subject_id}: Using {len(required_classes)} REQUIRED classes (out of {len(classes)})")
+                        logger.debug("%s: using %d REQUIRED classes (out of %d)", subject_id, len(required_classes), len(classes))
                     else:
                         # Use all classes for subjects without specific requirements
                         subject_classes.append(classes)
                         subject_ids.append(subject_id)
-                        print(f"  📚 {subject_id}: {len(classes)} classes")
+                        logger.debug("%s: %d classes", subject_id, len(classes))
                 else:
                     subject_classes.append(classes)
                     subject_ids.append(subject_id)
-                    print(f"  📚 {subject_id}: {len(classes)} classes")
+                    logger.debug("%s: %d classes", subject_id, len(classes))
         
         if not subject_classes:
             return []
         
-        # Step 2: Generate and filter combinations efficiently
-        print(f"🔢 [COMBINATIONS] Generating combinations with conflict checking...")
-        valid_combinations = []
-        
-        # Use itertools.product generator (lazy evaluation)
-        all_combinations = itertools.product(*subject_classes)
-        
-        checked_count = 0
-        max_to_check = max_combinations * 10  # Check up to 10x more to find valid ones
-        
-        for combo in all_combinations:
-            checked_count += 1
-            
-            combo_list = list(combo)
-            
-            # HARD FILTER: If specific class IDs required, verify ALL are present
-            if specific_class_ids:
-                combo_class_ids = [cls['class_id'] for cls in combo_list]
-                if not all(req_id in combo_class_ids for req_id in specific_class_ids):
-                    # Skip this combination - missing required class
-                    continue
-            
-            # ABSOLUTE RULES: never allow duplicate subjects or time conflicts.
-            if not self.has_duplicate_subjects(combo_list) and not self.has_time_conflicts(combo_list):
-                valid_combinations.append(combo_list)
-                # Stop if we have enough valid combinations
-                if len(valid_combinations) >= max_combinations:
-                    break
-            # Safety limit to avoid infinite loop
-            if checked_count >= max_to_check:
-                print(f"  ⚠️ Checked {checked_count} combinations, stopping search")
-                break
+        # Step 2: Branch-and-bound search for the top-K valid combinations
+        logger.debug("[COMBINATIONS] Searching top %d combinations (backtracking + forward checking)", max_combinations)
+        ranked, search_stats = self._search_top_combinations(
+            subject_classes,
+            preferences,
+            max_combinations=max_combinations,
+            specific_class_ids=specific_class_ids,
+            max_search_nodes=max_search_nodes,
+        )
         
-        print(f"  ✅ Checked {checked_count} combinations")
-        print(f"  ✅ Valid combinations (no conflicts): {len(valid_combinations)}")
+        logger.info(
+            "[COMBINATIONS] explored=%d forward_check_cuts=%d bound_cuts=%d valid=%d",
+            search_stats['nodes'], search_stats['forward_check_cuts'], search_stats['bound_cuts'], len(ranked),
+        )
+        if search_stats['truncated']:
+            logger.warning("[COMBINATIONS] Search node limit %s reached, returning best combinations found so far", max_search_nodes)
         
         # Never fall back to combinations that violate either absolute rule.
-        if not valid_combinations:
+        if not ranked:
             if specific_class_ids:
-                print(f"  ❌ No valid combinations with required classes {specific_class_ids}")
-                print(f"  💡 Suggestion: Required classes may have time conflicts with other subjects")
+                logger.info(
+                    "[COMBINATIONS] No valid combinations with required classes %s "
+                    "(they may conflict with other subjects)", specific_class_ids,
+                )
             else:
-                print(f"  ⚠️ No valid combinations found without duplicate subjects or time conflicts")
+                logger.info("[COMBINATIONS] No valid combinations without duplicate subjects or time conflicts")
             return []
         
-        # Step 4: Score and rank
-        print(f"⭐ [COMBINATIONS] Scoring combinations...")
+        # Step 3: Attach metrics (scores were computed exactly at the search leaves)
         scored_combinations = []
         
-        for combo in valid_combinations:
-            score = self.calculate_combination_score(combo, preferences)
+        for score, combo in ranked:
             metrics = self.calculate_schedule_metrics(combo)
             
             metrics['time_conflicts'] = False
@@ -129,18 +124,185 @@ class ScheduleCombinationGenerator:
                 'has_violations': False
             })
         
-        # Step 5: Sort by score (highest first)
-        scored_combinations.sort(key=lambda x: x['score'], reverse=True)
-
-        if not scored_combinations:
-            print("  ⚠️ No combinations available after scoring")
-            return []
-        
-        print(f"  🏆 Top score: {scored_combinations[0]['score']:.1f}")
-        print(f"  📊 Score range: {scored_combinations[-1]['score']:.1f} - {scored_combinations[0]['score']:.1f}")
+        logger.debug(
+            "[COMBINATIONS] score range %.1f - %.1f",
+            scored_combinations[-1]['score'], scored_combinations[0]['score'],
+        )
         
         return scored_combinations
 
+    def _search_top_combinations(
+        self,
+        subject_classes: List[List[Dict]],
+        preferences: Dict,
+        max_combinations: int,
+        specific_class_ids: Optional[List[str]] = None,
+        max_search_nodes: Optional[int] = None,
+    ) -> Tuple[List[Tuple[float, List[Dict]]], Dict[str, Any]]:
+        """
+        Depth-first branch-and-bound over one class per subject.
+
+        - Subjects are assigned in order of fewest sections first.
+        - Each class carries a bitmask of the classes it conflicts with, so
+          assigning a class prunes every remaining subject's domain with a
+          single AND (forward checking); an emptied domain is a dead end.
+        - Once ``max_combinations`` results are held, a branch is cut when an
+          admissible upper bound of ``calculate_combination_score`` cannot
+          beat the current K-th best.
+        - The last subject's candidates are scored together with
+          ``CombinationBatchScorer`` (same scores, one NumPy pass).
+
+        Returns ``(ranked, stats)`` where ``ranked`` is ``[(score, classes)]``
+        sorted by score descending; ties keep ``itertools.product`` order.
+        """
+        stats = {'nodes': 0, 'forward_check_cuts': 0, 'bound_cuts': 0, 'truncated': False}
+        if max_combinations <= 0 or not subject_classes:
+            return [], stats
+
+        subject_count = len(subject_classes)
+        flat_classes: List[Dict] = []
+        owners: List[int] = []
+        positions: List[int] = []
+        for subject_index, classes in enumerate(subject_classes):
+            for position, cls in enumerate(classes):
+                flat_classes.append(cls)
+                owners.append(subject_index)
+                positions.append(position)
+
+        conflict_masks = self._build_conflict_masks(flat_classes, owners)
+        bound = _ScoreUpperBound(self, flat_classes, preferences, subject_count)
+        scorer = CombinationBatchScorer(flat_classes)
+
+        # Fewest sections first keeps the branching factor low near the root.
+        order = sorted(range(subject_count), key=lambda s: (len(subject_classes[s]), s))
+        offsets = []
+        offset = 0
+        for classes in subject_classes:
+            offsets.append(offset)
+            offset += len(classes)
+
+        # Within a subject, try classes with the best optimistic score first so
+        # good leaves are found early and the bound starts cutting sooner.
+        value_orders = []
+        initial_domains = []
+        for subject_index in order:
+            members = range(offsets[subject_index], offsets[subject_index] + len(subject_classes[subject_index]))
+            value_orders.append(sorted(members, key=lambda g: (-bound.class_gain[g], g)))
+            domain = 0
+            for g in members:
+                domain |= 1 << g
+            initial_domains.append(domain)
+
+        bound.prepare_suffixes([list(range(offsets[s], offsets[s] + len(subject_classes[s]))) for s in order])
+
+        depth_of_subject = {subject_index: depth for depth, subject_index in enumerate(order)}
+        required_ids = set(specific_class_ids or [])
+        heap: List[Tuple[float, Tuple[int, ...], List[Dict]]] = []
+        assignment: List[int] = [0] * subject_count
+
+        def push(row: List[int], score: float) -> None:
+            product_index = tuple(positions[g] for g in row)
+            # Min-heap on (score, -index): the root is the current K-th best.
+            entry = (score, tuple(-i for i in product_index), [flat_classes[g] for g in row])
+            if len(heap) < max_combinations:
+                heapq.heappush(heap, entry)
+            elif entry[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, entry)
+
+        def score_last_subject(domain: int, state: Tuple) -> bool:
+            """Complete the assignment with each class left for the last subject and score them as one batch."""
+            depth = subject_count - 1
+            rows = []
+            within_budget = True
+            for g in value_orders[depth]:
+                if not (domain >> g) & 1:
+                    continue
+                stats['nodes'] += 1
+                if max_search_nodes is not None and stats['nodes'] > max_search_nodes:
+                    stats['truncated'] = True
+                    within_budget = False
+                    break
+                if len(heap) >= max_combinations:
+                    if bound.upper_bound(bound.extend(state, g), subject_count) + 0.01 < heap[0][0]:
+                        stats['bound_cuts'] += 1
+                        continue
+                assignment[depth] = g
+                row = [assignment[depth_of_subject[s]] for s in range(subject_count)]
+                if required_ids and not required_ids.issubset({flat_classes[i]['class_id'] for i in row}):
+                    continue
+                rows.append(row)
+
+            if rows:
+                for row, score in zip(rows, scorer.score(np.array(rows), preferences)):
+                    push(row, score)
+            return within_budget
+
+        def search(depth: int, domains: List[int], state: Tuple) -> bool:
+            """Return False once the node budget is exhausted."""
+            if depth == subject_count - 1:
+                return score_last_subject(domains[0], state)
+
+            domain = domains[0]
+            for g in value_orders[depth]:
+                if not (domain >> g) & 1:
+                    continue
+                stats['nodes'] += 1
+                if max_search_nodes is not None and stats['nodes'] > max_search_nodes:
+                    stats['truncated'] = True
+                    return False
+
+                next_state = bound.extend(state, g)
+                if len(heap) >= max_combinations:
+                    # Scores are rounded to 2 decimals, allow for that slack.
+                    if bound.upper_bound(next_state, depth + 1) + 0.01 < heap[0][0]:
+                        stats['bound_cuts'] += 1
+                        continue
+
+                conflicts = conflict_masks[g]
+                next_domains = []
+                for remaining in domains[1:]:
+                    remaining &= ~conflicts
+                    if not remaining:
+                        break
+                    next_domains.append(remaining)
+                if len(next_domains) != len(domains) - 1:
+                    stats['forward_check_cuts'] += 1
+                    continue
+
+                assignment[depth] = g
+                if not search(depth + 1, next_domains, next_state):
+                    return False
+            return True
+
+        search(0, initial_domains, bound.initial_state())
+
+        ranked = sorted(heap, key=lambda entry: (-entry[0], tuple(-i for i in entry[1])))
+        return [(score, combo) for score, _, combo in ranked], stats
+
+    def _build_conflict_masks(self, flat_classes: List[Dict], owners: List[int]) -> List[int]:
+        """
+        Precompute the pairwise conflict matrix as one bitmask per class.
+
+        Bit ``j`` of ``masks[i]`` is set when classes ``i`` and ``j`` may not
+        appear together: a time conflict or the same subject code.
+        """
+        masks = [0] * len(flat_classes)
+        occupancies = [get_occupancy(cls) for cls in flat_classes]
+        subject_keys = [
+            str(cls.get('subject_id')).strip().upper() if cls.get('subject_id') is not None else None
+            for cls in flat_classes
+        ]
+        for i, class1 in enumerate(flat_classes):
+            for j in range(i + 1, len(flat_classes)):
+                if owners[i] == owners[j]:
+                    continue
+                class2 = flat_classes[j]
+                same_subject = subject_keys[i] is not None and subject_keys[i] == subject_keys[j]
+                if same_subject or self._classes_conflict(class1, class2, occupancies[i], occupancies[j]):
+                    masks[i] |= 1 << j
+                    masks[j] |= 1 << i
+        return masks
+
     def select_diverse_combinations(
         self,
         combinations: List[Dict],
@@ -353,49 +515,77 @@ class ScheduleCombinationGenerator:
         Returns:
             True if conflict exists, False otherwise
         """
+        occupancies = [get_occupancy(cls) for cls in classes]
         for i, class1 in enumerate(classes):
-            for class2 in classes[i+1:]:
-                # Step 1: Check study_week overlap
-                weeks1 = set(class1.get('study_week', []) or [])
-                weeks2 = set(class2.get('study_week', []) or [])
-
-                # Missing week data is treated conservatively as potentially
-                # overlapping. Only explicit, disjoint week sets prove safety.
-                common_weeks = weeks1 & weeks2
-                if weeks1 and weeks2 and not common_weeks:
-                    continue
-                
-                # Step 2: Check study_date overlap
-                days1 = set(self._parse_study_days(class1['study_date']))
-                days2 = set(self._parse_study_days(class2['study_date']))
-                
-                # If no common days, no conflict
-                common_days = days1 & days2
-                if not common_days:
-                    continue
-                
-                # Step 3: Check time overlap
-                start1 = self._parse_time(class1['study_time_start'])
-                end1 = self._parse_time(class1['study_time_end'])
-                start2 = self._parse_time(class2['study_time_start'])
-                end2 = self._parse_time(class2['study_time_end'])
-                
-                # Time conflict if:
-                # - start2 is within [start1, end1) OR
-                # - end2 is within (start1, end1] OR
-                # - class2 completely covers class1 (start2 <= start1 AND end2 >= end1)
-                
-                start2_in_range = start1 <= start2 < end1
-                end2_in_range = start1 < end2 <= end1
-                class2_covers_class1 = start2 <= start1 and end2 >= end1
-                
-                if start2_in_range or end2_in_range or class2_covers_class1:
-                    print(f"⚠️ [CONFLICT] Class {class1.get('class_id')} vs {class2.get('class_id')}:")
-                    print(f"  Weeks: {common_weeks}, Days: {common_days}")
-                    print(f"  Class1: {start1}-{end1}, Class2: {start2}-{end2}")
+            for j in range(i + 1, len(classes)):
+                class2 = classes[j]
+                if self._classes_conflict(class1, class2, occupancies[i], occupancies[j]):
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(
+                            "[CONFLICT] %s (%s %s-%s) vs %s (%s %s-%s)",
+                            class1.get('class_id'), class1.get('study_date'),
+                            class1.get('study_time_start'), class1.get('study_time_end'),
+                            class2.get('class_id'), class2.get('study_date'),
+                            class2.get('study_time_start'), class2.get('study_time_end'),
+                        )
                     return True  # Conflict found!
         
         return False  # No conflicts
+
+    def _classes_conflict(
+        self,
+        class1: Dict,
+        class2: Dict,
+        occupancy1: Optional[ScheduleOccupancy] = None,
+        occupancy2: Optional[ScheduleOccupancy] = None,
+    ) -> bool:
+        """Pairwise form of the ABSOLUTE RULE used by has_time_conflicts."""
+        # Fast path: precomputed week / day-slot bitsets (see app.utils.schedule_occupancy).
+        # Missing week data is treated conservatively as potentially overlapping.
+        conflict = occupancy_conflict(
+            occupancy1 or get_occupancy(class1),
+            occupancy2 or get_occupancy(class2),
+            missing_weeks_overlap=True,
+        )
+        if conflict is not None:
+            return conflict
+        return self._classes_conflict_by_fields(class1, class2)
+
+    def _classes_conflict_by_fields(self, class1: Dict, class2: Dict) -> bool:
+        """Field-by-field conflict check, used when a time is off the 5-minute grid."""
+        # Step 1: Check study_week overlap
+        weeks1 = set(class1.get('study_week', []) or [])
+        weeks2 = set(class2.get('study_week', []) or [])
+
+        # Missing week data is treated conservatively as potentially
+        # overlapping. Only explicit, disjoint week sets prove safety.
+        if weeks1 and weeks2 and not (weeks1 & weeks2):
+            return False
+        
+        # Step 2: Check study_date overlap
+        days1 = set(self._parse_study_days(class1['study_date']))
+        days2 = set(self._parse_study_days(class2['study_date']))
+        
+        # If no common days, no conflict
+        if not (days1 & days2):
+            return False
+        
+        # Step 3: Check time overlap
+        start1 = self._parse_time(class1['study_time_start'])
+        end1 = self._parse_time(class1['study_time_end'])
+        start2 = self._parse_time(class2['study_time_start'])
+        end2 = self._parse_time(class2['study_time_end'])
+        
+        # Time conflict if:
+        # - start2 is within [start1, end1) OR
+        # - end2 is within (start1, end1] OR
+        # - class2 completely covers class1 (start2 <= start1 AND end2 >= end1)
+        
+        start2_in_range = start1 <= start2 < end1
+        end2_in_range = start1 < end2 <= end1
+        class2_covers_class1 = start2 <= start1 and end2 >= end1
+        
+        return start2_in_range or end2_in_range or class2_covers_class1
     
     def calculate_schedule_metrics(self, classes: List[Dict]) -> Dict:
         """
@@ -604,3 +794,130 @@ class ScheduleCombinationGenerator:
             return 'morning'
         elif 720 <= minutes < 1080:  # 12:00 - 18:00
             return 'afternoon'
+
+
+class _ScoreUpperBound:
+    """
+    Admissible (never under-estimating) bound on calculate_combination_score
+    for a partial assignment, used to prune the combination search.
+
+    Per-class preference terms (time period, avoided periods, preferred and
+    avoided days) are additive, so the remaining subjects contribute at most
+    their best class. Day-count, average-start and credit terms are bounded
+    from the days, start minutes and credits still reachable.
+    """
+
+    def __init__(
+        self,
+        generator: 'ScheduleCombinationGenerator',
+        flat_classes: List[Dict],
+        preferences: Dict,
+        subject_count: int,
+    ):
+        self.subject_count = subject_count
+
+        self.reward_free_days = (
+            not preferences.get('free_days_is_not_important', False)
+            and bool(preferences.get('prefer_free_days'))
+        )
+        self.reward_continuous = (
+            not preferences.get('continuous_is_not_important', False)
+            and bool(preferences.get('prefer_continuous'))
+        )
+        time_is_important = not preferences.get('time_is_not_important', False)
+        self.prefer_early_start = time_is_important and bool(preferences.get('prefer_early_start'))
+        self.prefer_late_start = time_is_important and bool(preferences.get('prefer_late_start'))
+
+        time_period = preferences.get('time_period')
+        avoid_periods = preferences.get('avoid_time_periods', []) or []
+        day_is_important = not preferences.get('day_is_not_important', False)
+        prefer_days = (preferences.get('prefer_days', []) or []) if day_is_important else []
+        avoid_days = (preferences.get('avoid_days', []) or []) if day_is_important else []
+
+        day_bits: Dict[str, int] = {}
+        self.class_gain: List[float] = []
+        self.class_days: List[int] = []
+        self.class_start: List[int] = []
+        self.class_credits: List[float] = []
+        for cls in flat_classes:
+            days = generator._parse_study_days(cls['study_date'])
+            day_mask = 0
+            for day in days:
+                day_mask |= 1 << day_bits.setdefault(day, len(day_bits))
+
+            gain = 0.0
+            period = generator._get_time_period(cls['study_time_start'])
+            if time_period and period == time_period:
+                gain += 15 / subject_count
+            if avoid_periods and period in avoid_periods:
+                gain -= 5
+            if prefer_days and any(day in prefer_days for day in days):
+                gain += 15 / subject_count
+            if avoid_days and any(day in avoid_days for day in days):
+                gain -= 5
+
+            self.class_gain.append(gain)
+            self.class_days.append(day_mask)
+            self.class_start.append(generator._time_to_minutes(generator._parse_time(cls['study_time_start'])))
+            self.class_credits.append(cls.get('credits', 0) or 0)
+
+    def prepare_suffixes(self, members_by_depth: List[List[int]]) -> None:
+        """Precompute best-case totals over the subjects from each depth onwards."""
+        depth_count = len(members_by_depth)
+        self.suffix_gain = [0.0] * (depth_count + 1)
+        self.suffix_days = [0] * (depth_count + 1)
+        self.suffix_min_start = [0] * (depth_count + 1)
+        self.suffix_max_start = [0] * (depth_count + 1)
+        self.suffix_min_credits = [0.0] * (depth_count + 1)
+        self.suffix_max_credits = [0.0] * (depth_count + 1)
+        for depth in range(depth_count - 1, -1, -1):
+            members = members_by_depth[depth]
+            day_union = 0
+            for g in members:
+                day_union |= self.class_days[g]
+            self.suffix_gain[depth] = self.suffix_gain[depth + 1] + max(self.class_gain[g] for g in members)
+            self.suffix_days[depth] = self.suffix_days[depth + 1] | day_union
+            self.suffix_min_start[depth] = self.suffix_min_start[depth + 1] + min(self.class_start[g] for g in members)
+            self.suffix_max_start[depth] = self.suffix_max_start[depth + 1] + max(self.class_start[g] for g in members)
+            self.suffix_min_credits[depth] = self.suffix_min_credits[depth + 1] + min(self.class_credits[g] for g in members)
+            self.suffix_max_credits[depth] = self.suffix_max_credits[depth + 1] + max(self.class_credits[g] for g in members)
+
+    def initial_state(self) -> Tuple[float, int, int, float]:
+        return (0.0, 0, 0, 0.0)
+
+    def extend(self, state: Tuple[float, int, int, float], g: int) -> Tuple[float, int, int, float]:
+        gain, day_mask, start_sum, credits = state
+        return (
+            gain + self.class_gain[g],
+            day_mask | self.class_days[g],
+            start_sum + self.class_start[g],
+            credits + self.class_credits[g],
+        )
+
+    def upper_bound(self, state: Tuple[float, int, int, float], depth: int) -> float:
+        gain, day_mask, start_sum, credits = state
+        bound = 100.0 + gain + self.suffix_gain[depth]
+
+        if self.reward_free_days:
+            # Free days only shrink as classes are added.
+            bound += (7 - bin(day_mask).count('1')) * 5
+        if self.reward_continuous:
+            # A continuous day is a study day, and study days come from reachable days.
+            bound += bin(day_mask | self.suffix_days[depth]).count('1') * 5
+        # The "prefer_continuous == False" penalty is never positive, so 0 bounds it.
+
+        if self.prefer_early_start:
+            avg_start = (start_sum + self.suffix_min_start[depth]) / self.subject_count
+            bound += max(0, (720 - avg_start) / 300 * 10)
+        if self.prefer_late_start:
+            avg_start = (start_sum + self.suffix_max_start[depth]) / self.subject_count
+            bound += max(0, (avg_start - 420) / 360 * 10)
+
+        min_credits = credits + self.suffix_min_credits[depth]
+        max_credits = credits + self.suffix_max_credits[depth]
+        if max_credits >= 12 and min_credits <= 18:
+            bound += 5
+        elif max_credits < 12:
+            bound -= (12 - max_credits)
+
+        return bound
@@ -12,8 +12,10 @@ def calculate_student_stats(student_id: str, db: Session) -> Dict[str, Any]:
     if not student:
         raise ValueError(f"Student {student_id} not found")
 
-    # Lấy tất cả learned subjects của student
-    learned_subjects = db.query(LearnedSubject).filter(
+    # Lấy tất cả learned subjects của student kèm tín chỉ môn học (một query)
+    learned_subjects = db.query(LearnedSubject.letter_grade, Subject.credits).join(
+        Subject, Subject.id == LearnedSubject.subject_id
+    ).filter(
         LearnedSubject.student_id == student_id
     ).all()
 
@@ -35,14 +37,8 @@ def calculate_student_stats(student_id: str, db: Session) -> Dict[str, Any]:
     failed_credits = 0
     passed_credits = 0
 
-    for learned in learned_subjects:
-        # Lấy subject để có credits
-        subject = db.query(Subject).filter(Subject.id == learned.subject_id).first()
-        if not subject:
-            continue
-
-        grade_score = letter_grade_to_score(learned.grade)
-        credits = subject.credits
+    for letter_grade, credits in learned_subjects:
+        grade_score = letter_grade_to_score(letter_grade)
 
         # Cộng vào tổng điểm và tín chỉ
         total_points += grade_score * credits
@@ -143,7 +139,9 @@ def update_semester_gpa(student_id: str, semester: str, db: Session) -> None:
     Tính và cập nhật GPA cho một semester cụ thể
     """
     # Lấy các learned subjects trong semester này
-    learned_subjects = db.query(LearnedSubject).filter(
+    learned_subjects = db.query(LearnedSubject.letter_grade, Subject.credits).join(
+        Subject, Subject.id == LearnedSubject.subject_id
+    ).filter(
         LearnedSubject.student_id == student_id,
         LearnedSubject.semester == semester
     ).all()
@@ -154,13 +152,8 @@ def update_semester_gpa(student_id: str, semester: str, db: Session) -> None:
     total_points = 0.0
     total_credits = 0
 
-    for learned in learned_subjects:
-        subject = db.query(Subject).filter(Subject.id == learned.subject_id).first()
-        if not subject:
-            continue
-
-        grade_score = letter_grade_to_score(learned.grade)
-        credits = subject.credits
+    for letter_grade, credits in learned_subjects:
+        grade_score = letter_grade_to_score(letter_grade)
 
         total_points += grade_score * credits
         total_credits += credits
@@ -0,0 +1,57 @@
+"""
+Process-wide cache for parsed JSON config files
+
+Rule engines are created per request but their JSON configs (rules_config.json,
+class_rules_config.json, elective_modules_config.json) almost never change.
+load_json_config() parses a file once and re-reads it only when its
+(mtime, size) stamp changes, so editing a config on disk still takes effect
+without a restart.
+
+The returned object is shared between callers and must be treated as
+read-only.
+"""
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+_cache: Dict[Tuple[str, Optional[Callable]], Tuple[Tuple[int, int], Any]] = {}
+_lock = threading.Lock()
+
+
+def load_json_config(path: str, transform: Optional[Callable[[Any], Any]] = None) -> Any:
+    """
+    Parsed content of a JSON file, cached until the file changes.
+
+    Args:
+        path: Config file path
+        transform: Optional function applied to the parsed JSON; its result is
+            what gets cached, so derived structures are rebuilt only on change
+
+    Raises:
+        FileNotFoundError / json.JSONDecodeError, same as json.load(open(path))
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    key = (path, transform)
+
+    with _lock:
+        cached = _cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if transform is not None:
+        data = transform(data)
+
+    with _lock:
+        _cache[key] = (stamp, data)
+    return data
+
+
+def clear_config_cache() -> None:
+    """Drop every cached config (tests / forced reload)"""
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,147 @@
+"""
+Precomputed timetable occupancy for O(1) class schedule conflict checks
+
+A class meets on a fixed set of study weeks, on a fixed set of weekdays, during
+one time interval. Its occupancy is therefore the product
+weeks x (day, 5-minute slot), stored as two Python-int bitsets:
+
+    week_mask: one bit per study week
+    slot_mask: one bit per (day, 5-minute slot) over the whole week
+
+Two products intersect exactly when both factors intersect, so a conflict
+check is ``week_mask & week_mask`` plus ``slot_mask & slot_mask`` instead of
+rebuilding sets and re-parsing ``study_date`` / ``study_time_*`` per pair.
+Keeping the factors separate is ~16x smaller than the expanded
+week x day x slot bitset and gives the same answer.
+
+Intervals that the 5-minute grid cannot represent exactly (unaligned or
+empty/inverted times) are marked ``exact=False`` and callers fall back to
+their field-by-field comparison for those pairs.
+"""
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+SLOT_MINUTES = 5
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+# Key under which loaders attach the occupancy to a class dict.
+OCCUPANCY_KEY = "_occupancy"
+
+# Bit positions for day names and week values. Known weekdays are fixed;
+# anything else (odd spellings, non-int weeks) gets the next free bit so the
+# bitsets keep plain set-equality semantics.
+_DAY_INDEX: Dict[str, int] = {
+    day: index
+    for index, day in enumerate(
+        ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+    )
+}
+_WEEK_INDEX: Dict[Any, int] = {}
+
+
+@dataclass(frozen=True)
+class ScheduleOccupancy:
+    """Bitset encoding of one class's weekly timetable"""
+    week_mask: int
+    slot_mask: int
+    exact: bool
+
+
+def _day_bit(day: str) -> int:
+    index = _DAY_INDEX.get(day)
+    if index is None:
+        index = _DAY_INDEX.setdefault(day, len(_DAY_INDEX))
+    return index
+
+
+def _week_bit(week: Any) -> int:
+    index = _WEEK_INDEX.get(week)
+    if index is None:
+        index = _WEEK_INDEX.setdefault(week, len(_WEEK_INDEX))
+    return index
+
+
+def parse_study_days(study_date: Optional[str]) -> List[str]:
+    """Parse "Monday,Wednesday" into day names (same rules as the rule engines)"""
+    if not study_date:
+        return []
+    return [day.strip() for day in study_date.split(',')]
+
+
+def time_to_minutes(time_val: Any) -> int:
+    """Minutes since midnight for time / timedelta / "HH:MM" values (0 if unparseable)"""
+    if isinstance(time_val, time):
+        return time_val.hour * 60 + time_val.minute
+    if isinstance(time_val, timedelta):
+        total_seconds = int(time_val.total_seconds())
+        return (total_seconds // 3600) * 60 + (total_seconds % 3600) // 60
+    if isinstance(time_val, str):
+        try:
+            parsed = datetime.strptime(time_val, '%H:%M').time()
+        except ValueError:
+            return 0
+        return parsed.hour * 60 + parsed.minute
+    return 0
+
+
+def build_occupancy(cls: Dict) -> ScheduleOccupancy:
+    """Encode a class dict (study_week, study_date, study_time_start/end)"""
+    week_mask = 0
+    for week in set(cls.get('study_week', []) or []):
+        week_mask |= 1 << _week_bit(week)
+
+    start = time_to_minutes(cls.get('study_time_start'))
+    end = time_to_minutes(cls.get('study_time_end'))
+    exact = start < end and start % SLOT_MINUTES == 0 and end % SLOT_MINUTES == 0
+
+    slot_mask = 0
+    if start < end:
+        first_slot = start // SLOT_MINUTES
+        last_slot = -(-end // SLOT_MINUTES)  # ceil
+        interval_mask = ((1 << (last_slot - first_slot)) - 1) << first_slot
+        for day in set(parse_study_days(cls.get('study_date'))):
+            slot_mask |= interval_mask << (_day_bit(day) * SLOTS_PER_DAY)
+
+    return ScheduleOccupancy(week_mask=week_mask, slot_mask=slot_mask, exact=exact)
+
+
+def get_occupancy(cls: Dict) -> ScheduleOccupancy:
+    """Return the occupancy attached at load time, or encode it on the fly"""
+    occupancy = cls.get(OCCUPANCY_KEY)
+    if occupancy is None:
+        occupancy = build_occupancy(cls)
+    return occupancy
+
+
+def attach_occupancy(classes: Iterable[Dict]) -> None:
+    """Encode each class once when rows are loaded, so later checks are bit ANDs"""
+    for cls in classes:
+        cls[OCCUPANCY_KEY] = build_occupancy(cls)
+
+
+def occupancy_conflict(
+    first: ScheduleOccupancy,
+    second: ScheduleOccupancy,
+    missing_weeks_overlap: bool,
+) -> Optional[bool]:
+    """
+    Check two encoded classes for a schedule conflict.
+
+    Args:
+        missing_weeks_overlap: how to treat a class without week data; True
+            means "could be any week" (conservative), False means "no weeks"
+
+    Returns:
+        True/False, or None when an inexact encoding means the caller must
+        compare the raw fields.
+    """
+    if first.week_mask and second.week_mask:
+        if not first.week_mask & second.week_mask:
+            return False
+    elif not missing_weeks_overlap:
+        return False
+
+    if not (first.exact and second.exact):
+        return None
+    return bool(first.slot_mask & second.slot_mask)
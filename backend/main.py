@@ -1,7 +1,8 @@
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 from fastapi import FastAPI, Depends, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 import os
 from sqlalchemy import text
 from app.db.database import engine
@@ -28,7 +29,10 @@ from app.utils.jwt_utils import get_current_user
 from dotenv import load_dotenv
 from app.agents.orchestration_metrics import get_orchestration_metrics
 from app.agents.orchestration_alerts import evaluate_orchestration_alerts
-from app.llm.llm_client import LLMClient
+from app.core.tracing import get_trace_recorder
+from app.llm.llm_client import get_llm_client
+from app.core.http_client import close_http_client
+from app.core.logging_config import configure_logging, shutdown_logging
 
 try:
     from app.cache.redis_cache import get_redis_cache
@@ -39,7 +43,17 @@ load_dotenv()
 
 database.Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="University API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+    _validate_agent_env_or_raise()
+    yield
+    await close_http_client()
+    shutdown_logging()
+
+
+app = FastAPI(title="University API", lifespan=lifespan)
 
 
 def _is_agent_enabled() -> bool:
@@ -66,11 +80,6 @@ def _validate_agent_env_or_raise() -> None:
         raise RuntimeError("AGENT_INTERNAL_TOOL_KEY must be strong in production (>=24 chars and not default)")
 
 
-@app.on_event("startup")
-def _startup_validation() -> None:
-    _validate_agent_env_or_raise()
-
-
 def _check_db_ready() -> dict:
     session = SessionLocal()
     try:
@@ -97,9 +106,7 @@ async def _check_llm_ready() -> dict:
     if not _is_agent_enabled():
         return {"status": "skipped", "reason": "agent disabled"}
     try:
-        llm = LLMClient()
-        state = llm.circuit_state()
-        await llm.close()
+        state = get_llm_client().circuit_state()
         return {"status": "ok", "circuit": state}
     except Exception as exc:
         return {"status": "error", "error": str(exc)}
@@ -201,6 +208,38 @@ def orchestration_alerts_snapshot(
     snapshot = get_orchestration_metrics().snapshot()
     return evaluate_orchestration_alerts(snapshot)
 
+
+@app.get("/metrics")
+def orchestration_metrics_prometheus(
+    x_internal_metrics_key: str | None = Header(default=None, alias="X-Internal-Metrics-Key"),
+    authorization: str | None = Header(default=None),
+):
+    # Prometheus scrape configs set "Authorization: Bearer <key>" rather than custom headers
+    expected = os.getenv("METRICS_INTERNAL_KEY", os.getenv("AGENT_INTERNAL_TOOL_KEY", "")).strip()
+    bearer = (authorization or "").removeprefix("Bearer ").strip()
+    if expected and expected not in (x_internal_metrics_key, bearer):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return PlainTextResponse(
+        get_orchestration_metrics().prometheus_text(),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+@app.get("/internal/traces/slowest")
+def slowest_request_traces(
+    limit: int = 10,
+    name: str | None = None,
+    x_internal_metrics_key: str | None = Header(default=None, alias="X-Internal-Metrics-Key"),
+):
+    expected = os.getenv("METRICS_INTERNAL_KEY", os.getenv("AGENT_INTERNAL_TOOL_KEY", "")).strip()
+    if expected and x_internal_metrics_key != expected:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    recorder = get_trace_recorder()
+    return {
+        "buffered": len(recorder),
+        "traces": recorder.slowest(limit=min(max(limit, 1), 100), name=name),
+    }
+
 # Log the first 7 characters of ORCHESTRATOR_API_KEY
 orchestrator_api_key = os.getenv("ORCHESTRATOR_API_KEY", "").strip()
 if not orchestrator_api_key:
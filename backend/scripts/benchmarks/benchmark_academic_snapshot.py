@@ -0,0 +1,131 @@
+"""
+Benchmark: snapshot học tập theo sinh viên — đọc thẳng DB vs. session memo + L1
+================================================================================
+
+Giả lập --requests request, mỗi request (một session) chạy các consumer dùng
+chung dữ liệu của một sinh viên:
+    • SubjectSuggestionRuleEngine: get_student_data, calculate_student_semester_number,
+      get_available_subjects
+    • graduation_progress (ChatbotService.process_graduation_progress)
+    • GET /students/{id}/academic-details
+    • ChatbotService._get_learned_subject_map
+So sánh:
+    • uncached : ACADEMIC_SNAPSHOT_CACHE_ENABLED=false — mỗi request build snapshot
+                 một lần (session memo) từ DB
+    • cached   : L1 in-process theo version semantic-cache; --write-every N commit một
+                 điểm mới mỗi N request để snapshot bị thay
+Mỗi câu SQL cộng thêm --rtt-ms (giả lập round-trip tới MySQL qua mạng).
+
+Cách dùng:
+    cd backend
+    python -m scripts.benchmarks.benchmark_academic_snapshot --requests 500 --rtt-ms 0.5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import time as timer
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BACKEND_ROOT))
+
+import app.agents  # noqa: E402,F401  (đăng ký session hooks của semantic cache)
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.db.database import Base  # noqa: E402
+from app.models.__init__ import (  # noqa: E402
+    Course,
+    CourseSubject,
+    Department,
+    LearnedSubject,
+    SemesterGPA,
+    Student,
+    Subject,
+)
+from app.routes.student_routes import get_student_academic_details  # noqa: E402
+from app.rules.subject_suggestion_rules import SubjectSuggestionRuleEngine  # noqa: E402
+from app.services import academic_snapshot_service  # noqa: E402
+from app.services.chatbot_service import ChatbotService  # noqa: E402
+
+SUBJECTS = 160
+GRADES = ["A", "B+", "B", "C+", "C", "D+", "D", "F"]
+
+
+def build_database(rtt_ms: float):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        db.add(Department(id="SOICT", name="Trường CNTT"))
+        db.add(Course(id=1, course_id="IT1", course_name="Khoa học máy tính"))
+        db.add_all(Subject(id=i, subject_id=f"IT{3000 + i}", subject_name=f"Môn {i}", credits=3)
+                   for i in range(1, SUBJECTS + 1))
+        db.add(Student(id=1, student_name="SV", email="sv@example.com", password="x", course_id=1,
+                       department_id="SOICT", cpa=3.1, warning_level="Cảnh cáo mức 0"))
+        db.flush()
+        db.add_all(CourseSubject(course_id=1, subject_id=i, learning_semester=i % 8 + 1)
+                   for i in range(1, SUBJECTS + 1))
+        db.add_all(LearnedSubject(student_id=1, subject_id=i, subject_name=f"Môn {i}", credits=3,
+                                  letter_grade=GRADES[i % len(GRADES)], semester=f"202{i % 4}{i % 2 + 1}")
+                   for i in range(1, 70))
+        db.add_all(SemesterGPA(student_id=1, semester=f"202{i}1", gpa=3.0, total_credits=18) for i in range(4))
+        db.commit()
+
+    counter = {"statements": 0}
+
+    def before_cursor_execute(*_):
+        counter["statements"] += 1
+        if rtt_ms:
+            timer.sleep(rtt_ms / 1000)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    return engine, factory, counter
+
+
+def one_request(db) -> None:
+    engine = SubjectSuggestionRuleEngine(db)
+    engine.get_student_data(1)
+    engine.calculate_student_semester_number(1, "20251")
+    engine.get_available_subjects(1, "20251")
+    service = ChatbotService(db)
+    asyncio.run(service.process_graduation_progress(1))
+    service._get_learned_subject_map(1, list(range(1, 40)))
+    get_student_academic_details(1, db=db, current_student=None)
+
+
+def measure(label: str, enabled: bool, args) -> None:
+    academic_snapshot_service.ACADEMIC_SNAPSHOT_CACHE_ENABLED = enabled
+    engine, factory, counter = build_database(args.rtt_ms)
+    start = timer.perf_counter()
+    for index in range(args.requests):
+        if args.write_every and index and index % args.write_every == 0:
+            with factory() as db:
+                db.add(LearnedSubject(student_id=1, subject_id=SUBJECTS, subject_name="Môn mới", credits=3,
+                                      letter_grade="B", semester="20251"))
+                db.commit()
+        with factory() as db:
+            one_request(db)
+    elapsed = timer.perf_counter() - start
+    print(f"  {label:8}: {elapsed:7.2f} s | {counter['statements']:6d} câu SQL | "
+          f"{elapsed / args.requests * 1000:6.2f} ms/request")
+    engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Academic snapshot: uncached vs session memo + L1")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--write-every", type=int, default=50)
+    parser.add_argument("--rtt-ms", type=float, default=0.5)
+    args = parser.parse_args()
+
+    print(f"{args.requests} request, commit điểm mỗi {args.write_every} request, rtt {args.rtt_ms} ms/câu SQL")
+    measure("uncached", False, args)
+    measure("cached", True, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Load test: chat endpoint DB work on sync Session vs AsyncSession
+================================================================
+
+Giả lập N stream chat chạy song song trên cùng một event loop. Mỗi stream:
+    • load dữ liệu gợi ý (một query chậm, SQLite hàm sleep_ms giả lập độ trễ DB)
+    • lưu lịch sử hội thoại (save_chat_turn)
+và đo:
+    • p50 / p99 thời gian hoàn thành mỗi stream
+    • độ trễ event loop (heartbeat 5 ms) — sync Session chặn loop trong lúc query
+
+    sync  : Session + ChatHistoryService (như endpoint cũ)
+    async : AsyncSession + AsyncChatHistoryService, loader chạy qua run_sync
+
+Cách dùng:
+    cd backend
+    python -m scripts.benchmarks.benchmark_async_db --streams 50 --query-ms 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time as timer
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BACKEND_ROOT))
+
+from sqlalchemy import create_engine, event, text  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool  # noqa: E402
+
+from app.db.database import Base, to_async_database_url  # noqa: E402
+from app.models.course_model import Course  # noqa: E402
+from app.models.department_model import Department  # noqa: E402
+from app.models.student_model import Student  # noqa: E402
+from app.services.chat_history_service import AsyncChatHistoryService, ChatHistoryService  # noqa: E402
+
+HEARTBEAT_SECONDS = 0.005
+
+
+def add_sleep_function(dbapi_connection, _) -> None:
+    dbapi_connection.create_function("sleep_ms", 1, lambda ms: timer.sleep(ms / 1000) or 0)
+
+
+def prepare_database(url: str) -> int:
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as session:
+        department = Department(id="D01", name="Benchmark")
+        course = Course(course_id="KBENCH", course_name="Benchmark course")
+        session.add_all([department, course])
+        session.flush()
+        session.add(Student(
+            student_name="Benchmark Student",
+            email="bench@example.com",
+            password="hashed",
+            course_id=course.id,
+            department_id=department.id,
+        ))
+        session.commit()
+        conversation_id = ChatHistoryService(session).create_conversation(1, "Benchmark").id
+    engine.dispose()
+    return conversation_id
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run_load(stream: Callable[[int], Awaitable[None]], streams: int) -> Dict[str, float]:
+    lags: List[float] = []
+    durations: List[float] = []
+    stop = asyncio.Event()
+
+    async def heartbeat() -> None:
+        while not stop.is_set():
+            started = timer.perf_counter()
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            lags.append(timer.perf_counter() - started - HEARTBEAT_SECONDS)
+
+    async def timed(index: int) -> None:
+        # Mọi request đến cùng lúc: latency tính từ lúc gửi, không phải lúc task được chạy
+        await stream(index)
+        durations.append(timer.perf_counter() - started)
+
+    beat = asyncio.create_task(heartbeat())
+    await asyncio.sleep(HEARTBEAT_SECONDS * 2)
+    started = timer.perf_counter()
+    await asyncio.gather(*(timed(index) for index in range(streams)))
+    wall = timer.perf_counter() - started
+    stop.set()
+    await beat
+
+    return {
+        "p50_ms": percentile(durations, 50) * 1000,
+        "p99_ms": percentile(durations, 99) * 1000,
+        "wall_ms": wall * 1000,
+        "max_lag_ms": max(lags) * 1000,
+    }
+
+
+async def benchmark(
+    url: str, conversation_id: int, streams: int, query_ms: float, pool_size: int
+) -> Dict[str, Dict[str, float]]:
+    sync_engine = create_engine(url, poolclass=QueuePool, pool_size=pool_size, max_overflow=0)
+    event.listen(sync_engine, "connect", add_sleep_function)
+    SyncSession = sessionmaker(bind=sync_engine)
+
+    async_engine = create_async_engine(
+        to_async_database_url(url), poolclass=AsyncAdaptedQueuePool, pool_size=pool_size, max_overflow=0
+    )
+    event.listen(async_engine.sync_engine, "connect", add_sleep_function)
+    AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    payload = {"text": "Gợi ý môn học", "intent": "subject_registration_suggestion", "data": []}
+
+    async def sync_stream(index: int) -> None:
+        with SyncSession() as session:
+            session.execute(text("SELECT sleep_ms(:ms)"), {"ms": query_ms})
+            ChatHistoryService(session).save_chat_turn(1, f"gợi ý môn {index}", payload, conversation_id)
+
+    async def async_stream(index: int) -> None:
+        async with AsyncSession() as session:
+            await session.run_sync(
+                lambda sync_session: sync_session.execute(text("SELECT sleep_ms(:ms)"), {"ms": query_ms})
+            )
+            await AsyncChatHistoryService(session).save_chat_turn(1, f"gợi ý môn {index}", payload, conversation_id)
+
+    try:
+        return {
+            "sync": await run_load(sync_stream, streams),
+            "async": await run_load(async_stream, streams),
+        }
+    finally:
+        sync_engine.dispose()
+        await async_engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sync vs async DB session load test")
+    parser.add_argument("--streams", type=int, default=50)
+    parser.add_argument("--query-ms", type=float, default=20.0)
+    parser.add_argument("--pool-size", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{Path(tmp) / 'benchmark.db'}"
+        conversation_id = prepare_database(url)
+        results = asyncio.run(benchmark(url, conversation_id, args.streams, args.query_ms, args.pool_size))
+
+    print(f"{args.streams} concurrent streams, {args.query_ms:.0f} ms loader query, pool {args.pool_size}")
+    for label, stats in results.items():
+        print(f"{label:>6}: p50 {stats['p50_ms']:8.1f} ms | p99 {stats['p99_ms']:8.1f} ms | "
+              f"wall {stats['wall_ms']:8.1f} ms | max loop lag {stats['max_lag_ms']:8.1f} ms")
+    sync_p99, async_p99 = results["sync"]["p99_ms"], results["async"]["p99_ms"]
+    print(f"p99 x{sync_p99 / async_p99:.1f}, loop lag "
+          f"x{results['sync']['max_lag_ms'] / max(results['async']['max_lag_ms'], 0.001):.1f}")
+
+
+if __name__ == "__main__":
+    main()
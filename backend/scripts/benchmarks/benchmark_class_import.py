@@ -0,0 +1,117 @@
+"""
+Benchmark: import thời khóa biểu — POST /classes/ từng dòng vs. POST /classes/bulk
+==================================================================================
+
+Giả lập admin import TKB một học kỳ gồm --classes mã lớp, mỗi mã 2 buổi/tuần:
+    • per-row : như trang ScheduleManagement cũ — mỗi dòng một lần create_class
+                (validate Pydantic, INSERT, commit, refresh)
+    • bulk    : import_classes — validate theo cột (mỗi giá trị giờ/ngày khác
+                nhau parse một lần), upsert --chunk dòng mỗi câu lệnh
+    • re-bulk : import lại cùng file (toàn bộ là UPDATE qua ON CONFLICT/ON DUPLICATE KEY)
+Mỗi câu SQL cộng thêm --rtt-ms (giả lập round-trip tới MySQL qua mạng).
+
+Cách dùng:
+    cd backend
+    python -m scripts.benchmarks.benchmark_class_import --classes 3000 --rtt-ms 0.5
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time as timer
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BACKEND_ROOT))
+
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.db.database import Base  # noqa: E402
+from app.models.__init__ import Class, Department, Subject  # noqa: E402
+from app.routes.class_routes import create_class  # noqa: E402
+from app.schemas.class_schema import ClassCreate  # noqa: E402
+from app.services.class_import_service import CLASS_IMPORT_CHUNK, import_classes  # noqa: E402
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+SLOTS = [("06:45", "09:10"), ("09:20", "11:45"), ("12:30", "14:55"), ("15:05", "17:30")]
+SUBJECTS = 400
+
+
+def build_rows(classes: int):
+    rng = random.Random(7)
+    rows = []
+    for index in range(classes):
+        subject = rng.randrange(SUBJECTS)
+        for day in rng.sample(DAYS, 2):
+            start, end = rng.choice(SLOTS)
+            rows.append({
+                "class_id": str(150000 + index), "class_name": f"Môn {subject}", "subject_id": subject + 1,
+                "classroom": f"D{rng.randint(3, 9)}-{rng.randint(101, 509)}", "class_type": "LT+BT",
+                "study_date": day, "study_time_start": start, "study_time_end": end,
+                "study_week": [week for week in range(2, 19) if week != 10],
+            })
+    return rows
+
+
+def build_session(rtt_ms: float):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(Department(id="SOICT", name="Trường CNTT"))
+    session.add_all(Subject(id=i + 1, subject_id=f"IT{3000 + i}", subject_name=f"Môn {i}", credits=3)
+                    for i in range(SUBJECTS))
+    session.commit()
+
+    counter = {"statements": 0}
+
+    def before_cursor_execute(*_):
+        counter["statements"] += 1
+        if rtt_ms:
+            timer.sleep(rtt_ms / 1000)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    return engine, session, counter
+
+
+def per_row_import(db, rows, _args) -> None:
+    for row in rows:
+        create_class(ClassCreate(**row), db=db)
+
+
+def bulk_import(db, rows, args) -> None:
+    import_classes(db, list(enumerate(rows, start=1)), chunk_size=args.chunk)
+    db.commit()
+
+
+def measure(label: str, runs, args, rows) -> None:
+    engine, db, counter = build_session(args.rtt_ms)
+    for index, run in enumerate(runs):
+        counter["statements"] = 0
+        start = timer.perf_counter()
+        run(db, rows, args)
+        elapsed = timer.perf_counter() - start
+        name = label if index == 0 else f"re-{label}"
+        print(f"  {name:8}: {elapsed:7.2f} s | {counter['statements']:6d} câu SQL | "
+              f"{db.query(Class).count()} buổi học")
+    db.close()
+    engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Timetable import: per-row create vs bulk upsert")
+    parser.add_argument("--classes", type=int, default=3000)
+    parser.add_argument("--chunk", type=int, default=CLASS_IMPORT_CHUNK)
+    parser.add_argument("--rtt-ms", type=float, default=0.5)
+    args = parser.parse_args()
+
+    rows = build_rows(args.classes)
+    print(f"{args.classes} mã lớp, {len(rows)} buổi học, chunk {args.chunk}, rtt {args.rtt_ms} ms/câu SQL")
+    measure("per-row", [per_row_import], args, rows)
+    measure("bulk", [bulk_import, bulk_import], args, rows)
+
+
+if __name__ == "__main__":
+    main()
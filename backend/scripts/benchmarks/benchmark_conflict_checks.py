@@ -0,0 +1,90 @@
+"""
+Micro-benchmark: class conflict checks, field parsing vs. precomputed bitsets
+============================================================================
+
+Đo thời gian kiểm tra trùng lịch giữa các cặp lớp:
+    • field   : dựng lại set(study_week), parse study_date / study_time_* mỗi cặp
+    • bitmask : dùng occupancy đã mã hóa sẵn khi load lớp (một phép AND)
+
+cho cả ``ScheduleCombinationGenerator._classes_conflict`` và
+``ClassSuggestionRuleEngine.has_schedule_conflict``.
+
+Cách dùng:
+    cd backend
+    python -m scripts.benchmarks.benchmark_conflict_checks --classes 400
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time as timer
+from datetime import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.rules.class_suggestion_rules import ClassSuggestionRuleEngine  # noqa: E402
+from app.services.schedule_combination_service import ScheduleCombinationGenerator  # noqa: E402
+from app.utils.schedule_occupancy import attach_occupancy  # noqa: E402
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+# HUST period start times (minutes since midnight)
+STARTS = [6 * 60 + 45, 8 * 60 + 25, 9 * 60 + 20, 10 * 60 + 15, 12 * 60 + 30, 14 * 60 + 10, 15 * 60 + 5]
+
+
+def build_classes(rng: random.Random, count: int) -> List[Dict]:
+    classes = []
+    for index in range(count):
+        start = rng.choice(STARTS)
+        classes.append({
+            "class_id": f"{index:06d}",
+            "study_week": rng.choice([list(range(2, 10)), list(range(11, 19)), list(range(2, 19))]),
+            "study_date": ",".join(rng.sample(DAYS, rng.choice([1, 2]))),
+            "study_time_start": time(start // 60, start % 60),
+            "study_time_end": time(*divmod(start + rng.choice([90, 135, 170]), 60)),
+        })
+    return classes
+
+
+def time_pairs(check: Callable[[Dict, Dict], bool], classes: List[Dict]) -> float:
+    started = timer.perf_counter()
+    for i, first in enumerate(classes):
+        for second in classes[i + 1:]:
+            check(first, second)
+    return timer.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Class conflict check micro-benchmark")
+    parser.add_argument("--classes", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    classes = build_classes(random.Random(args.seed), args.classes)
+    encoded = [dict(cls) for cls in classes]
+    started = timer.perf_counter()
+    attach_occupancy(encoded)
+    encode_ms = (timer.perf_counter() - started) * 1000
+
+    generator = ScheduleCombinationGenerator()
+    engine = ClassSuggestionRuleEngine.__new__(ClassSuggestionRuleEngine)
+    pairs = args.classes * (args.classes - 1) // 2
+    print(f"{args.classes} classes, {pairs} pairs, one-off encoding {encode_ms:.1f} ms")
+
+    cases = [
+        ("generator", generator._classes_conflict_by_fields, generator._classes_conflict),
+        ("rule engine", engine._has_schedule_conflict_by_fields, engine.has_schedule_conflict),
+    ]
+    for label, field_check, bitmask_check in cases:
+        field_s = time_pairs(field_check, classes)
+        bitmask_s = time_pairs(bitmask_check, encoded)
+        print(f"{label:>12}: field {field_s * 1e9 / pairs:8.0f} ns/pair | "
+              f"bitmask {bitmask_s * 1e9 / pairs:8.0f} ns/pair | speedup x{field_s / bitmask_s:.1f}")
+
+
+if __name__ == "__main__":
+    main()
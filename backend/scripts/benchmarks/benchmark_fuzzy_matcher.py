@@ -0,0 +1,110 @@
+"""
+Micro-benchmark: FuzzyMatcher lookup, full scan vs. n-gram prefilter
+====================================================================
+
+Sinh catalogue môn/lớp giả lập rồi đo thời gian match_subject / match_class /
+get_class_candidates khi:
+    • full     : quét WRatio toàn bộ danh sách (PREFILTER_MIN_ENTRIES rất lớn)
+    • indexed  : inverted index trigram/token lọc trước candidates
+và match_subjects cho cả batch query (process.cdist khi quét toàn bộ).
+
+Cách dùng:
+    cd backend
+    python -m scripts.benchmarks.benchmark_fuzzy_matcher --subjects 2000 --classes 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time as timer
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.services import fuzzy_matcher as fm  # noqa: E402
+
+WORDS = (
+    "giai tich dai so vat ly hoa hoc lap trinh huong doi tuong co so du lieu mang may tinh "
+    "cau truc thuat toan he dieu hanh tri tue nhan tao kinh te chinh tri triet xac suat thong ke "
+    "ky thuat phan mem an toan thong tin do hoa dien tu vien thong co khi dong luc nhiet"
+).split()
+
+
+def build_catalogue(rng: random.Random, subjects: int, classes: int) -> Tuple[List[Tuple[str, str, Set[int]]], List[Dict]]:
+    subject_rows = []
+    for index in range(subjects):
+        name = " ".join(rng.sample(WORDS, rng.randint(2, 5))) + rng.choice(["", " 1", " 2", " I", " II"])
+        subject_rows.append((f"S{index:05d}", name.title(), set(rng.sample(range(1, 21), rng.randint(0, 3)))))
+    class_rows = []
+    for index in range(classes):
+        subject_id, subject_name, course_ids = rng.choice(subject_rows)
+        class_rows.append({
+            "class_id": f"{100000 + index}",
+            "class_name": subject_name + rng.choice(["", " (TN)", f" - Nhóm {index % 9}"]),
+            "subject_id": subject_id,
+            "subject_name": subject_name,
+            "course_ids": set(course_ids),
+        })
+    return subject_rows, class_rows
+
+
+def load_matcher(subjects, classes) -> fm.FuzzyMatcher:
+    matcher = fm.FuzzyMatcher()
+    matcher._publish(list(subjects), list(classes))
+    matcher._last_refresh = datetime.now()
+    return matcher
+
+
+def time_queries(matcher: fm.FuzzyMatcher, queries: List[str], course_id: int) -> Dict[str, float]:
+    timings = {}
+    for label, call in [
+        ("match_subject", lambda q: matcher.match_subject(q, preferred_course_id=course_id)),
+        ("match_class", lambda q: matcher.match_class(q, preferred_course_id=course_id)),
+        ("get_class_candidates", lambda q: matcher.get_class_candidates(q)),
+    ]:
+        started = timer.perf_counter()
+        for query in queries:
+            call(query)
+        timings[label] = (timer.perf_counter() - started) * 1000 / len(queries)
+    started = timer.perf_counter()
+    matcher.match_subjects(queries, preferred_course_id=course_id)
+    timings["match_subjects (batch)"] = (timer.perf_counter() - started) * 1000 / len(queries)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="FuzzyMatcher prefilter micro-benchmark")
+    parser.add_argument("--subjects", type=int, default=2000)
+    parser.add_argument("--classes", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    subjects, classes = build_catalogue(rng, args.subjects, args.classes)
+    queries = [" ".join(rng.choice(subjects)[1].lower().split()[:rng.randint(1, 3)]) for _ in range(args.queries)]
+
+    default_min_entries = fm.PREFILTER_MIN_ENTRIES
+    fm.PREFILTER_MIN_ENTRIES = 10 ** 9
+    full = time_queries(load_matcher(subjects, classes), queries, course_id=3)
+    fm.PREFILTER_MIN_ENTRIES = default_min_entries
+
+    started = timer.perf_counter()
+    indexed_matcher = load_matcher(subjects, classes)
+    build_ms = (timer.perf_counter() - started) * 1000
+    indexed = time_queries(indexed_matcher, queries, course_id=3)
+
+    print(f"{args.subjects} subjects, {args.classes} classes, {args.queries} queries; "
+          f"cache + index build {build_ms:.0f} ms")
+    for label in full:
+        print(f"{label:>24}: full {full[label]:8.2f} ms/query | indexed {indexed[label]:8.2f} ms/query | "
+              f"x{full[label] / indexed[label]:.1f}")
+
+
+if __name__ == "__main__":
+    main()
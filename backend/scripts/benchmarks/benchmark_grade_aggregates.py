@@ -0,0 +1,111 @@
+"""
+Benchmark: cập nhật GPA/CPA sau mỗi lần sửa điểm — tính lại toàn bộ vs. delta
+==============================================================================
+
+Một sinh viên có --subjects môn trên 8 học kỳ; chạy --mutations lần sửa điểm
+(PUT /learned-subjects/{id}) trên môn bắt buộc:
+    • full        : update_semester_gpa + update_student_stats (đọc lại cả bảng điểm)
+    • incremental : apply_grade_change — cộng delta vào SemesterGPA và Student
+Mỗi câu SQL cộng thêm --rtt-ms (giả lập round-trip tới MySQL qua mạng).
+
+Cách dùng:
+    cd backend
+    python -m scripts.benchmarks.benchmark_grade_aggregates --subjects 60 --mutations 300 --rtt-ms 0.5
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time as timer
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BACKEND_ROOT))
+
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.db.database import Base  # noqa: E402
+from app.models.__init__ import Course, Department, LearnedSubject, Student, Subject  # noqa: E402
+from app.routes.learned_subject_routes import update_semester_gpa, update_student_stats  # noqa: E402
+from app.services.grade_aggregate_service import (  # noqa: E402
+    apply_grade_change,
+    grade_entry,
+    rebuild_student_aggregates,
+)
+
+GRADES = ["A+", "A", "B+", "B", "C+", "C", "D+", "D", "F"]
+
+
+def build_session(subjects: int, rtt_ms: float):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add(Department(id="SOICT", name="Trường CNTT"))
+    db.add(Course(id=1, course_id="IT-E6", course_name="KHMT"))
+    db.add(Student(id=1, student_name="SV", email="sv@x.vn", password="x", course_id=1))
+    db.add_all(Subject(id=i, subject_id=f"MI{1000 + i}", subject_name=f"Môn {i}", credits=3) for i in range(subjects))
+    db.flush()
+    db.add_all(LearnedSubject(subject_name="", credits=3, letter_grade="B", semester=f"202{i % 4}{i % 2 + 1}",
+                              student_id=1, subject_id=i) for i in range(subjects))
+    rebuild_student_aggregates(db, 1)
+    db.commit()
+
+    counter = {"statements": 0}
+
+    def before_cursor_execute(*_):
+        counter["statements"] += 1
+        if rtt_ms:
+            timer.sleep(rtt_ms / 1000)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    return engine, db, counter
+
+
+def full_update(db, learned, grade):
+    learned.letter_grade = grade
+    db.flush()
+    update_semester_gpa(1, learned.semester, db)
+    db.flush()
+    update_student_stats(1, db)
+    db.commit()
+
+
+def incremental_update(db, learned, grade):
+    before = grade_entry(learned)
+    learned.letter_grade = grade
+    apply_grade_change(db, 1, before, grade_entry(learned, before.subject_code))
+    db.commit()
+
+
+def measure(label, update, args):
+    engine, db, counter = build_session(args.subjects, args.rtt_ms)
+    rng = random.Random(7)
+    learned = db.query(LearnedSubject).all()
+    start = timer.perf_counter()
+    for _ in range(args.mutations):
+        update(db, rng.choice(learned), rng.choice(GRADES))
+    elapsed = timer.perf_counter() - start
+    student = db.get(Student, 1)
+    print(f"  {label:11}: {elapsed / args.mutations * 1000:6.2f} ms/lần | "
+          f"{counter['statements'] / args.mutations:5.1f} câu SQL/lần | CPA {student.cpa:.4f}")
+    db.close()
+    engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="GPA/CPA maintenance: full recompute vs incremental")
+    parser.add_argument("--subjects", type=int, default=60)
+    parser.add_argument("--mutations", type=int, default=300)
+    parser.add_argument("--rtt-ms", type=float, default=0.5)
+    args = parser.parse_args()
+
+    print(f"{args.subjects} môn, {args.mutations} lần sửa điểm, rtt {args.rtt_ms} ms/câu SQL")
+    measure("full", full_update, args)
+    measure("incremental", incremental_update, args)
+
+
+if __name__ == "__main__":
+    main()
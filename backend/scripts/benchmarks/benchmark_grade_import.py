@@ -0,0 +1,153 @@
+"""
+Benchmark: import file điểm — từng dòng (bản cũ) vs. theo tập (grade_import_service)
+====================================================================================
+
+Giả lập admin upload bảng điểm của --students sinh viên, mỗi người --rows môn
+trải trên 8 học kỳ; mỗi sinh viên đã có sẵn điểm 8 học kỳ trước đó.
+    • per-row : mỗi dòng 1 query Subject + 1 query kiểm tra trùng, db.add, rồi
+                update_semester_gpa cho MỌI học kỳ của sinh viên (như endpoint cũ)
+    • set     : parse read_only, 1 IN query mã HP, 1 query trùng, 1 bulk insert,
+                cộng delta vào SemesterGPA/Student của các học kỳ có môn mới
+Mỗi câu SQL cộng thêm --rtt-ms (giả lập round-trip tới MySQL qua mạng).
+
+Cách dùng:
+    cd backend
+    python -m scripts.benchmarks.benchmark_grade_import --students 200 --rows 40 --rtt-ms 0.5
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time as timer
+from io import BytesIO
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BACKEND_ROOT))
+
+import openpyxl  # noqa: E402
+from sqlalchemy import and_, create_engine, event  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.db.database import Base  # noqa: E402
+from app.models.__init__ import Course, Department, LearnedSubject, Student, Subject  # noqa: E402
+from app.routes.learned_subject_routes import (  # noqa: E402
+    apply_imported_grades,
+    update_semester_gpa,
+    update_student_stats,
+)
+from app.services.grade_aggregate_service import rebuild_all_grade_aggregates  # noqa: E402
+from app.services.grade_import_service import (  # noqa: E402
+    import_grade_rows,
+    parse_grade_workbook,
+    resolve_students,
+)
+
+OLD_SEMESTERS = [f"20{year}{term}" for year in (19, 20, 21, 22) for term in (1, 2)]
+NEW_SEMESTERS = [f"20{year}{term}" for year in (23, 24, 25, 26) for term in (1, 2)]
+
+
+def build_session(students: int, rows: int, rtt_ms: float):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(Department(id="SOICT", name="Trường CNTT"))
+    session.add(Course(id=1, course_id="IT1", course_name="KHMT"))
+    session.add_all(Subject(id=i, subject_id=f"IT{3000 + i}", subject_name=f"Môn {i}", credits=3,
+                            department_id="SOICT") for i in range(1, rows * 2 + 1))
+    session.add_all(Student(id=pk, student_name=f"SV {pk}", email=f"sv{pk}@x.vn", password="x", course_id=1)
+                    for pk in range(1, students + 1))
+    session.flush()
+    session.add_all(LearnedSubject(subject_name="", credits=3, letter_grade="B", semester=OLD_SEMESTERS[i % 8],
+                                   student_id=pk, subject_id=rows + i + 1)
+                    for pk in range(1, students + 1) for i in range(rows))
+    session.commit()
+    rebuild_all_grade_aggregates(session)
+
+    counter = {"statements": 0}
+
+    def before_cursor_execute(*_):
+        counter["statements"] += 1
+        if rtt_ms:
+            timer.sleep(rtt_ms / 1000)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    return engine, session, counter
+
+
+def build_workbook(students: int, rows: int) -> bytes:
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["STT", "Học kỳ", "Mã HP", "Tên HP", "Tín chỉ", "Điểm HP", "MSSV"])
+    for pk in range(1, students + 1):
+        for i in range(rows):
+            sheet.append([i, NEW_SEMESTERS[i % 8], f"IT{3001 + i}", "", 3, "A", pk])
+    buffer = BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def per_row_import(db, contents: bytes) -> int:
+    sheet = openpyxl.load_workbook(BytesIO(contents)).active
+    touched = set()
+    created = 0
+    for semester, code, grade, student_pk in (
+        (row[1], row[2], row[5], row[6]) for row in sheet.iter_rows(min_row=2, values_only=True)
+    ):
+        subject = db.query(Subject).filter(Subject.subject_id == code).first()
+        existing = db.query(LearnedSubject).filter(and_(
+            LearnedSubject.student_id == student_pk,
+            LearnedSubject.subject_id == subject.id,
+            LearnedSubject.semester == semester,
+        )).first()
+        if existing:
+            continue
+        db.add(LearnedSubject(subject_name=subject.subject_name, credits=subject.credits, letter_grade=grade,
+                              semester=semester, student_id=student_pk, subject_id=subject.id))
+        touched.add(student_pk)
+        created += 1
+    db.commit()
+    for student_pk in touched:
+        semesters = db.query(LearnedSubject.semester).filter(LearnedSubject.student_id == student_pk).distinct().all()
+        for (semester,) in semesters:
+            update_semester_gpa(student_pk, semester, db)
+        db.flush()
+        update_student_stats(student_pk, db)
+    db.commit()
+    return created
+
+
+def set_import(db, contents: bytes) -> int:
+    parsed = parse_grade_workbook(contents)
+    result = import_grade_rows(db, parsed, student_pks_by_key=resolve_students(db, (r.student_key for r in parsed.rows)))
+    apply_imported_grades(result.added, db)
+    db.commit()
+    return result.created
+
+
+def measure(label: str, run, args, contents: bytes) -> None:
+    engine, db, counter = build_session(args.students, args.rows, args.rtt_ms)
+    start = timer.perf_counter()
+    created = run(db, contents)
+    elapsed = timer.perf_counter() - start
+    print(f"  {label:8}: {elapsed:7.2f} s | {counter['statements']:6d} câu SQL | {created} dòng mới")
+    db.close()
+    engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk grade import: per-row vs set-based")
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=40)
+    parser.add_argument("--rtt-ms", type=float, default=0.5)
+    args = parser.parse_args()
+
+    contents = build_workbook(args.students, args.rows)
+    print(f"{args.students} sinh viên x {args.rows} môn, rtt {args.rtt_ms} ms/câu SQL")
+    measure("per-row", per_row_import, args, contents)
+    measure("set", set_import, args, contents)
+
+
+if __name__ == "__main__":
+    main()
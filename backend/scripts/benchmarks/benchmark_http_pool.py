@@ -0,0 +1,108 @@
+"""
+Micro-benchmark: tool call latency, AsyncClient per call vs. shared pooled client
+=================================================================================
+
+Dựng một HTTP server cục bộ (asyncio.start_server, không cần uvicorn) rồi
+gọi ToolsRegistry.call N lần tuần tự, so sánh:
+    • per-call : mở httpx.AsyncClient mới mỗi lần (cách cũ, bắt tay TCP mỗi hop)
+    • pooled   : get_http_client() dùng chung, keep-alive
+
+Với TLS (LLM/OpenAI) chênh lệch còn lớn hơn vì mỗi handshake tốn thêm 1-2 RTT.
+
+Cách dùng:
+    cd backend
+    python -m scripts.benchmarks.benchmark_http_pool --calls 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import time as timer
+from pathlib import Path
+from typing import List
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BACKEND_ROOT))
+
+import httpx  # noqa: E402
+
+from app.agents.orchestration_metrics import get_orchestration_metrics  # noqa: E402
+from app.agents.tools_registry import ToolsRegistry  # noqa: E402
+from app.core import http_client  # noqa: E402
+
+BODY = json.dumps({"status": "success", "data": [{"gpa": 3.2}]}).encode()
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.decode().split("\r\n"):
+                if line.lower().startswith("content-length:"):
+                    length = int(line.split(":", 1)[1])
+            await reader.readexactly(length)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                + f"Content-Length: {len(BODY)}\r\n\r\n".encode()
+                + BODY
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+def summarize(samples: List[float]) -> str:
+    ordered = sorted(samples)
+    p50 = ordered[len(ordered) // 2] * 1000
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000
+    return f"p50 {p50:6.2f} ms | p99 {p99:6.2f} ms | avg {sum(ordered) / len(ordered) * 1000:6.2f} ms"
+
+
+async def run(calls: int) -> None:
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/intent/grade_view"
+    registry = ToolsRegistry(tool_map={})
+    registry.register("grade_view", url, timeout=5)
+
+    per_call = []
+    for _ in range(calls):
+        started = timer.perf_counter()
+        async with httpx.AsyncClient(timeout=5) as client:
+            (await client.post(url, json={"q": "xem diem"})).json()
+        per_call.append(timer.perf_counter() - started)
+
+    metrics = get_orchestration_metrics()
+    metrics.reset()
+    pooled = []
+    for _ in range(calls):
+        started = timer.perf_counter()
+        await registry.call("grade_view", {"q": "xem diem"})
+        pooled.append(timer.perf_counter() - started)
+    counters = metrics.snapshot()["counters"]
+
+    await http_client.close_http_client()
+    server.close()
+    await server.wait_closed()
+
+    print(f"{calls} sequential tool calls")
+    print(f"per-call client: {summarize(per_call)}")
+    print(f"  pooled client: {summarize(pooled)} | "
+          f"connections opened {counters.get('tools.connection_opened', 0):.0f} / "
+          f"requests {counters.get('tools.request', 0):.0f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pooled httpx client micro-benchmark")
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.calls))
+
+
+if __name__ == "__main__":
+    main()
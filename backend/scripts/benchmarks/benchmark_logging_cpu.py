@@ -0,0 +1,122 @@
+"""
+Benchmark: CPU log trên thread xử lý request — print() vs. logger + QueueHandler
+================================================================================
+
+Mô phỏng lượng log của một chat request gợi ý lớp học:
+    • --conflicts lần has_time_conflicts gặp cặp lớp trùng lịch (mỗi lần 2 dòng dump)
+    • --tools lần gọi tool (payload + body preview bằng json.dumps, start/response/done)
+    • 4 dòng [CHAT_HISTORY_METRIC] JSON
+So sánh:
+    • print    : bản cũ — format f-string + json.dumps + ghi stdout ngay trên thread gọi
+    • logger   : LOG_LEVEL=INFO, QueueHandler; dump debug bị bỏ qua, format/ghi ở
+                 thread listener
+Stdout được chuyển sang os.devnull để chỉ đo CPU, không đo terminal.
+
+Cách dùng:
+    cd backend
+    python -m scripts.benchmarks.benchmark_logging_cpu --requests 300 --conflicts 200 --tools 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time as timer
+from contextlib import redirect_stdout
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.agents import orchestration_metrics  # noqa: E402,F401  (import order: tránh vòng import)
+from app.agents.tools_registry import _preview  # noqa: E402
+from app.agents.tools_registry import logger as tools_logger  # noqa: E402
+from app.core.logging_config import configure_logging, shutdown_logging  # noqa: E402
+from app.services.chat_history_service import ChatHistoryService  # noqa: E402
+from app.services.schedule_combination_service import ScheduleCombinationGenerator  # noqa: E402
+from app.utils.schedule_occupancy import get_occupancy  # noqa: E402
+
+CLASH = [
+    {"class_id": "C1", "study_date": "Monday", "study_time_start": "07:00", "study_time_end": "09:00", "study_week": [1, 2, 3]},
+    {"class_id": "C2", "study_date": "Monday", "study_time_start": "08:00", "study_time_end": "10:00", "study_week": [2, 3]},
+]
+PAYLOAD = {"q": "gợi ý lớp cho tôi", "student_id": 1, "conversation_id": 7}
+BODY = {"status": "success", "data": [{"class_id": f"C{index}", "subject_name": "Giải tích I", "room": "D9-101"} for index in range(40)]}
+
+
+def old_request(generator, conflicts: int, tools: int) -> None:
+    for _ in range(conflicts):
+        occupancies = [get_occupancy(cls) for cls in CLASH]
+        for i, class1 in enumerate(CLASH):
+            for j in range(i + 1, len(CLASH)):
+                class2 = CLASH[j]
+                if generator._classes_conflict(class1, class2, occupancies[i], occupancies[j]):
+                    print(f"⚠️ [CONFLICT] Class {class1.get('class_id')} vs {class2.get('class_id')}:")
+                    print(f"  Class1: {class1.get('study_date')} {class1.get('study_time_start')}-{class1.get('study_time_end')}, "
+                          f"Class2: {class2.get('study_date')} {class2.get('study_time_start')}-{class2.get('study_time_end')}")
+    for _ in range(tools):
+        payload_preview = json.dumps(PAYLOAD, ensure_ascii=False, default=str)[:160]
+        print(f"[TOOLS] start name=class_suggestion url=inprocess timeout=10s payload={payload_preview}")
+        print(f"[TOOLS] response name=class_suggestion status=200 duration_ms={12.3:.1f}")
+        body_preview = json.dumps(BODY, ensure_ascii=False, default=str)[:160]
+        print(f"[TOOLS] done name=class_suggestion body={body_preview}")
+    for event in ("list_cache_miss", "messages_cache_miss", "save_turn", "invalidate"):
+        print(f"[CHAT_HISTORY_METRIC] {json.dumps({'event': event, 'student_pk': 1, 'duration_ms': 3.2}, ensure_ascii=False)}")
+
+
+def new_request(generator, history, conflicts: int, tools: int) -> None:
+    for _ in range(conflicts):
+        generator.has_time_conflicts(CLASH)
+    for _ in range(tools):
+        if tools_logger.isEnabledFor(logging.DEBUG):
+            tools_logger.debug("[TOOLS] start name=%s payload=%s", "class_suggestion", _preview(PAYLOAD))
+        tools_logger.info("[TOOLS] response name=%s status=%s duration_ms=%.1f", "class_suggestion", 200, 12.3)
+        if tools_logger.isEnabledFor(logging.DEBUG):
+            tools_logger.debug("[TOOLS] done name=%s body=%s", "class_suggestion", _preview(BODY))
+    for event in ("list_cache_miss", "messages_cache_miss", "save_turn", "invalidate"):
+        history._log_metric(event, student_pk=1, duration_ms=3.2)
+
+
+def measure(run, requests: int) -> tuple:
+    wall, cpu = timer.perf_counter(), timer.thread_time()
+    for _ in range(requests):
+        run()
+    return timer.thread_time() - cpu, timer.perf_counter() - wall
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Logging CPU per chat request")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--conflicts", type=int, default=200)
+    parser.add_argument("--tools", type=int, default=3)
+    args = parser.parse_args()
+
+    generator = ScheduleCombinationGenerator()
+    history = ChatHistoryService(db=None)
+    with open(os.devnull, "w", encoding="utf-8") as devnull, redirect_stdout(devnull):
+        old_cpu, old_wall = measure(lambda: old_request(generator, args.conflicts, args.tools), args.requests)
+        # Baseline without any log output: same work, isolates the logging cost
+        configure_logging(level="CRITICAL", stream=devnull)
+        base_cpu, _ = measure(lambda: new_request(generator, history, args.conflicts, args.tools), args.requests)
+        configure_logging(level="INFO", stream=devnull)
+        process_cpu = timer.process_time()
+        new_cpu, new_wall = measure(lambda: new_request(generator, history, args.conflicts, args.tools), args.requests)
+        shutdown_logging()
+        process_cpu = timer.process_time() - process_cpu
+
+    per_request = lambda seconds: seconds / args.requests * 1000  # noqa: E731
+    print(f"{args.requests} requests x ({args.conflicts} conflict checks, {args.tools} tool calls, 4 metrics)")
+    print(f"  print  : {per_request(old_cpu):7.3f} ms CPU/request trên thread gọi | wall {per_request(old_wall):7.3f} ms")
+    print(f"  logger : {per_request(new_cpu):7.3f} ms CPU/request trên thread gọi | wall {per_request(new_wall):7.3f} ms "
+          f"| cả process {per_request(process_cpu):7.3f} ms")
+    print(f"  không log: {per_request(base_cpu):7.3f} ms CPU/request")
+    old_overhead, new_overhead = old_cpu - base_cpu, new_cpu - base_cpu
+    print(f"Chi phí log trên thread gọi: {per_request(old_overhead):.3f} ms -> {per_request(new_overhead):.3f} ms "
+          f"({(1 - new_overhead / old_overhead) * 100:.0f}% giảm); tổng CPU giảm {(1 - new_cpu / old_cpu) * 100:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
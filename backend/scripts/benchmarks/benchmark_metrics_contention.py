@@ -0,0 +1,94 @@
+"""
+Benchmark: OrchestrationMetrics dưới nhiều thread
+=================================================
+
+N thread cùng ghi counter + latency (như threadpool của FastAPI khi chạy các
+route sync và tool), cả hai bản dùng một threading.Lock chung:
+    • count/total : bản cũ — latency chỉ có count/total/max
+    • histogram   : OrchestrationMetrics — histogram theo label (p50/p95/p99)
+--threads 1 đo đúng hot path hiện tại (orchestrator ghi metrics trên một
+thread). Shard theo thread đã bị bỏ: chậm hơn một lock (~0.56M so với
+~0.89M writes/s) mà không có workload đa luồng nào thắng.
+
+Cách dùng:
+    cd backend
+    python -m scripts.benchmarks.benchmark_metrics_contention --threads 16 --ops 50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import threading
+import time as timer
+from collections import defaultdict
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.agents.orchestration_metrics import OrchestrationMetrics  # noqa: E402
+
+
+class CountTotalMetrics:
+    """Bản cũ của OrchestrationMetrics (latency chỉ có count/total/max)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._latency = defaultdict(lambda: {"count": 0, "total": 0.0, "max": 0.0})
+
+    def increment(self, key, value=1.0, labels=None):
+        with self._lock:
+            self._counters[key] += value
+
+    def observe_latency(self, key, seconds, labels=None):
+        with self._lock:
+            item = self._latency[key]
+            item["count"] += 1
+            item["total"] += seconds
+            item["max"] = max(item["max"], seconds)
+
+
+def run(metrics, threads: int, ops: int) -> float:
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(offset):
+        barrier.wait()
+        for index in range(ops):
+            metrics.increment("tools.grade_view.success")
+            metrics.observe_latency("node4.latency", 0.001 * ((index + offset) % 200 + 1))
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started = timer.perf_counter()
+    for thread in workers:
+        thread.join()
+    return timer.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="OrchestrationMetrics contention benchmark")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=50_000)
+    args = parser.parse_args()
+    total = args.threads * args.ops * 2
+
+    old_seconds = run(CountTotalMetrics(), args.threads, args.ops)
+    metrics = OrchestrationMetrics()
+    new_seconds = run(metrics, args.threads, args.ops)
+    started = timer.perf_counter()
+    latency = metrics.snapshot()["latency"]["node4.latency"]
+    snapshot_ms = (timer.perf_counter() - started) * 1000
+
+    print(f"{args.threads} threads x {args.ops} ops (counter + latency)")
+    print(f"  count/total : {total / old_seconds:10.0f} writes/s")
+    print(f"  histogram   : {total / new_seconds:10.0f} writes/s | snapshot {snapshot_ms:.2f} ms")
+    print(f"  node4.latency p50 {latency['p50_seconds'] * 1000:.1f} ms | "
+          f"p95 {latency['p95_seconds'] * 1000:.1f} ms | p99 {latency['p99_seconds'] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: ResponseCache in-memory fallback — memory growth & throughput
+========================================================================
+
+Mô phỏng Redis sập: N câu trả lời đã format (~2 KB, key khác nhau) được ghi
+vào fallback của ResponseCache, xen kẽ đọc lại các key gần đây.
+    • dict cũ      : dict thuần, chỉ xoá khi chính key đó được đọc sau khi hết hạn
+    • InMemoryCache: LRU + TTL giới hạn theo số entry và tổng byte
+
+Cách dùng:
+    cd backend
+    python -m scripts.benchmarks.benchmark_response_cache_memory --writes 200000
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time as timer
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.llm.response_cache import InMemoryCache  # noqa: E402
+
+
+class UnboundedDictCache:
+    """Bản cũ của InMemoryCache (trước khi giới hạn)"""
+
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        item = self.store.get(key)
+        if not item:
+            return None
+        value, expires = item
+        if expires < timer.time():
+            del self.store[key]
+            return None
+        return value
+
+    def set(self, key, value, ttl=300):
+        self.store[key] = (value, timer.time() + ttl)
+
+
+def run(cache, writes: int, payload: str) -> float:
+    started = timer.perf_counter()
+    for index in range(writes):
+        cache.set(f"node4:{index:08x}", payload, 300)
+        cache.get(f"node4:{max(0, index - 50):08x}")
+    return timer.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ResponseCache memory fallback benchmark")
+    parser.add_argument("--writes", type=int, default=200_000)
+    parser.add_argument("--payload-bytes", type=int, default=2048)
+    args = parser.parse_args()
+    payload = "Điểm " * (args.payload_bytes // 7)
+
+    old = UnboundedDictCache()
+    old_seconds = run(old, args.writes, payload)
+    old_bytes = sum(len(k) + len(v.encode("utf-8")) for k, (v, _) in old.store.items())
+
+    new = InMemoryCache()
+    new_seconds = run(new, args.writes, payload)
+    stats = new.stats()
+
+    print(f"{args.writes} writes of ~{args.payload_bytes} B (Redis down)")
+    print(f"  dict cũ      : {len(old.store):8d} entries | {old_bytes / 2**20:8.1f} MiB | {args.writes / old_seconds:9.0f} ops/s")
+    print(f"  InMemoryCache: {stats['entries']:8d} entries | {stats['bytes'] / 2**20:8.1f} MiB | "
+          f"{args.writes / new_seconds:9.0f} ops/s | evictions {stats['evictions']} | hit_rate {stats['hit_rate']}")
+
+
+if __name__ == "__main__":
+    main()
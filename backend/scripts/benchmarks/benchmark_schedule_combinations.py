@@ -0,0 +1,131 @@
+"""
+Benchmark: ScheduleCombinationGenerator search vs. the legacy brute-force loop
+==============================================================================
+
+So sánh bộ sinh tổ hợp thời khóa biểu (backtracking + forward checking +
+branch-and-bound) với vòng lặp ``itertools.product`` cũ (dừng sau
+``max_combinations * 10`` lần kiểm tra) trên thời khóa biểu tổng hợp từ
+5 đến 12 môn học.
+
+Cách dùng:
+    cd backend
+    python -m scripts.benchmarks.benchmark_schedule_combinations
+    python -m scripts.benchmarks.benchmark_schedule_combinations --sections 25 --top-k 50
+
+Đầu ra: bảng gồm thời gian chạy, điểm cao nhất và điểm thứ K của mỗi bộ sinh.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import itertools
+import random
+import sys
+import time as timer
+from datetime import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BACKEND_ROOT))
+
+from app.services.schedule_combination_service import ScheduleCombinationGenerator  # noqa: E402
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+PREFERENCES = {
+    "prefer_free_days": True,
+    "time_period": "morning",
+    "prefer_days": ["Monday", "Wednesday"],
+    "avoid_days": ["Saturday"],
+}
+
+
+def build_timetable(rng: random.Random, subject_count: int, sections: int) -> Dict[str, List[Dict]]:
+    """Synthetic timetable: each section meets 1-2 days, 2-3 periods, on half or full semester."""
+    classes_by_subject: Dict[str, List[Dict]] = {}
+    for s in range(subject_count):
+        subject_id = f"BM{s:04d}"
+        classes = []
+        for c in range(sections):
+            start_hour = rng.choice([6, 7, 8, 9, 10, 12, 13, 14, 15, 16])
+            classes.append({
+                "class_id": f"{s:02d}{c:04d}",
+                "subject_id": subject_id,
+                "study_week": rng.choice([list(range(1, 9)), list(range(9, 17)), list(range(1, 17))]),
+                "study_date": ",".join(sorted(rng.sample(DAYS, rng.choice([1, 1, 2])))),
+                "study_time_start": time(start_hour, 45),
+                "study_time_end": time(start_hour + rng.choice([1, 2]), 10),
+                "credits": rng.choice([2, 2, 3, 3, 4]),
+            })
+        classes_by_subject[subject_id] = classes
+    return classes_by_subject
+
+
+def legacy_generate_combinations(
+    generator: ScheduleCombinationGenerator,
+    classes_by_subject: Dict[str, List[Dict]],
+    preferences: Dict,
+    max_combinations: int,
+) -> List[Tuple[float, List[Dict]]]:
+    """The pre-solver algorithm: first K valid combos of itertools.product, capped at 10*K checks."""
+    valid = []
+    checked = 0
+    for combo in itertools.product(*classes_by_subject.values()):
+        checked += 1
+        combo = list(combo)
+        if not generator.has_duplicate_subjects(combo) and not generator.has_time_conflicts(combo):
+            valid.append(combo)
+            if len(valid) >= max_combinations:
+                break
+        if checked >= max_combinations * 10:
+            break
+    scored = [(generator.calculate_combination_score(combo, preferences), combo) for combo in valid]
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return scored
+
+
+def run(subject_range: range, sections: int, top_k: int, seed: int) -> None:
+    generator = ScheduleCombinationGenerator()
+    print(f"sections/subject={sections}  top_k={top_k}  seed={seed}")
+    print(f"{'subjects':>8} | {'legacy ms':>10} {'found':>6} {'best':>7} {'K-th':>7} | "
+          f"{'solver ms':>10} {'found':>6} {'best':>7} {'K-th':>7}")
+    print("-" * 88)
+    for subject_count in subject_range:
+        timetable = build_timetable(random.Random(seed + subject_count), subject_count, sections)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = timer.perf_counter()
+            legacy = legacy_generate_combinations(generator, timetable, PREFERENCES, top_k)
+            legacy_ms = (timer.perf_counter() - started) * 1000
+
+            started = timer.perf_counter()
+            solver = generator.generate_combinations(timetable, PREFERENCES, max_combinations=top_k)
+            solver_ms = (timer.perf_counter() - started) * 1000
+
+        legacy_scores = [score for score, _ in legacy]
+        solver_scores = [combo["score"] for combo in solver]
+
+        def describe(scores: List[float]) -> str:
+            if not scores:
+                return f"{0:>6} {'-':>7} {'-':>7}"
+            return f"{len(scores):>6} {scores[0]:>7.2f} {scores[-1]:>7.2f}"
+
+        print(f"{subject_count:>8} | {legacy_ms:>10.1f} {describe(legacy_scores)} | "
+              f"{solver_ms:>10.1f} {describe(solver_scores)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--min-subjects", type=int, default=5)
+    parser.add_argument("--max-subjects", type=int, default=12)
+    parser.add_argument("--sections", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(range(args.min_subjects, args.max_subjects + 1), args.sections, args.top_k, args.seed)
+
+
+if __name__ == "__main__":
+    main()
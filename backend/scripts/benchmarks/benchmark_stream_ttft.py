@@ -0,0 +1,160 @@
+"""
+Benchmark: time-to-first-token, blocking /generate vs. SSE streaming
+====================================================================
+
+Chạy model-space thật (FastAPI + scheduler) trên uvicorn với một Llama giả
+lập sinh từng token sau mỗi --token-ms mili-giây, rồi so sánh:
+    • blocking : POST /generate (stream=false) — người dùng chỉ thấy chữ khi
+                 toàn bộ câu trả lời xong, TTFT = tổng latency
+    • stream   : LLMClient.generate_stream qua SSE — TTFT = lúc token đầu tới
+
+Cách dùng:
+    cd backend
+    python -m scripts.benchmarks.benchmark_stream_ttft --requests 20 --tokens 80 --token-ms 15
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib.util
+import socket
+import sys
+import threading
+import time as timer
+import types
+from pathlib import Path
+from typing import List, Tuple
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BACKEND_ROOT))
+MODEL_SPACE_APP = BACKEND_ROOT.parent / "model-space" / "app.py"
+
+import uvicorn  # noqa: E402
+
+from app.agents.orchestration_metrics import get_orchestration_metrics  # noqa: E402
+from app.core import http_client  # noqa: E402
+from app.llm.llm_client import LLMClient  # noqa: E402
+
+
+class PacedLlama:
+    """Sinh ``tokens`` token, mỗi token mất ``token_ms`` (giả lập decode trên CPU)"""
+
+    tokens = 80
+    token_ms = 15.0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def tokenize(self, text, add_bos=True, special=False):
+        return list(text)
+
+    def eval(self, tokens):
+        pass
+
+    def reset(self):
+        pass
+
+    def save_state(self):
+        return None
+
+    def load_state(self, state):
+        pass
+
+    def _pieces(self):
+        for index in range(self.tokens):
+            timer.sleep(self.token_ms / 1000)
+            yield f"t{index} "
+
+    def create_chat_completion(self, messages, stream=False, **kwargs):
+        if stream:
+            return ({"choices": [{"delta": {"content": piece}}]} for piece in self._pieces())
+        return {"choices": [{"message": {"content": "".join(self._pieces())}}]}
+
+
+def load_model_space():
+    sys.modules["llama_cpp"] = types.SimpleNamespace(Llama=PacedLlama)
+    spec = importlib.util.spec_from_file_location("model_space_app", MODEL_SPACE_APP)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module._llm = PacedLlama()
+    module.WARMUP_ON_STARTUP = False
+    return module
+
+
+def start_server(app) -> tuple:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        timer.sleep(0.05)
+    return server, thread, port
+
+
+async def run_blocking(base_url: str, requests: int) -> List[float]:
+    client = http_client.get_http_client()
+    samples = []
+    for _ in range(requests):
+        started = timer.perf_counter()
+        response = await client.post(f"{base_url}/generate", json={"prompt": "Tóm tắt điểm"}, timeout=60)
+        response.raise_for_status()
+        samples.append(timer.perf_counter() - started)
+    return samples
+
+
+async def run_stream(base_url: str, requests: int) -> Tuple[List[float], List[float]]:
+    llm = LLMClient(base_url=base_url)
+    llm._openai = None
+    ttft, total = [], []
+    for _ in range(requests):
+        started = timer.perf_counter()
+        first = None
+        async for _piece in llm.generate_stream("Tóm tắt điểm", timeout=60):
+            if first is None:
+                first = timer.perf_counter() - started
+        ttft.append(first)
+        total.append(timer.perf_counter() - started)
+    return ttft, total
+
+
+def p50(samples: List[float]) -> float:
+    return sorted(samples)[len(samples) // 2] * 1000
+
+
+async def benchmark(base_url: str, requests: int) -> None:
+    blocking = await run_blocking(base_url, requests)
+    ttft, total = await run_stream(base_url, requests)
+    await http_client.close_http_client()
+
+    print(f"{requests} generations x {PacedLlama.tokens} tokens @ {PacedLlama.token_ms:.0f} ms/token")
+    print(f"  blocking : TTFT p50 {p50(blocking):8.1f} ms (= total)")
+    print(f"  stream   : TTFT p50 {p50(ttft):8.1f} ms | total p50 {p50(total):8.1f} ms")
+    print(f"TTFT x{p50(blocking) / p50(ttft):.1f}")
+    ttft_metric = get_orchestration_metrics().snapshot()["latency"].get("llm.generate_stream.ttft", {})
+    print(f"metric llm.generate_stream.ttft avg {ttft_metric.get('avg_seconds', 0) * 1000:.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Streaming time-to-first-token benchmark")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--tokens", type=int, default=80)
+    parser.add_argument("--token-ms", type=float, default=15.0)
+    args = parser.parse_args()
+
+    PacedLlama.tokens = args.tokens
+    PacedLlama.token_ms = args.token_ms
+    space = load_model_space()
+    server, thread, port = start_server(space.app)
+    try:
+        asyncio.run(benchmark(f"http://127.0.0.1:{port}", args.requests))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+        space._scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
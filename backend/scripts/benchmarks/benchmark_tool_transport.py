@@ -0,0 +1,150 @@
+"""
+Benchmark: multi-segment agent tool latency, HTTP loopback vs. in-process
+=========================================================================
+
+Chạy router agent-tools thật trên uvicorn (SQLite tạm, dữ liệu giả lập) rồi
+mô phỏng một lượt agent gồm N segment, mỗi segment một lần gọi NODE-3
+(graduation_progress) qua ToolsRegistry:
+    • http      : POST loopback tới /api/agent-tools/intent/... (cách cũ)
+    • inprocess : gọi thẳng run_graduation_progress trong cùng tool_session_scope
+
+Cách dùng:
+    cd backend
+    python -m scripts.benchmarks.benchmark_tool_transport --requests 100 --segments 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import socket
+import sys
+import tempfile
+import threading
+import time as timer
+from pathlib import Path
+from typing import List
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BACKEND_ROOT))
+
+import uvicorn  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.agents import inprocess_tools  # noqa: E402
+from app.agents.tools_registry import ToolsRegistry  # noqa: E402
+from app.core import http_client  # noqa: E402
+from app.db.database import Base, get_db  # noqa: E402
+from app.models.course_model import Course  # noqa: E402
+from app.models.course_subject_model import CourseSubject  # noqa: E402
+from app.models.department_model import Department  # noqa: E402
+from app.models.learned_subject_model import LearnedSubject  # noqa: E402
+from app.models.student_model import Student  # noqa: E402
+from app.models.subject_model import Subject  # noqa: E402
+from app.routes import agent_tool_routes  # noqa: E402
+
+
+def seed(Session, subjects: int) -> None:
+    with Session() as session:
+        department = Department(id="D01", name="Benchmark")
+        course = Course(course_id="KBENCH", course_name="Benchmark course")
+        session.add_all([department, course])
+        session.flush()
+        student = Student(student_name="Bench", email="bench@example.com", password="x",
+                          course_id=course.id, department_id=department.id)
+        session.add(student)
+        rows = [Subject(subject_id=f"S{i:04d}", subject_name=f"Môn {i}", credits=3) for i in range(subjects)]
+        session.add_all(rows)
+        session.flush()
+        for index, subject in enumerate(rows):
+            session.add(CourseSubject(course_id=course.id, subject_id=subject.id, learning_semester=index % 8 + 1))
+            if index % 2 == 0:
+                session.add(LearnedSubject(student_id=student.id, subject_id=subject.id, letter_grade="B", credits=3))
+        session.commit()
+
+
+def start_server(Session) -> tuple:
+    app = FastAPI()
+    app.include_router(agent_tool_routes.router, prefix="/api")
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        timer.sleep(0.05)
+    return server, thread, port
+
+
+async def run_mode(registry: ToolsRegistry, Session, requests: int, segments: int) -> List[float]:
+    samples = []
+    for _ in range(requests):
+        started = timer.perf_counter()
+        with Session() as db:
+            async with inprocess_tools.tool_session_scope(db):
+                for _ in range(segments):
+                    result = await registry.call("graduation_progress", {"q": "còn thiếu bao nhiêu tín", "student_id": 1})
+                    assert result["status"] == "success", result
+        samples.append(timer.perf_counter() - started)
+    return samples
+
+
+def summarize(samples: List[float]) -> str:
+    ordered = sorted(samples)
+    p50 = ordered[len(ordered) // 2] * 1000
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000
+    return f"p50 {p50:7.2f} ms | p99 {p99:7.2f} ms"
+
+
+async def benchmark(Session, port: int, requests: int, segments: int) -> None:
+    url = f"http://127.0.0.1:{port}/api/agent-tools/intent/graduation_progress"
+    inprocess_tools.LOCAL_APP_PORT = port
+    http_registry = ToolsRegistry(tool_map={"graduation_progress": {"url": url, "timeout": 10, "transport": "http"}})
+    local_registry = ToolsRegistry(tool_map={"graduation_progress": {"url": url, "timeout": 10}})
+
+    await run_mode(http_registry, Session, 3, segments)  # warm-up
+    http_samples = await run_mode(http_registry, Session, requests, segments)
+    local_samples = await run_mode(local_registry, Session, requests, segments)
+    await http_client.close_http_client()
+
+    print(f"{requests} agent requests x {segments} segments (graduation_progress)")
+    print(f"     http loopback: {summarize(http_samples)}")
+    print(f"        inprocess : {summarize(local_samples)}")
+    print(f"p50 x{sorted(http_samples)[len(http_samples) // 2] / sorted(local_samples)[len(local_samples) // 2]:.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Agent tool transport benchmark")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--segments", type=int, default=3)
+    parser.add_argument("--subjects", type=int, default=60)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'tools.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        seed(Session, args.subjects)
+        server, thread, port = start_server(Session)
+        try:
+            asyncio.run(benchmark(Session, port, args.requests, args.segments))
+        finally:
+            server.should_exit = True
+            thread.join(timeout=5)
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Script to add the unique session key uq_classes_session on an existing classes table
+
+Import TKB upsert theo buổi học (class_id, study_date, study_time_start) và từ chối
+(409) khi bảng chưa có unique index này. Base.metadata.create_all không thêm index
+vào bảng đã tồn tại, nên DB tạo trước khi có key phải chạy script này một lần:
+1. báo các nhóm buổi học trùng key (NULL tính như "" / 00:00, giống import) —
+   còn trùng thì dừng, không sửa gì; xoá/sửa các dòng đó rồi chạy lại;
+2. chuẩn hoá NULL: study_date → "", study_time_start → 00:00 (NULL không bao giờ
+   trùng trong unique index);
+3. tạo unique index.
+
+Cách dùng:
+    cd backend
+    python -m scripts.db.add_class_session_key              # kiểm tra + tạo index
+    python -m scripts.db.add_class_session_key --dry-run    # chỉ báo, không ghi
+"""
+
+import argparse
+import os
+import sys
+from typing import List, Tuple
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, "../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from sqlalchemy import Time, func, literal, select, text, update  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.db.database import SessionLocal  # noqa: E402
+from app.models.__init__ import Class  # noqa: E402
+from app.services.class_import_service import (  # noqa: E402
+    CLASS_SESSION_INDEX,
+    CLASS_SESSION_KEY,
+    MIDNIGHT,
+    class_session_key_exists,
+)
+
+
+def find_duplicate_sessions(db: Session) -> List[Tuple[str, str, object, int]]:
+    """(class_id, study_date, study_time_start, số dòng) của các key xuất hiện > 1 lần"""
+    study_date = func.coalesce(Class.study_date, "")
+    study_time_start = func.coalesce(Class.study_time_start, literal(MIDNIGHT, Time))
+    rows = db.execute(
+        select(Class.class_id, study_date, study_time_start, func.count())
+        .group_by(Class.class_id, study_date, study_time_start)
+        .having(func.count() > 1)
+        .order_by(Class.class_id)
+    ).all()
+    return [tuple(row) for row in rows]
+
+
+def add_class_session_key(db: Session, dry_run: bool = False) -> List[Tuple[str, str, object, int]]:
+    """
+    Tạo uq_classes_session nếu chưa có. Trả về các nhóm trùng (khác rỗng → không
+    tạo index, DB giữ nguyên).
+    """
+    if class_session_key_exists(db):
+        return []
+    duplicates = find_duplicate_sessions(db)
+    if duplicates or dry_run:
+        db.rollback()
+        return duplicates
+
+    db.execute(update(Class).where(Class.study_date.is_(None)).values(study_date=""))
+    db.execute(update(Class).where(Class.study_time_start.is_(None)).values(study_time_start=MIDNIGHT))
+    db.commit()
+    db.execute(text(f"CREATE UNIQUE INDEX {CLASS_SESSION_INDEX} ON classes ({', '.join(CLASS_SESSION_KEY)})"))
+    db.commit()
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add the unique session key on classes")
+    parser.add_argument("--dry-run", action="store_true", help="chỉ báo buổi trùng, không ghi")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if class_session_key_exists(db):
+            print(f"{CLASS_SESSION_INDEX} already exists, nothing to do")
+            return
+        duplicates = add_class_session_key(db, dry_run=args.dry_run)
+        for class_id, study_date, study_time_start, count in duplicates:
+            print(f"duplicate session: class_id={class_id} study_date={study_date!r} "
+                  f"study_time_start={study_time_start} rows={count}")
+        if duplicates:
+            print(f"{len(duplicates)} duplicate sessions — remove them, then run again")
+            sys.exit(1)
+        if args.dry_run:
+            print(f"No duplicate sessions; {CLASS_SESSION_INDEX} can be created")
+        else:
+            print(f"Created {CLASS_SESSION_INDEX} on classes ({', '.join(CLASS_SESSION_KEY)})")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
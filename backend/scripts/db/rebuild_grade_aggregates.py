@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Script to rebuild SemesterGPA rows and student GPA/CPA counters from learned_subjects
+
+Các thay đổi thường ngày được cộng dồn theo delta (grade_aggregate_service);
+script này tính lại toàn bộ để đối soát (sau khi sửa tay DB, import ngoài API...).
+
+Cách dùng:
+    cd backend
+    python -m scripts.db.rebuild_grade_aggregates              # tất cả sinh viên
+    python -m scripts.db.rebuild_grade_aggregates --student 12 --student 15
+"""
+
+import argparse
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, "../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from app.db.database import SessionLocal  # noqa: E402
+from app.services.grade_aggregate_service import REBUILD_BATCH_SIZE, rebuild_all_grade_aggregates  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild GPA/CPA aggregates from learned_subjects")
+    parser.add_argument("--student", type=int, action="append", help="students.id (lặp lại được)")
+    parser.add_argument("--batch-size", type=int, default=REBUILD_BATCH_SIZE)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        count = rebuild_all_grade_aggregates(db, student_ids=args.student, batch_size=args.batch_size)
+        print(f"Rebuilt aggregates for {count} students in {time.perf_counter() - start:.1f}s")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
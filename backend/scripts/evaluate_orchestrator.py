@@ -153,12 +153,13 @@ async def run_single_query(
     query: str,
     student_id: int,
     conversation_id: int,
+    tfidf_result: Optional[Dict[str, Any]] = None,
 ) -> EvaluationEntry:
     """
     Simulate orchestrator flow WITHOUT Node-1:
 
         bypass Node-1 → segments = [query]
-        Node-2        → orchestrator.node2_intent_router(query)
+        Node-2        → orchestrator.node2_intent_router(query, tfidf_result)
         Node-3        → orchestrator.tools.call(intent, payload)
         Node-4        → orchestrator.node4_response_formatter(results, ...)
 
@@ -179,7 +180,7 @@ async def run_single_query(
 
         # ── Node-2: Intent routing (TF-IDF only — no LLM call) ─────────────────
         try:
-            intent_info = await orchestrator.node2_intent_router(seg)
+            intent_info = await orchestrator.node2_intent_router(seg, tfidf_result=tfidf_result)
         except Exception as exc:
             intent_info = {"intent": "unknown", "confidence": 0.0, "source": "error"}
             print(f"[NODE-2] ERROR: {type(exc).__name__}: {exc}")
@@ -339,9 +340,12 @@ async def run_evaluation(
     results: List[EvaluationEntry] = []
     total_started = time.perf_counter()
 
-    for i, query in enumerate(queries, start=1):
+    # Node-2 TF-IDF cho toàn bộ câu hỏi trong một lần classify_batch
+    tfidf_results = await orchestrator.classify_segments_tfidf(queries)
+
+    for i, (query, tfidf_result) in enumerate(zip(queries, tfidf_results), start=1):
         print(f"[{i}/{len(queries)}] {query[:60]}{'...' if len(query) > 60 else ''}")
-        entry = await run_single_query(orchestrator, query, student_id, conversation_id)
+        entry = await run_single_query(orchestrator, query, student_id, conversation_id, tfidf_result)
         results.append(entry)
         # Brief pause between queries to avoid overwhelming the backend
         await asyncio.sleep(0.3)
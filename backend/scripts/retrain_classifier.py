@@ -1,6 +1,17 @@
 """
 Quick script to retrain TF-IDF classifier after updating intents.json
+
+Train TF-IDF + Word2Vec và lưu thành model artifact (xem
+app/chatbot/intent_model_store.py) để các worker chỉ cần load, không train lại.
+
+Cách dùng:
+    cd backend
+    python scripts/retrain_classifier.py                 # build artifact + test
+    python scripts/retrain_classifier.py --skip-test     # chỉ build (Docker)
+    python scripts/retrain_classifier.py --output-dir /models/intent
 """
+import argparse
+import asyncio
 import sys
 import os
 
@@ -10,13 +21,23 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app.chatbot.tfidf_classifier import TfidfIntentClassifier
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrain intent classifier and build the model artifact")
+    parser.add_argument("--output-dir", default=None, help="Artifact root (default: INTENT_MODEL_DIR or ml_models/intent_classifier)")
+    parser.add_argument("--skip-test", action="store_true", help="Only build the artifact")
+    args = parser.parse_args()
+
     print("🔄 Retraining TF-IDF Intent Classifier...")
-    
-    classifier = TfidfIntentClassifier()
-    
+
+    classifier = TfidfIntentClassifier(artifact_dir=args.output_dir, use_artifact=False)
+    artifact_dir = classifier.save_artifact()
+
     print("✅ Classifier retrained successfully!")
-    print(f"📊 Total intents: {len(classifier.intents)}")
-    
+    print(f"📊 Total intents: {len(classifier.intents.get('intents', []))}")
+    print(f"📦 Artifact: {artifact_dir} (fingerprint {classifier.fingerprint[:16]})")
+
+    if args.skip_test:
+        sys.exit(0)
+
     # Test some patterns
     test_questions = [
         "gợi ý lớp kỳ sau",
@@ -26,12 +47,11 @@ if __name__ == "__main__":
         "gợi ý môn học kỳ này",
         "tôi nên đăng ký môn gì"
     ]
-    
+
     print("\n🧪 Testing classification:")
     for q in test_questions:
-        import asyncio
         result = asyncio.run(classifier.classify_intent(q))
         print(f"  • '{q}'")
         print(f"    → Intent: {result['intent']} (confidence: {result['confidence']})")
-    
+
     print("\n✅ Done!")
@@ -0,0 +1,111 @@
+"""
+Test latency histograms: percentiles, concurrent writers, labels, Prometheus text, p95 alerts
+"""
+import random
+import threading
+
+from app.agents import orchestration_alerts
+from app.agents.orchestration_alerts import evaluate_orchestration_alerts, parse_p95_thresholds
+from app.agents.orchestration_metrics import LatencyHistogram, OrchestrationMetrics
+
+
+def _exact_percentile(samples, quantile):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+
+def test_percentiles_track_exact_values_within_bucket_width():
+    rng = random.Random(7)
+    samples = [rng.lognormvariate(-2.5, 0.8) for _ in range(20000)]
+    histogram = LatencyHistogram()
+    for value in samples:
+        histogram.observe(value)
+
+    for quantile in (0.5, 0.95, 0.99):
+        exact = _exact_percentile(samples, quantile)
+        assert abs(histogram.percentile(quantile) - exact) / exact < 0.1
+    assert histogram.percentile(1.0) <= max(samples)
+
+
+def test_single_sample_percentiles_equal_the_sample():
+    histogram = LatencyHistogram()
+    histogram.observe(0.042)
+
+    assert histogram.summary()["p50_seconds"] == 0.042
+    assert histogram.summary()["p99_seconds"] == 0.042
+
+
+def test_concurrent_writers_are_all_counted():
+    metrics = OrchestrationMetrics()
+
+    def worker():
+        for _ in range(1000):
+            metrics.increment("node1.calls")
+            metrics.observe_latency("node1.latency", 0.01)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"]["node1.calls"] == 8000
+    assert snapshot["latency"]["node1.latency"]["count"] == 8000
+    assert snapshot["latency"]["node1.latency"]["last_seconds"] == 0.01
+
+
+def test_labels_are_aggregated_and_kept_per_series():
+    metrics = OrchestrationMetrics()
+    metrics.observe_latency("agent.handle.latency", 0.2, labels={"intent": "grade_view", "cache_hit": "false"})
+    metrics.observe_latency("agent.handle.latency", 0.001, labels={"intent": "grade_view", "cache_hit": "true"})
+    metrics.increment("tools.grade_view.success", labels={"intent": "grade_view"})
+
+    snapshot = metrics.snapshot()
+    assert snapshot["latency"]["agent.handle.latency"]["count"] == 2
+    series = {item["labels"]["cache_hit"]: item for item in snapshot["latency_by_label"]["agent.handle.latency"]}
+    assert series["true"]["count"] == series["false"]["count"] == 1
+    assert series["false"]["p50_seconds"] == 0.2
+    assert snapshot["counters_by_label"]["tools.grade_view.success"] == [{"labels": {"intent": "grade_view"}, "value": 1.0}]
+
+
+def test_prometheus_text_derives_labels_from_dotted_keys():
+    metrics = OrchestrationMetrics()
+    metrics.increment("node4.fallback")
+    metrics.increment("tools.grade_view.failure", 2)
+    metrics.observe_latency("node4.latency", 0.003)
+    metrics.observe_latency("node4.latency", 0.5)
+    metrics.observe_latency("agent.handle.latency", 0.01, labels={"intent": 'a"b'})
+
+    text = metrics.prometheus_text()
+    lines = text.splitlines()
+
+    assert "# TYPE orchestration_node_fallback_total counter" in lines
+    assert 'orchestration_node_fallback_total{node="node4"} 1' in lines
+    assert 'orchestration_tool_failure_total{tool="grade_view"} 2' in lines
+    assert "# TYPE orchestration_node_latency_seconds histogram" in lines
+    assert 'orchestration_node_latency_seconds_bucket{node="node4",le="+Inf"} 2' in lines
+    assert 'orchestration_node_latency_seconds_count{node="node4"} 2' in lines
+    assert 'orchestration_agent_handle_latency_seconds_count{intent="a\\"b"} 1' in lines
+
+    buckets = [int(line.rsplit(" ", 1)[1]) for line in lines
+               if line.startswith('orchestration_node_latency_seconds_bucket{node="node4"')]
+    assert buckets == sorted(buckets)
+    assert buckets[-1] == 2
+
+
+def test_p95_alert_fires_per_key_once_enough_samples():
+    metrics = OrchestrationMetrics()
+    for _ in range(orchestration_alerts.ALERT_P95_MIN_SAMPLES):
+        metrics.observe_latency("node2.latency", 6.0)
+        metrics.observe_latency("node4.latency", 0.05)
+    metrics.observe_latency("node1.latency", 30.0)  # too few samples
+
+    thresholds = parse_p95_thresholds("node1.latency=5, node2.latency=5,node4.latency=3,bad=,zero=0")
+    assert thresholds == {"node1.latency": 5.0, "node2.latency": 5.0, "node4.latency": 3.0}
+
+    report = evaluate_orchestration_alerts(metrics.snapshot(), p95_thresholds=thresholds)
+    p95_alerts = [alert for alert in report["alerts"] if alert["code"] == "p95_latency_high"]
+    assert report["status"] == "alert"
+    assert [alert["key"] for alert in p95_alerts] == ["node2.latency"]
+    assert set(report["summary"]["p95_seconds"]) == {"node2.latency", "node4.latency"}
@@ -0,0 +1,241 @@
+"""
+Test front-of-pipeline semantic cache: hits skip the pipeline, commits bump per-student versions
+"""
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import create_engine, insert, update
+from sqlalchemy.orm import sessionmaker
+
+from app.agents import semantic_cache
+from app.agents.agent_orchestrator import AgentOrchestrator
+from app.agents.orchestration_metrics import get_orchestration_metrics
+from app.agents.semantic_cache import SemanticResponseCache, normalize_query
+from app.db.database import Base
+from app.llm.response_cache import ResponseCache
+from app.models.course_model import Course
+from app.models.department_model import Department
+from app.models.learned_subject_model import LearnedSubject
+from app.models.student_model import Student
+from app.models.subject_model import Subject
+
+
+class SharedStore(ResponseCache):
+    """In-memory ResponseCache that reports itself as shared, standing in for Redis."""
+
+    shared = True
+
+
+@pytest.fixture()
+def cache(monkeypatch):
+    shared = SemanticResponseCache(store=SharedStore(redis_url=""))
+    monkeypatch.setattr(semantic_cache, "_shared_cache", shared)
+    return shared
+
+
+@pytest.fixture()
+def Session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as session:
+        department = Department(id="D01", name="Test")
+        course = Course(course_id="KTEST", course_name="Test course")
+        session.add_all([department, course, Subject(subject_id="MI1114", subject_name="Giải tích I", credits=3)])
+        session.flush()
+        session.add_all([
+            Student(student_name=f"S{index}", email=f"s{index}@example.com", password="x",
+                    course_id=course.id, department_id=department.id)
+            for index in (1, 2)
+        ])
+        session.commit()
+    yield factory
+    engine.dispose()
+
+
+class CountingOrchestrator(AgentOrchestrator):
+    def __init__(self, cache, intent="grade_view"):
+        super().__init__(llm_client=object(), tools=None, cache=ResponseCache(redis_url=""), semantic_cache=cache)
+        self.runs = 0
+        self.intent = intent
+
+    async def _handle_graph(self, user_text, student_id=None, conversation_id=None):
+        self.runs += 1
+        return {"text": f"answer {self.runs}", "intent": self.intent, "raw": {"status": "success"}, "debug": {}}
+
+
+def _ask(orchestrator, text="Xem điểm của tôi?", student_id=1):
+    return asyncio.run(orchestrator.handle(text, student_id=student_id))
+
+
+def test_normalize_query_ignores_accents_case_and_trailing_punctuation():
+    assert normalize_query("  Xem   ĐIỂM của tôi ?? ") == normalize_query("xem diem cua toi")
+
+
+def test_repeated_question_skips_pipeline(cache):
+    orchestrator = CountingOrchestrator(cache)
+    metrics = get_orchestration_metrics()
+    hits_before = metrics.snapshot()["counters"].get("semantic_cache.hit", 0)
+
+    first = _ask(orchestrator)
+    second = _ask(orchestrator, text="xem diem cua toi")
+
+    assert orchestrator.runs == 1
+    assert second["text"] == first["text"] == "answer 1"
+    assert second["debug"]["semantic_cache"] == "hit"
+    assert metrics.snapshot()["counters"]["semantic_cache.hit"] == hits_before + 1
+
+    _ask(orchestrator, student_id=2)
+    _ask(orchestrator, student_id=None)
+    assert orchestrator.runs == 3
+
+
+def test_unshared_store_bypasses_the_cache(monkeypatch):
+    local = SemanticResponseCache(store=ResponseCache(redis_url=""))
+    monkeypatch.setattr(semantic_cache, "_shared_cache", local)
+    orchestrator = CountingOrchestrator(local)
+
+    first = _ask(orchestrator)
+    second = _ask(orchestrator)
+
+    assert orchestrator.runs == 2
+    assert first["text"] == "answer 1" and second["text"] == "answer 2"
+    assert local.store.stats()["memory"]["entries"] == 0
+
+
+class RecordingRedis:
+    """Redis client stand-in: dict storage, records each command and the thread it ran on."""
+
+    def __init__(self):
+        self.data = {}
+        self.calls = []
+
+    def _record(self, command):
+        self.calls.append((command, threading.get_ident()))
+
+    def get(self, key):
+        self._record("get")
+        return self.data.get(key)
+
+    def mget(self, keys):
+        self._record("mget")
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        self._record("set")
+        self.data[key] = value
+
+    def incr(self, key):
+        self._record("incr")
+        self.data[key] = str(int(self.data.get(key) or 0) + 1)
+        return int(self.data[key])
+
+
+def test_lookup_reads_redis_off_the_event_loop_in_two_round_trips(monkeypatch):
+    store = ResponseCache(redis_url="")
+    store._client, store._redis_available = RecordingRedis(), True
+    redis_cache = SemanticResponseCache(store=store)
+    monkeypatch.setattr(semantic_cache, "_shared_cache", redis_cache)
+    orchestrator = CountingOrchestrator(redis_cache)
+    _ask(orchestrator)
+    store._client.calls.clear()
+
+    async def ask_on_loop():
+        loop_thread = threading.get_ident()
+        result = await orchestrator.handle("xem điểm của tôi", student_id=1)
+        return loop_thread, result
+
+    loop_thread, result = asyncio.run(ask_on_loop())
+
+    assert result["debug"]["semantic_cache"] == "hit"
+    assert [command for command, _ in store._client.calls] == ["mget", "get"]
+    assert all(thread != loop_thread for _, thread in store._client.calls)
+
+
+def test_date_relative_answers_are_keyed_by_day(cache, monkeypatch):
+    class Day(semantic_cache.date):
+        current = semantic_cache.date(2026, 10, 16)
+
+        @classmethod
+        def today(cls):
+            return cls.current
+
+    monkeypatch.setattr(semantic_cache, "date", Day)
+    orchestrator = CountingOrchestrator(cache, intent="schedule_view")
+    _ask(orchestrator, text="lịch học hôm nay")
+    _ask(orchestrator, text="lịch học hôm nay")
+    assert orchestrator.runs == 1
+
+    Day.current = semantic_cache.date(2026, 10, 17)
+    answer = _ask(orchestrator, text="lịch học hôm nay")
+
+    assert orchestrator.runs == 2
+    assert answer["text"] == "answer 2"
+
+
+def test_uncacheable_intents_are_not_stored(cache):
+    orchestrator = CountingOrchestrator(cache, intent="class_registration_suggestion")
+    _ask(orchestrator)
+    _ask(orchestrator)
+
+    assert orchestrator.runs == 2
+
+
+def test_commit_invalidates_only_that_student(cache, Session):
+    orchestrator = CountingOrchestrator(cache)
+    _ask(orchestrator, student_id=1)
+    _ask(orchestrator, student_id=2)
+
+    with Session() as session:
+        session.add(LearnedSubject(student_id=1, subject_id=1, letter_grade="A", credits=3))
+        session.commit()
+
+    _ask(orchestrator, student_id=1)
+    _ask(orchestrator, student_id=2)
+    assert orchestrator.runs == 3
+
+    with Session() as session:
+        grade = session.query(LearnedSubject).one()
+        grade.letter_grade = "B"
+        session.flush()
+        session.rollback()
+    _ask(orchestrator, student_id=1)
+    assert orchestrator.runs == 3  # rolled back: nothing changed
+
+
+def test_moving_a_row_bumps_old_and_new_owner(cache, Session):
+    with Session() as session:
+        session.add(LearnedSubject(student_id=1, subject_id=1, letter_grade="A", credits=3))
+        session.commit()
+    orchestrator = CountingOrchestrator(cache)
+    _ask(orchestrator, student_id=1)
+    _ask(orchestrator, student_id=2)
+
+    with Session() as session:
+        session.query(LearnedSubject).one().student_id = 2
+        session.commit()
+    _ask(orchestrator, student_id=1)
+    _ask(orchestrator, student_id=2)
+
+    assert orchestrator.runs == 4
+
+
+def test_bulk_statements_invalidate(cache, Session):
+    orchestrator = CountingOrchestrator(cache)
+    _ask(orchestrator, student_id=1)
+    _ask(orchestrator, student_id=2)
+
+    with Session() as session:
+        session.execute(insert(LearnedSubject), [{"student_id": 2, "subject_id": 1, "letter_grade": "C", "credits": 3}])
+        session.commit()
+    _ask(orchestrator, student_id=1)
+    _ask(orchestrator, student_id=2)
+    assert orchestrator.runs == 3
+
+    with Session() as session:
+        session.execute(update(LearnedSubject).values(letter_grade="B"))
+        session.commit()
+    _ask(orchestrator, student_id=1)
+    _ask(orchestrator, student_id=2)
+    assert orchestrator.runs == 5
@@ -0,0 +1,246 @@
+"""
+Test the per-student academic snapshot: one round of queries shared by its consumers, cached across
+sessions and retired by learned-subject / class-register commits
+"""
+import asyncio
+import time as timer
+from datetime import time
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.agents import semantic_cache
+from app.agents.semantic_cache import SemanticResponseCache
+from app.db.database import Base
+from app.llm import response_cache
+from app.llm.response_cache import ResponseCache
+from app.models.__init__ import (
+    Class,
+    ClassRegister,
+    Course,
+    CourseSubject,
+    Department,
+    LearnedSubject,
+    SemesterGPA,
+    Student,
+    Subject,
+)
+from app.routes.agent_tool_routes import run_graduation_progress
+from app.routes.student_routes import get_student_academic_details
+from app.rules.subject_suggestion_rules import SubjectSuggestionRuleEngine
+from app.schemas.node_schemas import Node3ToolExecutorRequest
+from app.services import academic_snapshot_service
+from app.services.academic_snapshot_service import AcademicSnapshotCache, get_student_snapshot
+from app.services.chatbot_service import ChatbotService
+
+
+class SharedStore(ResponseCache):
+    """In-memory ResponseCache that reports itself as shared, standing in for Redis."""
+
+    shared = True
+
+
+@pytest.fixture(autouse=True)
+def caches(monkeypatch):
+    versions = SemanticResponseCache(store=SharedStore(redis_url=""))
+    monkeypatch.setattr(semantic_cache, "_shared_cache", versions)
+    monkeypatch.setattr(academic_snapshot_service, "_shared_cache", AcademicSnapshotCache())
+    return versions
+
+
+def _seed(factory, grade="B+"):
+    with factory() as session:
+        session.add(Department(id="SOICT", name="Trường CNTT"))
+        session.add(Course(id=1, course_id="IT1", course_name="Khoa học máy tính"))
+        session.add_all([
+            Subject(id=1, subject_id="MI1114", subject_name="Giải tích I", credits=3),
+            Subject(id=2, subject_id="IT3080", subject_name="Mạng máy tính", credits=3),
+            Subject(id=3, subject_id="IT4409", subject_name="Công nghệ Web", credits=2),
+        ])
+        session.add(Student(id=1, student_name="SV", email="sv@example.com", password="hash", course_id=1,
+                            department_id="SOICT", cpa=3.2, warning_level="Cảnh cáo mức 1"))
+        session.flush()
+        session.add_all([
+            CourseSubject(course_id=1, subject_id=1, learning_semester=1),
+            CourseSubject(course_id=1, subject_id=2, learning_semester=5),
+            CourseSubject(course_id=1, subject_id=3, learning_semester=6),
+            LearnedSubject(student_id=1, subject_id=1, subject_name="Giải tích I", credits=3,
+                           letter_grade="F", semester="20231"),
+            LearnedSubject(student_id=1, subject_id=1, subject_name="Giải tích I", credits=3,
+                           letter_grade=grade, semester="20233"),
+            SemesterGPA(student_id=1, semester="20231", gpa=0.0, total_credits=3),
+            Class(id=1, class_id="150001", class_name="Mạng máy tính", subject_id=2, study_date="Monday",
+                  study_time_start=time(6, 45), study_time_end=time(9, 10), study_week=[1, 2, 3]),
+        ])
+        session.commit()
+
+
+def _database(grade="B+", url="sqlite:///:memory:"):
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    _seed(factory, grade)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return engine, factory, statements
+
+
+@pytest.fixture()
+def database():
+    engine, factory, statements = _database()
+    yield factory, statements
+    engine.dispose()
+
+
+def test_consumers_share_one_round_of_queries(database):
+    factory, statements = database
+    with factory() as db:
+        engine = SubjectSuggestionRuleEngine(db)
+        student_data = engine.get_student_data(1)
+        semester_number = engine.calculate_student_semester_number(1, "20241")
+        available = engine.get_available_subjects(1, "20241")
+        learned_map = ChatbotService(db)._get_learned_subject_map(1, [1, 2])
+        details = get_student_academic_details(1, db=db, current_student=None)
+        tool = asyncio.run(run_graduation_progress(Node3ToolExecutorRequest(q="tiến độ", student_id=1), db))
+
+    assert len(statements) == 5
+    assert student_data == {
+        "cpa": 3.2,
+        "warning_level": 1,
+        "completed_subjects": {
+            "MI1114": {"subject_id": "MI1114", "subject_name": "Giải tích I", "grade": "B+", "credits": 3},
+        },
+    }
+    assert semester_number == 2
+    assert [subject["subject_id"] for subject in available] == ["MI1114", "IT3080", "IT4409"]
+    assert learned_map == {1: {"letter_grade": "B+", "semester": "20233", "credits": 3}}
+    assert "password" not in details["student"]
+    assert details["student"]["course_id"] == 1
+    assert (details["failed_subjects_number"], details["total_credits"], details["overall_gpa"]) == (1, 6, 1.75)
+    assert details["learned_subjects"][0]["subject_code"] == "MI1114"
+    assert tool.status == "success"
+    assert (tool.metadata["accumulated_credits"], tool.metadata["remaining_credits"]) == (3, 5)
+
+
+def test_later_sessions_read_the_cached_snapshot(database):
+    factory, statements = database
+    with factory() as db:
+        first = get_student_snapshot(db, 1)
+    statements.clear()
+
+    with factory() as db:
+        progress = asyncio.run(ChatbotService(db).process_graduation_progress(1))
+        second = get_student_snapshot(db, 1)
+
+    assert statements == []
+    assert second == first and second is not first
+    assert progress["metadata"]["missing_count"] == 2
+
+
+def test_learned_subject_commit_retires_the_snapshot(database):
+    factory, _ = database
+    with factory() as db:
+        assert get_student_snapshot(db, 1).graduation_progress()["accumulated_credits"] == 3
+
+    with factory() as db:
+        db.add(LearnedSubject(student_id=1, subject_id=2, subject_name="Mạng máy tính", credits=3,
+                              letter_grade="A", semester="20241"))
+        db.commit()
+    with factory() as db:
+        assert get_student_snapshot(db, 1).graduation_progress()["accumulated_credits"] == 6
+
+    with factory() as db:
+        db.execute(insert(LearnedSubject), [{"student_id": 1, "subject_id": 3, "subject_name": "Công nghệ Web",
+                                             "credits": 2, "letter_grade": "C", "semester": "20242"}])
+        db.commit()
+    with factory() as db:
+        assert get_student_snapshot(db, 1).semesters() == ["20231", "20233", "20241", "20242"]
+
+
+def test_class_register_commit_retires_the_snapshot(database):
+    factory, _ = database
+    with factory() as db:
+        assert get_student_snapshot(db, 1).registered_classes == []
+
+    with factory() as db:
+        db.add(ClassRegister(student_id=1, class_id=1))
+        db.commit()
+    with factory() as db:
+        registered = get_student_snapshot(db, 1).registered_classes
+
+    assert [(c["class_id"], c["subject_code"], c["study_time_start"]) for c in registered] == [
+        ("150001", "IT3080", "06:45:00"),
+    ]
+
+
+def test_uncommitted_writes_are_read_back_and_not_cached(database):
+    factory, _ = database
+    with factory() as db:
+        get_student_snapshot(db, 1)
+        db.add(LearnedSubject(student_id=1, subject_id=3, subject_name="Công nghệ Web", credits=2,
+                              letter_grade="A", semester="20241"))
+        assert "IT4409" in SubjectSuggestionRuleEngine(db).get_student_data(1)["completed_subjects"]
+        db.rollback()
+
+    with factory() as db:
+        assert "IT4409" not in get_student_snapshot(db, 1).completed_subjects()
+
+
+def test_second_worker_is_served_from_the_shared_store(tmp_path, monkeypatch):
+    engine, factory, statements = _database(url=f"sqlite:///{tmp_path / 'academic.db'}")
+    with factory() as db:
+        get_student_snapshot(db, 1)
+    statements.clear()
+    monkeypatch.setattr(academic_snapshot_service, "_shared_cache", AcademicSnapshotCache())
+
+    with factory() as db:
+        assert get_student_snapshot(db, 1).course_name == "Khoa học máy tính"
+
+    assert statements == []
+    engine.dispose()
+
+
+def test_databases_do_not_share_snapshots(database):
+    factory, _ = database
+    other_engine, other_factory, _ = _database(grade="F")
+    with factory() as db, other_factory() as other:
+        assert get_student_snapshot(db, 1).completed_subjects()["MI1114"]["grade"] == "B+"
+        assert get_student_snapshot(other, 1).completed_subjects()["MI1114"]["grade"] == "F"
+    other_engine.dispose()
+
+
+def test_unshared_store_serves_other_workers_writes_after_a_short_ttl(tmp_path, monkeypatch):
+    engine, factory, statements = _database(url=f"sqlite:///{tmp_path / 'academic.db'}")
+    workers = [
+        (SemanticResponseCache(store=ResponseCache(redis_url="")), AcademicSnapshotCache())
+        for _ in range(2)
+    ]
+
+    def on_worker(index):
+        versions, cache = workers[index]
+        monkeypatch.setattr(semantic_cache, "_shared_cache", versions)
+        monkeypatch.setattr(academic_snapshot_service, "_shared_cache", cache)
+
+    on_worker(0)
+    with factory() as db:
+        assert get_student_snapshot(db, 1).graduation_progress()["accumulated_credits"] == 3
+
+    on_worker(1)  # commits on the other worker bump only its own in-memory versions
+    with factory() as db:
+        db.add(LearnedSubject(student_id=1, subject_id=2, subject_name="Mạng máy tính", credits=3,
+                              letter_grade="A", semester="20241"))
+        db.commit()
+
+    on_worker(0)
+    statements.clear()
+    with factory() as db:
+        assert get_student_snapshot(db, 1).graduation_progress()["accumulated_credits"] == 3
+    assert statements == []
+
+    later = timer.time() + 60  # well inside ACADEMIC_SNAPSHOT_TTL, past the unshared cap
+    monkeypatch.setattr(response_cache, "time", SimpleNamespace(time=lambda: later))
+    with factory() as db:
+        assert get_student_snapshot(db, 1).graduation_progress()["accumulated_credits"] == 6
+    engine.dispose()
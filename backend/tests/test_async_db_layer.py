@@ -0,0 +1,259 @@
+"""
+Test async database layer: AsyncChatHistoryService and ChatbotService loaders on AsyncSession
+"""
+import asyncio
+import time
+import types
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.database import Base, to_async_database_url
+from app.models.course_model import Course
+from app.models.department_model import Department
+from app.models.student_model import Student
+from app.models.subject_model import Subject
+from app.services.chat_history_service import AsyncChatHistoryService, ChatHistoryService
+from app.services.chatbot_service import ChatbotService
+
+
+@pytest.fixture()
+def db_url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'chat.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    department = Department(id="D01", name="Test")
+    course = Course(course_id="KTEST", course_name="Test course")
+    session.add_all([department, course])
+    session.flush()
+    session.add_all([
+        Student(
+            student_name="Async Student",
+            email="async@example.com",
+            password="hashed",
+            course_id=course.id,
+            department_id=department.id,
+        ),
+        Subject(subject_id="IT3080", subject_name="Mạng máy tính", credits=3),
+    ])
+    session.commit()
+    session.close()
+    engine.dispose()
+    return url
+
+
+def _run_async(url, work):
+    async def main():
+        engine = create_async_engine(to_async_database_url(url))
+        try:
+            async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+                return await work(session)
+        finally:
+            await engine.dispose()
+    return asyncio.run(main())
+
+
+def test_async_database_url_mapping():
+    assert to_async_database_url("mysql+pymysql://u:p@h:3306/db") == "mysql+aiomysql://u:p@h:3306/db"
+    assert to_async_database_url("sqlite:///./x.db") == "sqlite+aiosqlite:///./x.db"
+    assert to_async_database_url("postgresql+asyncpg://h/db") == "postgresql+asyncpg://h/db"
+
+
+def test_async_chat_history_round_trip(db_url):
+    async def work(session):
+        service = AsyncChatHistoryService(session)
+        conversation = await service.get_or_create_conversation(1, None, first_message="  xem   điểm ")
+        assert conversation.title == "xem điểm"
+
+        _, user_msg, assistant_msg = await service.save_chat_turn(
+            student_pk=1,
+            user_content="xem điểm",
+            assistant_payload={"text": "GPA 3.2", "intent": "grade_view", "data": [{"gpa": 3.2}]},
+            conversation_id=conversation.id,
+        )
+        latest = await service.get_latest_assistant_message(1, conversation.id)
+        messages = await service.list_messages(1, conversation.id)
+        renamed = await service.rename_conversation(1, conversation.id, "Điểm")
+        listing = await service.list_conversations(1)
+
+        with pytest.raises(ValueError):
+            await service.get_or_create_conversation(2, conversation.id)
+
+        await service.delete_conversation(1, conversation.id)
+        after_delete = await service.list_conversations(1, page_size=5)
+        return user_msg, assistant_msg, latest, messages, renamed, listing, after_delete
+
+    user_msg, assistant_msg, latest, messages, renamed, listing, after_delete = _run_async(db_url, work)
+
+    assert latest["id"] == assistant_msg.id
+    assert latest["data_json"]["data"] == [{"gpa": 3.2}]
+    assert [item["role"] for item in messages["items"]] == ["user", "assistant"]
+    assert renamed.title == "Điểm"
+    assert [item["title"] for item in listing["items"]] == ["Điểm"]
+    assert after_delete["total"] == 0
+
+    # Same rows are visible through the sync service
+    engine = create_engine(db_url)
+    sync_service = ChatHistoryService(sessionmaker(bind=engine)())
+    assert sync_service.list_conversations(1, page_size=7)["total"] == 0
+    engine.dispose()
+
+
+def test_chatbot_loader_runs_on_async_session(db_url):
+    async def work(session):
+        service = ChatbotService(db=None, async_db=session)
+        return await service._run_loader(
+            lambda svc: [s.subject_id for s in svc.db.query(Subject).all()]
+        )
+
+    assert _run_async(db_url, work) == ["IT3080"]
+
+
+def test_loader_reuses_injected_engines_and_sync_matcher(db_url, monkeypatch):
+    from app.services import fuzzy_matcher
+
+    sync_engine = create_engine(db_url)
+    sync_session = sessionmaker(bind=sync_engine)()
+    matchers_before = len(fuzzy_matcher._shared_matchers)
+
+    async def work(session):
+        service = ChatbotService(db=sync_session, async_db=session)
+        service.class_rule_engine = "injected"
+        seen = await service._run_loader(lambda svc: (
+            svc.class_rule_engine, svc.class_query_service()._get_fuzzy(), svc.subject_rule_engine.db,
+        ))
+        again = await service._run_loader(lambda svc: svc)
+        first = await service._run_loader(lambda svc: svc)
+        return service, seen, again, first
+
+    service, (rule_engine, matcher, loader_session), again, first = _run_async(db_url, work)
+
+    assert rule_engine == "injected"
+    assert matcher is fuzzy_matcher.get_fuzzy_matcher(sync_session)
+    assert loader_session is not sync_session
+    assert again is first
+    assert len(fuzzy_matcher._shared_matchers) == matchers_before + 1
+    sync_session.close()
+    sync_engine.dispose()
+
+
+def test_loader_without_async_db_uses_service_itself():
+    service = ChatbotService(db=None)
+    service.subject_rule_engine = "injected"
+
+    result = asyncio.run(service._run_loader(lambda svc: svc.subject_rule_engine))
+
+    assert result == "injected"
+
+
+def test_sync_session_from_factory_is_opened_on_first_use_and_closed():
+    closed = []
+    session = types.SimpleNamespace(close=lambda: closed.append(True))
+    service = ChatbotService(None, db_factory=lambda: session)
+
+    assert service.has_sync_db and service._db is None
+    assert service.db is session and service.db is session
+    service.close()
+
+    assert closed == [True]
+    assert service._db is None
+
+
+def test_slow_queries_do_not_stall_event_loop(db_url):
+    """Heartbeat lag while 8 slow (40 ms) queries run: sync session blocks, async does not"""
+    query_seconds, streams = 0.04, 8
+
+    def add_sleep(dbapi_connection, _):
+        dbapi_connection.create_function("sleep_ms", 1, lambda ms: time.sleep(ms / 1000) or 0)
+
+    async def measure(run_query):
+        lags = []
+
+        async def heartbeat(stop):
+            while not stop.is_set():
+                started = time.perf_counter()
+                await asyncio.sleep(0.005)
+                lags.append(time.perf_counter() - started - 0.005)
+
+        stop = asyncio.Event()
+        beat = asyncio.create_task(heartbeat(stop))
+        await asyncio.sleep(0.01)
+        await asyncio.gather(*(run_query() for _ in range(streams)))
+        stop.set()
+        await beat
+        return max(lags)
+
+    sync_engine = create_engine(db_url)
+    event.listen(sync_engine, "connect", add_sleep)
+    SyncSession = sessionmaker(bind=sync_engine)
+
+    async def sync_query():
+        with SyncSession() as session:
+            session.execute(text("SELECT sleep_ms(:ms)"), {"ms": query_seconds * 1000})
+
+    async def main():
+        async_engine = create_async_engine(to_async_database_url(db_url))
+        event.listen(async_engine.sync_engine, "connect", add_sleep)
+        AsyncSession = async_sessionmaker(async_engine)
+
+        async def async_query():
+            async with AsyncSession() as session:
+                await session.execute(text("SELECT sleep_ms(:ms)"), {"ms": query_seconds * 1000})
+
+        await async_query()  # warm the pool
+        try:
+            return await measure(sync_query), await measure(async_query)
+        finally:
+            await async_engine.dispose()
+
+    sync_lag, async_lag = asyncio.run(main())
+    sync_engine.dispose()
+
+    assert sync_lag >= query_seconds
+    assert async_lag < sync_lag / 2
+
+
+def test_chat_stream_returns_async_connections_to_pool(db_url, monkeypatch):
+    """
+    Session của /chat-stream mở trong generator: stream xong pool không còn connection
+    nào bị giữ, và lời chào (không cần ORM sync) không mở sync Session
+    """
+    import json
+
+    from app.routes import chatbot_routes
+    from app.schemas.chatbot_schema import ChatMessage
+
+    monkeypatch.setenv("AGENT_ENABLED", "false")
+    sync_sessions = []
+    SyncSession = sessionmaker(bind=create_engine(db_url))
+    monkeypatch.setattr(chatbot_routes, "SessionLocal", lambda: sync_sessions.append(1) or SyncSession())
+
+    async def main():
+        from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+        engine = create_async_engine(to_async_database_url(db_url), poolclass=AsyncAdaptedQueuePool)
+        monkeypatch.setattr(
+            chatbot_routes, "AsyncSessionLocal", async_sessionmaker(engine, expire_on_commit=False)
+        )
+        try:
+            response = await chatbot_routes.chat_stream(
+                message=ChatMessage(message="xin chào"),
+                current_student=types.SimpleNamespace(id=1),
+            )
+            chunks = [chunk async for chunk in response.body_iterator]
+            return chunks, engine.sync_engine.pool.checkedout()
+        finally:
+            await engine.dispose()
+
+    chunks, checked_out = asyncio.run(main())
+
+    last = json.loads(chunks[-1].removeprefix("data: "))
+    assert last["type"] == "done"
+    assert checked_out == 0
+    assert sync_sessions == []
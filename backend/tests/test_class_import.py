@@ -0,0 +1,293 @@
+"""
+Test the bulk timetable import: column-wise validation, chunked upsert on the session key, set-based teacher update
+"""
+import asyncio
+from datetime import time
+from io import BytesIO
+
+import openpyxl
+import pytest
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import sessionmaker
+
+from app.db.database import Base
+from app.models.__init__ import Class, ClassRegister, Course, Department, Student, Subject
+from app.routes.class_routes import (
+    ClassBulkImportRequest,
+    TeacherUpdate,
+    TeacherUpdateRequest,
+    bulk_import_classes,
+    bulk_upload_classes,
+    preview_bulk_prune,
+    update_teachers,
+)
+from app.services import class_import_service
+from app.services.class_import_service import (
+    ClassImportError,
+    ensure_class_session_key,
+    import_classes,
+    read_class_file,
+)
+
+
+@pytest.fixture()
+def db():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(Department(id="SOICT", name="Trường CNTT"))
+    session.add(Course(id=1, course_id="IT1", course_name="Khoa học máy tính"))
+    session.add_all([
+        Subject(id=1, subject_id="IT3080", subject_name="Mạng máy tính", credits=3),
+        Subject(id=2, subject_id="IT4409", subject_name="Công nghệ Web", credits=3),
+    ])
+    session.add(Student(id=1, student_name="SV", email="sv@example.com", password="x",
+                        course_id=1, department_id="SOICT"))
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _row(code, day="Monday", start="06:45", end="09:10", **extra):
+    row = {
+        "class_code": code, "subject_name": "Mạng máy tính", "subject_code": "IT3080",
+        "day_of_week_converted": day, "study_time_start": start, "study_time_end": end,
+        "study_weeks": [1, 2, 3],
+    }
+    row.update(extra)
+    return row
+
+
+def _import(db, rows, prune=False):
+    return bulk_import_classes(ClassBulkImportRequest(rows=rows, prune=prune), db=db, _=None)
+
+
+def test_reimport_updates_sessions_in_place(db):
+    rows = [_row("1001"), _row("1001", day="Thursday", start="12:30", end="14:55"), _row("1002", room="D9-101")]
+    assert _import(db, rows)["inserted"] == 3
+    first_ids = sorted(c.id for c in db.query(Class))
+
+    rows[2]["room"] = "TC-205"
+    rows[0]["teacher_name"] = "Nguyễn Văn A"
+    result = _import(db, rows)
+
+    assert (result["inserted"], result["updated"], result["failed"]) == (0, 3, 0)
+    assert sorted(c.id for c in db.query(Class)) == first_ids
+    by_key = {(c.class_id, c.study_date): c for c in db.query(Class)}
+    assert by_key[("1002", "Monday")].classroom == "TC-205"
+    assert by_key[("1001", "Monday")].teacher_name == "Nguyễn Văn A"
+    assert by_key[("1001", "Thursday")].study_time_start == time(12, 30)
+
+
+def test_row_errors_are_reported_and_valid_rows_still_land(db):
+    rows = [
+        _row("1001"),
+        _row("1002", day="Funday"),
+        _row("1003", start="7h"),
+        _row("1004", subject_code="XX9999"),
+        _row("1005", start="09:00", end="08:00"),
+        _row("1001"),
+        {"class_id": "1006", "class_name": "Web", "subject_id": 2, "study_date": "Tuesday",
+         "study_time_start": "14:10", "study_week": "2-4,6"},
+    ]
+    result = _import(db, rows)
+
+    assert (result["inserted"], result["failed"]) == (2, 5)
+    errors = {error["row"]: error["error"] for error in result["errors"]}
+    assert "Funday" in errors[2]
+    assert errors[3].startswith("study_time_start")
+    assert "XX9999" in errors[4]
+    assert "study_time_end" in errors[5]
+    assert "dòng 1" in errors[6]
+    web = db.query(Class).filter(Class.class_id == "1006").one()
+    assert web.study_week == [2, 3, 4, 6]
+    assert web.study_time_end == time(0, 0)
+
+
+def test_distinct_values_are_parsed_once(db, monkeypatch):
+    calls = []
+    parse_time = class_import_service._parse_time
+    monkeypatch.setattr(class_import_service, "_parse_time", lambda value: calls.append(value) or parse_time(value))
+
+    _import(db, [_row(str(1000 + i)) for i in range(300)])
+
+    assert sorted(calls) == ["06:45", "09:10"]
+
+
+def test_prune_keeps_registrations_of_surviving_classes(db):
+    _import(db, [_row("1001"), _row("1002"), _row("1003")])
+    kept, dropped = (db.query(Class).filter(Class.class_id == code).one() for code in ("1001", "1003"))
+    db.add_all([ClassRegister(student_id=1, class_id=kept.id), ClassRegister(student_id=1, class_id=dropped.id)])
+    db.commit()
+
+    result = _import(db, [_row("1001"), _row("1002")], prune=True)
+
+    assert (result["updated"], result["deleted"]) == (2, 1)
+    assert sorted(c.class_id for c in db.query(Class)) == ["1001", "1002"]
+    assert [r.class_id for r in db.query(ClassRegister)] == [kept.id]
+
+
+def test_statement_count_does_not_grow_with_rows(db):
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    _import(db, [_row(str(1000 + i), day=day) for i in range(1500) for day in ("Monday", "Friday")])
+
+    assert db.query(Class).count() == 3000
+    assert len(statements) < 20
+
+
+def test_mysql_upsert_uses_on_duplicate_key_update():
+    class _Db:
+        def get_bind(self):
+            return type("Bind", (), {"dialect": mysql.dialect()})()
+
+    sql = str(class_import_service._upsert_statement(_Db()).compile(dialect=mysql.dialect()))
+
+    assert "ON DUPLICATE KEY UPDATE" in sql
+    assert "classroom = VALUES(classroom)" in sql
+    assert "class_id = VALUES(class_id)" not in sql
+
+
+def test_missing_session_key_is_reported_not_created(db):
+    db.execute(text("DROP TABLE classes"))
+    db.execute(text(
+        "CREATE TABLE classes (id INTEGER PRIMARY KEY, subject_id INTEGER, class_id VARCHAR(255), "
+        "class_name VARCHAR(255), linked_class_ids VARCHAR(255), class_type VARCHAR(255), classroom VARCHAR(255), "
+        "study_date VARCHAR(255), study_time_start TIME, study_time_end TIME, teacher_name VARCHAR(255), "
+        "study_week JSON)"
+    ))
+    db.execute(text("INSERT INTO classes (class_id, class_name, subject_id) VALUES ('1001', 'Mạng máy tính', 1)"))
+    db.commit()
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    with pytest.raises(ClassImportError, match="scripts.db.add_class_session_key"):
+        ensure_class_session_key(db)
+    with pytest.raises(HTTPException) as error:
+        _import(db, [_row("1001", room="D9-101")])
+
+    assert error.value.status_code == 409
+    assert not [sql for sql in statements if sql.lstrip().upper().startswith(("CREATE", "UPDATE", "INSERT"))]
+    assert db.execute(text("SELECT study_date, classroom FROM classes")).fetchall() == [(None, None)]
+
+
+def _legacy_classes_table(db, rows):
+    db.execute(text("DROP TABLE classes"))
+    db.execute(text(
+        "CREATE TABLE classes (id INTEGER PRIMARY KEY, subject_id INTEGER, class_id VARCHAR(255), "
+        "class_name VARCHAR(255), linked_class_ids VARCHAR(255), class_type VARCHAR(255), classroom VARCHAR(255), "
+        "study_date VARCHAR(255), study_time_start TIME, study_time_end TIME, teacher_name VARCHAR(255), "
+        "study_week JSON)"
+    ))
+    for class_id, study_date in rows:
+        db.execute(
+            text("INSERT INTO classes (class_id, study_date, subject_id) VALUES (:class_id, :study_date, 1)"),
+            {"class_id": class_id, "study_date": study_date},
+        )
+    db.commit()
+
+
+def test_session_key_script_normalises_nulls_and_unblocks_import(db):
+    from scripts.db.add_class_session_key import add_class_session_key
+
+    _legacy_classes_table(db, [("1001", None), ("1002", "Monday")])
+
+    assert add_class_session_key(db) == []
+
+    assert db.execute(text("SELECT class_id, study_date FROM classes ORDER BY class_id")).fetchall() == [
+        ("1001", ""), ("1002", "Monday"),
+    ]
+    assert db.query(Class).filter(Class.study_time_start.is_(None)).count() == 0
+    ensure_class_session_key(db)
+    assert _import(db, [_row("1002", start="00:00", end="00:00", room="D9-101")])["updated"] == 1
+
+
+def test_session_key_script_reports_duplicates_without_writing(db):
+    from scripts.db.add_class_session_key import add_class_session_key
+
+    _legacy_classes_table(db, [("1001", None), ("1001", ""), ("1002", "Monday")])
+
+    duplicates = add_class_session_key(db)
+
+    assert [(class_id, study_date, count) for class_id, study_date, _, count in duplicates] == [("1001", "", 2)]
+    assert db.execute(text("SELECT COUNT(*) FROM classes WHERE study_date IS NULL")).scalar() == 1
+    with pytest.raises(ClassImportError):
+        ensure_class_session_key(db)
+
+
+def test_prune_is_refused_when_any_row_fails(db):
+    _import(db, [_row("1001"), _row("1002")])
+
+    with pytest.raises(HTTPException) as partly_invalid:
+        _import(db, [_row("1001"), _row("1002", subject_code="XX0000")], prune=True)
+    with pytest.raises(HTTPException) as all_invalid:
+        _import(db, [_row("1001", study_time_start="25:00")], prune=True)
+    with pytest.raises(HTTPException) as empty:
+        _import(db, [], prune=True)
+
+    assert partly_invalid.value.status_code == all_invalid.value.status_code == empty.value.status_code == 409
+    assert sorted(c.class_id for c in db.query(Class)) == ["1001", "1002"]
+
+
+def test_prune_preview_lists_sessions_without_deleting(db):
+    _import(db, [_row("1001"), _row("1002"), _row("1002", day="Friday")])
+    dropped = db.query(Class).filter(Class.class_id == "1002", Class.study_date == "Friday").one()
+    db.add(ClassRegister(student_id=1, class_id=dropped.id))
+    db.commit()
+
+    preview = preview_bulk_prune(ClassBulkImportRequest(rows=[_row("1001"), _row("1002")]), db=db, _=None)
+    refused = preview_bulk_prune(ClassBulkImportRequest(rows=[_row("1001"), _row("")]), db=db, _=None)
+
+    assert preview["can_prune"] and preview["sessions_to_delete"] == 1
+    assert preview["registrations_to_delete"] == 1
+    assert preview["sessions"] == [{"id": dropped.id, "class_id": "1002", "class_name": "Mạng máy tính",
+                                    "study_date": "Friday", "study_time_start": "06:45"}]
+    assert not refused["can_prune"] and refused["failed"] == 1 and refused["sessions"] == []
+    assert db.query(Class).count() == 3 and db.query(ClassRegister).count() == 1
+
+
+def test_upload_csv_and_xlsx(db):
+    csv_body = (
+        "class_code,subject_code,subject_name,day_of_week_converted,study_time_start,study_time_end,study_weeks\n"
+        "1001,IT3080,Mạng máy tính,Monday,06:45,09:10,\"1,2,3\"\n"
+        "1002,IT3080,Mạng máy tính,Monday,7h,09:10,1\n"
+    ).encode("utf-8")
+    upload = UploadFile(filename="tkb.csv", file=BytesIO(csv_body))
+    result = asyncio.run(bulk_upload_classes(file=upload, prune=False, db=db, _=None))
+    assert (result["inserted"], result["failed"]) == (1, 1)
+    assert result["errors"][0]["row"] == 3
+
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["Class Code", "Subject Code", "Subject Name", "Day Of Week Converted",
+                  "Study Time Start", "Study Time End", "Study Weeks"])
+    sheet.append([1001, "IT3080", "Mạng máy tính", "Monday", time(6, 45), time(9, 10), "1-3"])
+    buffer = BytesIO()
+    workbook.save(buffer)
+    rows = read_class_file(buffer.getvalue(), "tkb.xlsx")
+    assert import_classes(db, rows).updated == 1
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(bulk_upload_classes(file=UploadFile(filename="tkb.pdf", file=BytesIO(b"")), db=db, _=None))
+    assert exc.value.status_code == 400
+
+
+def test_update_teachers_is_set_based(db):
+    _import(db, [_row("1001"), _row("1001", day="Friday"), _row("1002")])
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    result = update_teachers(TeacherUpdateRequest(updates=[
+        TeacherUpdate(class_id="1001", class_id_kem="", teacher="GV A"),
+        TeacherUpdate(class_id="1002", class_id_kem="", teacher="GV B"),
+        TeacherUpdate(class_id="9999", class_id_kem="9998", teacher="GV C"),
+    ]), db=db)
+
+    assert result["updated_count"] == 2
+    assert result["errors"] == ["Không tìm thấy lớp với mã: 9999 hoặc 9998"]
+    assert len(statements) == 2
+    assert {(c.class_id, c.teacher_name) for c in db.query(Class)} == {("1001", "GV A"), ("1002", "GV B")}
@@ -0,0 +1,177 @@
+"""
+Test shared FuzzyMatcher snapshot: incremental CRUD updates and cross-worker sync
+"""
+import json
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.database import Base
+from app.models.class_model import Class
+from app.models.course_model import Course
+from app.models.course_subject_model import CourseSubject
+from app.models.subject_model import Subject
+from app.services import fuzzy_matcher as fm
+
+
+class _FakeChangeLog:
+    """Redis stand-in shared by the 'workers' of a test"""
+
+    def __init__(self):
+        self.store = {}
+        self.client = object()
+
+    def get(self, key):
+        value = self.store.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl=None):
+        self.store[key] = json.dumps(value)
+        return True
+
+    def increment(self, key, amount=1):
+        value = (self.get(key) or 0) + amount
+        self.store[key] = json.dumps(value)
+        return value
+
+
+@pytest.fixture()
+def catalogue(monkeypatch):
+    change_log = _FakeChangeLog()
+    monkeypatch.setattr(fm, "_change_log", lambda: change_log)
+
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    course = Course(course_id="KTEST", course_name="Test course")
+    calculus = Subject(subject_id="MI1114", subject_name="Giải tích I", credits=3)
+    database = Subject(subject_id="IT3090", subject_name="Cơ sở dữ liệu", credits=3)
+    session.add_all([course, calculus, database])
+    session.flush()
+    session.add_all([
+        CourseSubject(course_id=course.id, subject_id=calculus.id, learning_semester=1),
+        Class(subject_id=database.id, class_id="150001", class_name="Cơ sở dữ liệu"),
+    ])
+    session.commit()
+
+    yield session, change_log
+    session.close()
+    engine.dispose()
+
+
+def _no_full_reload(monkeypatch, matcher):
+    def fail(db):
+        raise AssertionError("unexpected full reload")
+    monkeypatch.setattr(matcher, "refresh_cache", fail)
+
+
+def test_matcher_is_shared_per_engine(catalogue, monkeypatch):
+    session, _ = catalogue
+    first = fm.get_fuzzy_matcher(session)
+    _no_full_reload(monkeypatch, first)
+
+    second = fm.get_fuzzy_matcher(session)
+
+    assert second is first
+    assert first.subject_count == 2 and first.class_count == 1
+
+
+def test_subject_crud_updates_cache_incrementally(catalogue, monkeypatch):
+    session, change_log = catalogue
+    matcher = fm.get_fuzzy_matcher(session)
+    version = matcher.version
+    _no_full_reload(monkeypatch, matcher)
+
+    added = Subject(subject_id="MI1124", subject_name="Giải tích II", credits=3)
+    session.add(added)
+    session.commit()
+    fm.publish_catalogue_change(session, "subject", ["MI1124"])
+    assert matcher.match_subject("giai tich 2").subject_id == "MI1124"
+
+    database = session.query(Subject).filter(Subject.subject_id == "IT3090").one()
+    database.subject_id, database.subject_name = "IT3091", "Hệ quản trị cơ sở dữ liệu"
+    session.commit()
+    fm.publish_catalogue_change(session, "subject", ["IT3090", "IT3091"])
+    assert [s[0] for s in matcher._subjects] == ["MI1114", "MI1124", "IT3091"]
+    assert matcher._classes[0]["subject_id"] == "IT3091"
+    assert matcher._classes[0]["subject_name"] == "Hệ quản trị cơ sở dữ liệu"
+
+    session.delete(added)
+    session.commit()
+    fm.publish_catalogue_change(session, "subject", ["MI1124"])
+    assert "MI1124" not in matcher._subject_ids
+
+    assert matcher.version == version + 3
+    assert change_log.get(fm.CHANGE_COUNTER_KEY) == 3
+    assert matcher._seen_change == 3
+
+
+def test_class_updates_keep_cache_order(catalogue, monkeypatch):
+    session, _ = catalogue
+    matcher = fm.get_fuzzy_matcher(session)
+    _no_full_reload(monkeypatch, matcher)
+    subject = session.query(Subject).filter(Subject.subject_id == "MI1114").one()
+    session.add(Class(subject_id=subject.id, class_id="150002", class_name="Giải tích I"))
+    session.commit()
+    fm.publish_catalogue_change(session, "class", ["150002"])
+
+    cls = session.query(Class).filter(Class.class_id == "150001").one()
+    cls.class_name = "Cơ sở dữ liệu (TN)"
+    session.commit()
+    fm.publish_catalogue_change(session, "class", ["150001"])
+    assert [cd["class_id"] for cd in matcher._classes] == ["150001", "150002"]
+    assert matcher._class_names[0] == "co so du lieu tn"
+
+    # A code change drops the old key and appends the new one
+    cls.class_id = "150009"
+    session.commit()
+    fm.publish_catalogue_change(session, "class", ["150001", "150009"])
+    assert [cd["class_id"] for cd in matcher._classes] == ["150002", "150009"]
+    assert matcher._classes[0]["course_ids"] == {subject.course_subjects[0].course_id}
+    assert matcher.match_class("giai tich 1").class_id == "150002"
+
+
+def test_other_worker_changes_are_replayed(catalogue, monkeypatch):
+    session, change_log = catalogue
+    matcher = fm.get_fuzzy_matcher(session)
+    _no_full_reload(monkeypatch, matcher)
+
+    # Another worker commits and publishes; this process has no matcher for that engine
+    session.add(Subject(subject_id="PH1110", subject_name="Vật lý đại cương I", credits=3))
+    session.commit()
+    monkeypatch.setattr(fm, "_shared_matchers", {})
+    fm.publish_catalogue_change(session, "subject", ["PH1110"])
+    assert "PH1110" not in matcher._subject_ids
+
+    matcher._last_probe = 0.0
+    matcher.ensure_fresh(session)
+
+    assert "PH1110" in matcher._subject_ids
+    assert matcher._seen_change == change_log.get(fm.CHANGE_COUNTER_KEY)
+
+
+def test_signature_probe_reloads_unpublished_changes(catalogue):
+    session, change_log = catalogue
+    matcher = fm.get_fuzzy_matcher(session)
+    session.add(Subject(subject_id="SSH1111", subject_name="Triết học Mác - Lênin", credits=3))
+    session.commit()
+
+    matcher.ensure_fresh(session)
+    assert "SSH1111" not in matcher._subject_ids   # probe is throttled
+
+    matcher._last_probe = 0.0
+    matcher.ensure_fresh(session)
+    assert "SSH1111" in matcher._subject_ids
+
+
+def test_missing_change_entry_falls_back_to_full_reload(catalogue, monkeypatch):
+    session, change_log = catalogue
+    matcher = fm.get_fuzzy_matcher(session)
+    change_log.increment(fm.CHANGE_COUNTER_KEY)   # entry expired / never written
+    reloads = []
+    monkeypatch.setattr(matcher, "refresh_cache", reloads.append)
+
+    matcher.sync(session)
+
+    assert reloads == [session]
@@ -0,0 +1,125 @@
+"""
+Test FuzzyMatcher n-gram prefilter, per-course index arrays and batch matching
+"""
+import random
+from datetime import datetime
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+from app.services import fuzzy_matcher as fm
+from app.services.fuzzy_matcher import FuzzyMatcher
+
+WORDS = (
+    "giai tich dai so vat ly hoa hoc lap trinh huong doi tuong co so du lieu mang may tinh "
+    "cau truc thuat toan he dieu hanh tri tue nhan tao kinh te chinh tri xac suat thong ke"
+).split()
+
+
+def _load(matcher, subjects, classes):
+    """Fill the cache the way refresh_cache does, without a database"""
+    matcher._publish(list(subjects), list(classes))
+    matcher._last_refresh = datetime.now()
+    return matcher
+
+
+def _catalogue(rng, subject_count, class_count):
+    subjects = []
+    for index in range(subject_count):
+        name = " ".join(rng.sample(WORDS, rng.randint(2, 4))) + rng.choice(["", " 1", " 2", " II"])
+        subjects.append((f"S{index:04d}", name.title(), set(rng.sample([1, 2, 3], rng.randint(0, 2)))))
+    classes = []
+    for index in range(class_count):
+        subject_id, subject_name, course_ids = rng.choice(subjects)
+        classes.append({
+            "class_id": f"{100000 + index}",
+            "class_name": subject_name + rng.choice(["", " (TN)"]),
+            "subject_id": subject_id,
+            "subject_name": subject_name,
+            "course_ids": set(course_ids),
+        })
+    return subjects, classes
+
+
+def test_small_catalogue_scans_everything():
+    """Below PREFILTER_MIN_ENTRIES candidates equal a plain process.extract"""
+    rng = random.Random(1)
+    subjects, classes = _catalogue(rng, 60, 120)
+    matcher = _load(FuzzyMatcher(), subjects, classes)
+    assert matcher._subject_index is None and matcher._class_index is None
+
+    for query in ["giai tich 2", "co so du lieu", "lap trnh", "xyz"]:
+        expected = process.extract(
+            matcher._normalize(query), matcher._subject_names,
+            scorer=fuzz.WRatio, limit=15, score_cutoff=fm.SUGGEST_THRESHOLD,
+        )
+        candidates = matcher.get_subject_candidates(query, top_k=3)
+        assert [(c.subject_id, c.score) for c in candidates] == [
+            (matcher._subject_ids[idx], score) for _, score, idx in expected[:3]
+        ]
+
+
+def test_course_index_arrays_follow_cache():
+    subjects = [
+        ("IT0001", "Cấu trúc dữ liệu", {1, 2}),
+        ("IT0002", "Giải tích I", {2}),
+        ("IT0003", "Đại số", set()),
+    ]
+    matcher = _load(FuzzyMatcher(), subjects, [])
+
+    assert matcher._subject_course_index[1].tolist() == [0]
+    assert matcher._subject_course_index[2].tolist() == [0, 1]
+    assert matcher.match_subject("giai tich 1", preferred_course_id=2).subject_id == "IT0002"
+
+
+def test_prefilter_keeps_exact_names_and_lowest_index_ties(monkeypatch):
+    monkeypatch.setattr(fm, "PREFILTER_MIN_ENTRIES", 1)
+    monkeypatch.setattr(fm, "PREFILTER_MAX_CANDIDATES", 20)
+    rng = random.Random(7)
+    subjects, classes = _catalogue(rng, 300, 600)
+    indexed = _load(FuzzyMatcher(), subjects, classes)
+    assert indexed._subject_index is not None and indexed._class_index is not None
+
+    for sid, name, _ in rng.sample(subjects, 40):
+        match = indexed.match_subject(name)
+        assert match.score == 100
+        assert indexed._subject_names[indexed._subject_ids.index(match.subject_id)] == indexed._normalize(name)
+
+    # Many classes share one name: the first one in cache order wins, as with a full scan
+    target = classes[5]["class_name"]
+    first = next(cd for cd in classes if cd["class_name"] == target)
+    assert indexed.match_class(target).class_id == first["class_id"]
+
+
+def test_index_candidates_sorted_and_capped():
+    names = ["giai tich 1"] * 30 + ["dai so"] * 5
+    index = fm._NgramIndex(names)
+
+    hits = index.candidates("giai tich", limit=10)
+
+    assert hits.tolist() == list(range(10))
+    assert index.candidates("qqqq").size == 0
+
+
+def test_match_subjects_batch_equals_single(monkeypatch):
+    rng = random.Random(3)
+    subjects, classes = _catalogue(rng, 200, 10)
+    queries = ["giai tich", "", "co so du lieu 2", "xac suat thong ke", "abc", None, "dai so II"]
+
+    for min_entries in (10_000, 1):
+        monkeypatch.setattr(fm, "PREFILTER_MIN_ENTRIES", min_entries)
+        matcher = _load(FuzzyMatcher(), subjects, classes)
+        for course_id in (None, 1, 3):
+            batch = matcher.match_subjects(queries, preferred_course_id=course_id)
+            single = [matcher.match_subject(q, preferred_course_id=course_id) if q else None for q in queries]
+            assert batch == single
+
+
+def test_top_from_scores_orders_like_extract():
+    scores = np.array([60.0, 90.0, 40.0, 90.0, 75.0])
+    columns = np.array([0, 2, 4, 6, 8])
+    names = [f"n{i}" for i in range(9)]
+
+    top = FuzzyMatcher._top_from_scores(scores, columns, np.ones(5, dtype=bool), names, limit=3)
+
+    assert top == [("n2", 90.0, 2), ("n6", 90.0, 6), ("n8", 75.0, 8)]
@@ -0,0 +1,157 @@
+"""
+Test incremental GPA/CPA maintenance: random mutation sequences always match a full rebuild
+"""
+import random
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.db.database import Base
+from app.models.__init__ import Course, Department, LearnedSubject, SemesterGPA, Student, Subject
+from app.routes.learned_subject_routes import (
+    create_learned_subject,
+    create_new_learned_subject,
+    delete_learned_subject,
+    update_learned_subject,
+)
+from app.schemas.learned_subject_schema import (
+    LearnedSubjectCreate,
+    LearnedSubjectSimpleCreate,
+    LearnedSubjectUpdate,
+)
+from app.services.grade_aggregate_service import (
+    recover_grade_points,
+    rebuild_all_grade_aggregates,
+    rebuild_student_aggregates,
+)
+
+GRADES = ["A+", "A", "B+", "B", "C+", "C", "D+", "D", "F", "F"]
+SEMESTERS = ["20221", "20222", "20231", "20232"]
+# IT-E6 elective modules (app/rules/elective_modules_config.json) + core subjects, one with 0 credits
+SUBJECT_CREDITS = {
+    "IT4409": 3, "IT4785": 3, "IT4542": 3, "IT4930": 3, "IT3190": 3, "IT4441": 3,
+    "IT4210": 3, "IT4735": 3, "IT4651": 3,
+    "MI1114": 2, "IT3011": 3, "IT3100": 4, "SSH1111": 2, "PE1010": 0,
+}
+
+
+@pytest.fixture()
+def db():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(Department(id="D01", name="Dept"))
+    session.add(Course(id=1, course_id="IT-E6", course_name="Course"))
+    session.add(Student(id=1, student_name="SV", email="sv@example.com", password="x", course_id=1))
+    session.add_all(
+        Subject(id=index, subject_id=code, subject_name=code, credits=credits)
+        for index, (code, credits) in enumerate(SUBJECT_CREDITS.items(), start=1)
+    )
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _aggregates(db):
+    student = db.get(Student, 1)
+    semesters = {
+        row.semester: (row.gpa, row.total_credits)
+        for row in db.query(SemesterGPA).filter(SemesterGPA.student_id == 1)
+    }
+    return semesters, (
+        student.cpa, student.failed_subjects_number, student.study_subjects_number,
+        student.total_failed_credits, student.total_learned_credits,
+        student.warning_level, student.level_3_warning_number, student.year_level,
+    )
+
+
+def _mutate(db, rng, student):
+    learned = db.query(LearnedSubject).filter(LearnedSubject.student_id == 1).all()
+    operation = rng.choice(["create", "create", "replace", "update", "delete"] if learned else ["create"])
+    if operation == "create":
+        create_learned_subject(
+            LearnedSubjectCreate(
+                student_id=1, subject_id=rng.randint(1, len(SUBJECT_CREDITS)),
+                semester=rng.choice(SEMESTERS), letter_grade=rng.choice(GRADES),
+            ),
+            db=db, current_student=student,
+        )
+    elif operation == "replace":
+        create_new_learned_subject(
+            LearnedSubjectSimpleCreate(
+                student_id=1, subject_id=rng.choice(list(SUBJECT_CREDITS)),
+                semester=rng.choice(SEMESTERS), letter_grade=rng.choice(GRADES),
+            ),
+            db=db, current_student=student,
+        )
+    elif operation == "update":
+        fields = rng.choice([{"letter_grade": rng.choice(GRADES)}, {"semester": rng.choice(SEMESTERS)},
+                             {"letter_grade": rng.choice(GRADES), "semester": rng.choice(SEMESTERS)}])
+        update_learned_subject(rng.choice(learned).id, LearnedSubjectUpdate(**fields), db=db, current_student=student)
+    else:
+        delete_learned_subject(rng.choice(learned).id, db=db, current_student=student)
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_incremental_aggregates_match_full_rebuild(db, seed):
+    rng = random.Random(seed)
+    student = db.get(Student, 1)
+
+    for step in range(40):
+        _mutate(db, rng, student)
+        incremental = _aggregates(db)
+
+        rebuild_student_aggregates(db, 1)
+        db.commit()
+        assert _aggregates(db) == incremental, (seed, step)
+
+
+def test_core_subject_changes_do_not_reload_transcript(db):
+    student = db.get(Student, 1)
+    for subject_id in range(10, 15):
+        create_learned_subject(
+            LearnedSubjectCreate(student_id=1, subject_id=subject_id, semester="20231", letter_grade="B"),
+            db=db, current_student=student,
+        )
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    create_learned_subject(
+        LearnedSubjectCreate(student_id=1, subject_id=11, semester="20232", letter_grade="A"),
+        db=db, current_student=student,
+    )
+
+    transcript_reads = [sql for sql in statements if "learned_subjects.student_id = ?" in sql]
+    assert transcript_reads == []
+    assert _aggregates(db)[0]["20232"] == (4.0, 3)
+
+
+def test_reconciliation_repairs_drifted_rows(db):
+    student = db.get(Student, 1)
+    for subject_id, grade in ((10, "A"), (11, "F"), (12, "C")):
+        create_learned_subject(
+            LearnedSubjectCreate(student_id=1, subject_id=subject_id, semester="20231", letter_grade=grade),
+            db=db, current_student=student,
+        )
+    expected = _aggregates(db)
+    row = db.query(SemesterGPA).filter_by(student_id=1, semester="20231").one()
+    row.gpa = 1.234
+    db.add_all([
+        SemesterGPA(student_id=1, semester="20231", gpa=0.0, total_credits=0),
+        SemesterGPA(student_id=1, semester="19991", gpa=3.0, total_credits=3),
+    ])
+    student.cpa, student.total_learned_credits = 0.0, 0
+    db.commit()
+
+    assert rebuild_all_grade_aggregates(db) == 1
+    assert _aggregates(db) == expected
+    assert db.query(SemesterGPA).count() == 1
+
+
+def test_grade_points_survive_float_storage():
+    for credits in range(1, 200):
+        for points in range(0, credits * 8 + 1):
+            average = (points / 2) / credits
+            assert recover_grade_points(average, credits) == points / 2
@@ -0,0 +1,170 @@
+"""
+Test the set-based grade import: streaming parse, constant query count, changed-semester GPA recompute
+"""
+import asyncio
+from io import BytesIO
+
+import openpyxl
+import pytest
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.db.database import Base
+from app.models.__init__ import (
+    Course,
+    Department,
+    LearnedSubject,
+    SemesterGPA,
+    Student,
+    Subject,
+)
+from app.routes import learned_subject_routes
+from app.routes.learned_subject_routes import upload_grades_excel, upload_grades_excel_batch
+from app.services.grade_aggregate_service import GradeEntry, rebuild_student_aggregates
+from app.services.grade_import_service import (
+    GradeSheetError,
+    import_grade_rows,
+    parse_grade_workbook,
+)
+
+HEADER = ["STT", "Học kỳ", "Mã HP", "Tên HP", "Tín chỉ", "Điểm HP"]
+
+
+def _workbook(rows, header=HEADER, preamble=2):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    for _ in range(preamble):
+        sheet.append(["BẢNG ĐIỂM CÁ NHÂN"])
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+    buffer = BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture()
+def db():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(Department(id="SOICT", name="Trường CNTT"))
+    session.add(Course(id=1, course_id="IT1", course_name="Khoa học máy tính"))
+    session.add_all([
+        Student(id=pk, student_name=f"SV {pk}", email=f"sv{pk}@example.com", password="x",
+                course_id=1, department_id="SOICT")
+        for pk in (1, 2, 3)
+    ])
+    session.add_all([
+        Subject(id=index, subject_id=f"IT{3000 + index}", subject_name=f"Môn {index}", credits=3,
+                department_id="SOICT")
+        for index in range(1, 41)
+    ])
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _record_statements(session):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(session.get_bind(), "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+def test_streaming_parse_finds_header_and_validates_rows():
+    contents = _workbook([
+        [1, "20231", "IT3001", "Môn 1", 3, "A"],
+        [None, None, None, None, None, None],
+        [2, "20231", "IT3002", "Môn 2", 3, "E"],
+        [3, "20231", "", "Môn 3", 3, "B"],
+    ])
+
+    parsed = parse_grade_workbook(contents)
+
+    assert [(row.row_idx, row.subject_code, row.letter_grade) for row in parsed.rows] == [(4, "IT3001", "A")]
+    assert parsed.skipped == 2
+    assert parsed.errors == [(6, "Điểm 'E' không hợp lệ")]
+    assert parsed.has_student_column is False
+
+    with pytest.raises(GradeSheetError):
+        parse_grade_workbook(_workbook([], header=["Học kỳ", "Tên HP"]))
+
+
+def test_query_count_does_not_grow_with_rows(db):
+    rows = [[index, f"2023{index % 4 + 1}", f"IT{3000 + index}", "", 3, "B+"] for index in range(1, 41)]
+    rows.append([99, "20231", "IT9999", "", 3, "A"])
+    rows.append([100, "20232", "IT3001", "", 3, "A"])  # IT3001 is already in 20232 from row 1
+
+    db.add(LearnedSubject(subject_name="Môn 2", credits=3, letter_grade="C", semester="20233",
+                          student_id=1, subject_id=2))
+    db.commit()
+    statements = _record_statements(db)
+
+    result = import_grade_rows(db, parse_grade_workbook(_workbook(rows)), student_pk=1)
+    db.commit()
+
+    assert len([sql for sql in statements if sql.lstrip().upper().startswith("SELECT")]) == 2
+    assert len([sql for sql in statements if sql.lstrip().upper().startswith("INSERT")]) == 1
+    assert result.created == 39
+    assert result.skipped == 3
+    assert result.error_messages() == ["Dòng 44: Không tìm thấy môn học với mã HP 'IT9999'"]
+    assert {entry.semester for entry in result.added[1]} == {"20231", "20232", "20233", "20234"}
+    assert result.added[1][0] == GradeEntry("20232", 3, "B+", "IT3001")
+    assert db.query(LearnedSubject).filter(LearnedSubject.student_id == 1).count() == 40
+
+
+def test_upload_applies_new_rows_without_full_recompute(db, monkeypatch):
+    db.add(LearnedSubject(subject_name="Môn 1", credits=3, letter_grade="A", semester="20221",
+                          student_id=1, subject_id=1))
+    rebuild_student_aggregates(db, 1)
+    db.commit()
+    recomputed = []
+    monkeypatch.setattr(learned_subject_routes, "update_semester_gpa", lambda *args: recomputed.append(args))
+    monkeypatch.setattr(learned_subject_routes, "update_student_stats", lambda *args: recomputed.append(args))
+    contents = _workbook([
+        [1, "20231", "IT3002", "", 3, "A"],
+        [2, "20231", "IT3003", "", 3, "C"],
+        [3, "20221", "IT3001", "", 3, "A"],
+    ])
+    upload = UploadFile(file=BytesIO(contents), filename="diem.xlsx")
+
+    response = asyncio.run(upload_grades_excel(student_id=1, file=upload, db=db, current_student=None))
+
+    assert response == {"message": "Upload điểm thành công", "created": 2, "skipped": 1, "errors": None}
+    assert recomputed == []
+    gpas = {row.semester: (row.gpa, row.total_credits) for row in db.query(SemesterGPA).filter_by(student_id=1)}
+    assert gpas == {"20221": (4.0, 3), "20231": (3.0, 6)}
+    student = db.get(Student, 1)
+    assert (student.total_learned_credits, student.cpa) == (9, 30 / 9)
+
+
+def test_batch_upload_imports_many_students_in_one_pass(db):
+    rows = [
+        [1, "20231", "IT3001", "", 3, "A", 1],
+        [2, "20231", "IT3002", "", 3, "B", 2],
+        [3, "20232", "IT3003", "", 3, "F", 2],
+        [4, "20231", "IT3004", "", 3, "A", "77"],
+        [5, "20231", "IT3001", "", 3, "A", 1.0],
+    ]
+    contents = _workbook(rows, header=HEADER + ["MSSV"])
+    statements = _record_statements(db)
+    upload = UploadFile(file=BytesIO(contents), filename="lop.xlsx")
+
+    response = asyncio.run(upload_grades_excel_batch(file=upload, db=db, _=None))
+
+    assert response["students"] == 2 and response["created"] == 3 and response["skipped"] == 2
+    assert response["errors"] == ["Dòng 7: Không tìm thấy sinh viên '77'"]
+    assert len([sql for sql in statements if sql.startswith("INSERT INTO learned_subjects")]) == 1
+    assert db.get(Student, 2).failed_subjects_number == 1
+    assert db.query(SemesterGPA).filter(SemesterGPA.student_id == 3).count() == 0
+
+    upload = UploadFile(file=BytesIO(_workbook(rows)), filename="lop.xlsx")
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(upload_grades_excel_batch(file=upload, db=db, _=None))
+    assert exc_info.value.status_code == 400
@@ -0,0 +1,105 @@
+"""
+Test shared pooled httpx client: keep-alive reuse across tool calls, per-request timeouts
+"""
+import asyncio
+import json
+
+from app.agents.orchestration_metrics import get_orchestration_metrics
+from app.agents.tools_registry import ToolsRegistry
+from app.core import http_client
+
+
+async def _start_server(delay_seconds=0.0):
+    """Minimal HTTP/1.1 keep-alive server counting accepted TCP connections"""
+    state = {"connections": 0}
+
+    async def handle(reader, writer):
+        state["connections"] += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.decode().split("\r\n"):
+                    if line.lower().startswith("content-length:"):
+                        length = int(line.split(":", 1)[1])
+                await reader.readexactly(length)
+                await asyncio.sleep(delay_seconds)
+                body = json.dumps({"status": "success", "data": []}).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}", state
+
+
+def _counter(key):
+    return get_orchestration_metrics().snapshot()["counters"].get(key, 0)
+
+
+def test_tool_calls_reuse_one_connection():
+    async def main():
+        server, base_url, state = await _start_server()
+        registry = ToolsRegistry(tool_map={})
+        registry.register("grade_view", f"{base_url}/intent/grade_view", timeout=5)
+        registry.register("schedule_view", f"{base_url}/intent/schedule_view", timeout=2)
+        opened = _counter("tools.connection_opened")
+        try:
+            results = [await registry.call(name, {"q": "x"}) for name in ["grade_view", "schedule_view"] * 3]
+        finally:
+            await http_client.close_http_client()
+            server.close()
+            await server.wait_closed()
+        return results, state["connections"], _counter("tools.connection_opened") - opened
+
+    results, connections, opened = asyncio.run(main())
+
+    assert all(result["status"] == "success" for result in results)
+    assert connections == 1
+    assert opened == 1
+
+
+def test_per_tool_timeout_applies_per_request():
+    async def main():
+        server, base_url, _ = await _start_server(delay_seconds=0.3)
+        registry = ToolsRegistry(tool_map={})
+        registry.register("slow", f"{base_url}/slow", timeout=0.1)
+        registry.register("patient", f"{base_url}/patient", timeout=5)
+        try:
+            return await registry.call("slow", {}), await registry.call("patient", {})
+        finally:
+            await http_client.close_http_client()
+            server.close()
+            await server.wait_closed()
+
+    slow, patient = asyncio.run(main())
+
+    assert slow["status"] == "error" and slow["error"].startswith("TIMEOUT")
+    assert patient["status"] == "success"
+
+
+def test_client_is_shared_per_event_loop_and_closed_on_shutdown():
+    async def get_twice():
+        first, second = http_client.get_http_client(), http_client.get_http_client()
+        return first, second
+
+    first, second = asyncio.run(get_twice())
+    assert first is second
+
+    async def get_and_close():
+        client = http_client.get_http_client()
+        await http_client.close_http_client()
+        return client
+
+    # A new loop must not reuse sockets owned by the previous one
+    client = asyncio.run(get_and_close())
+    assert client is not first
+    assert client.is_closed
@@ -0,0 +1,174 @@
+"""
+Test in-process NODE-3 tool transport for ToolsRegistry
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.agents import inprocess_tools
+from app.agents.tools_registry import ToolsRegistry
+from app.db.database import Base
+from app.models.course_model import Course
+from app.models.course_subject_model import CourseSubject
+from app.models.department_model import Department
+from app.models.learned_subject_model import LearnedSubject
+from app.models.student_model import Student
+from app.models.subject_model import Subject
+
+LOCAL = "http://127.0.0.1:8000/api/agent-tools/intent"
+
+
+@pytest.fixture()
+def db():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    department = Department(id="D01", name="Test")
+    course = Course(course_id="KTEST", course_name="Test course")
+    calculus = Subject(subject_id="MI1114", subject_name="Giải tích I", credits=3)
+    networks = Subject(subject_id="IT3080", subject_name="Mạng máy tính", credits=2)
+    session.add_all([department, course, calculus, networks])
+    session.flush()
+    student = Student(
+        student_name="Tool Student", email="tool@example.com", password="hashed",
+        course_id=course.id, department_id=department.id,
+    )
+    session.add(student)
+    session.flush()
+    session.add_all([
+        CourseSubject(course_id=course.id, subject_id=calculus.id, learning_semester=1),
+        CourseSubject(course_id=course.id, subject_id=networks.id, learning_semester=5),
+        LearnedSubject(student_id=student.id, subject_id=calculus.id, letter_grade="B+", credits=3),
+    ])
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _registry():
+    return ToolsRegistry(tool_map={
+        name: {"url": f"{LOCAL}/{name}", "timeout": 5, "headers": {}}
+        for name in ("graduation_progress", "grade_view", "not_a_tool")
+    })
+
+
+def test_local_url_detection(monkeypatch):
+    assert inprocess_tools.local_intent_name(f"{LOCAL}/grade_view") == "grade_view"
+    assert inprocess_tools.local_intent_name("http://localhost:8000/api/agent-tools/intent/x/") == "x"
+    assert inprocess_tools.local_intent_name("https://tools.example.com/api/agent-tools/intent/x") is None
+    assert inprocess_tools.local_intent_name("http://127.0.0.1:9000/api/agent-tools/intent/x") is None
+    assert inprocess_tools.local_intent_name("http://127.0.0.1:8000/api/other") is None
+
+    assert inprocess_tools.use_inprocess_transport(f"{LOCAL}/grade_view")
+    assert not inprocess_tools.use_inprocess_transport(f"{LOCAL}/grade_view", transport="http")
+    monkeypatch.setattr(inprocess_tools, "AGENT_TOOLS_TRANSPORT", "http")
+    assert not inprocess_tools.use_inprocess_transport(f"{LOCAL}/grade_view")
+
+
+def test_graduation_progress_runs_in_process(db):
+    async def main():
+        async with inprocess_tools.tool_session_scope(db):
+            return await _registry().call("graduation_progress", {"q": "còn thiếu bao nhiêu tín", "student_id": 1})
+
+    result = asyncio.run(main())
+
+    assert result["status"] == "success"
+    assert result["metadata"]["remaining_credits"] == 2
+    assert [row["subject_id"] for row in result["data"]["data"]] == ["IT3080"]
+    assert db.is_active  # caller-owned session stays open
+
+
+def test_scope_shares_session_and_chatbot_service(db, monkeypatch):
+    seen = []
+
+    async def fake_process_single_query(**kwargs):
+        seen.append((kwargs["db"], kwargs["chatbot_service"]))
+        return SimpleNamespace(
+            text="ok", intent=kwargs["forced_intent"], confidence="high",
+            data=[{"gpa": 3.2}], sql=None, sql_error=None, metadata={},
+        )
+
+    monkeypatch.setattr("app.routes.chatbot_routes._process_single_query", fake_process_single_query)
+    registry = _registry()
+
+    async def main():
+        async with inprocess_tools.tool_session_scope(db):
+            first = await registry.call("grade_view", {"q": "xem điểm", "student_id": 1})
+            second = await registry.call("grade_view", {"q": "điểm kỳ này", "student_id": 1})
+        return first, second
+
+    first, second = asyncio.run(main())
+
+    assert first["status"] == second["status"] == "success"
+    assert first["data"]["data"] == [{"gpa": 3.2}]
+    assert seen[0][0] is db and seen[1][0] is db
+    assert seen[0][1] is seen[1][1]
+
+
+def test_inprocess_errors_match_http_contract(db):
+    registry = _registry()
+
+    async def main():
+        async with inprocess_tools.tool_session_scope(db):
+            return (
+                await registry.call("not_a_tool", {"q": "x"}),
+                await registry.call("grade_view", {"student_id": 1}),
+            )
+
+    unsupported, invalid = asyncio.run(main())
+
+    assert unsupported["http_status"] == 404
+    assert unsupported["error"].startswith("HTTP_404_NOT_FOUND")
+    assert invalid["http_status"] == 422
+    assert invalid["error"].startswith("HTTP_422_VALIDATION")
+
+
+def test_timed_out_call_keeps_scope_busy_until_worker_finishes(db, monkeypatch):
+    release_worker = asyncio.Event()
+    fresh_sessions, seen = [], []
+
+    class FreshSession:
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    def session_factory():
+        fresh_sessions.append(FreshSession())
+        return fresh_sessions[-1]
+
+    async def fake_dispatch(intent_name, request, scope):
+        seen.append(scope.db)
+        if len(seen) == 1:
+            await release_worker.wait()  # stands in for a to_thread worker still using scope.db
+        return {"status": "success"}
+
+    monkeypatch.setattr(inprocess_tools, "_dispatch", fake_dispatch)
+    monkeypatch.setattr("app.db.database.SessionLocal", session_factory)
+    url = f"{LOCAL}/grade_view"
+    payload = {"q": "xem điểm", "student_id": 1}
+
+    async def main():
+        async with inprocess_tools.tool_session_scope(db):
+            scope = inprocess_tools._current_scope.get()
+            timed_out = await inprocess_tools.call_local_tool(url, payload, timeout=0.01)
+            busy_after_timeout = scope.busy
+            second = await inprocess_tools.call_local_tool(url, payload, timeout=1)
+            release_worker.set()
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            third = await inprocess_tools.call_local_tool(url, payload, timeout=1)
+        return timed_out, busy_after_timeout, second, third
+
+    timed_out, busy_after_timeout, second, third = asyncio.run(main())
+
+    assert timed_out["error"].startswith("TIMEOUT")
+    assert busy_after_timeout
+    assert second["status"] == third["status"] == "success"
+    assert seen == [db, fresh_sessions[0], db]
+    assert fresh_sessions[0].closed
+    assert db.is_active
@@ -0,0 +1,91 @@
+"""
+Test batch intent classification (classify_batch) against classify_intent
+"""
+import asyncio
+
+import pytest
+
+from app.agents.agent_orchestrator import AgentOrchestrator
+from app.chatbot.tfidf_classifier import TfidfIntentClassifier
+from app.llm.response_cache import ResponseCache
+
+
+MESSAGES = [
+    "xem điểm",
+    "tôi nên đăng ký môn gì",
+    "gợi ý lớp kỳ sau",
+    "",
+    "tkb của tôi tuần này",
+    "qwerty zxcv",
+    "tôi không muốn học muộn, gợi ý lớp kỳ sau",
+    "cảm ơn nhé",
+    "   ",
+    "DK lop hoc nao?",
+]
+
+
+@pytest.fixture(scope="module")
+def classifier(tmp_path_factory):
+    return TfidfIntentClassifier(artifact_dir=str(tmp_path_factory.mktemp("intent_model")))
+
+
+def test_classify_batch_matches_classify_intent(classifier):
+    batch = asyncio.run(classifier.classify_batch(MESSAGES))
+    single = [asyncio.run(classifier.classify_intent(message)) for message in MESSAGES]
+
+    assert batch == single
+
+
+def test_tfidf_reduceat_matches_per_pattern_max(classifier):
+    """Max per intent via reduceat equals the per-pattern dict aggregation"""
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    normalized = [classifier._normalize_vietnamese(m) for m in MESSAGES if m.strip()]
+    scores = classifier._tfidf_scores_batch(normalized)
+    pattern_scores = cosine_similarity(
+        classifier.tfidf_vectorizer.transform(normalized), classifier.intent_tfidf_matrix
+    )
+
+    for row, similarities in enumerate(pattern_scores):
+        expected = {}
+        for label, score in zip(classifier.intent_labels, similarities):
+            expected[label] = max(expected.get(label, score), score)
+        assert dict(zip(classifier._intent_order, scores[row].tolist())) == expected
+
+
+def test_classify_batch_empty_input(classifier):
+    assert asyncio.run(classifier.classify_batch([])) == []
+
+
+class _RecordingTFIDF:
+    def __init__(self):
+        self.batches = []
+        self.single_calls = 0
+
+    async def classify_batch(self, messages):
+        self.batches.append(list(messages))
+        return [{"intent": "grade_view", "confidence_score": 0.9} for _ in messages]
+
+    async def classify_intent(self, text):
+        self.single_calls += 1
+        return {"intent": "grade_view", "confidence_score": 0.9}
+
+
+def test_orchestrator_classifies_segments_in_one_batch():
+    orchestrator = AgentOrchestrator(llm_client=object(), tools=None, cache=ResponseCache())
+    orchestrator.tfidf = _RecordingTFIDF()
+    segments = ["xem điểm của tôi", "lịch học, tránh môn IT3080"]
+
+    async def run():
+        tfidf_results = await orchestrator.classify_segments_tfidf(segments)
+        return await asyncio.gather(*(
+            orchestrator.node2_intent_router(seg, tfidf_result=result)
+            for seg, result in zip(segments, tfidf_results)
+        ))
+
+    infos = asyncio.run(run())
+
+    assert orchestrator.tfidf.batches == [["xem điểm của tôi", "lịch học"]]
+    assert orchestrator.tfidf.single_calls == 0
+    assert [info["source"] for info in infos] == ["tfidf", "tfidf"]
+    assert infos[1]["constraints"]["exclude_subjects"] == ["IT3080"]
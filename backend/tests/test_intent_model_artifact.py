@@ -0,0 +1,78 @@
+"""
+Test persisted TF-IDF + Word2Vec intent model artifact
+"""
+import asyncio
+
+import numpy as np
+
+from app.chatbot import tfidf_classifier
+from app.chatbot.intent_model_store import artifact_path, compute_fingerprint
+from app.chatbot.tfidf_classifier import TfidfIntentClassifier
+
+
+QUESTIONS = [
+    "xem điểm",
+    "tôi nên đăng ký môn gì",
+    "gợi ý lớp kỳ sau",
+    "tkb của tôi",
+    "cảm ơn nhé",
+]
+
+
+def test_loaded_artifact_classifies_like_trained_model(tmp_path):
+    """Second instance loads from disk and gives identical results"""
+    trained = TfidfIntentClassifier(artifact_dir=str(tmp_path))
+    assert not trained.loaded_from_artifact
+
+    loaded = TfidfIntentClassifier(artifact_dir=str(tmp_path))
+    assert loaded.loaded_from_artifact
+    assert loaded.word2vec_model is None
+
+    assert loaded.tfidf_vectorizer.vocabulary_ == trained.tfidf_vectorizer.vocabulary_
+    assert (loaded.intent_tfidf_matrix != trained.intent_tfidf_matrix).nnz == 0
+    assert loaded.intent_labels == trained.intent_labels
+    assert loaded.intent_keywords_map == trained.intent_keywords_map
+    for tag, embedding in trained.intent_embeddings_map.items():
+        assert np.array_equal(loaded.intent_embeddings_map[tag], embedding)
+
+    for question in QUESTIONS:
+        assert asyncio.run(loaded.classify_intent(question)) == asyncio.run(trained.classify_intent(question))
+
+
+def test_fingerprint_tracks_intents_and_config():
+    """Editing intents.json or config produces a different artifact key"""
+    intents = {"intents": [{"tag": "greeting", "patterns": ["xin chào"]}]}
+    config = {"word2vec_params": {"epochs": 20}}
+    base = compute_fingerprint(intents, config, {})
+
+    assert compute_fingerprint(intents, config, {}) == base
+    assert compute_fingerprint(intents, {"word2vec_params": {"epochs": 30}}, {}) != base
+    changed_intents = {"intents": [{"tag": "greeting", "patterns": ["xin chào", "hello"]}]}
+    assert compute_fingerprint(changed_intents, config, {}) != base
+
+
+def test_use_artifact_false_neither_reads_nor_writes(tmp_path):
+    classifier = TfidfIntentClassifier(artifact_dir=str(tmp_path), use_artifact=False)
+
+    assert not classifier.loaded_from_artifact
+    assert not list(tmp_path.iterdir())
+
+    saved = classifier.save_artifact()
+    assert saved == artifact_path(str(tmp_path), classifier.fingerprint)
+
+
+def test_get_intent_classifier_is_shared(monkeypatch):
+    created = []
+
+    class FakeClassifier:
+        def __init__(self):
+            created.append(self)
+
+    monkeypatch.setattr(tfidf_classifier, "TfidfIntentClassifier", FakeClassifier)
+    monkeypatch.setattr(tfidf_classifier, "_classifier_instance", None)
+
+    first = tfidf_classifier.get_intent_classifier()
+    second = tfidf_classifier.get_intent_classifier()
+
+    assert first is second
+    assert len(created) == 1
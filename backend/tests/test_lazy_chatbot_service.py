@@ -0,0 +1,75 @@
+"""
+Test lazy ChatbotService components and mtime-cached rule configs
+"""
+import json
+import os
+from unittest.mock import MagicMock
+
+from app.agents.orchestration_metrics import get_orchestration_metrics
+from app.services import chatbot_service
+from app.services.elective_service import ElectiveModuleService
+from app.utils.config_cache import load_json_config
+
+
+def _init_count(component):
+    latency = get_orchestration_metrics().snapshot()["latency"]
+    return latency.get(f"chatbot_service.init.{component}", {}).get("count", 0)
+
+
+def test_components_are_built_on_first_use(monkeypatch):
+    created = []
+
+    class FakeEngine:
+        def __init__(self, db):
+            created.append(type(self).__name__)
+
+    monkeypatch.setattr(chatbot_service, "SubjectSuggestionRuleEngine", type("SubjectEngine", (FakeEngine,), {}))
+    monkeypatch.setattr(chatbot_service, "ClassSuggestionRuleEngine", type("ClassEngine", (FakeEngine,), {}))
+    before = _init_count("subject_rule_engine")
+
+    service = chatbot_service.ChatbotService(MagicMock())
+    assert created == []
+
+    engine = service.subject_rule_engine
+    assert service.subject_rule_engine is engine
+    assert created == ["SubjectEngine"]
+    assert _init_count("subject_rule_engine") == before + 1
+
+    service.class_rule_engine
+    assert created == ["SubjectEngine", "ClassEngine"]
+
+
+def test_fuzzy_matcher_failure_is_not_retried(monkeypatch):
+    calls = []
+
+    def broken(db):
+        calls.append(db)
+        raise RuntimeError("catalogue unavailable")
+
+    monkeypatch.setattr("app.services.fuzzy_matcher.get_fuzzy_matcher", broken)
+    service = chatbot_service.ChatbotService(MagicMock())
+
+    assert service._fuzzy_matcher is None
+    assert service._fuzzy_matcher is None
+    assert len(calls) == 1
+
+
+def test_json_config_reloads_only_when_file_changes(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"limit": 1}), encoding="utf-8")
+
+    first = load_json_config(str(path))
+    assert load_json_config(str(path)) is first
+
+    path.write_text(json.dumps({"limit": 22}), encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert load_json_config(str(path)) == {"limit": 22}
+
+
+def test_elective_services_share_parsed_config():
+    first = ElectiveModuleService()
+    second = ElectiveModuleService()
+
+    assert first._courses is second._courses
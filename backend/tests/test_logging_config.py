@@ -0,0 +1,98 @@
+"""
+Test the queue-backed app logger: structured JSON, lazy debug formatting, off-thread sink
+"""
+import io
+import json
+import logging
+import threading
+
+import pytest
+
+from app.core import logging_config
+from app.core.logging_config import configure_logging, shutdown_logging
+from app.services.schedule_combination_service import ScheduleCombinationGenerator
+
+
+@pytest.fixture()
+def stream():
+    app_logger = logging.getLogger("app")
+    saved = (app_logger.level, app_logger.propagate, list(app_logger.handlers))
+    buffer = io.StringIO()
+    yield buffer
+    shutdown_logging()
+    app_logger.setLevel(saved[0])
+    app_logger.propagate = saved[1]
+    app_logger.handlers[:] = saved[2]
+
+
+class CountingArg:
+    calls = 0
+
+    def __str__(self):
+        CountingArg.calls += 1
+        return "arg"
+
+
+def test_json_lines_carry_structured_fields(stream):
+    configure_logging(level="INFO", fmt="json", stream=stream)
+    logger = logging.getLogger("app.services.chat_history_service")
+
+    logger.info("[CHAT_HISTORY_METRIC] %s", "cache_hit", extra={"fields": {"event": "cache_hit", "page": 1}})
+    shutdown_logging()
+
+    record = json.loads(stream.getvalue())
+    assert record["level"] == "INFO"
+    assert record["logger"] == "app.services.chat_history_service"
+    assert record["msg"] == "[CHAT_HISTORY_METRIC] cache_hit"
+    assert record["event"] == "cache_hit" and record["page"] == 1
+
+
+def test_debug_arguments_are_never_formatted_at_info(stream):
+    configure_logging(level="INFO", stream=stream)
+    CountingArg.calls = 0
+
+    logging.getLogger("app.test").debug("dump %s", CountingArg())
+    shutdown_logging()
+
+    assert CountingArg.calls == 0
+    assert stream.getvalue() == ""
+
+
+def test_message_is_rendered_at_call_time_and_written_off_thread(stream, monkeypatch):
+    writer_threads = set()
+    original_format = logging_config.TextFormatter.format
+
+    def recording_format(self, record):
+        writer_threads.add(threading.get_ident())
+        return original_format(self, record)
+
+    monkeypatch.setattr(logging_config.TextFormatter, "format", recording_format)
+    configure_logging(level="INFO", fmt="text", stream=stream)
+    segments = ["a"]
+
+    logging.getLogger("app.test").info("segments=%s", segments)
+    segments.append("b")
+    shutdown_logging()
+
+    assert "segments=['a']" in stream.getvalue()
+    assert writer_threads and threading.get_ident() not in writer_threads
+
+
+def test_conflict_dump_is_gated_by_level(stream):
+    configure_logging(level="INFO", stream=stream)
+    generator = ScheduleCombinationGenerator()
+    clash = [
+        {"class_id": "C1", "study_date": "Monday", "study_time_start": "07:00", "study_time_end": "09:00",
+         "study_week": [1, 2, 3]},
+        {"class_id": "C2", "study_date": "Monday", "study_time_start": "08:00", "study_time_end": "10:00",
+         "study_week": [2, 3]},
+    ]
+
+    assert generator.has_time_conflicts(clash) is True
+    shutdown_logging()
+    assert "[CONFLICT]" not in stream.getvalue()
+
+    configure_logging(level="DEBUG", stream=stream)
+    assert generator.has_time_conflicts(clash) is True
+    shutdown_logging()
+    assert "[CONFLICT] C1 (Monday 07:00-09:00) vs C2 (Monday 08:00-10:00)" in stream.getvalue()
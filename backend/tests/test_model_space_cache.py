@@ -0,0 +1,154 @@
+"""
+Test model-space prompt-prefix KV cache and deterministic result cache (stub Llama, no model file)
+"""
+import asyncio
+import importlib.util
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+MODEL_SPACE_APP = Path(__file__).resolve().parents[2] / "model-space" / "app.py"
+
+
+class StubLlama:
+    """Token = byte; create_chat_completion evaluates only past the common prefix like llama-cpp"""
+
+    def __init__(self, *args, **kwargs):
+        self.context = []
+        self.evaluated = 0
+        self.completions = 0
+
+    def tokenize(self, text, add_bos=True, special=False):
+        return list(text)
+
+    def eval(self, tokens):
+        self.context.extend(tokens)
+        self.evaluated += len(tokens)
+
+    def reset(self):
+        self.context = []
+
+    def save_state(self):
+        return list(self.context)
+
+    def load_state(self, state):
+        self.context = list(state)
+
+    def create_chat_completion(self, messages, **kwargs):
+        system, user = messages[0]["content"], messages[1]["content"]
+        prompt = self.tokenize(
+            f"<|im_start|>system\n{system}<|im_end|>\n<|im_start|>user\n{user}<|im_end|>\n"
+            "<|im_start|>assistant\n".encode("utf-8")
+        )
+        common = 0
+        for current, new in zip(self.context, prompt):
+            if current != new:
+                break
+            common += 1
+        self.evaluated += len(prompt) - common
+        self.completions += 1
+
+        if "phân loại intent" in system:
+            content = '{"intent": "grade_view", "confidence": 0.9}'
+        elif "tách câu hỏi" in system:
+            content = '{"segments": ["xem điểm", "xem lịch"]}'
+        else:
+            content = "ok"
+        self.context = prompt + list(content.encode("utf-8"))
+        return {"choices": [{"message": {"content": content}}]}
+
+
+@pytest.fixture()
+def space(monkeypatch):
+    monkeypatch.setitem(sys.modules, "llama_cpp", types.SimpleNamespace(Llama=StubLlama))
+    spec = importlib.util.spec_from_file_location("model_space_app", MODEL_SPACE_APP)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module._llm = StubLlama()
+    yield module
+    module._scheduler.stop()
+
+
+def _suffix_cost(module, system_prompt, user_prompt):
+    full = f"<|im_start|>system\n{system_prompt}<|im_end|>\n<|im_start|>user\n{user_prompt}<|im_end|>\n<|im_start|>assistant\n"
+    return len(full.encode("utf-8")) - len(module.PromptPrefixCache.chatml_prefix(system_prompt).encode("utf-8"))
+
+
+def test_alternating_endpoints_only_evaluate_user_suffix(space):
+    llm = space._llm
+    space._prefill_prefix_states()
+    assert space._prefix_cache.stats()["states"] == 3
+
+    before = llm.evaluated
+    asyncio.run(space.classify(space.ClassifyRequest(text="xem điểm")))
+    asyncio.run(space.split(space.SplitRequest(text="xem điểm và xem lịch")))
+    asyncio.run(space.generate(space.GenerateRequest(prompt="Tóm tắt", temperature=0.2)))
+    evaluated = llm.evaluated - before
+
+    classify_user = (
+        "Phân loại đoạn văn sau vào đúng 1 intent. "
+        "Trả về JSON đúng định dạng: {\"intent\": \"...\", \"confidence\": 0.0}.\n\n"
+        "Đoạn văn: xem điểm"
+    )
+    split_user = (
+        "Tách văn bản sau thành mảng JSON tên là segments. "
+        "Nếu chỉ có 1 ý, trả về đúng 1 phần tử.\n\n"
+        "Văn bản: xem điểm và xem lịch\n\n"
+        "Định dạng: {\"segments\": [\"...\"]}"
+    )
+    expected = (
+        _suffix_cost(space, space.CLASSIFY_SYSTEM_PROMPT, classify_user)
+        + _suffix_cost(space, space.SPLIT_SYSTEM_PROMPT, split_user)
+        + _suffix_cost(space, space.GENERATE_SYSTEM_PROMPT, "Tóm tắt")
+    )
+    assert evaluated == expected
+    assert space._prefix_cache.stats()["misses"] == 3
+
+
+def test_prefix_state_is_built_once_per_system_prompt(space):
+    llm = space._llm
+    asyncio.run(space.classify(space.ClassifyRequest(text="điểm môn giải tích", temperature=0.5)))
+    first_cost = llm.evaluated
+    asyncio.run(space.generate(space.GenerateRequest(prompt="x")))
+    asyncio.run(space.classify(space.ClassifyRequest(text="điểm môn vật lý", temperature=0.5)))
+
+    stats = space._prefix_cache.stats()
+    assert stats["misses"] == 2 and stats["hits"] == 1
+    assert llm.evaluated - first_cost < first_cost
+
+
+def test_deterministic_classify_and_split_are_memoized(space):
+    llm = space._llm
+    first = asyncio.run(space.classify(space.ClassifyRequest(text=" xem điểm ")))
+    second = asyncio.run(space.classify(space.ClassifyRequest(text="xem điểm")))
+    asyncio.run(space.split(space.SplitRequest(text="xem điểm và lịch")))
+    asyncio.run(space.split(space.SplitRequest(text="xem điểm và lịch")))
+
+    assert first == second == {"intent": "grade_view", "confidence": 0.9, "text": first["text"]}
+    assert llm.completions == 2
+    assert space._result_cache.stats()["hits"] == 2
+
+    second["intent"] = "mutated"
+    assert asyncio.run(space.classify(space.ClassifyRequest(text="xem điểm")))["intent"] == "grade_view"
+
+
+def test_sampled_requests_bypass_result_cache(space):
+    llm = space._llm
+    for _ in range(2):
+        asyncio.run(space.classify(space.ClassifyRequest(text="xem điểm", temperature=0.3)))
+
+    assert llm.completions == 2
+    assert space._result_cache.stats()["size"] == 0
+
+
+def test_result_cache_evicts_least_recently_used(space):
+    cache = space.ResultCache(max_size=2)
+    cache.put(("classify", "a"), {"intent": "a"})
+    cache.put(("classify", "b"), {"intent": "b"})
+    cache.get(("classify", "a"))
+    cache.put(("classify", "c"), {"intent": "c"})
+
+    assert cache.get(("classify", "b")) is None
+    assert cache.get(("classify", "a")) == {"intent": "a"}
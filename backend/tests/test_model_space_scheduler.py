@@ -0,0 +1,164 @@
+"""
+Test model-space inference scheduler: single worker, priorities, deadline dropping, micro-batching
+"""
+import asyncio
+import importlib.util
+import sys
+import threading
+import time
+import types
+from pathlib import Path
+
+import pytest
+
+MODEL_SPACE_APP = Path(__file__).resolve().parents[2] / "model-space" / "app.py"
+
+
+class SlowLlama:
+    """Records completion order and fails if two threads enter at once"""
+
+    def __init__(self, *args, **kwargs):
+        self.order = []
+        self.active = 0
+        self.max_active = 0
+        self.release = threading.Event()
+        self.release.set()
+        self._guard = threading.Lock()
+
+    def tokenize(self, text, add_bos=True, special=False):
+        return list(text)
+
+    def eval(self, tokens):
+        pass
+
+    def reset(self):
+        pass
+
+    def save_state(self):
+        return None
+
+    def load_state(self, state):
+        pass
+
+    def create_chat_completion(self, messages, **kwargs):
+        with self._guard:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            self.release.wait(timeout=5)
+            time.sleep(0.01)
+            user = messages[1]["content"]
+            self.order.append(user)
+            if "phân loại" in messages[0]["content"]:
+                return {"choices": [{"message": {"content": '{"intent": "grade_view", "confidence": 0.9}'}}]}
+            return {"choices": [{"message": {"content": f"done {user}"}}]}
+        finally:
+            with self._guard:
+                self.active -= 1
+
+
+@pytest.fixture()
+def space(monkeypatch):
+    monkeypatch.setitem(sys.modules, "llama_cpp", types.SimpleNamespace(Llama=SlowLlama))
+    spec = importlib.util.spec_from_file_location("model_space_app", MODEL_SPACE_APP)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module._llm = SlowLlama()
+    yield module
+    module._llm.release.set()
+    module._scheduler.stop()
+
+
+async def _until_running(llm):
+    while llm.active == 0:
+        await asyncio.sleep(0.001)
+
+
+def _generate(space, prompt, timeout=5.0):
+    return space._chat_completion(
+        system_prompt=space.GENERATE_SYSTEM_PROMPT, user_prompt=prompt, max_tokens=16,
+        temperature=0.2, top_p=0.9, repeat_penalty=1.0, timeout_seconds=timeout,
+    )
+
+
+def _classify(space, text, timeout=5.0):
+    return space._chat_completion(
+        system_prompt=space.CLASSIFY_SYSTEM_PROMPT, user_prompt=f"phân loại {text}", max_tokens=8,
+        temperature=0.0, top_p=0.2, repeat_penalty=1.0, timeout_seconds=timeout,
+        priority=space.PRIORITY_FAST,
+    )
+
+
+def test_fast_requests_jump_ahead_of_queued_generations(space):
+    llm = space._llm
+
+    async def main():
+        llm.release.clear()
+        first = asyncio.create_task(_generate(space, "gen-1"))
+        await _until_running(llm)
+        queued = [asyncio.create_task(_generate(space, "gen-2")), asyncio.create_task(_classify(space, "a"))]
+        await asyncio.sleep(0.02)
+        llm.release.set()
+        return await asyncio.gather(first, *queued)
+
+    asyncio.run(main())
+
+    assert llm.order == ["gen-1", "phân loại a", "gen-2"]
+    assert llm.max_active == 1
+
+
+def test_expired_requests_are_dropped_without_running(space):
+    llm = space._llm
+
+    async def main():
+        llm.release.clear()
+        blocker = asyncio.create_task(_generate(space, "long"))
+        await _until_running(llm)
+        with pytest.raises(asyncio.TimeoutError):
+            await _classify(space, "late", timeout=0.05)
+        llm.release.set()
+        await blocker
+        # worker reaches the expired job right after resolving the blocker
+        for _ in range(500):
+            if space._scheduler.stats()["dropped_expired"]:
+                break
+            await asyncio.sleep(0.002)
+
+    asyncio.run(main())
+    stats = space._scheduler.stats()
+
+    assert "phân loại late" not in llm.order
+    assert stats["dropped_expired"] == 1
+    assert stats["queue_depth"] == 0
+
+
+def test_fast_requests_with_same_prompt_are_micro_batched(space):
+    llm = space._llm
+
+    async def main():
+        llm.release.clear()
+        blocker = asyncio.create_task(_generate(space, "long"))
+        await _until_running(llm)
+        fast = [asyncio.create_task(_classify(space, text)) for text in ("x", "y", "x")]
+        await asyncio.sleep(0.02)
+        llm.release.set()
+        await blocker
+        return await asyncio.gather(*fast)
+
+    results = asyncio.run(main())
+    stats = space._scheduler.stats()
+
+    assert results[0] == results[2]
+    assert llm.order[1:] == ["phân loại x", "phân loại y"]
+    assert stats["batches"] == 1 and stats["avg_batch_size"] == 3
+    assert stats["deduplicated"] == 1
+    assert stats["wait_ms"]["fast"]["count"] == 3
+
+
+def test_health_exposes_scheduler_stats(space):
+    asyncio.run(space.classify(space.ClassifyRequest(text="xem điểm")))
+
+    health = space.health()
+
+    assert health["scheduler"]["processed"] == 1
+    assert health["scheduler"]["wait_ms"]["fast"]["count"] == 1
@@ -0,0 +1,190 @@
+"""
+EXPLAIN-based regression tests for the hot-path queries
+
+Each case runs the real code path against a seeded database, captures the SQL it
+emits and EXPLAINs every statement that has a WHERE clause. A statement that
+filters but still scans a whole table (sqlite: "SCAN <table>", MySQL: type=ALL)
+fails the test — usually it means an index from app/db/migrations/add_hot_path_indexes.py
+is missing or a query stopped matching it. Statements without WHERE (catalogue
+loads, count/max probes) read the whole table by design and are not checked.
+
+The academic snapshot cache is switched off so every case reaches the database.
+
+Runs on in-memory sqlite; set QUERY_PLAN_MYSQL_URL to a throwaway MySQL schema
+to run the same cases there (tables are created, seeded and dropped).
+"""
+import asyncio
+import os
+import re
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from app.db.database import Base
+from app.models.__init__ import (
+    Class,
+    ClassRegister,
+    Course,
+    CourseSubject,
+    Department,
+    LearnedSubject,
+    SemesterGPA,
+    Student,
+    Subject,
+)
+from app.models.chat_history_model import ChatConversation, ChatMessage
+from app.routes.class_register_routes import get_enriched_class_registers_by_student
+from app.rules.class_suggestion_rules import ClassSuggestionRuleEngine
+from app.rules.subject_suggestion_rules import SubjectSuggestionRuleEngine
+from app.services import academic_snapshot_service, class_import_service, grade_import_service
+from app.services.chat_history_service import ChatHistoryService
+from app.services.chatbot_service import ChatbotService
+from app.services.class_query_service import ClassQueryService
+from app.services.constraint_extractor import ClassQueryConstraints
+from app.services.grade_aggregate_service import rebuild_student_aggregates
+
+COURSES, SUBJECTS, STUDENTS, CLASSES = 20, 300, 200, 3000
+_WHERE = re.compile(r"\bWHERE\b", re.IGNORECASE)
+_CHECKED = re.compile(r"^\s*(SELECT|UPDATE|DELETE)\b", re.IGNORECASE)
+
+CASES = {
+    "academic_snapshot.load": lambda db: academic_snapshot_service.load_student_snapshot(db, 1),
+    "class_suggestion.get_available_classes": lambda db: ClassSuggestionRuleEngine(db).get_available_classes(
+        1, subject_ids=[1, 2, 3]
+    ),
+    "subject_suggestion.get_student_data": lambda db: SubjectSuggestionRuleEngine(db).get_student_data(1),
+    "class_query.query": lambda db: ClassQueryService(db).query(
+        ClassQueryConstraints(subject_codes=["IT3001", "IT3002"])
+    ),
+    "class_query.query_for_suggestion": lambda db: ClassQueryService(db).query_for_suggestion(
+        ClassQueryConstraints(), ["IT3001", "IT3005"]
+    ),
+    "chat_history.list_conversations": lambda db: ChatHistoryService(db).list_conversations(1, 1, 20),
+    "chat_history.list_messages": lambda db: ChatHistoryService(db).list_messages(2, 1, 1, 20),
+    "chat_history.get_latest_assistant_message": lambda db: ChatHistoryService(db).get_latest_assistant_message(2, 1),
+    "chatbot.process_student_info": lambda db: asyncio.run(ChatbotService(db).process_student_info(1)),
+    "chatbot.process_graduation_progress": lambda db: asyncio.run(ChatbotService(db).process_graduation_progress(1)),
+    "class_registers.enriched_by_student": lambda db: get_enriched_class_registers_by_student(
+        1, db=db, current_student=None
+    ),
+    "grade_import.resolve_subjects": lambda db: grade_import_service._resolve_subjects(db, {"IT3001", "it3002"}),
+    "class_import.existing_keys": lambda db: class_import_service._existing_keys(db, ["100001", "100002"]),
+    "grade_aggregates.rebuild_student": lambda db: rebuild_student_aggregates(db, 1),
+}
+
+
+def _seed(engine):
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add(Department(id="SOICT", name="Trường CNTT"))
+    db.add_all(Course(id=i, course_id=f"IT{i}", course_name=f"Ngành {i}") for i in range(1, COURSES + 1))
+    db.add_all(Subject(id=i, subject_id=f"IT{3000 + i}", subject_name=f"Môn {i}", credits=3)
+               for i in range(1, SUBJECTS + 1))
+    db.add_all(Student(id=i, student_name=f"SV {i}", email=f"sv{i}@example.com", password="x",
+                       course_id=i % COURSES + 1) for i in range(1, STUDENTS + 1))
+    db.flush()
+    db.add_all(Class(id=i, class_id=str(100000 + i), class_name=f"Lớp {i}", subject_id=i % SUBJECTS + 1,
+                     study_date="Monday", study_week=[1, 2, 3]) for i in range(1, CLASSES + 1))
+    db.add_all(CourseSubject(course_id=c, subject_id=i, learning_semester=i % 8 + 1)
+               for c in range(1, COURSES + 1) for i in range(1, SUBJECTS + 1, 3))
+    db.flush()
+    db.add_all(ClassRegister(student_id=i % STUDENTS + 1, class_id=i % CLASSES + 1) for i in range(CLASSES * 2))
+    db.add_all(LearnedSubject(student_id=i % STUDENTS + 1, subject_id=i % SUBJECTS + 1, semester=f"202{i % 4}1",
+                              letter_grade="B", credits=3, subject_name="") for i in range(STUDENTS * 30))
+    db.add_all(SemesterGPA(student_id=i % STUDENTS + 1, semester=f"202{i // STUDENTS}1", gpa=3.0, total_credits=3)
+               for i in range(STUDENTS * 4))
+    db.add_all(ChatConversation(id=i, student_pk=i % STUDENTS + 1) for i in range(1, STUDENTS * 3 + 1))
+    db.flush()
+    db.add_all(ChatMessage(conversation_id=i % (STUDENTS * 3) + 1, role="user", content="x")
+               for i in range(STUDENTS * 30))
+    db.commit()
+    # Planner statistics, như DB thật đã chạy ANALYZE
+    if engine.dialect.name == "sqlite":
+        db.execute(text("ANALYZE"))
+    else:
+        for table in Base.metadata.sorted_tables:
+            db.execute(text(f"ANALYZE TABLE {table.name}"))
+    db.commit()
+    db.close()
+
+
+def _capture(engine, case):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and _CHECKED.match(statement) and _WHERE.search(statement):
+            statements.append((statement, parameters))
+
+    db = sessionmaker(bind=engine)()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        case(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+        db.rollback()
+        db.close()
+    return statements
+
+
+def full_scans(engine, case):
+    """[(statement, plan lines that read a whole table)] for every captured statement."""
+    regressions = []
+    with engine.connect() as conn:
+        for statement, parameters in _capture(engine, case):
+            if engine.dialect.name == "sqlite":
+                plan = [row[3] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+                scans = [line for line in plan if line.startswith("SCAN ") and "CONSTANT ROW" not in line]
+            else:
+                plan = conn.exec_driver_sql("EXPLAIN " + statement, parameters).mappings().all()
+                scans = [f"{row['table']}: type=ALL" for row in plan if row["type"] == "ALL"]
+            if scans:
+                regressions.append((" ".join(statement.split())[:160], scans))
+    return regressions
+
+
+def _engines():
+    yield pytest.param("sqlite://", id="sqlite")
+    mysql_url = os.getenv("QUERY_PLAN_MYSQL_URL")
+    yield pytest.param(
+        mysql_url, id="mysql",
+        marks=pytest.mark.skipif(not mysql_url, reason="QUERY_PLAN_MYSQL_URL not set"),
+    )
+
+
+@pytest.fixture(scope="module", params=list(_engines()))
+def seeded_engine(request):
+    engine = create_engine(request.param)
+    if engine.dialect.name != "sqlite":
+        Base.metadata.drop_all(engine)
+    _seed(engine)
+    yield engine
+    if engine.dialect.name != "sqlite":
+        Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def uncached_snapshots(monkeypatch):
+    monkeypatch.setattr(academic_snapshot_service, "ACADEMIC_SNAPSHOT_CACHE_ENABLED", False)
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_hot_path_query_does_not_full_scan(seeded_engine, name):
+    assert _capture(seeded_engine, CASES[name]), f"{name} emitted no filtered statements"
+    assert full_scans(seeded_engine, CASES[name]) == []
+
+
+def test_harness_catches_a_dropped_index():
+    engine = create_engine("sqlite://")
+    _seed(engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX idx_classes_subject"))
+        conn.execute(text("DROP INDEX idx_class_registers_class"))
+        conn.execute(text("DROP INDEX idx_class_registers_student_class"))
+        conn.execute(text("ANALYZE"))
+
+    regressions = full_scans(engine, CASES["class_suggestion.get_available_classes"])
+
+    assert regressions
+    engine.dispose()
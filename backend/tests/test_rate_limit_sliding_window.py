@@ -0,0 +1,150 @@
+"""
+Test the sliding-window rate limiter: no boundary bursts, one Redis round-trip, circuit breaker
+"""
+import importlib
+
+import pytest
+
+from app.middleware.rate_limit import _RedisRateLimiter, _SlidingWindowStore
+
+rl = importlib.import_module("app.middleware.rate_limit")
+
+TIERS = [("per_minute", 3, 60), ("per_hour", 5, 3600)]
+KEYS = ["rate_limit:{student:1}:per_minute", "rate_limit:{student:1}:per_hour"]
+
+
+def test_window_slides_instead_of_resetting_at_the_boundary():
+    store = _SlidingWindowStore()
+    tier = [("per_minute", 3, 60)]
+
+    assert all(store.hit(KEYS[:1], tier, now=t).allowed for t in (0.0, 59.0, 59.5))
+    # A fixed window would reset at t=60 and allow 3 more immediately
+    assert store.hit(KEYS[:1], tier, now=60.5).allowed  # t=0 left the window
+    denied = store.hit(KEYS[:1], tier, now=61.0)
+
+    assert not denied.allowed
+    assert denied.tier == "per_minute" and denied.limit == 3
+    assert denied.retry_after == 58  # 59.0 + 60 - 61.0
+
+
+def test_denied_requests_do_not_consume_quota_and_longest_tier_wins():
+    store = _SlidingWindowStore()
+
+    for t in range(5):
+        assert store.hit(KEYS, TIERS, now=t * 30.0).allowed
+    for _ in range(10):
+        decision = store.hit(KEYS, TIERS, now=130.0)
+        assert not decision.allowed
+    # Minute tier has room again, hour tier frees up at 0 + 3600
+    assert decision.tier == "per_hour"
+    assert decision.retry_after == 3470
+
+    assert store.hit(KEYS, TIERS, now=3600.5).allowed
+
+
+class FakeScript:
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def __call__(self, keys, args):
+        self.calls.append((keys, args))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+class FakeClient:
+    def __init__(self, script):
+        self.script = script
+
+    def register_script(self, source):
+        return self.script
+
+
+class FakeCache:
+    def __init__(self, client):
+        self.client = client
+
+
+def test_all_tiers_are_checked_in_one_script_call():
+    script = FakeScript([[1], [0, 2, 1500]])
+    limiter = _RedisRateLimiter(cache=FakeCache(FakeClient(script)), store=_SlidingWindowStore())
+
+    assert limiter.hit("student:1", TIERS).backend == "redis"
+    denied = limiter.hit("student:1", TIERS)
+
+    assert len(script.calls) == 2
+    keys, args = script.calls[0]
+    assert keys == KEYS
+    assert args[1:] == [3, 60_000, 5, 3_600_000]
+    assert (denied.allowed, denied.tier, denied.retry_after) == (False, "per_hour", 2)
+
+
+def test_circuit_breaker_skips_redis_while_open(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(rl.time, "monotonic", lambda: clock[0])
+    script = FakeScript([ConnectionError("down")] * rl.RATE_LIMIT_REDIS_FAIL_THRESHOLD + [[1]])
+    limiter = _RedisRateLimiter(cache=FakeCache(FakeClient(script)), store=_SlidingWindowStore())
+
+    for _ in range(rl.RATE_LIMIT_REDIS_FAIL_THRESHOLD + 5):
+        decision = limiter.hit("student:1", [("per_minute", 100, 60)])
+        assert decision.allowed and decision.backend == "memory"
+    assert len(script.calls) == rl.RATE_LIMIT_REDIS_FAIL_THRESHOLD
+
+    clock[0] += rl.RATE_LIMIT_REDIS_COOLDOWN_SECONDS
+    assert limiter.hit("student:1", [("per_minute", 100, 60)]).backend == "redis"
+
+
+class LuaRedis:
+    """Runs the real Lua script against a minimal sorted-set emulation."""
+
+    def __init__(self, lupa):
+        self.lua = lupa.LuaRuntime(unpack_returned_tuples=True)
+        self.now_ms = 1_000_000
+        self.zsets = {}
+        self.lua.globals().redis = self.lua.table(call=self._call)
+        self.run = self.lua.eval("function(source) return load(source) end")
+
+    def _call(self, command, key=None, *args):
+        if command == "TIME":
+            return self.lua.table(str(self.now_ms // 1000), str(self.now_ms % 1000 * 1000))
+        zset = self.zsets.setdefault(key, [])
+        if command == "ZREMRANGEBYSCORE":
+            zset[:] = [item for item in zset if item[0] > float(args[1])]
+        elif command == "ZCARD":
+            return len(zset)
+        elif command == "ZRANGE":
+            score, member = sorted(zset)[int(args[0])]
+            return self.lua.table(member, str(score))
+        elif command == "ZADD":
+            zset.append((float(args[0]), args[1]))
+        return None
+
+    def register_script(self, source):
+        chunk = self.run(source)
+
+        def script(keys, args):
+            self.lua.globals().KEYS = self.lua.table(*keys)
+            self.lua.globals().ARGV = self.lua.table(*[str(arg) for arg in args])
+            result = chunk()
+            return [result[index] for index in range(1, len(result) + 1)]
+
+        return script
+
+
+def test_lua_script_matches_in_memory_algorithm():
+    lupa = pytest.importorskip("lupa")
+    redis = LuaRedis(lupa)
+    limiter = _RedisRateLimiter(cache=FakeCache(redis), store=_SlidingWindowStore())
+    store = _SlidingWindowStore()
+
+    for step_ms in (0, 20_000, 39_000, 40_000, 59_999, 60_001, 61_000, 100_000, 130_000, 3_600_500):
+        redis.now_ms = 1_000_000 + step_ms
+        from_redis = limiter.hit("student:1", TIERS)
+        from_memory = store.hit(KEYS, TIERS, now=step_ms / 1000)
+        assert from_redis.backend == "redis"
+        assert (from_redis.allowed, from_redis.tier, from_redis.retry_after) == (
+            from_memory.allowed, from_memory.tier, from_memory.retry_after
+        ), step_ms
@@ -0,0 +1,101 @@
+"""
+Test bounded LRU/TTL InMemoryCache used as the ResponseCache fallback
+"""
+import pytest
+
+from app.llm import response_cache
+from app.llm.response_cache import InMemoryCache, ResponseCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(response_cache.time, "time", fake.time)
+    return fake
+
+
+def test_evicts_least_recently_used_past_entry_cap(clock):
+    cache = InMemoryCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_cap_counts_key_and_utf8_value(clock):
+    cache = InMemoryCache(max_entries=100, max_bytes=30)
+    cache.set("k1", "điểm")  # 2 + 6 bytes
+    cache.set("k2", "x" * 10)
+    cache.set("k3", "y" * 10)
+
+    stats = cache.stats()
+    assert stats["bytes"] <= 30
+    assert cache.get("k1") is None and cache.get("k3") == "y" * 10
+
+    cache.set("huge", "z" * 100)
+    assert cache.get("huge") is None
+    assert cache.get("k3") == "y" * 10
+
+
+def test_expired_entries_are_swept_incrementally_without_reads(clock):
+    cache = InMemoryCache(max_entries=1000, sweep_batch=4, bucket_seconds=1)
+    for index in range(10):
+        cache.set(f"old{index}", "v", ttl=5)
+    cache.set("fresh", "v", ttl=600)
+
+    clock.now += 10
+    cache.set("trigger", "v")
+    assert cache.stats()["entries"] == 12 - 4  # one bounded sweep step
+    for _ in range(3):
+        cache.get("fresh")
+
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["expirations"] == 10
+    assert cache.get("fresh") == "v"
+
+
+def test_reset_key_is_not_expired_by_its_old_bucket(clock):
+    cache = InMemoryCache(bucket_seconds=1)
+    cache.set("k", "old", ttl=5)
+    cache.set("k", "new", ttl=600)
+    clock.now += 10
+    cache.get("other")
+
+    assert cache.get("k") == "new"
+    assert cache.stats()["bytes"] == len("k") + len("new")
+
+
+def test_counters_survive_eviction_and_expiry(clock):
+    cache = InMemoryCache(max_entries=1)
+    assert cache.incr("version") == 1
+    cache.set("a", "1")
+    cache.set("b", "2")
+    clock.now += 10_000
+
+    assert cache.incr("version") == 2
+    assert cache.get("version") == "2"
+
+
+def test_response_cache_memory_fallback_reports_stats(clock):
+    cache = ResponseCache(redis_url="")
+    cache.set("k", "v")
+    cache.get("k")
+    cache.get("missing")
+
+    stats = cache.stats()
+    assert stats["backend"] == "memory"
+    assert stats["memory"]["hits"] == 1 and stats["memory"]["misses"] == 1
+    assert stats["memory"]["entries"] == 1
@@ -0,0 +1,88 @@
+"""
+Test vectorized combination scoring against the per-combination scorer
+"""
+import itertools
+import random
+from datetime import time, timedelta
+
+import numpy as np
+
+from app.services.schedule_batch_scorer import CombinationBatchScorer
+from app.services.schedule_combination_service import ScheduleCombinationGenerator
+
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+PREFERENCE_SETS = [
+    {},
+    {'prefer_free_days': True},
+    {'prefer_continuous': True, 'time_period': 'morning'},
+    {'prefer_continuous': False, 'avoid_time_periods': ['afternoon', 'evening']},
+    {'prefer_days': ['Monday', 'Friday'], 'avoid_days': ['Saturday', 'Sunday']},
+    {'prefer_early_start': True, 'prefer_late_start': True},
+    {'prefer_late_start': True, 'time_period': 'afternoon', 'prefer_free_days': True},
+    {
+        'prefer_free_days': True,
+        'free_days_is_not_important': True,
+        'prefer_continuous': True,
+        'continuous_is_not_important': True,
+        'prefer_days': ['Tuesday'],
+        'day_is_not_important': True,
+        'prefer_early_start': True,
+        'time_is_not_important': True,
+    },
+]
+
+
+def _random_class(rng, index):
+    start = rng.randrange(6 * 60, 20 * 60, 5)
+    end = min(start + rng.choice([45, 90, 135, 170, 230, 400]), 23 * 60 + 55)
+    start_value = time(start // 60, start % 60)
+    if rng.random() < 0.3:
+        start_value = timedelta(minutes=start)
+    return {
+        'class_id': f"C{index:03d}",
+        'subject_id': f"S{index:03d}",
+        'study_date': ','.join(rng.sample(DAYS, rng.randint(1, 3))),
+        'study_time_start': start_value,
+        'study_time_end': time(end // 60, end % 60),
+        'credits': rng.choice([1, 2, 3, 4]),
+    }
+
+
+def test_batch_scores_identical_to_scalar_scorer():
+    """Every row of the batch equals calculate_combination_score exactly"""
+    rng = random.Random(3)
+    generator = ScheduleCombinationGenerator()
+    classes = [_random_class(rng, index) for index in range(40)]
+    scorer = CombinationBatchScorer(classes)
+
+    for class_count in (1, 2, 4, 7):
+        combos = np.array([rng.sample(range(len(classes)), class_count) for _ in range(150)])
+        for preferences in PREFERENCE_SETS:
+            batch = scorer.score(combos, preferences)
+            expected = [
+                generator.calculate_combination_score([classes[i] for i in row], preferences)
+                for row in combos
+            ]
+            assert batch == expected
+
+
+def test_batch_day_metrics_match_schedule_metrics():
+    """Free and continuous days follow calculate_schedule_metrics, including start-time ties"""
+    generator = ScheduleCombinationGenerator()
+    classes = [
+        {'study_date': 'Monday', 'study_time_start': time(7, 0), 'study_time_end': time(13, 0)},
+        {'study_date': 'Monday', 'study_time_start': time(8, 0), 'study_time_end': time(9, 0)},
+        {'study_date': 'Monday', 'study_time_start': time(8, 0), 'study_time_end': time(12, 30)},
+        {'study_date': 'Monday,Tuesday', 'study_time_start': time(13, 0), 'study_time_end': time(18, 30)},
+    ]
+    scorer = CombinationBatchScorer(classes)
+    combos = np.array(list(itertools.permutations(range(len(classes)), 3)))
+
+    metrics = scorer.day_metrics(combos)
+
+    for row, free_days, continuous in zip(combos, metrics['free_days'], metrics['continuous_study_days']):
+        expected = generator.calculate_schedule_metrics([classes[i] for i in row])
+        assert free_days == expected['free_days']
+        assert continuous == expected['continuous_study_days']
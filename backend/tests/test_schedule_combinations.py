@@ -1,10 +1,46 @@
 """
 Test Schedule Combination Generator
 """
+import itertools
+import random
 from datetime import time
 from app.services.schedule_combination_service import ScheduleCombinationGenerator
 
 
+def _random_timetable(rng, subject_count, sections_per_subject):
+    """Build a synthetic timetable with plenty of overlapping sections."""
+    days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+    classes_by_subject = {}
+    for s in range(subject_count):
+        subject_id = f"SUB{s:02d}"
+        classes = []
+        for c in range(rng.randint(1, sections_per_subject)):
+            start_hour = rng.choice([7, 9, 12, 13, 15, 17])
+            classes.append({
+                'class_id': f"{s:02d}{c:03d}",
+                'subject_id': subject_id,
+                'study_week': rng.choice([[1, 2, 3, 4], [5, 6, 7, 8], [1, 2, 3, 4, 5, 6, 7, 8]]),
+                'study_date': ','.join(sorted(rng.sample(days, rng.randint(1, 2)))),
+                'study_time_start': time(start_hour, 0),
+                'study_time_end': time(start_hour + rng.choice([1, 2]), 25),
+                'credits': rng.choice([2, 3, 4]),
+            })
+        classes_by_subject[subject_id] = classes
+    return classes_by_subject
+
+
+def _brute_force_top_k(generator, classes_by_subject, preferences, k):
+    """Exhaustive itertools.product reference: every valid combo, scored and ranked."""
+    scored = []
+    for combo in itertools.product(*classes_by_subject.values()):
+        combo = list(combo)
+        if generator.has_duplicate_subjects(combo) or generator.has_time_conflicts(combo):
+            continue
+        scored.append((generator.calculate_combination_score(combo, preferences), combo))
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return scored[:k]
+
+
 def test_time_conflict_detection():
     """Test time conflict detection"""
     generator = ScheduleCombinationGenerator()
@@ -269,10 +305,56 @@ def test_combination_generation():
                 print(f"       • {cls['class_id']}: {cls['study_date']} {cls['study_time_start']}-{cls['study_time_end']}")
 
 
+def test_branch_and_bound_matches_exhaustive_top_k():
+    """Branch-and-bound search must return exactly the exhaustive top-K"""
+    generator = ScheduleCombinationGenerator()
+    rng = random.Random(2024)
+    preference_sets = [
+        {},
+        {'prefer_free_days': True, 'time_period': 'morning'},
+        {'prefer_continuous': True, 'prefer_days': ['Monday', 'Tuesday'], 'avoid_days': ['Saturday']},
+        {'prefer_continuous': False, 'prefer_early_start': True, 'avoid_time_periods': ['afternoon']},
+        {'prefer_late_start': True, 'prefer_free_days': True, 'time_period': 'afternoon'},
+    ]
+
+    for trial in range(12):
+        classes_by_subject = _random_timetable(rng, subject_count=rng.randint(2, 5), sections_per_subject=5)
+        preferences = preference_sets[trial % len(preference_sets)]
+        k = rng.choice([1, 3, 10])
+
+        expected = _brute_force_top_k(generator, classes_by_subject, preferences, k)
+        result = generator.generate_combinations(classes_by_subject, preferences, max_combinations=k)
+
+        assert [combo['score'] for combo in result] == [score for score, _ in expected]
+        # Equal scores keep itertools.product order, so class lists match exactly.
+        assert [combo['classes'] for combo in result] == [combo for _, combo in expected]
+        for combo in result:
+            assert not generator.has_time_conflicts(combo['classes'])
+            assert combo['score'] == generator.calculate_combination_score(combo['classes'], preferences)
+
+
+def test_branch_and_bound_respects_specific_class_ids():
+    """Required class IDs stay a hard filter in the search"""
+    generator = ScheduleCombinationGenerator()
+    classes_by_subject = _random_timetable(random.Random(7), subject_count=4, sections_per_subject=4)
+    required = classes_by_subject['SUB01'][0]['class_id']
+
+    result = generator.generate_combinations(
+        classes_by_subject,
+        {'specific_class_ids': [required]},
+        max_combinations=5,
+    )
+
+    for combo in result:
+        assert required in [cls['class_id'] for cls in combo['classes']]
+
+
 if __name__ == '__main__':
     test_time_conflict_detection()
     test_schedule_metrics()
     test_combination_generation()
+    test_branch_and_bound_matches_exhaustive_top_k()
+    test_branch_and_bound_respects_specific_class_ids()
     
     print("\n" + "=" * 60)
     print("✅ ALL TESTS COMPLETED")
@@ -0,0 +1,119 @@
+"""
+Test bitmask timetable occupancy used for class conflict checks
+"""
+import random
+from datetime import time
+
+from app.rules.class_suggestion_rules import ClassSuggestionRuleEngine
+from app.services.schedule_combination_service import ScheduleCombinationGenerator
+from app.utils.schedule_occupancy import (
+    OCCUPANCY_KEY,
+    attach_occupancy,
+    build_occupancy,
+    occupancy_conflict,
+)
+
+
+def _random_class(rng, index):
+    minute_step = rng.choice([5, 5, 5, 1])  # mostly on the 5-minute grid
+    start = rng.randrange(6 * 60, 18 * 60, minute_step)
+    end = start + rng.choice([0, 45, 50, 90, 95, 135, 170])
+    end = min(end, 23 * 60)
+    return {
+        'class_id': f"C{index:03d}",
+        'study_week': rng.choice([[], [1, 2, 3], [3, 4, 5, 6], [7, 8], list(range(1, 17))]),
+        'study_date': ','.join(rng.sample(['Monday', 'Tuesday', 'Wednesday', 'Saturday'], rng.randint(1, 2))),
+        'study_time_start': time(start // 60, start % 60),
+        'study_time_end': time(end // 60, end % 60),
+    }
+
+
+def _engine():
+    engine = ClassSuggestionRuleEngine.__new__(ClassSuggestionRuleEngine)
+    engine.db = None
+    return engine
+
+
+def test_occupancy_encodes_adjacent_classes_without_overlap():
+    """Back-to-back classes share no 5-minute slot"""
+    first = build_occupancy({
+        'study_week': [1, 2],
+        'study_date': 'Monday',
+        'study_time_start': time(8, 15),
+        'study_time_end': time(9, 0),
+    })
+    second = build_occupancy({
+        'study_week': [2, 3],
+        'study_date': 'Monday',
+        'study_time_start': time(9, 0),
+        'study_time_end': time(10, 30),
+    })
+
+    assert first.exact and second.exact
+    assert first.week_mask & second.week_mask
+    assert occupancy_conflict(first, second, missing_weeks_overlap=True) is False
+
+
+def test_occupancy_marks_off_grid_times_inexact():
+    """Times off the 5-minute grid fall back to field comparison"""
+    occupancy = build_occupancy({
+        'study_week': [1],
+        'study_date': 'Monday',
+        'study_time_start': time(8, 13),
+        'study_time_end': time(9, 0),
+    })
+    assert not occupancy.exact
+
+
+def test_missing_weeks_semantics_per_caller():
+    """Generator treats missing weeks as overlapping, rule engine as disjoint"""
+    first = build_occupancy({'study_week': [], 'study_date': 'Monday',
+                             'study_time_start': time(9, 0), 'study_time_end': time(11, 0)})
+    second = build_occupancy({'study_week': [1], 'study_date': 'Monday',
+                              'study_time_start': time(10, 0), 'study_time_end': time(12, 0)})
+
+    assert occupancy_conflict(first, second, missing_weeks_overlap=True) is True
+    assert occupancy_conflict(first, second, missing_weeks_overlap=False) is False
+
+
+def test_bitmask_conflicts_match_field_comparison():
+    """Both conflict functions give the same answer with and without attached bitsets"""
+    rng = random.Random(11)
+    generator = ScheduleCombinationGenerator()
+    engine = _engine()
+    classes = [_random_class(rng, index) for index in range(80)]
+    encoded = [dict(cls) for cls in classes]
+    attach_occupancy(encoded)
+
+    for i in range(len(classes)):
+        for j in range(i + 1, len(classes)):
+            expected_generator = generator._classes_conflict_by_fields(classes[i], classes[j])
+            assert generator._classes_conflict(encoded[i], encoded[j]) == expected_generator
+
+            expected_engine = engine._has_schedule_conflict_by_fields(classes[i], classes[j])
+            assert engine.has_schedule_conflict(encoded[i], encoded[j]) == expected_engine
+
+
+def test_filter_no_schedule_conflict_uses_attached_occupancy():
+    """Registered-class filtering keeps conflict bookkeeping"""
+    engine = _engine()
+    registered = [{
+        'class_id': 'R1',
+        'study_week': [1, 2, 3],
+        'study_date': 'Tuesday',
+        'study_time_start': time(13, 0),
+        'study_time_end': time(15, 0),
+    }]
+    candidates = [
+        {'class_id': 'A', 'study_week': [2], 'study_date': 'Tuesday',
+         'study_time_start': time(14, 0), 'study_time_end': time(16, 0)},
+        {'class_id': 'B', 'study_week': [2], 'study_date': 'Tuesday',
+         'study_time_start': time(15, 0), 'study_time_end': time(16, 0)},
+    ]
+    attach_occupancy(candidates)
+
+    filtered = engine.filter_no_schedule_conflict(candidates, registered)
+
+    assert [cls['class_id'] for cls in filtered] == ['B']
+    assert candidates[0]['conflict_with'] == ['R1']
+    assert OCCUPANCY_KEY in candidates[1]
@@ -0,0 +1,197 @@
+"""
+Test token streaming: model-space SSE /generate -> LLMClient.generate_stream -> node-4 deltas
+"""
+import asyncio
+import importlib.util
+import json
+import sys
+import types
+from pathlib import Path
+
+import httpx
+import pytest
+
+from app.agents import agent_orchestrator
+from app.agents.agent_orchestrator import AgentOrchestrator
+from app.agents.orchestration_metrics import get_orchestration_metrics
+from app.agents.response_stream import DELTA, RESULT, emit_delta, stream_with_deltas
+from app.llm import llm_client
+from app.llm.response_cache import ResponseCache
+from app.schemas.chatbot_schema import StreamChunk
+
+MODEL_SPACE_APP = Path(__file__).resolve().parents[2] / "model-space" / "app.py"
+
+
+class StreamingLlama:
+    def __init__(self, *args, **kwargs):
+        self.pieces = ["Điểm ", "CPA ", "của bạn ", "là 3.2"]
+
+    def tokenize(self, text, add_bos=True, special=False):
+        return list(text)
+
+    def eval(self, tokens):
+        pass
+
+    def reset(self):
+        pass
+
+    def save_state(self):
+        return None
+
+    def load_state(self, state):
+        pass
+
+    def create_chat_completion(self, messages, stream=False, **kwargs):
+        if not stream:
+            return {"choices": [{"message": {"content": "".join(self.pieces)}}]}
+        return ({"choices": [{"delta": {"content": piece}}]} for piece in self.pieces)
+
+
+@pytest.fixture()
+def space(monkeypatch):
+    monkeypatch.setitem(sys.modules, "llama_cpp", types.SimpleNamespace(Llama=StreamingLlama))
+    spec = importlib.util.spec_from_file_location("model_space_app", MODEL_SPACE_APP)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module._llm = StreamingLlama()
+    yield module
+    module._scheduler.stop()
+
+
+def _events(body: str):
+    return [json.loads(line[5:]) for line in body.splitlines() if line.startswith("data:")]
+
+
+def test_model_space_generate_streams_sse_tokens(space):
+    async def main():
+        response = await space.generate(space.GenerateRequest(prompt="CPA?", stream=True))
+        return "".join([chunk async for chunk in response.body_iterator])
+
+    events = _events(asyncio.run(main()))
+
+    assert [event["delta"] for event in events[:-1]] == ["Điểm ", "CPA ", "của bạn ", "là 3.2"]
+    assert events[-1] == {"done": True, "text": "Điểm CPA của bạn là 3.2"}
+    assert asyncio.run(space.generate(space.GenerateRequest(prompt="CPA?"))) == {"text": "Điểm CPA của bạn là 3.2"}
+
+
+def _client_for(handler, monkeypatch):
+    shared = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(llm_client, "get_http_client", lambda: shared)
+    monkeypatch.setattr(llm_client, "OPENAI_API_KEY", "")
+    return llm_client.LLMClient(base_url="http://model-space.test")
+
+
+def test_llm_client_streams_from_model_space(monkeypatch):
+    seen = {}
+
+    def handler(request):
+        seen["url"] = str(request.url)
+        seen["payload"] = json.loads(request.content)
+        body = "".join(
+            f"data: {json.dumps(event)}\n\n"
+            for event in ({"delta": "Xin "}, {"delta": "chào"}, {"done": True, "text": "Xin chào"})
+        )
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    client = _client_for(handler, monkeypatch)
+    metrics = get_orchestration_metrics()
+    before = metrics.snapshot()["latency"].get("llm.generate_stream.ttft", {}).get("count", 0)
+
+    async def main():
+        return [piece async for piece in client.generate_stream("chào", max_tokens=8)]
+
+    assert asyncio.run(main()) == ["Xin ", "chào"]
+    assert seen["url"] == "http://model-space.test/generate"
+    assert seen["payload"]["stream"] is True and seen["payload"]["max_tokens"] == 8
+    assert metrics.snapshot()["latency"]["llm.generate_stream.ttft"]["count"] == before + 1
+
+
+def test_llm_client_stream_falls_back_when_backend_fails_before_first_token(monkeypatch):
+    client = _client_for(lambda request: httpx.Response(503, text="loading"), monkeypatch)
+
+    async def main():
+        return [piece async for piece in client.generate_stream("chào")]
+
+    assert asyncio.run(main()) == [llm_client.GENERATE_FALLBACK_TEXT]
+
+
+def test_deltas_from_spawned_tasks_arrive_before_result():
+    async def pipeline():
+        async def segment(text):
+            await asyncio.sleep(0)
+            emit_delta(text)
+
+        await asyncio.gather(segment("a"), segment("b"))
+        return {"text": "ab"}
+
+    async def main():
+        return [item async for item in stream_with_deltas(pipeline, timeout=1.0)]
+
+    items = asyncio.run(main())
+
+    assert sorted(value for kind, value in items[:-1] if kind == DELTA) == ["a", "b"]
+    assert items[-1] == (RESULT, {"text": "ab"})
+    emit_delta("outside a stream is a no-op")
+
+
+class StreamingFakeLLM:
+    async def generate_stream(self, prompt, **kwargs):
+        for piece in ("GPA ", "3.2"):
+            yield piece
+
+
+def test_node4_forwards_llm_pieces_as_deltas(monkeypatch):
+    monkeypatch.setattr(agent_orchestrator, "NODE4_STREAM_LLM", True)
+    orchestrator = AgentOrchestrator(llm_client=StreamingFakeLLM(), tools=None, cache=ResponseCache())
+    raw = {"status": "success", "data": {"data": [{"gpa": 3.2}]}}
+
+    async def main():
+        return [
+            item async for item in stream_with_deltas(
+                lambda: orchestrator.node4_response_formatter(raw, "GPA?", intent_hints=["grade_view"]),
+                timeout=1.0,
+            )
+        ]
+
+    items = asyncio.run(main())
+
+    assert items[:2] == [(DELTA, "GPA "), (DELTA, "3.2")]
+    assert items[-1][1]["text"] == "GPA 3.2" and items[-1][1]["model_used"] == "llm_stream"
+    assert StreamChunk(type="delta", text="GPA ").type == "delta"
+
+
+class BrokenStreamLLM:
+    async def generate_stream(self, prompt, **kwargs):
+        yield "GPA của "
+        raise httpx.ReadTimeout("stream stalled")
+
+
+def test_node4_stream_failure_after_pieces_does_not_append_fallback_delta(monkeypatch):
+    monkeypatch.setattr(agent_orchestrator, "NODE4_STREAM_LLM", True)
+    orchestrator = AgentOrchestrator(llm_client=BrokenStreamLLM(), tools=None, cache=ResponseCache())
+    raw = {"status": "success", "data": {"data": [{"gpa": 3.2}]}}
+
+    async def main():
+        return [
+            item async for item in stream_with_deltas(
+                lambda: orchestrator.node4_response_formatter(raw, "GPA?", intent_hints=["grade_view"]),
+                timeout=1.0,
+            )
+        ]
+
+    items = asyncio.run(main())
+
+    assert items[:-1] == [(DELTA, "GPA của ")]
+    result = items[-1][1]
+    assert result["model_used"] == "rule_based" and result["text"]
+
+
+def test_node4_without_stream_stays_rule_based(monkeypatch):
+    monkeypatch.setattr(agent_orchestrator, "NODE4_STREAM_LLM", True)
+    orchestrator = AgentOrchestrator(llm_client=StreamingFakeLLM(), tools=None, cache=ResponseCache())
+
+    result = asyncio.run(orchestrator.node4_response_formatter(
+        {"status": "success", "data": {"data": [{"gpa": 3.2}]}}, "GPA?", intent_hints=["grade_view"],
+    ))
+
+    assert result["model_used"] == "rule_based"
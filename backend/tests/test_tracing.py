@@ -0,0 +1,150 @@
+"""
+Test per-request span tracing: nesting across tasks, DB spans, tool spans, ring buffer
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.agents.agent_orchestrator import AgentOrchestrator
+from app.agents.tools_registry import ToolsRegistry
+from app.core import tracing
+from app.core.tracing import (
+    TraceRecorder,
+    annotate_trace,
+    current_trace_id,
+    span,
+    start_trace,
+    trace_request,
+    traced,
+)
+from app.llm.response_cache import ResponseCache
+
+
+@pytest.fixture()
+def recorder(monkeypatch):
+    fresh = TraceRecorder(capacity=3)
+    monkeypatch.setattr(tracing, "_recorder", fresh)
+    return fresh
+
+
+def _names(trace):
+    return [(item["depth"], item["name"]) for item in trace["spans"]]
+
+
+def test_spans_nest_across_gather_and_threads(recorder):
+    @traced("classify")
+    async def classify(index):
+        await asyncio.sleep(0.01)
+        with span("inner", index=index):
+            pass
+
+    def blocking_step():
+        with span("in_thread"):
+            pass
+
+    async def run():
+        with start_trace("chat", trace_id="abc12345"):
+            assert current_trace_id() == "abc12345"
+            with span("preprocess"):
+                pass
+            await asyncio.gather(classify(1), classify(2))
+            await asyncio.to_thread(blocking_step)
+            annotate_trace(mode="agent")
+
+    asyncio.run(run())
+
+    [trace] = recorder.slowest(1)
+    assert trace["trace_id"] == "abc12345"
+    assert trace["attrs"] == {"mode": "agent"}
+    assert _names(trace) == [
+        (0, "chat"), (1, "preprocess"), (1, "classify"), (2, "inner"),
+        (1, "classify"), (2, "inner"), (1, "in_thread"),
+    ]
+    assert trace["self_ms_by_name"]["classify"] >= 15
+    assert any(line.startswith("chat;classify ") for line in trace["folded"])
+    assert current_trace_id() is None
+
+
+def test_spans_without_trace_are_noops(recorder):
+    with span("orphan") as orphan:
+        assert orphan is None
+    assert len(recorder) == 0
+
+
+def test_each_sql_statement_is_a_span(recorder):
+    engine = create_engine("sqlite:///:memory:")
+    with start_trace("chat"):
+        with span("tool"):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+                with pytest.raises(Exception):
+                    conn.execute(text("SELECT * FROM missing_table"))
+    engine.dispose()
+
+    [trace] = recorder.slowest(1)
+    db_spans = [item for item in trace["spans"] if item["name"] == "db.query"]
+    assert [item["depth"] for item in db_spans] == [2, 2]
+    assert db_spans[0]["attrs"]["statement"] == "SELECT 1"
+    assert db_spans[1]["attrs"]["error"] == "OperationalError"
+
+
+def test_ring_buffer_keeps_latest_and_sorts_by_duration(recorder, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_MAX_SPANS", 2)
+
+    @trace_request("chat")
+    async def endpoint(index):
+        for _ in range(3):
+            with span("step"):
+                pass
+        await asyncio.sleep(0.005 * index)
+        return current_trace_id()
+
+    trace_ids = [asyncio.run(endpoint(index)) for index in range(5)]
+
+    slowest = recorder.slowest(10)
+    assert len(recorder) == 3
+    assert [item["trace_id"] for item in slowest] == trace_ids[:1:-1]
+    assert slowest[0]["span_count"] == 2
+    assert slowest[0]["dropped_spans"] == 2
+
+
+def test_streaming_body_is_one_trace(recorder):
+    @trace_request("chat_stream")
+    async def body():
+        yield current_trace_id()
+        with span("formatter"):
+            yield "chunk"
+
+    async def consume():
+        return [item async for item in body()]
+
+    trace_id, _ = asyncio.run(consume())
+    [trace] = recorder.slowest(1)
+    assert trace["trace_id"] == trace_id
+    assert _names(trace) == [(0, "chat_stream"), (1, "formatter")]
+
+
+def test_orchestrator_and_tool_calls_are_spans(recorder):
+    class FakeTools(ToolsRegistry):
+        async def _call(self, name, payload):
+            return {"status": "success", "data": []}
+
+    class GraphOrchestrator(AgentOrchestrator):
+        async def _handle_graph(self, user_text, student_id=None, conversation_id=None):
+            raw = await self.tools.call("grade_view", {"q": user_text})
+            return {"text": "ok", "intent": "unknown", "raw": raw, "debug": {}}
+
+    orchestrator = GraphOrchestrator(llm_client=object(), tools=FakeTools(), cache=ResponseCache(redis_url=""))
+
+    async def run():
+        with start_trace("chat"):
+            await orchestrator.handle("xem điểm", student_id=None)
+
+    asyncio.run(run())
+
+    [trace] = recorder.slowest(1)
+    tool_spans = [item for item in trace["spans"] if item["name"] == "tool"]
+    assert (1, "agent.handle") in _names(trace)
+    assert tool_spans[0]["depth"] == 2
+    assert tool_spans[0]["attrs"] == {"tool": "grade_view", "status": "success"}
@@ -516,7 +516,6 @@ const ScheduleManagement = () => {
     setShowExcelUpload(false)
     
     try {
-      await clearAllClassesBeforeImport()
       const successCount = await createClassesFromExcel(excelData)
       
       // Refresh the list
@@ -530,32 +529,12 @@ const ScheduleManagement = () => {
       }
     } catch (error) {
       console.error('Error creating classes:', error)
-      alert('❌ Có lỗi xảy ra khi tạo lớp học. Vui lòng kiểm tra console (F12) để biết chi tiết.')
+      alert(`❌ Có lỗi xảy ra khi tạo lớp học: ${error instanceof Error ? error.message : 'Không rõ nguyên nhân'}`)
     } finally {
       setCreateLoading(false)
     }
   }
 
-  const clearAllClassesBeforeImport = async () => {
-    const deleteRegistersResponse = await fetch(
-      '/api/classes/actions/delete-all-registers/',
-      getAuthRequestOptions({ method: 'DELETE' })
-    )
-    if (!deleteRegistersResponse.ok) {
-      const errorText = await deleteRegistersResponse.text()
-      throw new Error(`Không thể xóa toàn bộ class-registers: ${errorText}`)
-    }
-
-    const deleteClassesResponse = await fetch(
-      '/api/classes/actions/delete-all-classes/',
-      getAuthRequestOptions({ method: 'DELETE' })
-    )
-    if (!deleteClassesResponse.ok) {
-      const errorText = await deleteClassesResponse.text()
-      throw new Error(`Không thể xóa toàn bộ classes: ${errorText}`)
-    }
-  }
-
   const createSubjectIfNotExists = async (subjectCode: string, subjectName: string): Promise<number> => {
     try {
       // Create a new subject
@@ -593,7 +572,6 @@ const ScheduleManagement = () => {
   }
 
   const createClassesFromExcel = async (excelData: any[]): Promise<number> => {
-    let successCount = 0
     const errors: { class_code: string, reason: string }[] = []
     
     // First, get all subjects to map subject_code to subject_id
@@ -612,107 +590,129 @@ const ScheduleManagement = () => {
     }
     
     console.log(` Starting bulk upload: ${excelData.length} classes`)
-    
-    for (let i = 0; i < excelData.length; i++) {
-      const row = excelData[i]
-      const classCode = row.class_code || `Row_${i + 1}`
-      
-      try {
-        // Validation: Check required fields
-        if (!row.class_code || !row.subject_name || !row.subject_code) {
-          errors.push({ class_code: classCode, reason: '❌ Missing required fields (class_code, subject_name, subject_code)' })
-          console.warn(`⚠️ Skipping ${classCode}: Missing required fields`)
-          continue
-        }
-        
-        // Map subject_code to subject_id, create new subject if not found
-        let subjectId = subjectsMap[row.subject_code]
-        if (!subjectId) {
-          console.warn(`⚠️ Subject not found for code: ${row.subject_code}, creating new subject...`)
-          subjectId = await createSubjectIfNotExists(row.subject_code, row.subject_name)
-          subjectsMap[row.subject_code] = subjectId // Cache for future use
-        }
 
-        // Map Excel fields to API fields according to ClassCreate schema
-        const asOptionalString = (value: unknown): string | undefined => {
-          if (value === null || value === undefined) return undefined
-          const normalized = String(value).trim()
-          if (!normalized) return undefined
-          const lowered = normalized.toLowerCase()
-          if (['null', 'none', 'n/a', 'na', '-', '--'].includes(lowered)) return undefined
-          return normalized
-        }
+    const asOptionalString = (value: unknown): string | undefined => {
+      if (value === null || value === undefined) return undefined
+      const normalized = String(value).trim()
+      if (!normalized) return undefined
+      const lowered = normalized.toLowerCase()
+      if (['null', 'none', 'n/a', 'na', '-', '--'].includes(lowered)) return undefined
+      return normalized
+    }
 
-        const asOptionalStringList = (value: unknown): string[] | undefined => {
-          const normalized = asOptionalString(value)
-          return normalized ? [normalized] : undefined
-        }
+    const asOptionalStringList = (value: unknown): string[] | undefined => {
+      const normalized = asOptionalString(value)
+      return normalized ? [normalized] : undefined
+    }
 
-        const asOptionalWeekList = (value: unknown): number[] | undefined => {
-          if (!Array.isArray(value)) return undefined
-          const cleaned = value.filter((item) => Number.isInteger(item) && item > 0)
-          return cleaned.length > 0 ? cleaned : undefined
-        }
+    const asOptionalWeekList = (value: unknown): number[] | undefined => {
+      if (!Array.isArray(value)) return undefined
+      const cleaned = value.filter((item) => Number.isInteger(item) && item > 0)
+      return cleaned.length > 0 ? cleaned : undefined
+    }
 
-        const asTimeOrMidnight = (value: unknown): string => {
-          const normalized = asOptionalString(value)
-          return normalized ?? '00:00'
-        }
+    const asTimeOrMidnight = (value: unknown): string => {
+      const normalized = asOptionalString(value)
+      return normalized ?? '00:00'
+    }
 
-        const classData = {
-          // Required fields mapped from Excel
-          class_id: row.class_code,
-          class_name: row.subject_name,
-          subject_id: subjectId,
-          
-          // Optional fields mapped from Excel
-          linked_class_ids: asOptionalStringList(row.class_code_attached),
-          class_type: asOptionalString(row.class_type),
-          classroom: asOptionalString(row.room),
-          study_date: asOptionalString(row.day_of_week_converted),
-          study_time_start: asTimeOrMidnight(row.study_time_start),
-          study_time_end: asTimeOrMidnight(row.study_time_end),
-          teacher_name: asOptionalString(row.teacher_name),
-          study_week: asOptionalWeekList(row.study_weeks) ?? []
-        }
+    const rows: any[] = []
+    for (let i = 0; i < excelData.length; i++) {
+      const row = excelData[i]
+      const classCode = row.class_code || `Row_${i + 1}`
+
+      // Validation: Check required fields
+      if (!row.class_code || !row.subject_name || !row.subject_code) {
+        errors.push({ class_code: classCode, reason: '❌ Missing required fields (class_code, subject_name, subject_code)' })
+        console.warn(`⚠️ Skipping ${classCode}: Missing required fields`)
+        continue
+      }
 
-        console.log(`📤 [${i + 1}/${excelData.length}] Creating class: ${classCode}`)
+      // Map subject_code to subject_id, create new subject if not found
+      let subjectId = subjectsMap[row.subject_code]
+      if (!subjectId) {
+        console.warn(`⚠️ Subject not found for code: ${row.subject_code}, creating new subject...`)
+        subjectId = await createSubjectIfNotExists(row.subject_code, row.subject_name)
+        subjectsMap[row.subject_code] = subjectId // Cache for future use
+      }
 
-        const response = await fetch('/api/classes/', {
-          method: 'POST',
-          headers: {
-            'Content-Type': 'application/json',
-          },
-          body: JSON.stringify(classData),
-        })
+      // Map Excel fields to API fields according to ClassCreate schema
+      rows.push({
+        class_id: row.class_code,
+        class_name: row.subject_name,
+        subject_id: subjectId,
+        linked_class_ids: asOptionalStringList(row.class_code_attached),
+        class_type: asOptionalString(row.class_type),
+        classroom: asOptionalString(row.room),
+        study_date: asOptionalString(row.day_of_week_converted),
+        study_time_start: asTimeOrMidnight(row.study_time_start),
+        study_time_end: asTimeOrMidnight(row.study_time_end),
+        teacher_name: asOptionalString(row.teacher_name),
+        study_week: asOptionalWeekList(row.study_weeks) ?? []
+      })
+    }
 
-        if (response.ok) {
-          successCount++
-          console.log(`✅ [${i + 1}/${excelData.length}] Success: ${classCode}`)
-        } else {
-          const errorText = await response.text()
-          let errorReason = '❌ Server error'
-          
-          try {
-            const errorJson = JSON.parse(errorText)
-            errorReason = `❌ ${errorJson.detail || errorText}`
-          } catch {
-            errorReason = `❌ ${errorText.substring(0, 100)}`
-          }
-          
-          errors.push({ class_code: classCode, reason: errorReason })
-          console.error(`❌ [${i + 1}/${excelData.length}] Failed: ${classCode} - ${errorReason}`)
-        }
-      } catch (error) {
-        const errorMsg = error instanceof Error ? error.message : String(error)
-        errors.push({ class_code: classCode, reason: `❌ Exception: ${errorMsg}` })
-        console.error(`❌ [${i + 1}/${excelData.length}] Exception: ${classCode}`, error)
+    // One upsert request for the whole timetable; prune removes sessions that are
+    // no longer in the file while keeping registrations of the classes that stay.
+    // Prune only when every row is valid, and only after the admin confirms the
+    // sessions it would delete (a skipped row would otherwise count as "removed").
+    let prune = false
+    if (errors.length === 0 && rows.length > 0) {
+      const previewResponse = await fetch('/api/classes/bulk/prune-preview', getAuthRequestOptions({
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ rows }),
+      }))
+      if (!previewResponse.ok) {
+        throw new Error(`Không kiểm tra được các buổi học sẽ bị xóa: ${await previewResponse.text()}`)
+      }
+      const preview = await previewResponse.json()
+      if (preview.can_prune && preview.sessions_to_delete === 0) {
+        prune = true
+      } else if (preview.can_prune) {
+        const sample = (preview.sessions as { class_id: string, class_name: string, study_date: string, study_time_start: string | null }[])
+          .slice(0, 10)
+          .map(s => `• ${s.class_id} - ${s.class_name} (${s.study_date || '?'} ${s.study_time_start ?? ''})`)
+          .join('\n')
+        const remaining = preview.sessions_to_delete > 10 ? `\n... và ${preview.sessions_to_delete - 10} buổi khác` : ''
+        prune = window.confirm(
+          `File không còn ${preview.sessions_to_delete} buổi học đang có trong hệ thống ` +
+          `(kèm ${preview.registrations_to_delete} đăng ký lớp):\n\n${sample}${remaining}\n\n` +
+          `OK: xóa các buổi học này. Hủy: chỉ thêm/cập nhật, giữ nguyên các buổi học cũ.`
+        )
       }
     }
-    
+
+    const response = await fetch('/api/classes/bulk', getAuthRequestOptions({
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ rows, prune }),
+    }))
+    if (!response.ok) {
+      // 409: DB chưa có key buổi học — detail nêu script cần chạy (scripts/db/add_class_session_key.py)
+      const body = await response.text()
+      let detail = body
+      try {
+        detail = JSON.parse(body).detail ?? body
+      } catch {
+        // not JSON, keep the raw text
+      }
+      throw new Error(`Import thời khóa biểu thất bại: ${detail}`)
+    }
+
+    const result = await response.json()
+    const successCount = result.inserted + result.updated
+    for (const error of result.errors as { class_id: string | null, error: string }[]) {
+      errors.push({ class_code: error.class_id ?? '?', reason: `❌ ${error.error}` })
+    }
+
     // Display detailed summary
     console.log(`\n📊 Upload Summary:`)
-    console.log(`✅ Success: ${successCount}/${excelData.length}`)
+    console.log(`✅ Success: ${successCount}/${excelData.length} (${result.inserted} new, ${result.updated} updated, ${result.deleted} removed)`)
     console.log(`❌ Failed: ${errors.length}/${excelData.length}`)
     
     if (errors.length > 0) {
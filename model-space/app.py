@@ -1,11 +1,17 @@
 import json
 import asyncio
+import hashlib
+import itertools
 import os
+import queue
 import re
-from threading import Lock
-from typing import Any, Dict, List, Optional
+import time
+from collections import OrderedDict
+from threading import Event, Lock, Thread
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
 
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
 try:
@@ -24,11 +30,16 @@ TOP_P = float(os.getenv("LLAMA_TOP_P", "0.9"))
 REPEAT_PENALTY = float(os.getenv("LLAMA_REPEAT_PENALTY", "1.08"))
 DEFAULT_GENERATE_TEMPERATURE = float(os.getenv("LLAMA_GENERATE_TEMPERATURE", "0.2"))
 DEFAULT_FAST_TEMPERATURE = float(os.getenv("LLAMA_FAST_TEMPERATURE", "0.0"))
-MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "2"))
+MAX_QUEUE_DEPTH = int(os.getenv("MAX_QUEUE_DEPTH", "64"))
+MAX_FAST_BATCH = int(os.getenv("MAX_FAST_BATCH", "8"))
+BUSY_RETRY_AFTER_SECONDS = int(os.getenv("BUSY_RETRY_AFTER_SECONDS", "2"))
 WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").strip().lower() == "true"
 INFERENCE_TIMEOUT_SPLIT = float(os.getenv("INFERENCE_TIMEOUT_SPLIT", "8"))
 INFERENCE_TIMEOUT_CLASSIFY = float(os.getenv("INFERENCE_TIMEOUT_CLASSIFY", "8"))
 INFERENCE_TIMEOUT_GENERATE = float(os.getenv("INFERENCE_TIMEOUT_GENERATE", "20"))
+PREFIX_CACHE_ENABLED = os.getenv("PREFIX_CACHE_ENABLED", "true").strip().lower() == "true"
+PREFIX_CACHE_MAX_STATES = int(os.getenv("PREFIX_CACHE_MAX_STATES", "8"))
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "512"))
 
 ALLOWED_INTENTS = [
     "grade_view",
@@ -43,10 +54,25 @@ ALLOWED_INTENTS = [
     "unknown",
 ]
 
+CLASSIFY_SYSTEM_PROMPT = (
+    "Bạn là bộ phân loại intent cho chatbot trường đại học. "
+    "Chỉ trả về JSON hợp lệ, không markdown, không giải thích. "
+    f"Intent hợp lệ: {', '.join(ALLOWED_INTENTS)}."
+)
+SPLIT_SYSTEM_PROMPT = (
+    "Bạn tách câu hỏi phức hợp thành danh sách các câu hỏi đơn. "
+    "Chỉ trả về JSON hợp lệ, không markdown, không giải thích."
+)
+GENERATE_SYSTEM_PROMPT = (
+    "Bạn là trợ lý trả lời tiếng Việt. "
+    "Ưu tiên chính xác, ngắn gọn, không lặp, không bịa dữ liệu, không nhắc tới prompt nội bộ."
+)
+
 _llm: Optional[Llama] = None
 _llm_lock = Lock()
+# One Llama context: evaluation + KV state swaps must not interleave across threads
+_inference_lock = Lock()
 _loaded_at: Optional[str] = None
-_request_semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
 
 app = FastAPI(title="Qwen2 Agent Space", version="1.0.0")
 
@@ -74,6 +100,7 @@ class GenerateRequest(BaseModel):
     top_p: float = Field(default=TOP_P, ge=0.0, le=1.0)
     repeat_penalty: float = Field(default=REPEAT_PENALTY, ge=1.0, le=2.0)
     stop: Optional[List[str]] = None
+    stream: bool = False
 
 
 def _load_llm() -> Llama:
@@ -120,6 +147,102 @@ def _safe_json_loads(text: str) -> Dict[str, Any]:
         raise
 
 
+class PromptPrefixCache:
+    """
+    Saved KV states for system-prompt prefixes (llama-cpp save_state/load_state).
+
+    create_chat_completion only re-evaluates the tokens after the longest
+    common prefix with what the context currently holds. Alternating
+    /classify, /split and /generate keeps changing that prefix, so every call
+    re-evaluated its system prompt. Before a completion, the state saved right
+    after the endpoint's prefix is restored, leaving only the user suffix to
+    evaluate. States are kept in LRU order (PREFIX_CACHE_MAX_STATES).
+
+    Callers must hold _inference_lock.
+    """
+
+    def __init__(self, max_states: int = PREFIX_CACHE_MAX_STATES):
+        self.max_states = max_states
+        self._states: "OrderedDict[str, Any]" = OrderedDict()
+        self._active_key: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def chatml_prefix(system_prompt: str) -> str:
+        # Same layout as llama-cpp's "chatml" formatter, up to the user content
+        return f"<|im_start|>system\n{system_prompt}<|im_end|>\n<|im_start|>user\n"
+
+    def prepare(self, llm: Any, system_prompt: str) -> None:
+        key = hashlib.sha1(system_prompt.encode("utf-8")).hexdigest()
+        if key == self._active_key:
+            # Context still holds this prefix from the previous call
+            self.hits += 1
+            return
+
+        state = self._states.get(key)
+        if state is not None:
+            llm.load_state(state)
+            self._states.move_to_end(key)
+            self.hits += 1
+        else:
+            tokens = llm.tokenize(self.chatml_prefix(system_prompt).encode("utf-8"), add_bos=True, special=True)
+            llm.reset()
+            llm.eval(tokens)
+            self._states[key] = llm.save_state()
+            while len(self._states) > self.max_states:
+                self._states.popitem(last=False)
+            self.misses += 1
+        self._active_key = key
+
+    def invalidate(self) -> None:
+        """Context no longer starts with a cached prefix (error mid-evaluation)."""
+        self._active_key = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"states": len(self._states), "hits": self.hits, "misses": self.misses}
+
+
+class ResultCache:
+    """LRU of deterministic (temperature 0) /classify and /split responses."""
+
+    def __init__(self, max_size: int = RESULT_CACHE_SIZE):
+        self.max_size = max_size
+        self._items: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> Optional[Dict[str, Any]]:
+        value = self._items.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return dict(value)
+
+    def put(self, key: tuple, value: Dict[str, Any]) -> None:
+        if self.max_size <= 0:
+            return
+        self._items[key] = dict(value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._items), "hits": self.hits, "misses": self.misses}
+
+
+_prefix_cache = PromptPrefixCache()
+_result_cache = ResultCache()
+
+
+def _result_cache_key(endpoint: str, request: BaseModel) -> Optional[tuple]:
+    if request.temperature != 0.0:
+        return None
+    return (endpoint, request.text.strip(), request.max_tokens, request.top_p, request.repeat_penalty)
+
+
 def _chat_completion_sync(
     system_prompt: str,
     user_prompt: str,
@@ -128,23 +251,243 @@ def _chat_completion_sync(
     top_p: float,
     repeat_penalty: float,
     stop: Optional[List[str]] = None,
+    on_delta: Optional[Callable[[str], None]] = None,
 ) -> str:
+    """
+    Run one completion on the shared Llama. With ``on_delta`` the completion is
+    streamed and every token piece is handed to the callback as it is decoded;
+    the callback may raise to abort generation (client went away).
+    """
     llm = _load_llm()
-    response = llm.create_chat_completion(
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        max_tokens=max_tokens,
-        temperature=temperature,
-        top_p=top_p,
-        repeat_penalty=repeat_penalty,
-        stop=stop,
-    )
+    with _inference_lock:
+        try:
+            if PREFIX_CACHE_ENABLED:
+                _prefix_cache.prepare(llm, system_prompt)
+            response = llm.create_chat_completion(
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+                max_tokens=max_tokens,
+                temperature=temperature,
+                top_p=top_p,
+                repeat_penalty=repeat_penalty,
+                stop=list(stop) if stop else None,
+                stream=on_delta is not None,
+            )
+            if on_delta is not None:
+                pieces = []
+                for chunk in response:
+                    piece = chunk["choices"][0].get("delta", {}).get("content")
+                    if piece:
+                        pieces.append(piece)
+                        on_delta(piece)
+                return "".join(pieces).strip()
+        except Exception:
+            _prefix_cache.invalidate()
+            raise
     content = response["choices"][0]["message"]["content"]
     return content.strip()
 
 
+PRIORITY_FAST = 0      # /classify, /split
+PRIORITY_GENERATE = 1  # /generate
+
+
+class SchedulerBusyError(RuntimeError):
+    pass
+
+
+class _InferenceJob:
+    __slots__ = ("priority", "deadline", "seq", "args", "future", "loop", "enqueued_at", "abandoned")
+
+    def __init__(self, priority: int, deadline: float, seq: int, args: tuple, future: Any, loop: Any):
+        self.priority = priority
+        self.deadline = deadline
+        self.seq = seq
+        self.args = args
+        self.future = future
+        self.loop = loop
+        self.enqueued_at = time.monotonic()
+        self.abandoned = False
+
+    def __lt__(self, other: "_InferenceJob") -> bool:
+        return (self.priority, self.deadline, self.seq) < (other.priority, other.deadline, other.seq)
+
+
+class InferenceScheduler:
+    """
+    Single inference worker in front of the shared Llama instance.
+
+    Requests wait in a priority queue (fast endpoints ahead of /generate,
+    earliest deadline first within a priority) and one thread runs them, so
+    the Llama context is never used concurrently. Jobs whose caller timeout
+    has already expired, or whose caller gave up, are dropped unrun.
+
+    Micro-batching: llama-cpp-python runs one sequence per
+    create_chat_completion, so instead of multi-sequence decoding the worker
+    drains queued fast jobs sharing the same system prompt into one batch.
+    They run back-to-back on the restored prompt prefix, and identical
+    requests in a batch are computed once.
+    """
+
+    def __init__(self, run: Any, max_queue_depth: int = MAX_QUEUE_DEPTH, max_batch: int = MAX_FAST_BATCH):
+        self._run = run
+        self.max_queue_depth = max_queue_depth
+        self.max_batch = max(1, max_batch)
+        self._queue: "queue.PriorityQueue[_InferenceJob]" = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._thread: Optional[Thread] = None
+        self._start_lock = Lock()
+        self._stats_lock = Lock()
+        self._processed = 0
+        self._dropped = 0
+        self._deduplicated = 0
+        self._batches = 0
+        self._batched_jobs = 0
+        self._wait_totals = {PRIORITY_FAST: 0.0, PRIORITY_GENERATE: 0.0}
+        self._wait_counts = {PRIORITY_FAST: 0, PRIORITY_GENERATE: 0}
+        self._wait_max = {PRIORITY_FAST: 0.0, PRIORITY_GENERATE: 0.0}
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = Thread(target=self._worker, name="inference-worker", daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        with self._start_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_InferenceJob(-1, 0.0, -1, (), None, None))
+            thread.join(timeout=5)
+        # The stop sentinel sorts ahead of every job, so whatever is still queued
+        # would never run: fail those callers now instead of leaving them hanging.
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job.future is not None:
+                self._resolve(job, error=SchedulerBusyError("inference scheduler stopped"))
+
+    def is_full(self) -> bool:
+        return self._queue.qsize() >= self.max_queue_depth
+
+    async def submit(self, args: tuple, priority: int, timeout_seconds: float) -> str:
+        if self.is_full():
+            raise SchedulerBusyError("inference queue is full")
+        loop = asyncio.get_running_loop()
+        job = _InferenceJob(priority, time.monotonic() + timeout_seconds, next(self._seq), args, loop.create_future(), loop)
+        self.start()
+        self._queue.put(job)
+        try:
+            return await asyncio.wait_for(job.future, timeout=timeout_seconds)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            job.abandoned = True
+            raise
+
+    # ── worker thread ────────────────────────────────────────────────────────
+    def _worker(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job.priority < 0:
+                return
+            batch = [job]
+            if job.priority == PRIORITY_FAST:
+                deferred = []
+                while len(batch) < self.max_batch:
+                    try:
+                        candidate = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if candidate.priority == PRIORITY_FAST and candidate.args[0] == job.args[0]:
+                        batch.append(candidate)
+                    else:
+                        deferred.append(candidate)
+                        if candidate.priority != PRIORITY_FAST:
+                            break
+                for candidate in deferred:
+                    self._queue.put(candidate)
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[_InferenceJob]) -> None:
+        # Stats are updated before each future resolves so callers see them
+        if len(batch) > 1:
+            with self._stats_lock:
+                self._batches += 1
+                self._batched_jobs += len(batch)
+
+        computed: Dict[tuple, Any] = {}
+        for job in batch:
+            now = time.monotonic()
+            if job.abandoned or now >= job.deadline:
+                with self._stats_lock:
+                    self._dropped += 1
+                self._resolve(job, error=TimeoutError("request deadline expired in queue"))
+                continue
+
+            self._record_wait(job, now - job.enqueued_at)
+            if job.args in computed:
+                with self._stats_lock:
+                    self._deduplicated += 1
+                value, error = computed[job.args]
+            else:
+                try:
+                    value, error = self._run(*job.args), None
+                except Exception as exc:
+                    value, error = None, exc
+                computed[job.args] = (value, error)
+                with self._stats_lock:
+                    self._processed += 1
+            self._resolve(job, value=value, error=error)
+
+    def _record_wait(self, job: _InferenceJob, waited: float) -> None:
+        with self._stats_lock:
+            self._wait_totals[job.priority] += waited
+            self._wait_counts[job.priority] += 1
+            self._wait_max[job.priority] = max(self._wait_max[job.priority], waited)
+
+    @staticmethod
+    def _resolve(job: _InferenceJob, value: Any = None, error: Optional[BaseException] = None) -> None:
+        def _set() -> None:
+            if job.future.done():
+                return
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(value)
+
+        try:
+            job.loop.call_soon_threadsafe(_set)
+        except RuntimeError:
+            pass  # caller's event loop already closed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            wait_ms = {}
+            for priority, label in ((PRIORITY_FAST, "fast"), (PRIORITY_GENERATE, "generate")):
+                count = self._wait_counts[priority]
+                wait_ms[label] = {
+                    "count": count,
+                    "avg": round(self._wait_totals[priority] / count * 1000, 2) if count else 0.0,
+                    "max": round(self._wait_max[priority] * 1000, 2),
+                }
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "processed": self._processed,
+                "dropped_expired": self._dropped,
+                "deduplicated": self._deduplicated,
+                "batches": self._batches,
+                "avg_batch_size": round(self._batched_jobs / self._batches, 2) if self._batches else 0.0,
+                "wait_ms": wait_ms,
+            }
+
+
+_scheduler = InferenceScheduler(lambda *args: _chat_completion_sync(*args))
+
+
 async def _chat_completion(
     system_prompt: str,
     user_prompt: str,
@@ -154,21 +497,91 @@ async def _chat_completion(
     repeat_penalty: float,
     timeout_seconds: float,
     stop: Optional[List[str]] = None,
+    priority: int = PRIORITY_GENERATE,
+    on_delta: Optional[Callable[[str], None]] = None,
 ) -> str:
-    async with _request_semaphore:
-        return await asyncio.wait_for(
-            asyncio.to_thread(
-                _chat_completion_sync,
-                system_prompt,
-                user_prompt,
-                max_tokens,
-                temperature,
-                top_p,
-                repeat_penalty,
-                stop,
-            ),
-            timeout=timeout_seconds,
+    args = (
+        system_prompt,
+        user_prompt,
+        max_tokens,
+        temperature,
+        top_p,
+        repeat_penalty,
+        tuple(stop) if stop else None,
+    )
+    if on_delta is not None:
+        # The callback makes the job unique, so streamed jobs are never deduplicated.
+        args += (on_delta,)
+    return await _scheduler.submit(args, priority=priority, timeout_seconds=timeout_seconds)
+
+
+class _StreamClosed(Exception):
+    pass
+
+
+def _http_error(action: str, exc: Exception) -> HTTPException:
+    """503 + Retry-After when the inference queue is full or stopping, otherwise 500."""
+    if isinstance(exc, SchedulerBusyError):
+        return HTTPException(
+            status_code=503,
+            detail=f"{action} unavailable: {exc}",
+            headers={"Retry-After": str(BUSY_RETRY_AFTER_SECONDS)},
+        )
+    return HTTPException(status_code=500, detail=f"{action} failed: {exc}")
+
+
+def _sse(payload: Dict[str, Any]) -> str:
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+async def _stream_generate(request: GenerateRequest) -> AsyncIterator[str]:
+    """
+    SSE body for /generate with stream=true: one ``{"delta": ...}`` event per
+    decoded piece, then ``{"done": true, "text": ...}`` or ``{"error": ...}``.
+    The worker thread pushes pieces through call_soon_threadsafe before it
+    resolves the job future, so every delta is queued before completion.
+    """
+    loop = asyncio.get_running_loop()
+    deltas: "asyncio.Queue[str]" = asyncio.Queue()
+    closed = Event()
+
+    def on_delta(piece: str) -> None:
+        if closed.is_set():
+            raise _StreamClosed("client disconnected")
+        loop.call_soon_threadsafe(deltas.put_nowait, piece)
+
+    completion = asyncio.ensure_future(
+        _chat_completion(
+            system_prompt=GENERATE_SYSTEM_PROMPT,
+            user_prompt=request.prompt,
+            max_tokens=request.max_tokens,
+            temperature=request.temperature,
+            top_p=request.top_p,
+            repeat_penalty=request.repeat_penalty,
+            timeout_seconds=INFERENCE_TIMEOUT_GENERATE,
+            stop=request.stop,
+            on_delta=on_delta,
         )
+    )
+    try:
+        while True:
+            getter = asyncio.ensure_future(deltas.get())
+            done, _ = await asyncio.wait({getter, completion}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                yield _sse({"delta": getter.result()})
+                continue
+            getter.cancel()
+            break
+        while not deltas.empty():
+            yield _sse({"delta": deltas.get_nowait()})
+        try:
+            yield _sse({"done": True, "text": completion.result()})
+        except Exception as exc:
+            yield _sse({"error": f"generation failed: {exc}"})
+    finally:
+        closed.set()
+        if not completion.done():
+            completion.cancel()
 
 
 @app.on_event("startup")
@@ -185,10 +598,28 @@ async def _warmup() -> None:
                 repeat_penalty=1.0,
                 timeout_seconds=min(INFERENCE_TIMEOUT_CLASSIFY, 5.0),
                 stop=["\n"],
+                priority=PRIORITY_FAST,
             )
         except Exception:
             # Warmup failure should not crash startup; readiness/health will expose degraded status.
             pass
+        if PREFIX_CACHE_ENABLED:
+            await asyncio.to_thread(_prefill_prefix_states)
+
+
+@app.on_event("shutdown")
+def _stop_scheduler() -> None:
+    _scheduler.stop()
+
+
+def _prefill_prefix_states() -> None:
+    llm = _load_llm()
+    with _inference_lock:
+        for system_prompt in (CLASSIFY_SYSTEM_PROMPT, SPLIT_SYSTEM_PROMPT, GENERATE_SYSTEM_PROMPT):
+            try:
+                _prefix_cache.prepare(llm, system_prompt)
+            except Exception:
+                _prefix_cache.invalidate()
 
 
 @app.get("/")
@@ -200,7 +631,7 @@ def root() -> Dict[str, Any]:
         "n_batch": N_BATCH,
         "n_threads": N_THREADS,
         "loaded": _llm is not None,
-        "max_concurrent_requests": MAX_CONCURRENT_REQUESTS,
+        "max_queue_depth": MAX_QUEUE_DEPTH,
     }
 
 
@@ -210,17 +641,21 @@ def health() -> Dict[str, Any]:
         "status": "healthy" if _llm is not None else "degraded",
         "loaded": _llm is not None,
         "warmup_on_startup": WARMUP_ON_STARTUP,
-        "max_concurrent_requests": MAX_CONCURRENT_REQUESTS,
+        "scheduler": _scheduler.stats(),
+        "prefix_cache": _prefix_cache.stats() if PREFIX_CACHE_ENABLED else None,
+        "result_cache": _result_cache.stats(),
     }
 
 
 @app.post("/classify")
 async def classify(request: ClassifyRequest) -> Dict[str, Any]:
-    system_prompt = (
-        "Bạn là bộ phân loại intent cho chatbot trường đại học. "
-        "Chỉ trả về JSON hợp lệ, không markdown, không giải thích. "
-        f"Intent hợp lệ: {', '.join(ALLOWED_INTENTS)}."
-    )
+    cache_key = _result_cache_key("classify", request)
+    if cache_key is not None:
+        cached = _result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    system_prompt = CLASSIFY_SYSTEM_PROMPT
     user_prompt = (
         "Phân loại đoạn văn sau vào đúng 1 intent. "
         "Trả về JSON đúng định dạng: {\"intent\": \"...\", \"confidence\": 0.0}.\n\n"
@@ -236,7 +671,8 @@ async def classify(request: ClassifyRequest) -> Dict[str, Any]:
             top_p=request.top_p,
             repeat_penalty=request.repeat_penalty,
             timeout_seconds=INFERENCE_TIMEOUT_CLASSIFY,
-            stop=["\n"]
+            stop=["\n"],
+            priority=PRIORITY_FAST,
         )
         parsed = _safe_json_loads(content)
         intent = str(parsed.get("intent") or "unknown")
@@ -247,17 +683,23 @@ async def classify(request: ClassifyRequest) -> Dict[str, Any]:
             confidence = float(confidence)
         except Exception:
             confidence = 0.0
-        return {"intent": intent, "confidence": confidence, "text": content}
+        result = {"intent": intent, "confidence": confidence, "text": content}
+        if cache_key is not None:
+            _result_cache.put(cache_key, result)
+        return result
     except Exception as exc:
-        raise HTTPException(status_code=500, detail=f"classification failed: {exc}") from exc
+        raise _http_error("classification", exc) from exc
 
 
 @app.post("/split")
 async def split(request: SplitRequest) -> Dict[str, Any]:
-    system_prompt = (
-        "Bạn tách câu hỏi phức hợp thành danh sách các câu hỏi đơn. "
-        "Chỉ trả về JSON hợp lệ, không markdown, không giải thích."
-    )
+    cache_key = _result_cache_key("split", request)
+    if cache_key is not None:
+        cached = _result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    system_prompt = SPLIT_SYSTEM_PROMPT
     user_prompt = (
         "Tách văn bản sau thành mảng JSON tên là segments. "
         "Nếu chỉ có 1 ý, trả về đúng 1 phần tử.\n\n"
@@ -274,7 +716,8 @@ async def split(request: SplitRequest) -> Dict[str, Any]:
             top_p=request.top_p,
             repeat_penalty=request.repeat_penalty,
             timeout_seconds=INFERENCE_TIMEOUT_SPLIT,
-            stop=["\n"]
+            stop=["\n"],
+            priority=PRIORITY_FAST,
         )
         parsed = _safe_json_loads(content)
         segments = parsed.get("segments") or []
@@ -283,17 +726,27 @@ async def split(request: SplitRequest) -> Dict[str, Any]:
         segments = [str(segment).strip() for segment in segments if str(segment).strip()]
         if not segments:
             segments = [request.text.strip()]
-        return {"segments": segments, "text": content}
+        result = {"segments": segments, "text": content}
+        if cache_key is not None:
+            _result_cache.put(cache_key, result)
+        return result
     except Exception as exc:
-        raise HTTPException(status_code=500, detail=f"split failed: {exc}") from exc
+        raise _http_error("split", exc) from exc
 
 
 @app.post("/generate")
-async def generate(request: GenerateRequest) -> Dict[str, Any]:
-    system_prompt = (
-        "Bạn là trợ lý trả lời tiếng Việt. "
-        "Ưu tiên chính xác, ngắn gọn, không lặp, không bịa dữ liệu, không nhắc tới prompt nội bộ."
-    )
+async def generate(request: GenerateRequest) -> Any:
+    if request.stream:
+        # Once the stream starts the status is 200, so a full queue is refused up front
+        if _scheduler.is_full():
+            raise _http_error("generation", SchedulerBusyError("inference queue is full"))
+        return StreamingResponse(
+            _stream_generate(request),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    system_prompt = GENERATE_SYSTEM_PROMPT
     try:
         content = await _chat_completion(
             system_prompt=system_prompt,
@@ -307,4 +760,4 @@ async def generate(request: GenerateRequest) -> Dict[str, Any]:
         )
         return {"text": content}
     except Exception as exc:
-        raise HTTPException(status_code=500, detail=f"generation failed: {exc}") from exc
\ No newline at end of file
+        raise _http_error("generation", exc) from exc
\ No newline at end of file